@@ -19,6 +19,15 @@ class Settings(BaseSettings):
     eventos_topico_influencers: str = "eventos-crear-influencer"
     pulsar_address: str = "pulsar"  # Variable de entorno PULSAR_ADDRESS
     pulsar_broker: str = "pulsar:6650"  # Valor por defecto
+    pulsar_consumidor_tamano_cola: int = 1000  # receiver_queue_size (prefetch) de cada suscripción
+    pulsar_consumidor_concurrencia: int = 1  # Hilos por suscripción
+    pulsar_consumidor_pausa_error_segundos: float = 5  # Solo errores de recepción (conexión con el broker)
+    pulsar_consumidor_max_intentos: int = 5  # Intentos antes de mover el mensaje a la DLQ
+    pulsar_consumidor_retardo_base_ms: int = 500
+    pulsar_consumidor_retardo_maximo_ms: int = 60000
+    pulsar_flujo_latencia_maxima_ms: int = 2000  # Latencia del manejador que reduce la ventana en vuelo; 0 la ignora
+    pulsar_flujo_factor_reduccion: float = 0.5
+    pulsar_flujo_pausa_ms: int = 2000  # Pausa de la suscripción cuando la ventana ya es 1
     
     # Logging
     log_level: str = "INFO"
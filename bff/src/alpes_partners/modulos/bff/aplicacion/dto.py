@@ -3,7 +3,7 @@ DTOs para el BFF.
 """
 
 from pydantic import BaseModel, Field
-from typing import List
+from typing import List, Optional
 
 
 class CrearInfluencerRequest(BaseModel):
@@ -23,6 +23,7 @@ class CrearInfluencerResponse(BaseModel):
     """Response del endpoint de crear influencer."""
     success: bool = Field(..., description="Indica si la operación fue exitosa")
     message: str = Field(..., description="Mensaje descriptivo del resultado")
+    id_correlacion: Optional[str] = Field(default=None, description="ID de correlación para seguir el flujo")
 
 
 class HealthResponse(BaseModel):
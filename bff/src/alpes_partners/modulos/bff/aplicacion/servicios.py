@@ -53,7 +53,7 @@ class BFFService:
             logger.info(f"Creando influencer: {id_influencer}")
             
             # Enviar evento a Pulsar
-            self.pulsar_service.enviar_evento_crear_influencer(
+            id_correlacion = self.pulsar_service.enviar_evento_crear_influencer(
                 id_influencer=id_influencer,
                 nombre=nombre,
                 email=email,
@@ -66,7 +66,8 @@ class BFFService:
             
             return {
                 "success": True,
-                "message": "Influencer procesado"
+                "message": "Influencer procesado",
+                "id_correlacion": id_correlacion
             }
             
         except Exception as e:
@@ -5,15 +5,13 @@ Se suscribe al tópico eventos-contratos y mantiene una lista de contratos actua
 
 import logging
 import threading
-import time
 from typing import List, Dict, Any
 from datetime import datetime
 
-import pulsar
-import _pulsar
 from pulsar.schema import AvroSchema
 
-from alpes_partners.config.settings import settings
+from alpes_partners.seedwork.infraestructura.consumidores import runtime_consumidores
+from alpes_partners.seedwork.infraestructura.contexto import PROPIEDAD_CORRELACION
 from .schema.v1.eventos import EventoContratoCreado, EventoContratoError
 
 logger = logging.getLogger(__name__)
@@ -23,93 +21,49 @@ class ConsumidorContratosBFF:
     
     def __init__(self):
         self.ultimo_evento: Dict[str, Any] = None
-        self.cliente = None
-        self.consumidor = None
-        self.hilo_consumidor = None
         self.ejecutando = False
+        self.registrado = False
         self.lock = threading.Lock()
     
     def iniciar_consumidor(self):
-        """Inicia el consumidor en un hilo separado."""
+        """Registra la suscripción en el runtime de consumidores compartido del proceso."""
         if self.ejecutando:
             logger.warning("El consumidor ya está ejecutándose")
             return
         
+        runtime = runtime_consumidores()
+        if not self.registrado:
+            runtime.registrar(
+                'eventos-contratos',
+                'bff-contratos-stream',
+                AvroSchema(EventoContratoCreado),
+                self._manejar_mensaje,
+                nombre='bff-eventos-contratos',
+            )
+            self.registrado = True
+        # Si la suscripción falla se puede reintentar con otra llamada
+        runtime.iniciar()
         self.ejecutando = True
-        self.hilo_consumidor = threading.Thread(target=self._consumir_eventos, daemon=True)
-        self.hilo_consumidor.start()
-        logger.info("Consumidor de contratos iniciado")
+        logger.info("BFF: Suscrito exitosamente a eventos de contratos")
     
     def detener_consumidor(self):
         """Detiene el consumidor."""
         self.ejecutando = False
-        if self.hilo_consumidor:
-            self.hilo_consumidor.join(timeout=5)
-        if self.cliente:
-            self.cliente.close()
+        runtime_consumidores().detener()
         logger.info("Consumidor de contratos detenido")
     
-    def _consumir_eventos(self):
-        """Método principal del consumidor que se ejecuta en un hilo separado."""
-        try:
-            broker_url = settings.pulsar_address
-            logger.info(f"BFF: Conectando a Pulsar en {broker_url}:6650 para eventos de contratos...")
-            
-            self.cliente = pulsar.Client(f'pulsar://{broker_url}:6650')
-            logger.info("BFF: Cliente Pulsar creado exitosamente")
-            
-            # Suscribirse al tópico de eventos de contratos
-            self.consumidor = self.cliente.subscribe(
-                'eventos-contratos',
-                consumer_type=_pulsar.ConsumerType.Shared,
-                subscription_name='bff-contratos-stream',
-                schema=AvroSchema(EventoContratoCreado)
-            )
-            
-            logger.info("BFF: Suscrito exitosamente a eventos de contratos")
-            logger.info("BFF: Esperando eventos en el tópico 'eventos-contratos'...")
-            
-            while self.ejecutando:
-                try:
-                    # Recibir mensaje con timeout
-                    mensaje = self.consumidor.receive(timeout_millis=1000)
-                    if mensaje:
-                        evento = mensaje.value()
-                        logger.info(f"BFF: ¡Evento de contrato recibido! ID: {getattr(evento, 'id', 'N/A')}")
-                        logger.info(f"BFF: Datos del evento: {evento}")
-                        
-                        # Procesar evento
-                        self._procesar_evento_contrato(evento)
-                        
-                        # Confirmar procesamiento
-                        self.consumidor.acknowledge(mensaje)
-                        logger.info("BFF: Evento de contrato procesado y confirmado")
-                    else:
-                        # Timeout - esto es normal, no es un error
-                        logger.debug("BFF: Timeout esperando eventos (normal)")
-                        
-                except Exception as e:
-                    if "timeout" not in str(e).lower() and "no message" not in str(e).lower():
-                        logger.error(f"BFF: Error procesando evento de contrato: {e}")
-                        import traceback
-                        logger.error(f"BFF: Traceback: {traceback.format_exc()}")
-                    time.sleep(0.1)  # Pequeña pausa para evitar CPU alto
-                    
-        except Exception as e:
-            logger.error(f"BFF: Error crítico en consumidor de contratos: {e}")
-            import traceback
-            logger.error(f"BFF: Traceback completo: {traceback.format_exc()}")
-        finally:
-            if self.cliente:
-                self.cliente.close()
-                logger.info("BFF: Conexión con Pulsar cerrada")
+    def _manejar_mensaje(self, mensaje):
+        evento = mensaje.value()
+        logger.info(f"BFF: ¡Evento de contrato recibido! ID: {getattr(evento, 'id', 'N/A')}")
+        self._procesar_evento_contrato(evento, (mensaje.properties() or {}).get(PROPIEDAD_CORRELACION))
     
-    def _procesar_evento_contrato(self, evento):
+    def _procesar_evento_contrato(self, evento, id_correlacion: str = None):
         """Procesa un evento de contrato y actualiza el último evento."""
         try:
             with self.lock:
                 # Extraer datos del evento
                 datos_contrato = self._extraer_datos_contrato(evento)
+                datos_contrato['id_correlacion'] = id_correlacion
                 
                 # Actualizar el último evento (no hacer append)
                 self.ultimo_evento = datos_contrato
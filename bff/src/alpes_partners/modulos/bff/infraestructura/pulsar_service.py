@@ -8,6 +8,8 @@ from pulsar.schema import Record, String, Array, Long, AvroSchema
 from typing import List, Optional
 from datetime import datetime
 
+from alpes_partners.seedwork.infraestructura.contexto import contexto_mensaje, nuevo_id_correlacion, propiedades_salientes
+
 logger = logging.getLogger(__name__)
 
 
@@ -62,8 +64,8 @@ class PulsarService:
         biografia: str = "",
         sitio_web: str = "",
         telefono: str = ""
-    ):
-        """Envía un evento de crear influencer."""
+    ) -> str:
+        """Envía un evento de crear influencer y retorna el id de correlación del flujo."""
         try:
             if not self.producer:
                 self.conectar()
@@ -88,9 +90,12 @@ class PulsarService:
             # Crear evento de integración
             evento = EventoCrearInfluencer(data=payload)
             
-            # Enviar mensaje
-            self.producer.send(evento)
-            logger.info(f"Evento de crear influencer enviado: {id_influencer}")
+            # Enviar mensaje iniciando una nueva correlación
+            id_correlacion = nuevo_id_correlacion()
+            with contexto_mensaje(id_correlacion=id_correlacion):
+                self.producer.send(evento, properties=propiedades_salientes())
+            logger.info(f"Evento de crear influencer enviado: {id_influencer} (correlación {id_correlacion})")
+            return id_correlacion
             
         except Exception as e:
             logger.error(f"Error enviando evento de crear influencer: {e}")
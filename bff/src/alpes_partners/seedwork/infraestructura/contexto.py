@@ -0,0 +1,114 @@
+"""
+Contexto de correlación y causación de los mensajes de integración.
+
+Los ids viajan como propiedades de los mensajes de Pulsar. Los consumidores
+abren el contexto con ``contexto_desde_mensaje`` al recibir un mensaje y los
+productores lo estampan en cada publicación con ``propiedades_salientes``, de
+modo que los ids se propagan sin modificar los schemas Avro. Cada publicación
+lleva además su propio id (``id-mensaje``), que se conserva al reenviarla desde
+el outbox o la DLQ y con el que los consumidores descartan duplicados.
+
+En las sagas por coreografía, cada paso agrega al sobre la compensación que lo
+deshace (``agregar_compensacion``); el evento de error que corta el flujo lleva
+así la lista completa de compensaciones pendientes.
+"""
+
+import json
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+PROPIEDAD_CORRELACION = 'id-correlacion'
+PROPIEDAD_CAUSACION = 'id-causacion'
+PROPIEDAD_COMPENSACIONES = 'compensaciones'
+PROPIEDAD_ID_MENSAJE = 'id-mensaje'
+
+
+@dataclass(frozen=True)
+class ContextoMensaje:
+    id_correlacion: Optional[str] = None
+    id_causacion: Optional[str] = None
+    compensaciones: Optional[str] = None  # Lista JSON de las compensaciones de los pasos ya ejecutados
+
+
+_contexto: ContextVar = ContextVar('contexto_mensaje', default=ContextoMensaje())
+
+
+def contexto_actual() -> ContextoMensaje:
+    return _contexto.get()
+
+
+@contextmanager
+def contexto_mensaje(id_correlacion: Optional[str] = None, id_causacion: Optional[str] = None):
+    """Establece el contexto del hilo actual; los valores omitidos se heredan del contexto vigente."""
+    actual = _contexto.get()
+    token = _contexto.set(ContextoMensaje(
+        id_correlacion=id_correlacion or actual.id_correlacion,
+        id_causacion=id_causacion or actual.id_causacion,
+        compensaciones=actual.compensaciones,
+    ))
+    try:
+        yield _contexto.get()
+    finally:
+        _contexto.reset(token)
+
+
+@contextmanager
+def contexto_desde_mensaje(mensaje):
+    """
+    Contexto para procesar un mensaje recibido: conserva su correlación y toma el
+    id del mensaje como causación de todo lo que se publique durante el proceso.
+    """
+    propiedades = mensaje.properties() or {}
+    token = _contexto.set(ContextoMensaje(
+        id_correlacion=propiedades.get(PROPIEDAD_CORRELACION),
+        id_causacion=str(mensaje.message_id()),
+        compensaciones=propiedades.get(PROPIEDAD_COMPENSACIONES),
+    ))
+    try:
+        yield _contexto.get()
+    finally:
+        _contexto.reset(token)
+
+
+def compensaciones_actuales() -> List[Dict[str, str]]:
+    """Compensaciones del sobre vigente, de la más antigua a la más reciente."""
+    compensaciones = _contexto.get().compensaciones
+    return json.loads(compensaciones) if compensaciones else []
+
+
+@contextmanager
+def agregar_compensacion(comando: str, **datos: str):
+    """Agrega al sobre la compensación del paso en curso para las publicaciones del bloque."""
+    actual = _contexto.get()
+    compensaciones = compensaciones_actuales() + [{'comando': comando, **datos}]
+    token = _contexto.set(ContextoMensaje(
+        id_correlacion=actual.id_correlacion,
+        id_causacion=actual.id_causacion,
+        compensaciones=json.dumps(compensaciones),
+    ))
+    try:
+        yield _contexto.get()
+    finally:
+        _contexto.reset(token)
+
+
+def nuevo_id_correlacion() -> str:
+    return str(uuid.uuid4())
+
+
+def propiedades_salientes(propiedades: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Propiedades a publicar: un id nuevo, las del contexto vigente y las explícitas."""
+    contexto = _contexto.get()
+    salientes = {PROPIEDAD_ID_MENSAJE: str(uuid.uuid4())}
+    if contexto.id_correlacion:
+        salientes[PROPIEDAD_CORRELACION] = contexto.id_correlacion
+    if contexto.id_causacion:
+        salientes[PROPIEDAD_CAUSACION] = contexto.id_causacion
+    if contexto.compensaciones:
+        salientes[PROPIEDAD_COMPENSACIONES] = contexto.compensaciones
+    if propiedades:
+        salientes.update(propiedades)
+    return salientes
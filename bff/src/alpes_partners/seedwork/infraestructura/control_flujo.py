@@ -0,0 +1,137 @@
+"""
+Control de flujo adaptativo de los consumidores de Pulsar.
+
+Cada suscripción tiene una ventana de mensajes en vuelo (recibidos y aún sin
+terminar). Los hilos del runtime piden lugar en la ventana antes de recibir, así
+que con la ventana llena dejan de sacar mensajes de la cola del consumidor y el
+broker deja de enviar cuando esa cola se llena: el trabajo pendiente queda en el
+broker y no en memoria.
+
+La ventana se ajusta con AIMD a partir de dos señales: la latencia del
+manejador (media móvil) y la espera reciente por una conexión del pool de base
+de datos. La ventana se ajusta como mucho una vez cada ``intervalo_ajuste_ms``
+(o cada latencia, si es mayor), porque los mensajes que ya estaban en vuelo y la
+espera reciente del pool reflejan todavía la ventana anterior. Si alguna señal
+pasa su umbral la ventana se multiplica por ``factor_reduccion``, y si ya
+estaba en 1 la suscripción se pausa ``pausa_ms``. Mientras las señales están
+bajo el umbral la ventana crece de a un mensaje por intervalo hasta su máximo.
+Tras una pausa se reanuda con un mensaje en vuelo y la latencia se vuelve a
+medir desde cero.
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PoliticaFlujo:
+    latencia_maxima_ms: float = 2000  # 0 desactiva la señal
+    espera_pool_maxima_ms: float = 100  # 0 desactiva la señal
+    factor_reduccion: float = 0.5
+    pausa_ms: int = 2000
+    intervalo_ajuste_ms: int = 250
+    suavizado: float = 0.2  # Peso de cada muestra en la media móvil de latencia
+
+    def saturado(self, latencia_ms: float, espera_pool_ms: float) -> bool:
+        return bool((self.latencia_maxima_ms and latencia_ms > self.latencia_maxima_ms)
+                    or (self.espera_pool_maxima_ms and espera_pool_ms > self.espera_pool_maxima_ms))
+
+
+class ControlFlujo:
+    """Ventana AIMD de mensajes en vuelo de una suscripción."""
+
+    def __init__(self, nombre: str, maximo: int, politica: PoliticaFlujo,
+                 espera_pool_ms: Optional[Callable[[], float]] = None):
+        self._nombre = nombre
+        self._politica = politica
+        self._espera_pool_ms = espera_pool_ms or (lambda: 0.0)
+        self._condicion = threading.Condition()
+        self.maximo = max(1, maximo)
+        self.limite = self.maximo
+        self.en_vuelo = 0
+        self.latencia_ms: Optional[float] = None
+        self.reducciones = 0
+        self.pausas = 0
+        self._pausado_hasta: Optional[float] = None
+        self._ultimo_ajuste = 0.0
+
+    @property
+    def pausado(self) -> bool:
+        return self._pausado_hasta is not None
+
+    def adquirir(self, timeout: float) -> bool:
+        """Ocupa un lugar en la ventana; False si no se liberó ninguno en ``timeout`` segundos."""
+        limite_espera = time.monotonic() + timeout
+        with self._condicion:
+            while True:
+                ahora = time.monotonic()
+                if self._pausado_hasta is not None and ahora >= self._pausado_hasta:
+                    self._reanudar()
+                if self._pausado_hasta is None and self.en_vuelo < self.limite:
+                    self.en_vuelo += 1
+                    return True
+                espera = limite_espera - ahora
+                if espera <= 0:
+                    return False
+                if self._pausado_hasta is not None:
+                    espera = min(espera, self._pausado_hasta - ahora)
+                self._condicion.wait(espera)
+
+    def liberar(self, segundos: Optional[float] = None):
+        """Libera un lugar de la ventana y ajusta el límite con la latencia del mensaje (None si no se recibió)."""
+        espera_pool_ms = self._espera_pool_ms() if segundos is not None else 0.0
+        with self._condicion:
+            self.en_vuelo -= 1
+            if segundos is not None:
+                self._ajustar(1000 * segundos, espera_pool_ms)
+            self._condicion.notify_all()
+
+    def _ajustar(self, latencia_ms: float, espera_pool_ms: float):
+        suavizado = self._politica.suavizado
+        self.latencia_ms = (latencia_ms if self.latencia_ms is None
+                            else suavizado * latencia_ms + (1 - suavizado) * self.latencia_ms)
+        if self._pausado_hasta is not None:
+            return
+        ahora = time.monotonic()
+        if ahora - self._ultimo_ajuste < max(self._politica.intervalo_ajuste_ms, self.latencia_ms) / 1000.0:
+            return
+        if self._politica.saturado(self.latencia_ms, espera_pool_ms):
+            self._ultimo_ajuste = ahora
+            if self.limite <= 1:
+                self._pausado_hasta = ahora + self._politica.pausa_ms / 1000.0
+                self.limite = 0
+                self.pausas += 1
+                logger.warning(f"CONSUMIDORES: {self._nombre} saturado (latencia {self.latencia_ms:.0f} ms, "
+                               f"espera del pool {espera_pool_ms:.0f} ms), pausa de {self._politica.pausa_ms} ms")
+                return
+            self.limite = max(1, int(self.limite * self._politica.factor_reduccion))
+            self.reducciones += 1
+            logger.warning(f"CONSUMIDORES: {self._nombre} saturado (latencia {self.latencia_ms:.0f} ms, "
+                           f"espera del pool {espera_pool_ms:.0f} ms), ventana reducida a {self.limite}")
+        elif self.limite < self.maximo:
+            self._ultimo_ajuste = ahora
+            self.limite += 1
+
+    def _reanudar(self):
+        self._pausado_hasta = None
+        self._ultimo_ajuste = time.monotonic()
+        self.limite = 1
+        self.latencia_ms = None
+        logger.info(f"CONSUMIDORES: {self._nombre} reanudado con ventana 1")
+
+    def como_dict(self) -> Dict[str, Any]:
+        with self._condicion:
+            return {
+                'ventana': self.limite,
+                'ventana_maxima': self.maximo,
+                'en_vuelo': self.en_vuelo,
+                'latencia_ms': round(self.latencia_ms, 3) if self.latencia_ms is not None else None,
+                'reducciones': self.reducciones,
+                'pausas': self.pausas,
+                'pausado': self.pausado,
+            }
@@ -0,0 +1,118 @@
+"""
+Política de reintentos de los consumidores de Pulsar.
+
+Cuando un manejador falla, el mensaje se rechaza con ``negative_acknowledge`` y
+el broker lo vuelve a entregar. El retardo entre intentos crece de forma
+exponencial desde ``retardo_base_ms`` hasta ``retardo_maximo_ms``, con jitter
+para que los mensajes que fallaron juntos no se reintenten juntos. El broker
+aplica ``retardo_base_ms`` a cada rechazo (``negative_ack_redelivery_delay_ms``
+del consumidor) y ``ProgramadorRechazos`` retiene el mensaje el resto del
+retardo antes de rechazarlo, sin ocupar el hilo que lo procesó.
+
+El número de intento sale del contador de reentregas del mensaje. Al agotar
+``max_intentos`` el mensaje se publica en el tópico de mensajes muertos
+``<tópico>-<suscripción>-DLQ`` con su contenido original y propiedades que
+describen el fallo, y se confirma en la suscripción original.
+"""
+
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROPIEDAD_DLQ_TOPICO = 'dlq-topico-origen'
+PROPIEDAD_DLQ_SUSCRIPCION = 'dlq-suscripcion'
+PROPIEDAD_DLQ_ERROR_TIPO = 'dlq-error-tipo'
+PROPIEDAD_DLQ_ERROR = 'dlq-error'
+PROPIEDAD_DLQ_INTENTOS = 'dlq-intentos'
+PROPIEDAD_DLQ_SCHEMA = 'dlq-schema'  # Ruta modulo:Record del schema Avro del tópico de origen
+PROPIEDAD_DLQ_FECHA = 'dlq-fecha'
+
+
+def topico_dlq(topico: str, suscripcion: str) -> str:
+    """Tópico de mensajes muertos de una suscripción (misma convención que Pulsar)."""
+    return f'{topico}-{suscripcion}-DLQ'
+
+
+def intento_de(mensaje) -> int:
+    """Número de intento de la entrega actual del mensaje (1 en la primera entrega)."""
+    reentregas = mensaje.redelivery_count() if hasattr(mensaje, 'redelivery_count') else 0
+    return (reentregas or 0) + 1
+
+
+@dataclass(frozen=True)
+class PoliticaReintentos:
+    max_intentos: int = 5
+    retardo_base_ms: int = 500
+    retardo_maximo_ms: int = 60000
+
+    def agotada(self, intento: int) -> bool:
+        return intento >= self.max_intentos
+
+    def retardo_ms(self, intento: int) -> float:
+        """Retardo antes del siguiente intento: mitad fija y mitad aleatoria del tope exponencial."""
+        tope = min(self.retardo_maximo_ms, self.retardo_base_ms * 2 ** (intento - 1))
+        return tope / 2 + random.uniform(0, tope / 2)
+
+
+class ProgramadorRechazos:
+    """Rechaza mensajes cuando vence su retardo, desde un único hilo para todas las suscripciones."""
+
+    def __init__(self):
+        self._pendientes: List[Tuple[float, int, Any, Any]] = []
+        self._secuencia = itertools.count()
+        self._condicion = threading.Condition()
+        self._hilo: Optional[threading.Thread] = None
+        self._detenido = False
+
+    def programar(self, consumidor, mensaje, retardo_segundos: float):
+        if retardo_segundos <= 0:
+            consumidor.negative_acknowledge(mensaje)
+            return
+        with self._condicion:
+            if self._detenido:
+                consumidor.negative_acknowledge(mensaje)
+                return
+            heapq.heappush(self._pendientes,
+                           (time.monotonic() + retardo_segundos, next(self._secuencia), consumidor, mensaje))
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._ejecutar, daemon=True, name='programador-rechazos')
+                self._hilo.start()
+            self._condicion.notify()
+
+    def pendientes(self) -> int:
+        with self._condicion:
+            return len(self._pendientes)
+
+    def _ejecutar(self):
+        while True:
+            with self._condicion:
+                while not self._detenido and (
+                        not self._pendientes or self._pendientes[0][0] > time.monotonic()):
+                    espera = self._pendientes[0][0] - time.monotonic() if self._pendientes else None
+                    self._condicion.wait(espera)
+                if self._detenido:
+                    return
+                _, _, consumidor, mensaje = heapq.heappop(self._pendientes)
+            try:
+                consumidor.negative_acknowledge(mensaje)
+            except Exception as e:
+                logger.warning(f"CONSUMIDORES: Error rechazando mensaje para reintento: {e}")
+
+    def detener(self):
+        """Rechaza de inmediato los mensajes retenidos para que el broker los reentregue."""
+        with self._condicion:
+            self._detenido = True
+            pendientes, self._pendientes = self._pendientes, []
+            self._condicion.notify_all()
+        for _, _, consumidor, mensaje in pendientes:
+            try:
+                consumidor.negative_acknowledge(mensaje)
+            except Exception as e:
+                logger.warning(f"CONSUMIDORES: Error rechazando mensaje pendiente al detener: {e}")
@@ -4,7 +4,6 @@ Se suscribe a eventos de influencers y ejecuta comandos para crear campanas auto
 """
 
 import logging
-import time
 import uuid
 from datetime import datetime
 
@@ -12,12 +11,12 @@ from datetime import datetime
 logger = logging.getLogger(__name__)
 
 # Imports esenciales
-import pulsar
-import _pulsar
 from pulsar.schema import AvroSchema
 
 from alpes_partners.config.app import crear_app_minima
-from alpes_partners.seedwork.infraestructura import utils
+from alpes_partners.config.settings import settings
+from alpes_partners.seedwork.infraestructura.consumidores import clave_por_campos, runtime_consumidores
+from alpes_partners.seedwork.infraestructura.contexto import agregar_compensacion
 from alpes_partners.modulos.campanas.infraestructura.schema.eventos import EventoInfluencerRegistrado
 from alpes_partners.modulos.campanas.aplicacion.comandos.crear_campana import RegistrarCampana, ejecutar_comando_registrar_campana
 from alpes_partners.modulos.campanas.aplicacion.comandos.eliminar_campana import EliminarCampana, ejecutar_comando_eliminar_campana
@@ -28,96 +27,57 @@ app = crear_app_minima()
 
 def suscribirse_a_eventos_influencers_desde_campanas():
     """
-    DESHABILITADO: Suscribirse a eventos de influencers para crear campanas automáticamente.
-    Ahora las campañas se crean solo a través de comandos de la saga.
+    Suscribirse a eventos de influencers para crear campanas automáticamente.
+    Solo en modo coreografía (SAGA_MODO=coreografia); en orquestación las campañas
+    se crean a través de comandos de la saga.
     """
-    logger.info("CAMPANAS: Consumidor directo de influencers DESHABILITADO - Solo procesar comandos de saga")
-    return
+    if settings.saga_modo != 'coreografia':
+        logger.info("CAMPANAS: Consumidor directo de influencers DESHABILITADO - Solo procesar comandos de saga")
+        return
     
-    # CÓDIGO COMENTADO - Las campañas ahora se crean solo a través de comandos de la saga
-    # cliente = None
-    # try:
-    #     logger.info("CAMPANAS: Conectando a Pulsar...")
-    #     cliente = pulsar.Client(f'pulsar://{utils.broker_host()}:6650')
-    #     
-    #     # Consumidor para eventos de influencers
-    #     consumidor = cliente.subscribe(
-    #         'eventos-influencers', 
-    #         consumer_type=_pulsar.ConsumerType.Shared,
-    #         subscription_name='campanas-sub-eventos-influencers', 
-    #         schema=AvroSchema(EventoInfluencerRegistrado)
-    #     )
+    runtime = runtime_consumidores()
+    runtime.registrar(
+        'eventos-influencers',
+        'campanas-sub-eventos-influencers',
+        AvroSchema(EventoInfluencerRegistrado),
+        _manejar_evento_influencer,
+        nombre='campanas-eventos-influencers',
+        clave=clave_por_campos('id_influencer'),
+    )
+    runtime.iniciar()
+    logger.info("CAMPANAS: Suscrito a eventos de influencers (coreografía)")
 
-    #     logger.info("CAMPANAS: Suscrito a eventos de influencers")
-    #     logger.info("CAMPANAS: Esperando eventos...")
-    #     
-    #     while True:
-    #         try:
-    #             mensaje = consumidor.receive()
-    #             logger.info(f"CAMPANAS: Evento recibido - {mensaje.value()}")
-    #             
-    #             # Procesar evento
-    #             _procesar_evento_influencer(mensaje.value())
-    #             
-    #             # Confirmar procesamiento
-    #             consumidor.acknowledge(mensaje)
-    #             logger.info("CAMPANAS: Evento procesado y confirmado")
-    #             
-    #         except Exception as e:
-    #             logger.error(f"CAMPANAS: Error procesando evento: {e}")
-    #             time.sleep(5)  # Esperar antes de continuar
-    #             
-    # except Exception as e:
-    #     logger.error(f"CAMPANAS: Error en consumidor: {e}")
-    # finally:
-    #     if cliente:
-    #         cliente.close()
+
+def _manejar_evento_influencer(mensaje):
+    logger.info(f"CAMPANAS: Evento recibido - {mensaje.value()}")
+    _procesar_evento_influencer(mensaje.value())
+    logger.info("CAMPANAS: Evento procesado")
 
 
 def suscribirse_a_eventos_eliminacion_campana():
     """
     Suscribirse a eventos de eliminación de campaña para compensación.
     """
-    cliente = None
-    try:
-        logger.info("CAMPANAS: Conectando a Pulsar para eventos de eliminación de campaña...")
-        cliente = pulsar.Client(f'pulsar://{utils.broker_host()}:6650')
-        
-        # Importar esquema de eventos
-        from alpes_partners.modulos.campanas.infraestructura.schema.eventos import EventoCampanaEliminacionRequerida
-        
-        # Consumidor para eventos de eliminación de campaña
-        consumidor = cliente.subscribe(
-            'eventos-campanas-eliminacion-v2', 
-            consumer_type=_pulsar.ConsumerType.Shared,
-            subscription_name='campanas-sub-eventos-eliminacion-v2', 
-            schema=AvroSchema(EventoCampanaEliminacionRequerida)
-        )
+    # Importar esquema de eventos
+    from alpes_partners.modulos.campanas.infraestructura.schema.eventos import EventoCampanaEliminacionRequerida
+    
+    runtime = runtime_consumidores()
+    runtime.registrar(
+        'eventos-campanas-eliminacion-v2',
+        'campanas-sub-eventos-eliminacion-v2',
+        AvroSchema(EventoCampanaEliminacionRequerida),
+        _manejar_evento_eliminacion_campana,
+        nombre='campanas-eventos-eliminacion',
+        clave=clave_por_campos('campana_id'),
+    )
+    runtime.iniciar()
+    logger.info("CAMPANAS: Suscrito a eventos de eliminación de campaña")
 
-        logger.info("CAMPANAS: Suscrito a eventos de eliminación de campaña")
-        logger.info("CAMPANAS: Esperando eventos...")
-        
-        while True:
-            try:
-                mensaje = consumidor.receive()
-                logger.info(f"CAMPANAS: Evento recibido - {mensaje.value()}")
-                
-                # Procesar evento
-                _procesar_evento_eliminacion_campana(mensaje.value())
-                
-                # Confirmar procesamiento
-                consumidor.acknowledge(mensaje)
-                logger.info("CAMPANAS: Evento procesado y confirmado")
-                
-            except Exception as e:
-                logger.error(f"CAMPANAS: Error procesando evento: {e}")
-                time.sleep(5)  # Esperar antes de continuar
-                
-    except Exception as e:
-        logger.error(f"CAMPANAS: Error en consumidor de eventos: {e}")
-    finally:
-        if cliente:
-            cliente.close()
+
+def _manejar_evento_eliminacion_campana(mensaje):
+    logger.info(f"CAMPANAS: Evento recibido - {mensaje.value()}")
+    _procesar_evento_eliminacion_campana(mensaje.value())
+    logger.info("CAMPANAS: Evento procesado")
 
 
 def _procesar_evento_eliminacion_campana(evento):
@@ -178,8 +138,11 @@ def _procesar_evento_influencer(evento):
             # Crear comando para registrar campana
             comando = _crear_comando_campana(datos)
             
-            # Ejecutar comando usando la función específica del módulo
-            ejecutar_comando_registrar_campana(comando)
+            # Ejecutar comando usando la función específica del módulo; CampanaCreada sale con
+            # la compensación de este paso en el sobre
+            with agregar_compensacion('EliminarCampana', campana_id=comando.id,
+                                      influencer_id=comando.influencer_origen_id):
+                ejecutar_comando_registrar_campana(comando)
             
             logger.info(f"CAMPANAS: Campana creada para influencer: {datos.get('nombre', 'N/A')}")
             
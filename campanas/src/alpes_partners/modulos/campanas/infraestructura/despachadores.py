@@ -10,7 +10,7 @@ import uuid
 from alpes_partners.modulos.campanas.infraestructura.schema.eventos import (
     EventoCampanaCreada, CampanaCreadaPayload, EventoCampanaEliminada, CampanaEliminadaPayload
 )
-from alpes_partners.seedwork.infraestructura import utils
+from alpes_partners.seedwork.infraestructura.productores import registro_productores
 
 epoch = datetime.datetime.utcfromtimestamp(0)
 
@@ -23,12 +23,9 @@ def unix_time_millis(dt):
 class DespachadorCampanas:
     """Despachador de eventos para campanas."""
     
-    def _publicar_mensaje(self, mensaje, topico, schema):
-        """Publica un mensaje en el tópico especificado."""
-        cliente = pulsar.Client(f'pulsar://{utils.broker_host()}:6650')
-        publicador = cliente.create_producer(topico, schema=schema)
-        publicador.send(mensaje)
-        cliente.close()
+    def _publicar_mensaje(self, mensaje, topico, schema, clave=None):
+        """Publica un mensaje en el tópico especificado con el productor compartido."""
+        registro_productores().publicar(mensaje, topico, schema, clave=clave)
 
     def publicar_evento_campana_creada(self, evento, topico='eventos-campanas'):
         """Publica evento cuando una campaña es creada."""
@@ -83,7 +80,7 @@ class DespachadorCampanas:
             data=payload
         )
         
-        self._publicar_mensaje(evento_integracion, topico, AvroSchema(EventoCampanaCreada))
+        self._publicar_mensaje(evento_integracion, topico, AvroSchema(EventoCampanaCreada), clave=payload.campana_id)
     
     def publicar_evento_campana_eliminada(self, campana_id: str, influencer_id: str, razon: str, topico='eventos-campanas-eliminacion-v2'):
         """Publica evento cuando una campaña es eliminada."""
@@ -115,4 +112,4 @@ class DespachadorCampanas:
             data=payload
         )
         
-        self._publicar_mensaje(evento_integracion, topico, AvroSchema(EventoCampanaEliminada))
+        self._publicar_mensaje(evento_integracion, topico, AvroSchema(EventoCampanaEliminada), clave=payload.campana_id)
@@ -0,0 +1,667 @@
+"""
+Runtime de consumidores de Pulsar compartido por todo el proceso.
+
+Los módulos registran sus suscripciones (tópico, suscripción, schema y manejador)
+y el runtime las atiende con un único ``pulsar.Client``, el mismo que usan los
+productores. Cada suscripción tiene su propio consumidor y ``concurrencia``
+hilos que reciben, procesan y confirman. El tamaño de la cola de prefetch
+(``receiver_queue_size``) y la concurrencia se configuran en un solo lugar,
+con valores por defecto en settings y ajustes por suscripción.
+
+El manejador recibe el mensaje de Pulsar y se ejecuta dentro de
+``contexto_desde_mensaje``. Si termina sin error el mensaje se confirma; si
+falla, se rechaza según la ``PoliticaReintentos`` de la suscripción (ver
+``reintentos.py``) y el hilo sigue con el siguiente mensaje: se reintenta con
+retardo exponencial y, al agotar los intentos, pasa al tópico de mensajes
+muertos. ``pausa_error_segundos`` solo aplica a los errores de recepción.
+``detener()`` deja de recibir, espera a que terminen los mensajes en proceso y
+cierra los consumidores.
+
+Las suscripciones registradas con una función ``clave`` se procesan en modo
+concurrente con orden por clave: un hilo recibe y reparte los mensajes entre
+``concurrencia`` trabajadores según el hash de la clave (el id de la entidad),
+de modo que los mensajes de una misma entidad se procesan en orden y los de
+entidades distintas en paralelo. Cada trabajador confirma su mensaje al
+terminarlo. Estas suscripciones son ``KeyShared``: el broker reparte las claves
+entre las réplicas y mantiene el orden por clave también entre procesos. Un
+mensaje que falla no bloquea su clave mientras espera el reintento, así que los
+siguientes de la misma entidad pueden procesarse antes que él.
+
+Las suscripciones registradas con ``registrar_lote`` reciben con ``batch_receive``
+hasta ``tamano_lote`` mensajes (o los que lleguen en ``espera_lote_ms``) y los
+entregan juntos a un manejador de lote, que normalmente los procesa en una sola
+transacción con ``procesar_en_lote`` (ver ``uow.py``). Los mensajes que el
+manejador no reporta como fallidos se confirman al volver, después del commit;
+los fallidos siguen la política de reintentos uno por uno.
+
+Con ``registrar_despacho`` una sola suscripción atiende varios tópicos: el
+consumidor recibe bytes y un ``DespachoPorTopico`` decodifica cada mensaje con
+el schema de su tópico y lo entrega al manejador de ese tópico. Los mensajes
+que agotan sus intentos van a la DLQ de su tópico de origen.
+
+Cada suscripción limita sus mensajes en vuelo con un ``ControlFlujo`` (ver
+``control_flujo.py``): los hilos piden lugar en la ventana antes de recibir y la
+ventana se achica o se pausa cuando la latencia del manejador o la espera por
+una conexión del pool pasan sus umbrales, y vuelve a crecer cuando se recuperan.
+"""
+
+import atexit
+import itertools
+import logging
+import queue
+import re
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import _pulsar
+import pulsar
+
+from .contexto import contexto_desde_mensaje
+from .control_flujo import ControlFlujo, PoliticaFlujo
+from .reintentos import (
+    PROPIEDAD_DLQ_ERROR, PROPIEDAD_DLQ_ERROR_TIPO, PROPIEDAD_DLQ_FECHA, PROPIEDAD_DLQ_INTENTOS,
+    PROPIEDAD_DLQ_SCHEMA, PROPIEDAD_DLQ_SUSCRIPCION, PROPIEDAD_DLQ_TOPICO, PoliticaReintentos,
+    ProgramadorRechazos, intento_de, topico_dlq
+)
+from ...config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class MetricasManejador:
+    """Contadores de una suscripción, actualizados por todos sus hilos."""
+    recibidos: int = 0
+    procesados: int = 0
+    fallidos: int = 0
+    reintentados: int = 0
+    enviados_dlq: int = 0
+    lotes: int = 0
+    segundos_procesando: float = 0.0
+    ultimo_error: Optional[str] = None
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def registrar(self, segundos: float, error: Optional[Exception] = None):
+        with self._lock:
+            self.recibidos += 1
+            self.segundos_procesando += segundos
+            if error is None:
+                self.procesados += 1
+            else:
+                self.fallidos += 1
+                self.ultimo_error = str(error)
+
+    def contar(self, contador: str):
+        with self._lock:
+            setattr(self, contador, getattr(self, contador) + 1)
+
+    def como_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'recibidos': self.recibidos,
+                'procesados': self.procesados,
+                'fallidos': self.fallidos,
+                'reintentados': self.reintentados,
+                'enviados_dlq': self.enviados_dlq,
+                'lotes': self.lotes,
+                'ms_promedio': round(1000 * self.segundos_procesando / self.recibidos, 3) if self.recibidos else 0.0,
+                'ultimo_error': self.ultimo_error,
+            }
+
+
+def topico_corto(topico: str) -> str:
+    """Nombre del tópico sin el prefijo ``persistent://tenant/namespace/`` ni el sufijo de partición."""
+    return re.sub(r'-partition-\d+$', '', topico.rsplit('/', 1)[-1])
+
+
+class MensajeDespachado:
+    """Mensaje recibido como bytes cuyo ``value()`` es el valor decodificado con el schema de su tópico."""
+
+    def __init__(self, mensaje, valor):
+        self._mensaje = mensaje
+        self._valor = valor
+
+    def value(self):
+        return self._valor
+
+    def __getattr__(self, nombre):
+        return getattr(self._mensaje, nombre)
+
+
+class DespachoPorTopico:
+    """
+    Tabla de despacho de una suscripción a varios tópicos: por cada tópico, el
+    schema de sus mensajes, su manejador y los campos de su clave.
+    """
+
+    def __init__(self):
+        self._rutas: Dict[str, Tuple[Any, Callable[[Any], None], Tuple[str, ...]]] = {}
+
+    def agregar(self, topico: str, schema, manejador: Callable[[Any], None], campos_clave: Tuple[str, ...] = ()):
+        self._rutas[topico] = (schema, manejador, tuple(campos_clave))
+        return self
+
+    @property
+    def topicos(self) -> List[str]:
+        return list(self._rutas)
+
+    def topico_de(self, mensaje) -> str:
+        return topico_corto(mensaje.topic_name())
+
+    def schema_de(self, mensaje):
+        ruta = self._rutas.get(self.topico_de(mensaje))
+        return ruta[0] if ruta is not None else None
+
+    def _ruta(self, mensaje):
+        topico = self.topico_de(mensaje)
+        if topico not in self._rutas:
+            raise ValueError(f"No hay manejador para los mensajes de {topico}")
+        return self._rutas[topico]
+
+    def decodificar(self, mensaje) -> MensajeDespachado:
+        schema = self._ruta(mensaje)[0]
+        datos = mensaje.data()
+        # Sin schema se entregan los bytes; el broker en memoria entrega los objetos sin serializar
+        valor = schema.decode(datos) if schema is not None and isinstance(datos, (bytes, bytearray)) else mensaje.value()
+        return MensajeDespachado(mensaje, valor)
+
+    def clave(self, mensaje) -> Optional[str]:
+        campos = self._ruta(mensaje)[2]
+        particion = mensaje.partition_key() if hasattr(mensaje, 'partition_key') else None
+        if particion or not campos:
+            return particion or None
+        return clave_por_campos(*campos)(self.decodificar(mensaje))
+
+    def __call__(self, mensaje):
+        self._ruta(mensaje)[1](self.decodificar(mensaje))
+
+
+@dataclass
+class Suscripcion:
+    topico: Any  # Nombre del tópico o, con despacho, lista de tópicos
+    nombre_suscripcion: str
+    schema: Any
+    manejador: Optional[Callable[[Any], None]]
+    nombre: str
+    concurrencia: int
+    tamano_cola_receptor: int
+    politica_reintentos: PoliticaReintentos
+    clave: Optional[Callable[[Any], Optional[str]]] = None
+    manejador_lote: Optional[Callable[[List[Any]], Optional[List[Tuple[Any, Exception]]]]] = None
+    tamano_lote: int = 1
+    espera_lote_ms: int = 0
+    despacho: Optional[DespachoPorTopico] = None
+    flujo: Optional[ControlFlujo] = None
+    metricas: MetricasManejador = field(default_factory=MetricasManejador)
+    consumidor: Any = None
+    hilos: List[threading.Thread] = field(default_factory=list)
+    colas: List["queue.Queue"] = field(default_factory=list)
+
+    @property
+    def por_clave(self) -> bool:
+        """Si los mensajes se reparten entre trabajadores por clave."""
+        return self.clave is not None and self.concurrencia > 1 and not self.en_lote
+
+    @property
+    def en_lote(self) -> bool:
+        """Si los mensajes se reciben y procesan en lotes."""
+        return self.manejador_lote is not None
+
+    def topico_de(self, mensaje) -> str:
+        """Tópico del que llegó el mensaje."""
+        return self.despacho.topico_de(mensaje) if self.despacho is not None else self.topico
+
+    def schema_de(self, mensaje):
+        return self.despacho.schema_de(mensaje) if self.despacho is not None else self.schema
+
+
+def clave_por_campos(*campos: str) -> Callable[[Any], Optional[str]]:
+    """
+    Función de clave para ``registrar``: la clave de partición con que se publicó
+    el mensaje o, si no tiene, el primero de ``campos`` con valor en su payload
+    (``value().data`` o ``value()``).
+    """
+    def clave(mensaje) -> Optional[str]:
+        particion = mensaje.partition_key() if hasattr(mensaje, 'partition_key') else None
+        if particion:
+            return particion
+        valor = mensaje.value()
+        datos = getattr(valor, 'data', None) or valor
+        for campo in campos:
+            encontrado = getattr(datos, campo, None)
+            if encontrado:
+                return str(encontrado)
+        return None
+    return clave
+
+
+class RuntimeConsumidores:
+    """Suscripciones de Pulsar atendidas por hilos sobre un cliente compartido."""
+
+    def __init__(self,
+                 fabrica_cliente: Callable[[], Any],
+                 tamano_cola_receptor: int = 1000,
+                 concurrencia: int = 1,
+                 pausa_error_segundos: float = 5,
+                 timeout_recepcion_ms: int = 1000,
+                 tipo_consumidor=_pulsar.ConsumerType.Shared,
+                 politica_reintentos: Optional[PoliticaReintentos] = None,
+                 politica_flujo: Optional[PoliticaFlujo] = None,
+                 espera_pool_ms: Optional[Callable[[], float]] = None):
+        self._fabrica_cliente = fabrica_cliente
+        self._tamano_cola_receptor = tamano_cola_receptor
+        self._concurrencia = concurrencia
+        self._pausa_error_segundos = pausa_error_segundos
+        self._timeout_recepcion_ms = timeout_recepcion_ms
+        self._tipo_consumidor = tipo_consumidor
+        self._politica_reintentos = politica_reintentos or PoliticaReintentos()
+        self._politica_flujo = politica_flujo or PoliticaFlujo()
+        self._espera_pool_ms = espera_pool_ms
+        self._rechazos = ProgramadorRechazos()
+        self._productores_dlq: Dict[str, Any] = {}
+        self._suscripciones: Dict[str, Suscripcion] = {}
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+
+    def registrar(self,
+                  topico: str,
+                  suscripcion: str,
+                  schema,
+                  manejador: Callable[[Any], None],
+                  nombre: Optional[str] = None,
+                  concurrencia: Optional[int] = None,
+                  tamano_cola_receptor: Optional[int] = None,
+                  clave: Optional[Callable[[Any], Optional[str]]] = None,
+                  politica_reintentos: Optional[PoliticaReintentos] = None) -> Suscripcion:
+        """
+        Registra una suscripción; se empieza a consumir en el siguiente ``iniciar()``.
+        Con ``clave`` (ver ``clave_por_campos``) la suscripción es ``KeyShared`` y
+        sus ``concurrencia`` trabajadores mantienen el orden por clave.
+        """
+        return self._agregar(Suscripcion(
+            topico=topico,
+            nombre_suscripcion=suscripcion,
+            schema=schema,
+            manejador=manejador,
+            nombre=nombre or suscripcion,
+            concurrencia=concurrencia or self._concurrencia,
+            tamano_cola_receptor=tamano_cola_receptor or self._tamano_cola_receptor,
+            politica_reintentos=politica_reintentos or self._politica_reintentos,
+            clave=clave,
+        ))
+
+    def registrar_lote(self,
+                       topico: str,
+                       suscripcion: str,
+                       schema,
+                       manejador_lote: Callable[[List[Any]], Optional[List[Tuple[Any, Exception]]]],
+                       tamano_lote: int,
+                       espera_lote_ms: int = 100,
+                       nombre: Optional[str] = None,
+                       concurrencia: Optional[int] = None,
+                       clave: Optional[Callable[[Any], Optional[str]]] = None,
+                       politica_reintentos: Optional[PoliticaReintentos] = None) -> Suscripcion:
+        """
+        Registra una suscripción que se procesa en lotes de hasta ``tamano_lote`` mensajes.
+        ``manejador_lote`` recibe la lista de mensajes y devuelve los ``(mensaje, error)``
+        que fallaron; si lanza una excepción fallan todos. Con ``clave`` la suscripción
+        es ``KeyShared`` y un solo hilo procesa los lotes, en el orden en que llegan.
+        """
+        return self._agregar(Suscripcion(
+            topico=topico,
+            nombre_suscripcion=suscripcion,
+            schema=schema,
+            manejador=None,
+            nombre=nombre or suscripcion,
+            concurrencia=1 if clave is not None else concurrencia or self._concurrencia,
+            tamano_cola_receptor=max(tamano_lote, self._tamano_cola_receptor),
+            politica_reintentos=politica_reintentos or self._politica_reintentos,
+            clave=clave,
+            manejador_lote=manejador_lote,
+            tamano_lote=tamano_lote,
+            espera_lote_ms=espera_lote_ms,
+        ))
+
+    def registrar_despacho(self,
+                           despacho: DespachoPorTopico,
+                           suscripcion: str,
+                           nombre: Optional[str] = None,
+                           concurrencia: Optional[int] = None,
+                           tamano_cola_receptor: Optional[int] = None,
+                           por_clave: bool = True,
+                           politica_reintentos: Optional[PoliticaReintentos] = None) -> Suscripcion:
+        """
+        Registra una sola suscripción a todos los tópicos de ``despacho``. Con
+        ``por_clave`` usa la clave de cada tópico y mantiene el orden por entidad.
+        """
+        return self._agregar(Suscripcion(
+            topico=despacho.topicos,
+            nombre_suscripcion=suscripcion,
+            schema=None,
+            manejador=despacho,
+            nombre=nombre or suscripcion,
+            concurrencia=concurrencia or self._concurrencia,
+            tamano_cola_receptor=tamano_cola_receptor or self._tamano_cola_receptor,
+            politica_reintentos=politica_reintentos or self._politica_reintentos,
+            clave=despacho.clave if por_clave else None,
+            despacho=despacho,
+        ))
+
+    def _agregar(self, suscripcion: Suscripcion) -> Suscripcion:
+        with self._lock:
+            if suscripcion.nombre in self._suscripciones:
+                raise ValueError(f"Ya existe una suscripción registrada como {suscripcion.nombre}")
+            self._suscripciones[suscripcion.nombre] = suscripcion
+        return suscripcion
+
+    def iniciar(self):
+        """Suscribe y lanza los hilos de las suscripciones que aún no se iniciaron."""
+        with self._lock:
+            pendientes = [s for s in self._suscripciones.values() if s.consumidor is None]
+            for suscripcion in pendientes:
+                # Sin schema (suscripciones con despacho) el consumidor recibe bytes
+                opciones = {'schema': suscripcion.schema} if suscripcion.schema is not None else {}
+                if suscripcion.en_lote:
+                    opciones['batch_receive_policy'] = pulsar.ConsumerBatchReceivePolicy(
+                        suscripcion.tamano_lote, -1, suscripcion.espera_lote_ms)
+                suscripcion.consumidor = self._fabrica_cliente().subscribe(
+                    suscripcion.topico,
+                    subscription_name=suscripcion.nombre_suscripcion,
+                    consumer_type=(_pulsar.ConsumerType.KeyShared if suscripcion.clave is not None
+                                   else self._tipo_consumidor),
+                    receiver_queue_size=suscripcion.tamano_cola_receptor,
+                    # El broker aplica la mitad del retardo base y ProgramadorRechazos el resto del backoff
+                    negative_ack_redelivery_delay_ms=max(1, suscripcion.politica_reintentos.retardo_base_ms // 2),
+                    **opciones,
+                )
+                modo = ('trabajador(es) por clave' if suscripcion.por_clave
+                        else f'hilo(s) con lotes de {suscripcion.tamano_lote}' if suscripcion.en_lote
+                        else 'hilo(s)')
+                logger.info(f"CONSUMIDORES: Suscrito a {suscripcion.topico} ({suscripcion.nombre_suscripcion}), "
+                            f"{suscripcion.concurrencia} {modo}, cola {suscripcion.tamano_cola_receptor}")
+                suscripcion.flujo = ControlFlujo(suscripcion.nombre, self._ventana_maxima(suscripcion),
+                                                 self._politica_flujo, self._espera_pool_ms)
+                if suscripcion.por_clave:
+                    self._iniciar_trabajadores(suscripcion)
+                elif suscripcion.en_lote:
+                    for i in range(suscripcion.concurrencia):
+                        self._lanzar(suscripcion, self._consumir_lotes, f'consumidor-{suscripcion.nombre}-{i}')
+                else:
+                    for i in range(suscripcion.concurrencia):
+                        self._lanzar(suscripcion, self._consumir, f'consumidor-{suscripcion.nombre}-{i}')
+
+    def _ventana_maxima(self, suscripcion: Suscripcion) -> int:
+        """Mensajes en vuelo sin control de flujo: uno por hilo o, por clave, además los encolados."""
+        if suscripcion.por_clave:
+            return suscripcion.concurrencia * (1 + self._capacidad_cola(suscripcion))
+        return suscripcion.concurrencia
+
+    def _capacidad_cola(self, suscripcion: Suscripcion) -> int:
+        return max(1, suscripcion.tamano_cola_receptor // suscripcion.concurrencia)
+
+    def _lanzar(self, suscripcion: Suscripcion, objetivo: Callable, nombre: str, *args):
+        hilo = threading.Thread(target=objetivo, args=(suscripcion, *args), daemon=True, name=nombre)
+        suscripcion.hilos.append(hilo)
+        hilo.start()
+
+    def _iniciar_trabajadores(self, suscripcion: Suscripcion):
+        # Colas acotadas: si un trabajador se atrasa, el receptor deja de recibir y el prefetch queda en el broker
+        capacidad = self._capacidad_cola(suscripcion)
+        for i in range(suscripcion.concurrencia):
+            cola: "queue.Queue" = queue.Queue(maxsize=capacidad)
+            suscripcion.colas.append(cola)
+            self._lanzar(suscripcion, self._trabajar, f'trabajador-{suscripcion.nombre}-{i}', cola)
+        self._lanzar(suscripcion, self._repartir, f'receptor-{suscripcion.nombre}')
+
+    def _recibir(self, suscripcion: Suscripcion):
+        """Siguiente mensaje de la suscripción, o None si no llegó ninguno a tiempo."""
+        try:
+            return suscripcion.consumidor.receive(timeout_millis=self._timeout_recepcion_ms)
+        except pulsar.Timeout:
+            return None
+        except Exception as e:
+            if not self._detener.is_set():
+                logger.error(f"CONSUMIDORES: Error recibiendo de {suscripcion.topico}: {e}")
+                self._detener.wait(self._pausa_error_segundos)
+            return None
+
+    def _recibir_lote(self, suscripcion: Suscripcion) -> List[Any]:
+        """Mensajes recibidos según la política de lote; vacío si no llegó ninguno a tiempo."""
+        try:
+            return suscripcion.consumidor.batch_receive()
+        except pulsar.Timeout:
+            return []
+        except Exception as e:
+            if not self._detener.is_set():
+                logger.error(f"CONSUMIDORES: Error recibiendo lote de {suscripcion.topico}: {e}")
+                self._detener.wait(self._pausa_error_segundos)
+            return []
+
+    def _adquirir(self, suscripcion: Suscripcion) -> bool:
+        """Lugar en la ventana de control de flujo; False si no se liberó ninguno a tiempo."""
+        return suscripcion.flujo.adquirir(self._timeout_recepcion_ms / 1000.0)
+
+    def _consumir(self, suscripcion: Suscripcion):
+        while not self._detener.is_set():
+            if not self._adquirir(suscripcion):
+                continue
+            mensaje = self._recibir(suscripcion)
+            suscripcion.flujo.liberar(self._procesar(suscripcion, mensaje) if mensaje is not None else None)
+
+    def _repartir(self, suscripcion: Suscripcion):
+        """Reparte los mensajes recibidos: misma clave, mismo trabajador."""
+        sin_clave = itertools.cycle(suscripcion.colas)
+        while not self._detener.is_set():
+            if not self._adquirir(suscripcion):
+                continue
+            mensaje = self._recibir(suscripcion)
+            if mensaje is None:
+                suscripcion.flujo.liberar()
+                continue
+            try:
+                clave = suscripcion.clave(mensaje)
+            except Exception as e:
+                logger.warning(f"CONSUMIDORES: No se pudo obtener la clave de un mensaje de {suscripcion.topico}: {e}")
+                clave = None
+            # Sin clave no hay orden que preservar: se reparte en ronda
+            cola = (suscripcion.colas[zlib.crc32(clave.encode()) % len(suscripcion.colas)]
+                    if clave else next(sin_clave))
+            while not self._detener.is_set():
+                try:
+                    cola.put(mensaje, timeout=self._timeout_recepcion_ms / 1000.0)
+                    break
+                except queue.Full:
+                    continue
+
+    def _trabajar(self, suscripcion: Suscripcion, cola: "queue.Queue"):
+        # Al detener se termina el mensaje en curso; los encolados quedan sin confirmar y el broker los reentrega
+        while not self._detener.is_set():
+            try:
+                mensaje = cola.get(timeout=self._timeout_recepcion_ms / 1000.0)
+            except queue.Empty:
+                continue
+            suscripcion.flujo.liberar(self._procesar(suscripcion, mensaje))
+
+    def _procesar(self, suscripcion: Suscripcion, mensaje) -> float:
+        """Procesa y confirma o rechaza el mensaje; devuelve los segundos que tardó el manejador."""
+        inicio = time.perf_counter()
+        try:
+            with contexto_desde_mensaje(mensaje):
+                suscripcion.manejador(mensaje)
+            suscripcion.consumidor.acknowledge(mensaje)
+        except Exception as e:
+            segundos = time.perf_counter() - inicio
+            suscripcion.metricas.registrar(segundos, e)
+            self._reintentar_o_descartar(suscripcion, mensaje, e)
+            return segundos
+        segundos = time.perf_counter() - inicio
+        suscripcion.metricas.registrar(segundos)
+        return segundos
+
+    def _consumir_lotes(self, suscripcion: Suscripcion):
+        # Cada lote ocupa un lugar en la ventana y aporta la latencia por mensaje
+        while not self._detener.is_set():
+            if not self._adquirir(suscripcion):
+                continue
+            mensajes = self._recibir_lote(suscripcion)
+            suscripcion.flujo.liberar(self._procesar_lote(suscripcion, mensajes) if mensajes else None)
+
+    def _procesar_lote(self, suscripcion: Suscripcion, mensajes: List[Any]) -> float:
+        """Procesa el lote y devuelve los segundos por mensaje."""
+        inicio = time.perf_counter()
+        try:
+            fallidos = suscripcion.manejador_lote(mensajes) or []
+        except Exception as e:
+            logger.error(f"CONSUMIDORES: Error procesando lote de {len(mensajes)} mensajes de "
+                         f"{suscripcion.topico} ({suscripcion.nombre}): {e}")
+            fallidos = [(mensaje, e) for mensaje in mensajes]
+        errores = {id(mensaje): error for mensaje, error in fallidos}
+        # El manejador ya confirmó su transacción: se confirman juntos y el cliente agrupa los acks
+        for mensaje in mensajes:
+            if id(mensaje) not in errores:
+                try:
+                    suscripcion.consumidor.acknowledge(mensaje)
+                except Exception as e:
+                    logger.warning(f"CONSUMIDORES: Error confirmando mensaje de {suscripcion.topico}: {e}")
+        segundos = (time.perf_counter() - inicio) / len(mensajes)
+        for mensaje in mensajes:
+            error = errores.get(id(mensaje))
+            suscripcion.metricas.registrar(segundos, error)
+            if error is not None:
+                self._reintentar_o_descartar(suscripcion, mensaje, error)
+        suscripcion.metricas.contar('lotes')
+        return segundos
+
+    def _reintentar_o_descartar(self, suscripcion: Suscripcion, mensaje, error: Exception):
+        """Programa el reintento del mensaje fallido o, si agotó sus intentos, lo mueve a la DLQ."""
+        politica = suscripcion.politica_reintentos
+        intento = intento_de(mensaje)
+        topico = suscripcion.topico_de(mensaje)
+        if not politica.agotada(intento):
+            retardo_ms = politica.retardo_ms(intento)
+            logger.error(f"CONSUMIDORES: Error procesando mensaje de {topico} ({suscripcion.nombre}), "
+                         f"intento {intento}/{politica.max_intentos}, reintento en {retardo_ms:.0f} ms: {error}")
+            suscripcion.metricas.contar('reintentados')
+            self._rechazos.programar(suscripcion.consumidor, mensaje,
+                                     (retardo_ms - politica.retardo_base_ms // 2) / 1000.0)
+            return
+
+        try:
+            self._enviar_a_dlq(suscripcion, mensaje, error, intento)
+            suscripcion.consumidor.acknowledge(mensaje)
+        except Exception as e:
+            # Sin DLQ disponible el mensaje sigue reintentándose con el retardo máximo
+            logger.error(f"CONSUMIDORES: No se pudo mover a la DLQ un mensaje de {topico}: {e}")
+            self._rechazos.programar(suscripcion.consumidor, mensaje, politica.retardo_maximo_ms / 1000.0)
+            return
+        suscripcion.metricas.contar('enviados_dlq')
+        logger.error(f"CONSUMIDORES: Mensaje de {topico} ({suscripcion.nombre}) enviado a "
+                     f"{topico_dlq(topico, suscripcion.nombre_suscripcion)} tras {intento} intentos: "
+                     f"{error}")
+
+    def _enviar_a_dlq(self, suscripcion: Suscripcion, mensaje, error: Exception, intento: int):
+        """Publica el contenido original del mensaje en la DLQ con la descripción del fallo."""
+        topico = suscripcion.topico_de(mensaje)
+        registro = getattr(suscripcion.schema_de(mensaje), '_record_cls', None)
+        propiedades = {
+            **(mensaje.properties() or {}),
+            PROPIEDAD_DLQ_TOPICO: topico,
+            PROPIEDAD_DLQ_SUSCRIPCION: suscripcion.nombre_suscripcion,
+            PROPIEDAD_DLQ_ERROR_TIPO: type(error).__name__,
+            PROPIEDAD_DLQ_ERROR: str(error)[:1000],
+            PROPIEDAD_DLQ_INTENTOS: str(intento),
+            PROPIEDAD_DLQ_SCHEMA: f'{registro.__module__}:{registro.__qualname__}' if registro is not None else '',
+            PROPIEDAD_DLQ_FECHA: datetime.utcnow().isoformat(),
+        }
+        opciones = {'properties': propiedades}
+        clave = mensaje.partition_key() if hasattr(mensaje, 'partition_key') else None
+        if clave:
+            opciones['partition_key'] = clave
+        self._productor_dlq(topico_dlq(topico, suscripcion.nombre_suscripcion)).send(
+            mensaje.data(), **opciones)
+
+    def _productor_dlq(self, topico: str):
+        with self._lock:
+            productor = self._productores_dlq.get(topico)
+            if productor is None:
+                productor = self._productores_dlq[topico] = self._fabrica_cliente().create_producer(topico)
+            return productor
+
+    def metricas(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            suscripciones = list(self._suscripciones.values())
+        return {s.nombre: {'topico': s.topico, 'concurrencia': s.concurrencia, 'por_clave': s.por_clave,
+                           'tamano_lote': s.tamano_lote, **s.metricas.como_dict(),
+                           'flujo': s.flujo.como_dict() if s.flujo is not None else None}
+                for s in suscripciones}
+
+    def esperar(self):
+        """Bloquea hasta que se detenga el runtime."""
+        self._detener.wait()
+
+    def detener(self, timeout: Optional[float] = 10):
+        """Deja de recibir, espera los mensajes en proceso y cierra los consumidores."""
+        if self._detener.is_set():
+            return
+        self._detener.set()
+        with self._lock:
+            suscripciones = list(self._suscripciones.values())
+        for suscripcion in suscripciones:
+            for hilo in suscripcion.hilos:
+                hilo.join(timeout)
+        # Los mensajes que esperaban su reintento se rechazan antes de cerrar los consumidores
+        self._rechazos.detener()
+        for suscripcion in suscripciones:
+            if suscripcion.consumidor is not None:
+                try:
+                    suscripcion.consumidor.close()
+                except Exception as e:
+                    logger.warning(f"CONSUMIDORES: Error cerrando consumidor de {suscripcion.topico}: {e}")
+        with self._lock:
+            productores_dlq, self._productores_dlq = list(self._productores_dlq.values()), {}
+        for productor in productores_dlq:
+            try:
+                productor.close()
+            except Exception as e:
+                logger.warning(f"CONSUMIDORES: Error cerrando productor de DLQ: {e}")
+        logger.info("CONSUMIDORES: Runtime detenido")
+
+
+_runtime: Optional[RuntimeConsumidores] = None
+_runtime_lock = threading.Lock()
+
+
+def runtime_consumidores() -> RuntimeConsumidores:
+    """Runtime de consumidores global del proceso, sobre el cliente del registro de productores."""
+    global _runtime
+    if _runtime is None:
+        with _runtime_lock:
+            if _runtime is None:
+                from .database import metricas_pool
+                from .productores import registro_productores
+                registro = registro_productores()
+                _runtime = RuntimeConsumidores(
+                    fabrica_cliente=lambda: registro.cliente,
+                    tamano_cola_receptor=settings.pulsar_consumidor_tamano_cola,
+                    concurrencia=settings.pulsar_consumidor_concurrencia,
+                    pausa_error_segundos=settings.pulsar_consumidor_pausa_error_segundos,
+                    politica_reintentos=PoliticaReintentos(
+                        max_intentos=settings.pulsar_consumidor_max_intentos,
+                        retardo_base_ms=settings.pulsar_consumidor_retardo_base_ms,
+                        retardo_maximo_ms=settings.pulsar_consumidor_retardo_maximo_ms,
+                    ),
+                    politica_flujo=PoliticaFlujo(
+                        latencia_maxima_ms=settings.pulsar_flujo_latencia_maxima_ms,
+                        espera_pool_maxima_ms=settings.pulsar_flujo_espera_pool_maxima_ms,
+                        factor_reduccion=settings.pulsar_flujo_factor_reduccion,
+                        pausa_ms=settings.pulsar_flujo_pausa_ms,
+                    ),
+                    espera_pool_ms=metricas_pool.espera_reciente_ms,
+                )
+                # Registrado después del registro de productores: atexit lo detiene antes de cerrar el cliente
+                atexit.register(_runtime.detener)
+    return _runtime
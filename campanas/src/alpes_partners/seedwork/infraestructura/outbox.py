@@ -0,0 +1,208 @@
+"""
+Outbox transaccional para eventos de integración.
+
+Mientras ``capturar_en_outbox`` está activo, las publicaciones del registro de
+productores se serializan y se agregan como filas de ``outbox_mensajes`` a la
+sesión de la unidad de trabajo, de modo que se confirman en la misma
+transacción que el agregado. ``RelayOutbox`` drena la tabla en lotes, publica
+de forma asíncrona y marca como enviadas las filas confirmadas por el broker.
+"""
+
+import contextvars
+import importlib
+import json
+import logging
+import threading
+import uuid
+from concurrent.futures import Future, wait
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache
+from typing import Callable, Dict, Optional
+
+import pulsar
+from pulsar.schema import AvroSchema
+from sqlalchemy import Boolean, Column, DateTime, Index, LargeBinary, String, Text, select, update
+from sqlalchemy.orm import declarative_base
+
+from ...config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+Base = declarative_base()
+
+_CLAVE_PARTICION = '__clave_particion'
+
+_sesion_outbox: contextvars.ContextVar = contextvars.ContextVar('sesion_outbox', default=None)
+
+
+class OutboxModelo(Base):
+    """Mensaje de integración pendiente de publicar."""
+    __tablename__ = "outbox_mensajes"
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    topico = Column(String(255), nullable=False)
+    schema = Column(String(255), nullable=True)  # Ruta del Record Avro; None para bytes
+    contenido = Column(LargeBinary, nullable=False)
+    propiedades = Column(Text, nullable=True)  # Propiedades del mensaje en JSON
+    enviado = Column(Boolean, nullable=False, default=False)
+    fecha_creacion = Column(DateTime, nullable=False, default=datetime.utcnow)
+    fecha_envio = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index('ix_outbox_pendientes', 'enviado', 'fecha_creacion'),
+    )
+
+
+@contextmanager
+def capturar_en_outbox(sesion):
+    """Redirige las publicaciones del hilo actual al outbox de ``sesion``."""
+    token = _sesion_outbox.set(sesion)
+    try:
+        yield
+    finally:
+        _sesion_outbox.reset(token)
+
+
+def sesion_outbox_actual():
+    """Sesión en la que se deben registrar las publicaciones, o None si se publica directo."""
+    return _sesion_outbox.get()
+
+
+def agregar_a_outbox(sesion, mensaje, topico: str, schema, propiedades: Optional[Dict[str, str]] = None,
+                     clave: Optional[str] = None):
+    """Serializa el mensaje y lo agrega a la sesión como fila pendiente."""
+    registro = getattr(schema, '_record_cls', None)
+    if clave:
+        # La clave de partición viaja junto a las propiedades para no cambiar el esquema de la tabla
+        propiedades = {**(propiedades or {}), _CLAVE_PARTICION: str(clave)}
+    sesion.add(OutboxModelo(
+        id=str(uuid.uuid4()),
+        topico=topico,
+        schema=f'{registro.__module__}:{registro.__qualname__}' if registro is not None else None,
+        contenido=schema.encode(mensaje) if registro is not None else mensaje,
+        propiedades=json.dumps(propiedades) if propiedades else None,
+        enviado=False,
+        fecha_creacion=datetime.utcnow(),
+    ))
+
+
+@lru_cache(maxsize=None)
+def _resolver_schema(ruta: Optional[str]):
+    if not ruta:
+        return None
+    modulo, nombre = ruta.split(':')
+    return AvroSchema(getattr(importlib.import_module(modulo), nombre))
+
+
+class RelayOutbox:
+    """Publica en lotes las filas pendientes del outbox."""
+
+    def __init__(self,
+                 fabrica_sesion: Optional[Callable] = None,
+                 registro=None,
+                 tamano_lote: int = 500,
+                 intervalo_segundos: float = 0.5,
+                 timeout_confirmacion_segundos: float = 30):
+        if fabrica_sesion is None:
+            from .database import SessionLocal
+            fabrica_sesion = SessionLocal
+        if registro is None:
+            from .productores import RegistroProductores
+            # Registro propio para publicar con el tamaño de lote del relay
+            registro = RegistroProductores(asincrono=True, batching_max_mensajes=tamano_lote)
+        self._fabrica_sesion = fabrica_sesion
+        self._registro = registro
+        self._tamano_lote = tamano_lote
+        self._intervalo_segundos = intervalo_segundos
+        self._timeout_confirmacion_segundos = timeout_confirmacion_segundos
+        self._detener = threading.Event()
+
+    def drenar_lote(self) -> int:
+        """Publica un lote de filas pendientes y retorna cuántas quedaron marcadas como enviadas."""
+        sesion = self._fabrica_sesion()
+        try:
+            consulta = (
+                select(OutboxModelo)
+                .where(OutboxModelo.enviado.is_(False))
+                .order_by(OutboxModelo.fecha_creacion, OutboxModelo.id)
+                .limit(self._tamano_lote)
+            )
+            if sesion.get_bind().dialect.name == 'postgresql':
+                # Permite varias réplicas del relay sin publicar la misma fila dos veces
+                consulta = consulta.with_for_update(skip_locked=True)
+            filas = sesion.execute(consulta).scalars().all()
+            if not filas:
+                sesion.commit()
+                return 0
+
+            confirmaciones = [(fila.id, self._publicar(fila)) for fila in filas]
+            wait([futuro for _, futuro in confirmaciones], timeout=self._timeout_confirmacion_segundos)
+            enviados = [
+                id_fila for id_fila, futuro in confirmaciones
+                if futuro.done() and futuro.result() == pulsar.Result.Ok
+            ]
+
+            if enviados:
+                sesion.execute(
+                    update(OutboxModelo)
+                    .where(OutboxModelo.id.in_(enviados))
+                    .values(enviado=True, fecha_envio=datetime.utcnow())
+                )
+            sesion.commit()
+
+            if len(enviados) < len(filas):
+                logger.warning(f"OUTBOX: {len(filas) - len(enviados)} mensajes sin confirmar, se reintentarán")
+            return len(enviados)
+        except Exception:
+            sesion.rollback()
+            raise
+        finally:
+            sesion.close()
+
+    def _publicar(self, fila: OutboxModelo) -> Future:
+        futuro: Future = Future()
+        schema = _resolver_schema(fila.schema)
+        mensaje = schema.decode(fila.contenido) if schema is not None else fila.contenido
+        propiedades = json.loads(fila.propiedades) if fila.propiedades else {}
+        clave = propiedades.pop(_CLAVE_PARTICION, None)
+        try:
+            self._registro.publicar_async(
+                mensaje, fila.topico, schema,
+                callback=lambda resultado: futuro.set_result(resultado),
+                propiedades=propiedades or None,
+                clave=clave
+            )
+        except Exception as e:
+            logger.error(f"OUTBOX: Error publicando mensaje {fila.id} en {fila.topico}: {e}")
+            futuro.set_result(None)
+        return futuro
+
+    def ejecutar(self):
+        """Bucle del relay: drena mientras haya pendientes y espera ``intervalo_segundos`` si no."""
+        logger.info("OUTBOX: Relay iniciado")
+        while not self._detener.is_set():
+            try:
+                if self.drenar_lote() < self._tamano_lote:
+                    self._detener.wait(self._intervalo_segundos)
+            except Exception as e:
+                logger.error(f"OUTBOX: Error drenando outbox: {e}")
+                self._detener.wait(5)
+        self._registro.cerrar()
+        logger.info("OUTBOX: Relay detenido")
+
+    def detener(self):
+        self._detener.set()
+
+
+def iniciar_relay_outbox() -> Optional[threading.Thread]:
+    """Inicia el relay en un hilo daemon si el outbox está habilitado."""
+    if not settings.outbox_habilitado:
+        return None
+    relay = RelayOutbox(
+        tamano_lote=settings.outbox_tamano_lote,
+        intervalo_segundos=settings.outbox_intervalo_ms / 1000.0,
+    )
+    hilo = threading.Thread(target=relay.ejecutar, daemon=True, name='relay-outbox')
+    hilo.start()
+    return hilo
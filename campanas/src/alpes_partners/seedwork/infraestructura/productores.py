@@ -0,0 +1,279 @@
+"""
+Registro de cliente y productores de Pulsar compartidos por todo el proceso.
+
+Los despachadores publican a través de este registro en lugar de abrir un
+``pulsar.Client`` por mensaje: la conexión con el broker y el registro de cada
+productor se pagan una sola vez y se reutilizan entre hilos.
+
+En modo asíncrono los mensajes se envían con ``send_async`` sobre productores con
+batching; una ventana acotada de mensajes en vuelo aplica contrapresión y
+``vaciar()`` espera las confirmaciones pendientes antes de cerrar.
+
+Dentro de ``outbox.capturar_en_outbox`` las publicaciones se escriben en el
+outbox de la transacción en curso en lugar de enviarse al broker.
+
+Cada mensaje lleva como propiedades los ids de correlación y causación del
+contexto vigente (ver ``contexto.py``). ``clave`` se envía como clave de
+partición: los consumidores ``KeyShared`` la usan para mantener el orden de los
+mensajes de una misma entidad.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import pulsar
+
+from . import utils
+from .contexto import propiedades_salientes
+from .outbox import agregar_a_outbox, sesion_outbox_actual
+from ...config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+def clave_schema(schema) -> str:
+    """Identificador estable de un schema (las instancias de AvroSchema no son comparables)."""
+    registro = getattr(schema, '_record_cls', None)
+    if registro is not None:
+        return f'{registro.__module__}.{registro.__qualname__}'
+    return type(schema).__name__
+
+
+def _opciones_envio(propiedades: Dict[str, str], clave: Optional[str]) -> Dict[str, Any]:
+    opciones: Dict[str, Any] = {'properties': propiedades}
+    if clave:
+        opciones['partition_key'] = str(clave)
+    return opciones
+
+
+class _EntradaProductor:
+    def __init__(self, productor):
+        self.productor = productor
+        self.ultimo_uso = time.monotonic()
+
+
+class RegistroProductores:
+    """Cliente de Pulsar y productores reutilizables indexados por (tópico, schema)."""
+
+    def __init__(self,
+                 url_broker: Optional[str] = None,
+                 fabrica_cliente: Optional[Callable[[str], Any]] = None,
+                 inactividad_segundos: float = 300,
+                 intervalo_limpieza_segundos: float = 60,
+                 asincrono: bool = False,
+                 max_en_vuelo: int = 1000,
+                 batching_max_mensajes: int = 1000,
+                 batching_max_retardo_ms: int = 10):
+        self._url_broker = url_broker or f'pulsar://{utils.broker_host()}:6650'
+        self._fabrica_cliente = fabrica_cliente or pulsar.Client
+        self._inactividad_segundos = inactividad_segundos
+        self._intervalo_limpieza_segundos = intervalo_limpieza_segundos
+        self._cliente = None
+        self._productores: Dict[Tuple[str, str], _EntradaProductor] = {}
+        self._lock = threading.RLock()
+        self._ultima_limpieza = time.monotonic()
+        self._cerrado = False
+
+        self._asincrono = asincrono
+        self._batching_max_mensajes = batching_max_mensajes
+        self._batching_max_retardo_ms = batching_max_retardo_ms
+        self._ventana = threading.BoundedSemaphore(max_en_vuelo)
+        self._pendientes = threading.Condition()
+        self._en_vuelo = 0
+        self.enviados = 0
+        self.fallidos = 0
+
+    @property
+    def cliente(self):
+        """Cliente de Pulsar del proceso, creado en el primer uso."""
+        if self._cliente is None:
+            with self._lock:
+                if self._cliente is None:
+                    logger.info(f"PULSAR: Conectando cliente compartido a {self._url_broker}")
+                    self._cliente = self._fabrica_cliente(self._url_broker)
+        return self._cliente
+
+    def obtener_productor(self, topico: str, schema):
+        """Devuelve el productor de (tópico, schema), creándolo si no existe."""
+        clave = (topico, clave_schema(schema))
+        self._limpiar_si_corresponde()
+
+        with self._lock:
+            if self._cerrado:
+                raise RuntimeError("El registro de productores está cerrado")
+            entrada = self._productores.get(clave)
+            if entrada is None:
+                logger.info(f"PULSAR: Creando productor para {topico} ({clave[1]})")
+                opciones = {'schema': schema} if schema is not None else {}
+                if self._asincrono:
+                    opciones.update(
+                        batching_enabled=True,
+                        batching_max_messages=self._batching_max_mensajes,
+                        batching_max_publish_delay_ms=self._batching_max_retardo_ms,
+                        block_if_queue_full=True,
+                    )
+                entrada = _EntradaProductor(self.cliente.create_producer(topico, **opciones))
+                self._productores[clave] = entrada
+            entrada.ultimo_uso = time.monotonic()
+            return entrada.productor
+
+    def publicar(self, mensaje, topico: str, schema, propiedades: Optional[Dict[str, str]] = None,
+                 clave: Optional[str] = None):
+        """Publica un mensaje reutilizando el productor del tópico (asíncrono si está configurado)."""
+        propiedades = propiedades_salientes(propiedades)
+        sesion = sesion_outbox_actual()
+        if sesion is not None:
+            agregar_a_outbox(sesion, mensaje, topico, schema, propiedades, clave=clave)
+            return None
+        if self._asincrono:
+            self.publicar_async(mensaje, topico, schema, propiedades=propiedades, clave=clave)
+            return None
+        opciones = _opciones_envio(propiedades, clave)
+        productor = self.obtener_productor(topico, schema)
+        try:
+            return productor.send(mensaje, **opciones)
+        except pulsar.AlreadyClosed:
+            # El productor se cerró (limpieza o desconexión definitiva): se recrea una vez
+            self._descartar(topico, schema)
+            return self.obtener_productor(topico, schema).send(mensaje, **opciones)
+
+    def publicar_async(self, mensaje, topico: str, schema,
+                       callback: Optional[Callable[[Any], None]] = None,
+                       propiedades: Optional[Dict[str, str]] = None,
+                       clave: Optional[str] = None):
+        """
+        Encola el mensaje con ``send_async`` y retorna sin esperar la confirmación.
+        Bloquea solo si ya hay ``max_en_vuelo`` mensajes sin confirmar. ``callback``
+        recibe el ``pulsar.Result`` del envío.
+        """
+        opciones = _opciones_envio(propiedades_salientes(propiedades), clave)
+        self._ventana.acquire()
+        with self._pendientes:
+            self._en_vuelo += 1
+
+        def confirmacion(resultado, id_mensaje):
+            self._confirmar(topico, resultado)
+            if callback is not None:
+                callback(resultado)
+
+        try:
+            try:
+                self.obtener_productor(topico, schema).send_async(mensaje, confirmacion, **opciones)
+            except pulsar.AlreadyClosed:
+                self._descartar(topico, schema)
+                self.obtener_productor(topico, schema).send_async(mensaje, confirmacion, **opciones)
+        except Exception:
+            self._confirmar(topico, None, registrar=False)
+            raise
+
+    def vaciar(self, timeout: Optional[float] = 30) -> bool:
+        """Fuerza el envío de los lotes pendientes y espera sus confirmaciones."""
+        with self._lock:
+            productores = [entrada.productor for entrada in self._productores.values()]
+        for productor in productores:
+            try:
+                productor.flush()
+            except Exception as e:
+                logger.warning(f"PULSAR: Error vaciando productor: {e}")
+
+        with self._pendientes:
+            vacio = self._pendientes.wait_for(lambda: self._en_vuelo == 0, timeout)
+        if not vacio:
+            logger.warning(f"PULSAR: {self._en_vuelo} mensajes sin confirmar tras vaciar")
+        return vacio
+
+    def estadisticas(self) -> Dict[str, int]:
+        with self._pendientes:
+            return {
+                'enviados': self.enviados,
+                'fallidos': self.fallidos,
+                'en_vuelo': self._en_vuelo,
+                'productores': len(self._productores),
+            }
+
+    def _confirmar(self, topico: str, resultado, registrar: bool = True):
+        with self._pendientes:
+            self._en_vuelo -= 1
+            if resultado == pulsar.Result.Ok:
+                self.enviados += 1
+            else:
+                self.fallidos += 1
+            self._pendientes.notify_all()
+        self._ventana.release()
+        if registrar and resultado != pulsar.Result.Ok:
+            logger.error(f"PULSAR: Error confirmando envío a {topico}: {resultado}")
+
+    def limpiar_inactivos(self) -> int:
+        """Cierra los productores sin uso durante más de ``inactividad_segundos``."""
+        limite = time.monotonic() - self._inactividad_segundos
+        with self._lock:
+            inactivos = [clave for clave, entrada in self._productores.items() if entrada.ultimo_uso < limite]
+            entradas = [self._productores.pop(clave) for clave in inactivos]
+            self._ultima_limpieza = time.monotonic()
+
+        for clave, entrada in zip(inactivos, entradas):
+            logger.info(f"PULSAR: Cerrando productor inactivo para {clave[0]}")
+            self._cerrar_productor(entrada.productor)
+        return len(entradas)
+
+    def cerrar(self):
+        """Cierra productores y cliente. Se registra con atexit para el registro global."""
+        if self._asincrono and not self._cerrado:
+            self.vaciar()
+        with self._lock:
+            if self._cerrado:
+                return
+            self._cerrado = True
+            entradas = list(self._productores.values())
+            self._productores.clear()
+            cliente, self._cliente = self._cliente, None
+
+        for entrada in entradas:
+            self._cerrar_productor(entrada.productor)
+        if cliente is not None:
+            try:
+                cliente.close()
+            except Exception as e:
+                logger.warning(f"PULSAR: Error cerrando cliente compartido: {e}")
+        logger.info("PULSAR: Registro de productores cerrado")
+
+    def _limpiar_si_corresponde(self):
+        if time.monotonic() - self._ultima_limpieza >= self._intervalo_limpieza_segundos:
+            self.limpiar_inactivos()
+
+    def _descartar(self, topico: str, schema):
+        with self._lock:
+            entrada = self._productores.pop((topico, clave_schema(schema)), None)
+        if entrada is not None:
+            self._cerrar_productor(entrada.productor)
+
+    @staticmethod
+    def _cerrar_productor(productor):
+        try:
+            productor.close()
+        except Exception as e:
+            logger.warning(f"PULSAR: Error cerrando productor: {e}")
+
+
+_registro: Optional[RegistroProductores] = None
+_registro_lock = threading.Lock()
+
+
+def registro_productores() -> RegistroProductores:
+    """Registro de productores global del proceso."""
+    global _registro
+    if _registro is None:
+        with _registro_lock:
+            if _registro is None:
+                _registro = RegistroProductores(
+                    inactividad_segundos=settings.pulsar_productor_inactividad_segundos,
+                    asincrono=settings.pulsar_publicacion_asincrona,
+                    max_en_vuelo=settings.pulsar_max_en_vuelo,
+                    batching_max_mensajes=settings.pulsar_batching_max_mensajes,
+                    batching_max_retardo_ms=settings.pulsar_batching_max_retardo_ms,
+                )
+                atexit.register(_registro.cerrar)
+    return _registro
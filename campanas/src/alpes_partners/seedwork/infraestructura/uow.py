@@ -1,8 +1,12 @@
 from abc import ABC, abstractmethod
 from enum import Enum
+from typing import Any, Callable, List, Optional, Tuple
+import contextvars
 import logging
 
 from ..dominio.entidades import AgregacionRaiz
+from .contexto import contexto_desde_mensaje
+from .outbox import capturar_en_outbox
 from pydispatch import dispatcher
 
 import pickle
@@ -21,6 +25,32 @@ class Batch:
         self.lock = lock
         self.kwargs = kwargs
 
+class LoteTransaccional:
+    """
+    Transacción compartida por los mensajes de un lote (ver ``procesar_en_lote``).
+    Mientras está activa, cada mensaje usa su propia unidad de trabajo, sus commits
+    solo escriben en la sesión y sus eventos post-commit se difieren hasta el
+    commit del lote.
+    """
+
+    def __init__(self):
+        self.uow: Optional['UnidadTrabajo'] = None
+        self.diferidos: List[Tuple[contextvars.Context, list]] = []
+
+    def diferir(self, eventos: list):
+        if eventos:
+            # Se publican luego en el contexto (correlación, causa) del mensaje que los produjo
+            self.diferidos.append((contextvars.copy_context(), list(eventos)))
+
+
+_lote_actual: contextvars.ContextVar = contextvars.ContextVar('lote_actual', default=None)
+
+
+def lote_actual() -> Optional[LoteTransaccional]:
+    """Lote transaccional en curso, o None si cada commit confirma su propia transacción."""
+    return _lote_actual.get()
+
+
 class UnidadTrabajo(ABC):
 
     def __enter__(self):
@@ -50,7 +80,11 @@ class UnidadTrabajo(ABC):
         raise NotImplementedError                    
 
     def commit(self):
-        self._publicar_eventos_post_commit()
+        lote = lote_actual()
+        if lote is not None:
+            lote.diferir(self._obtener_eventos())
+        else:
+            self._publicar_eventos_post_commit()
         self._limpiar_batches()
 
     @abstractmethod
@@ -78,6 +112,11 @@ class UnidadTrabajo(ABC):
             logger.info(f"UoW: Enviando evento {type(evento).__name__} con señal {signal}")
             dispatcher.send(signal=signal, evento=evento)
 
+    def _publicar_eventos_en_outbox(self, sesion):
+        """Despacha los eventos de integración escribiéndolos en el outbox de ``sesion``."""
+        with capturar_en_outbox(sesion):
+            self._publicar_eventos_post_commit()
+
 def is_flask():
     try:
         from flask import session
@@ -88,6 +127,12 @@ def is_flask():
 # Funciones simplificadas sin pickle
 
 def unidad_de_trabajo() -> UnidadTrabajo:
+    lote = lote_actual()
+    if lote is not None:
+        if lote.uow is None:
+            from ...config.uow import UnidadTrabajoSQLAlchemy
+            lote.uow = UnidadTrabajoSQLAlchemy()
+        return lote.uow
     if is_flask():
         from flask import g
         if not hasattr(g, 'uow'):
@@ -98,7 +143,10 @@ def unidad_de_trabajo() -> UnidadTrabajo:
         raise Exception('No hay unidad de trabajo')
 
 def guardar_unidad_trabajo(uow: UnidadTrabajo):
-    if is_flask():
+    lote = lote_actual()
+    if lote is not None:
+        lote.uow = uow
+    elif is_flask():
         from flask import g
         g.uow = uow
     else:
@@ -135,3 +183,44 @@ class UnidadTrabajoPuerto:
         uow = unidad_de_trabajo()
         uow.registrar_batch(operacion, *args, lock=lock, **kwargs)
         guardar_unidad_trabajo(uow)
+
+
+def procesar_en_lote(sesion, mensajes: List[Any], procesar: Callable[[Any], None]) -> List[Tuple[Any, Exception]]:
+    """
+    Procesa ``mensajes`` en una sola transacción de ``sesion``, cada uno dentro de
+    su propio savepoint y de ``contexto_desde_mensaje``. Un mensaje que falla
+    revierte solo su savepoint y se devuelve en la lista de ``(mensaje, error)``;
+    el resto se confirma con un único commit. Los eventos post-commit de los
+    mensajes confirmados se publican después de ese commit. Si el commit falla
+    la transacción se revierte y la excepción se propaga.
+    """
+    lote = LoteTransaccional()
+    token = _lote_actual.set(lote)
+    fallidos = []
+    try:
+        for mensaje in mensajes:
+            lote.uow = None
+            diferidos = len(lote.diferidos)
+            try:
+                with sesion.begin_nested(), contexto_desde_mensaje(mensaje):
+                    procesar(mensaje)
+            except Exception as e:
+                del lote.diferidos[diferidos:]
+                fallidos.append((mensaje, e))
+        sesion.commit()
+    except Exception:
+        sesion.rollback()
+        raise
+    finally:
+        lote.uow = None
+        _lote_actual.reset(token)
+
+    for contexto, eventos in lote.diferidos:
+        contexto.run(_publicar_eventos_diferidos, eventos)
+    return fallidos
+
+
+def _publicar_eventos_diferidos(eventos: list):
+    _lote_actual.set(None)
+    for evento in eventos:
+        dispatcher.send(signal=f'{type(evento).__name__}Integracion', evento=evento)
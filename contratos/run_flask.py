@@ -16,6 +16,9 @@ sys.path.insert(0, src_path)
 
 import logging
 from alpes_partners.config.settings import settings
+from alpes_partners.seedwork.infraestructura.consumidores import runtime_consumidores
+from alpes_partners.seedwork.infraestructura.database import estado_pool, precalentar_pool
+from alpes_partners.seedwork.infraestructura.outbox import iniciar_relay_outbox
 from alpes_partners.modulos.contratos.infraestructura.consumidores import suscribirse_a_eventos_campanas_desde_contratos
 from alpes_partners.modulos.contratos.infraestructura.consumidores_comandos import suscribirse_a_comandos_contratos
 
@@ -38,6 +41,16 @@ def health_check():
         'service': 'contratos-microservice'
     })
 
+@app.route('/consumidores')
+def metricas_consumidores():
+    """Métricas de cada suscripción del runtime de consumidores."""
+    return jsonify(runtime_consumidores().metricas())
+
+@app.route('/pool')
+def metricas_pool_bd():
+    """Espera por conexión, conexiones y utilización del pool de base de datos."""
+    return jsonify(estado_pool())
+
 def start_consumer():
     """Inicia el consumidor de eventos en un hilo separado."""
     try:
@@ -62,6 +75,9 @@ def main():
     # Obtener puerto de Cloud Run
     port = int(os.environ.get('PORT', 8080))
     
+    # Las conexiones se abren antes de recibir el primer mensaje
+    precalentar_pool()
+    
     try:
         # Iniciar consumidor de eventos en hilo daemon
         consumer_thread = threading.Thread(target=start_consumer, daemon=True)
@@ -73,6 +89,10 @@ def main():
         command_consumer_thread.start()
         logger.info("Consumidor de comandos iniciado")
         
+        # Iniciar relay del outbox si está habilitado
+        if iniciar_relay_outbox():
+            logger.info("Relay de outbox iniciado")
+        
         # Iniciar servidor HTTP
         logger.info(f"Servidor HTTP iniciado en puerto {port}")
         app.run(host='0.0.0.0', port=port, debug=False)
@@ -1,5 +1,6 @@
 from ..seedwork.infraestructura.database import db
-from ..seedwork.infraestructura.uow import UnidadTrabajo, Batch
+from .settings import settings
+from ..seedwork.infraestructura.uow import UnidadTrabajo, Batch, lote_actual
 
 class UnidadTrabajoSQLAlchemy(UnidadTrabajo):
 
@@ -29,17 +30,30 @@ class UnidadTrabajoSQLAlchemy(UnidadTrabajo):
             lock = batch.lock
             batch.operacion(*batch.args, **batch.kwargs)
 
-        db.session.commit()
+        # Dentro de un lote solo se escribe en la sesión: el lote confirma la transacción
+        confirmar = db.session.flush if lote_actual() is not None else db.session.commit
+
+        if settings.outbox_habilitado:
+            # Los eventos se escriben en el outbox y se confirman junto con el agregado;
+            # el relay los publica después sin bloquear este commit
+            self._publicar_eventos_en_outbox(db.session)
+            confirmar()
+            self._limpiar_batches()
+            return
+
+        confirmar()
 
         super().commit()
 
     def rollback(self, savepoint=None):
         if savepoint:
             savepoint.rollback()
-        else:
+        elif lote_actual() is None:
+            # En un lote el savepoint del mensaje revierte sus cambios
             db.session.rollback()
         
         super().rollback()
     
     def savepoint(self):
-        db.session.begin_nested()
+        if lote_actual() is None:
+            db.session.begin_nested()
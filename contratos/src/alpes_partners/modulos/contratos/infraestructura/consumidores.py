@@ -4,7 +4,6 @@ Se suscribe a eventos de campañas y ejecuta comandos para crear contratos autom
 """
 
 import logging
-import time
 import uuid
 from datetime import datetime
 
@@ -12,12 +11,11 @@ from datetime import datetime
 logger = logging.getLogger(__name__)
 
 # Imports esenciales
-import pulsar
-import _pulsar
 from pulsar.schema import AvroSchema
 
 from alpes_partners.config.app import crear_app_minima
-from alpes_partners.seedwork.infraestructura import utils
+from alpes_partners.config.settings import settings
+from alpes_partners.seedwork.infraestructura.consumidores import clave_por_campos, runtime_consumidores
 from alpes_partners.modulos.contratos.aplicacion.comandos.crear_contrato import CrearContrato, ejecutar_comando_crear_contrato
 
 # Definir esquema de campaña localmente para evitar dependencias circulares
@@ -53,50 +51,32 @@ app = crear_app_minima()
 
 def suscribirse_a_eventos_campanas_desde_contratos():
     """
-    DESHABILITADO: Suscribirse a eventos de campañas para crear contratos automáticamente.
-    Ahora los contratos se crean solo a través de comandos de la saga.
+    Suscribirse a eventos de campañas para crear contratos automáticamente.
+    Solo en modo coreografía (SAGA_MODO=coreografia); en orquestación los contratos
+    se crean a través de comandos de la saga.
     """
-    logger.info("CONTRATOS: Consumidor directo de campañas DESHABILITADO - Solo procesar comandos de saga")
-    return
+    if settings.saga_modo != 'coreografia':
+        logger.info("CONTRATOS: Consumidor directo de campañas DESHABILITADO - Solo procesar comandos de saga")
+        return
     
-    # CÓDIGO COMENTADO - Los contratos ahora se crean solo a través de comandos de la saga
-    # cliente = None
-    # try:
-    #     logger.info("CONTRATOS: Conectando a Pulsar...")
-    #     cliente = pulsar.Client(f'pulsar://{utils.broker_host()}:6650')
-    #     
-    #     # Consumidor para eventos de campañas
-    #     consumidor = cliente.subscribe(
-    #         'eventos-campanas', 
-    #         consumer_type=_pulsar.ConsumerType.Shared,
-    #         subscription_name='contratos-sub-eventos-campanas', 
-    #         schema=AvroSchema(EventoCampanaCreada)
-    #     )
-
-    #     logger.info("CONTRATOS: Suscrito a eventos de campañas")
-    #     logger.info("CONTRATOS: Esperando eventos...")
-    #     
-    #     while True:
-    #         try:
-    #             mensaje = consumidor.receive()
-    #             logger.info(f"CONTRATOS: Evento recibido - {mensaje.value()}")
-    #             
-    #             # Procesar evento
-    #             _procesar_evento_campana(mensaje.value())
-    #             
-    #             # Confirmar procesamiento
-    #             consumidor.acknowledge(mensaje)
-    #             logger.info("CONTRATOS: Evento procesado y confirmado")
-    #             
-    #         except Exception as e:
-    #             logger.error(f"CONTRATOS: Error procesando evento: {e}")
-    #             time.sleep(5)  # Esperar antes de continuar
-    #             
-    # except Exception as e:
-    #     logger.error(f"CONTRATOS: Error en consumidor: {e}")
-    # finally:
-    #     if cliente:
-    #         cliente.close()
+    runtime = runtime_consumidores()
+    runtime.registrar(
+        'eventos-campanas',
+        'contratos-sub-eventos-campanas',
+        AvroSchema(EventoCampanaCreada),
+        _manejar_evento_campana,
+        nombre='contratos-eventos-campanas',
+        clave=clave_por_campos('campana_id'),
+    )
+    runtime.iniciar()
+    logger.info("CONTRATOS: Suscrito a eventos de campañas (coreografía)")
+
+
+def _manejar_evento_campana(mensaje):
+    logger.info(f"CONTRATOS: Evento recibido - {mensaje.value()}")
+    # Un error de contrato sale con las compensaciones del sobre
+    _procesar_evento_campana(mensaje.value())
+    logger.info("CONTRATOS: Evento procesado")
 
 
 def _procesar_evento_campana(evento):
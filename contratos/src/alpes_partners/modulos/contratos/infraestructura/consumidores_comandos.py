@@ -1,83 +1,116 @@
 import logging
-import time
-import pulsar
-import _pulsar
 import uuid
 from datetime import datetime
 from pulsar.schema import AvroSchema
 from alpes_partners.config.app import crear_app_minima
-from alpes_partners.seedwork.infraestructura import utils
+from alpes_partners.config.settings import settings
+from alpes_partners.seedwork.infraestructura.consumidores import clave_por_campos, runtime_consumidores
+from alpes_partners.seedwork.infraestructura.database import db
+from alpes_partners.seedwork.infraestructura.idempotencia import registro_idempotencia
+from alpes_partners.seedwork.infraestructura.uow import procesar_en_lote
 from alpes_partners.modulos.contratos.aplicacion.comandos.crear_contrato import CrearContrato, ejecutar_comando_crear_contrato
 from alpes_partners.modulos.contratos.infraestructura.schema.v1.comandos import ComandoCrearContrato
 
 logger = logging.getLogger(__name__)
 app = crear_app_minima()
 
+CONSUMIDOR = 'contratos-comandos'
+
 def suscribirse_a_comandos_contratos():
     """
     Suscribirse a comandos de contratos desde la saga.
+    Con ``pulsar_comandos_tamano_lote`` mayor que 1 los comandos se procesan en
+    lotes, con un solo commit por lote.
     """
-    cliente = None
-    try:
-        logger.info("CONTRATOS COMANDOS: Conectando a Pulsar para comandos...")
-        cliente = pulsar.Client(f'pulsar://{utils.broker_host()}:6650')
-        consumidor = cliente.subscribe(
+    runtime = runtime_consumidores()
+    if settings.pulsar_comandos_tamano_lote > 1:
+        runtime.registrar_lote(
+            'comandos-contratos-v2',
+            'contratos-sub-comandos-v2',
+            AvroSchema(ComandoCrearContrato),
+            _manejar_lote_comandos_crear_contrato,
+            tamano_lote=settings.pulsar_comandos_tamano_lote,
+            espera_lote_ms=settings.pulsar_comandos_espera_lote_ms,
+            nombre=CONSUMIDOR,
+            clave=clave_por_campos('campana_id'),
+        )
+    else:
+        runtime.registrar(
             'comandos-contratos-v2',
-            consumer_type=_pulsar.ConsumerType.Shared,
-            subscription_name='contratos-sub-comandos-v2',
-            schema=AvroSchema(ComandoCrearContrato)
+            'contratos-sub-comandos-v2',
+            AvroSchema(ComandoCrearContrato),
+            _manejar_comando_crear_contrato,
+            nombre=CONSUMIDOR,
+            clave=clave_por_campos('campana_id'),
         )
-        logger.info("CONTRATOS COMANDOS: Suscrito a comandos de contratos")
-        logger.info("CONTRATOS COMANDOS: Esperando comandos...")
+    runtime.iniciar()
+    logger.info("CONTRATOS COMANDOS: Suscrito a comandos de contratos")
+
+def _manejar_comando_crear_contrato(mensaje):
+    logger.info(f"CONTRATOS COMANDOS: Comando recibido - {mensaje.value()}")
+    _procesar_comando_crear_contrato(mensaje)
+    logger.info("CONTRATOS COMANDOS: Comando procesado")
 
-        while True:
-            try:
-                mensaje = consumidor.receive()
-                logger.info(f"CONTRATOS COMANDOS: Comando recibido - {mensaje.value()}")
-                _procesar_comando_crear_contrato(mensaje.value())
-                consumidor.acknowledge(mensaje)
-                logger.info("CONTRATOS COMANDOS: Comando procesado y confirmado")
-            except Exception as e:
-                logger.error(f"CONTRATOS COMANDOS: Error procesando comando: {e}")
-                import traceback
-                logger.error(f"CONTRATOS COMANDOS: Traceback: {traceback.format_exc()}")
-                time.sleep(5)
-    except Exception as e:
-        logger.error(f"CONTRATOS COMANDOS: Error en consumidor de comandos: {e}")
-    finally:
-        if cliente:
-            cliente.close()
+def _manejar_lote_comandos_crear_contrato(mensajes):
+    """
+    Procesa un lote de comandos en una sola transacción, con un savepoint por comando.
+    Los comandos que fallan se devuelven al runtime, que los rechaza uno por uno
+    según la política de reintentos; el resto se confirma.
+    """
+    logger.info(f"CONTRATOS COMANDOS: Lote de {len(mensajes)} comandos recibido")
+    with app.app_context():
+        fallidos = procesar_en_lote(db.session, mensajes, _ejecutar_si_nuevo)
+    for mensaje, error in fallidos:
+        logger.error(f"CONTRATOS COMANDOS: Error al procesar comando CrearContrato: {error}")
+    logger.info(f"CONTRATOS COMANDOS: Lote procesado, {len(mensajes) - len(fallidos)} contratos creados")
+    return fallidos
 
-def _procesar_comando_crear_contrato(comando_integracion):
+def _procesar_comando_crear_contrato(mensaje):
     """
     Procesa un comando de crear contrato desde la saga.
     """
     with app.app_context():
         try:
-            logger.info("CONTRATOS COMANDOS: Procesando comando CrearContrato")
-            data = comando_integracion.data
-
-            comando = CrearContrato(
-                fecha_creacion=data.fecha_creacion if hasattr(data, 'fecha_creacion') else datetime.utcnow().isoformat(),
-                fecha_actualizacion=datetime.utcnow().isoformat(),
-                id=str(uuid.uuid4()),
-                influencer_id=data.influencer_id,
-                influencer_nombre=data.influencer_nombre,
-                influencer_email=data.influencer_email,
-                campana_id=data.campana_id,
-                campana_nombre=data.campana_nombre,
-                categorias=data.categorias,
-                descripcion=data.descripcion,
-                monto_base=data.monto_base,
-                moneda=data.moneda,
-                fecha_inicio=data.fecha_inicio,
-                fecha_fin=data.fecha_fin,
-                entregables=data.entregables,
-                tipo_contrato=data.tipo_contrato
-            )
-            ejecutar_comando_crear_contrato(comando)
-            logger.info(f"CONTRATOS COMANDOS: Contrato {comando.id} creado desde comando de saga")
+            _ejecutar_si_nuevo(mensaje)
         except Exception as e:
             logger.error(f"CONTRATOS COMANDOS: Error al procesar comando CrearContrato: {e}")
             import traceback
             logger.error(f"CONTRATOS COMANDOS: Traceback: {traceback.format_exc()}")
+            # El runtime reintenta el comando y, al agotar los intentos, lo mueve a la DLQ
+            raise
+
+def _ejecutar_si_nuevo(mensaje):
+    """
+    Ejecuta el comando si el consumidor no lo procesó antes. El id del mensaje se
+    registra en la misma transacción que el contrato; un duplicado no toca el dominio.
+    """
+    if registro_idempotencia().registrar_si_nuevo(db.session, CONSUMIDOR, mensaje):
+        _ejecutar_comando_crear_contrato(mensaje.value())
+
+def _ejecutar_comando_crear_contrato(comando_integracion):
+    """
+    Convierte el comando de la saga en el comando de dominio y lo ejecuta.
+    """
+    logger.info("CONTRATOS COMANDOS: Procesando comando CrearContrato")
+    data = comando_integracion.data
+
+    comando = CrearContrato(
+        fecha_creacion=data.fecha_creacion if hasattr(data, 'fecha_creacion') else datetime.utcnow().isoformat(),
+        fecha_actualizacion=datetime.utcnow().isoformat(),
+        id=str(uuid.uuid4()),
+        influencer_id=data.influencer_id,
+        influencer_nombre=data.influencer_nombre,
+        influencer_email=data.influencer_email,
+        campana_id=data.campana_id,
+        campana_nombre=data.campana_nombre,
+        categorias=data.categorias,
+        descripcion=data.descripcion,
+        monto_base=data.monto_base,
+        moneda=data.moneda,
+        fecha_inicio=data.fecha_inicio,
+        fecha_fin=data.fecha_fin,
+        entregables=data.entregables,
+        tipo_contrato=data.tipo_contrato
+    )
+    ejecutar_comando_crear_contrato(comando)
+    logger.info(f"CONTRATOS COMANDOS: Contrato {comando.id} creado desde comando de saga")
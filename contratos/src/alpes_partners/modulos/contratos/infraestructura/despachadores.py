@@ -4,7 +4,7 @@ from pulsar.schema import *
 from alpes_partners.modulos.contratos.infraestructura.schema.v1.eventos import (
     EventoContratoCreado, ContratoCreadoPayload, EventoContratoError, ContratoErrorPayload
 )
-from alpes_partners.seedwork.infraestructura import utils
+from alpes_partners.seedwork.infraestructura.productores import registro_productores
 
 import datetime
 
@@ -14,11 +14,8 @@ def unix_time_millis(dt):
 
 
 class DespachadorContratos:
-    def _publicar_mensaje(self, mensaje, topico, schema):
-        cliente = pulsar.Client(f'pulsar://{utils.broker_host()}:6650')
-        publicador = cliente.create_producer(topico, schema=schema)
-        publicador.send(mensaje)
-        cliente.close()
+    def _publicar_mensaje(self, mensaje, topico, schema, clave=None):
+        registro_productores().publicar(mensaje, topico, schema, clave=clave)
 
     def publicar_evento_contrato_creado(self, evento, topico='eventos-contratos'):
         """Publica evento cuando un contrato es creado."""
@@ -41,7 +38,7 @@ class DespachadorContratos:
             service_name="alpes-partners-contratos",
             data=payload
         )
-        self._publicar_mensaje(evento_integracion, topico, AvroSchema(EventoContratoCreado))
+        self._publicar_mensaje(evento_integracion, topico, AvroSchema(EventoContratoCreado), clave=payload.id_campana)
     
     def publicar_evento_error_contrato(self, evento, topico='eventos-contratos-error'):
         """Publica evento cuando hay un error en la creación del contrato."""
@@ -66,15 +63,12 @@ class DespachadorContratos:
             service_name="alpes-partners-contratos",
             data=payload
         )
-        self._publicar_mensaje(evento_integracion, topico, AvroSchema(EventoContratoError))
+        self._publicar_mensaje(evento_integracion, topico, AvroSchema(EventoContratoError), clave=payload.id_campana)
     
     def publicar(self, evento, topico, schema=None):
         """Método genérico para publicar eventos."""
         try:
-            cliente = pulsar.Client(f'pulsar://{utils.broker_host()}:6650')
-            publicador = cliente.create_producer(topico, schema=schema)
-            publicador.send(evento)
-            cliente.close()
+            registro_productores().publicar(evento, topico, schema)
         except Exception as e:
             import logging
             logger = logging.getLogger(__name__)
@@ -1,25 +1,183 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.pool import NullPool
-from typing import Generator
+from sqlalchemy.pool import QueuePool
+from collections import deque
+from typing import Generator, Optional
 import logging
+import threading
+import time
+import weakref
 
 from ...config.settings import settings
 
 # Para Flask-SQLAlchemy
 from flask_sqlalchemy import SQLAlchemy
 
+
+class SQLAlchemyCompartido(SQLAlchemy):
+    """
+    Flask-SQLAlchemy sobre el engine del proceso: las apps configuradas con
+    ``settings.database_url`` usan ``engine`` (y su pool) en lugar de crear uno propio.
+    """
+
+    def _make_engine(self, bind_key, options, app):
+        if bind_key is None and make_url(options['url']) == make_url(settings.database_url):
+            return engine
+        return super()._make_engine(bind_key, options, app)
+
+
 # Instancia global de SQLAlchemy para Flask
-db = SQLAlchemy()
+db = SQLAlchemyCompartido()
 
 logger = logging.getLogger(__name__)
 
-# Motor de base de datos síncrono
-engine = create_engine(
-    settings.database_url,
-    poolclass=NullPool,  # Para evitar problemas con conexiones en desarrollo
-    echo=settings.debug,  # Log de queries SQL en modo debug
-)
+
+class MetricasPool:
+    """
+    Esperas por una conexión del pool, conexiones abiertas y conexiones prestadas
+    de los engines medidos con ``medir_pool``.
+    """
+
+    def __init__(self, ventana_segundos: float = 0.25):
+        self._ventana_segundos = ventana_segundos
+        self._recientes = deque()
+        self._lock = threading.Lock()
+        self.esperas = 0
+        self.segundos_esperando = 0.0
+        self.espera_maxima = 0.0
+        self.en_uso = 0
+        self.en_uso_maximo = 0
+        self.aperturas = 0
+
+    def registrar_espera(self, segundos: float):
+        ahora = time.monotonic()
+        with self._lock:
+            self.esperas += 1
+            self.segundos_esperando += segundos
+            self.espera_maxima = max(self.espera_maxima, segundos)
+            self._recientes.append((ahora, segundos))
+            self._descartar_viejas(ahora)
+
+    def abrir(self):
+        with self._lock:
+            self.aperturas += 1
+
+    def prestar(self, cantidad: int):
+        with self._lock:
+            self.en_uso += cantidad
+            self.en_uso_maximo = max(self.en_uso_maximo, self.en_uso)
+
+    def espera_reciente_ms(self) -> float:
+        """Espera promedio del último ``ventana_segundos``; 0 si no se pidió ninguna conexión."""
+        with self._lock:
+            self._descartar_viejas(time.monotonic())
+            if not self._recientes:
+                return 0.0
+            return 1000 * sum(segundos for _, segundos in self._recientes) / len(self._recientes)
+
+    def _descartar_viejas(self, ahora: float):
+        while self._recientes and self._recientes[0][0] < ahora - self._ventana_segundos:
+            self._recientes.popleft()
+
+    def como_dict(self) -> dict:
+        espera_reciente_ms = self.espera_reciente_ms()
+        with self._lock:
+            return {
+                'conexiones_en_uso': self.en_uso,
+                'conexiones_en_uso_maximo': self.en_uso_maximo,
+                'conexiones_abiertas': self.aperturas,
+                'esperas': self.esperas,
+                'espera_ms_promedio': round(1000 * self.segundos_esperando / self.esperas, 3) if self.esperas else 0.0,
+                'espera_ms_reciente': round(espera_reciente_ms, 3),
+                'espera_ms_maxima': round(1000 * self.espera_maxima, 3),
+            }
+
+
+metricas_pool = MetricasPool()
+_engines_medidos = weakref.WeakSet()
+
+
+class _MedidorPool:
+    """
+    Listeners de los eventos ``connect``, ``checkout`` y ``checkin`` del pool de un engine.
+
+    El pool no avisa cuando un hilo empieza a esperar una conexión, así que la espera
+    se estima: una conexión devuelta que se presta con el pool agotado (todas sus
+    conexiones prestadas) registra como espera el tiempo que el pool lleva agotado.
+    El primer préstamo de una conexión nueva no esperó en el pool y solo se cuenta
+    como apertura, de modo que el precalentamiento no suma esperas.
+    """
+
+    def __init__(self, motor, metricas: MetricasPool):
+        self._motor = motor
+        self._metricas = metricas
+        self._lock = threading.Lock()
+        self._agotado_desde: Optional[float] = None
+
+    def conectar(self, dbapi_connection, connection_record):
+        connection_record.info['medir_pool_nueva'] = True
+        self._metricas.abrir()
+
+    def prestar(self, dbapi_connection, connection_record, connection_proxy):
+        self._metricas.prestar(1)
+        nueva = connection_record.info.pop('medir_pool_nueva', False)
+        ahora = time.perf_counter()
+        agotado = self._agotado()
+        with self._lock:
+            espera = (ahora - self._agotado_desde) if agotado and self._agotado_desde is not None else 0.0
+            if not agotado:
+                self._agotado_desde = None
+            elif self._agotado_desde is None:
+                self._agotado_desde = ahora
+        if not nueva:
+            self._metricas.registrar_espera(espera)
+
+    def devolver(self, dbapi_connection, connection_record):
+        self._metricas.prestar(-1)
+
+    def _agotado(self) -> bool:
+        pool = self._motor.pool
+        if not isinstance(pool, QueuePool):
+            return False
+        # QueuePool no expone el desborde máximo; -1 es desborde sin límite
+        desborde = pool._max_overflow
+        return desborde >= 0 and pool.checkedout() >= pool.size() + desborde
+
+
+def medir_pool(motor, metricas: Optional[MetricasPool] = None):
+    """Registra en ``metricas`` (por defecto ``metricas_pool``) las esperas, aperturas y préstamos del pool de ``motor``."""
+    if motor in _engines_medidos:
+        return
+    _engines_medidos.add(motor)
+    medidor = _MedidorPool(motor, metricas or metricas_pool)
+    event.listen(motor, 'connect', medidor.conectar)
+    event.listen(motor, 'checkout', medidor.prestar)
+    event.listen(motor, 'checkin', medidor.devolver)
+
+
+def _crear_engine():
+    """Engine del proceso, con un ``QueuePool`` configurado en settings."""
+    opciones = {}
+    if settings.db_statement_timeout_ms > 0 and make_url(settings.database_url).get_backend_name() == 'postgresql':
+        # El servidor corta cualquier sentencia de estas conexiones que pase el límite
+        opciones['connect_args'] = {'options': f'-c statement_timeout={settings.db_statement_timeout_ms}'}
+    return create_engine(
+        settings.database_url,
+        poolclass=QueuePool,
+        pool_size=settings.db_pool_tamano,
+        max_overflow=settings.db_pool_desborde,
+        pool_timeout=settings.db_pool_timeout_segundos,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        pool_recycle=settings.db_pool_reciclar_segundos,
+        echo=settings.debug,  # Log de queries SQL en modo debug
+        **opciones,
+    )
+
+
+# Motor de base de datos síncrono, compartido por SessionLocal y Flask-SQLAlchemy
+engine = _crear_engine()
+medir_pool(engine)
 
 # Factory de sesiones síncronas
 SessionLocal = sessionmaker(
@@ -61,6 +219,8 @@ def init_db():
         Base.metadata.create_all(bind=engine)
         logger.info("Tablas de base de datos creadas/actualizadas (datos preservados)")
 
+    _crear_tablas_seedwork()
+
 
 def init_db_flask_tables():
     """Inicializa las tablas usando Flask-SQLAlchemy."""
@@ -69,12 +229,58 @@ def init_db_flask_tables():
     
     # Crear todas las tablas definidas en los modelos
     Base.metadata.create_all(bind=engine)
+    _crear_tablas_seedwork()
     logger.info("Tablas Flask-SQLAlchemy creadas/actualizadas")
 
 
+def _crear_tablas_seedwork():
+    """Crea las tablas de infraestructura compartidas (outbox y mensajes procesados)."""
+    from .outbox import Base as BaseOutbox
+    from .idempotencia import Base as BaseIdempotencia
+    BaseOutbox.metadata.create_all(bind=engine)
+    BaseIdempotencia.metadata.create_all(bind=engine)
+
+
+def precalentar_pool() -> int:
+    """
+    Abre ``db_pool_tamano`` conexiones al iniciar el servicio para que los primeros
+    mensajes no paguen el connect. Devuelve cuántas se abrieron.
+    """
+    if not settings.db_pool_precalentar:
+        return 0
+    abiertas = []
+    try:
+        # Son conexiones nuevas: el precalentamiento no cuenta como espera de los manejadores
+        for _ in range(settings.db_pool_tamano):
+            abiertas.append(engine.pool.connect())
+    except Exception as e:
+        logger.warning(f"No se pudo precalentar el pool de conexiones: {e}")
+    finally:
+        for conexion in abiertas:
+            conexion.close()
+    logger.info(f"Pool de conexiones precalentado con {len(abiertas)} conexiones")
+    return len(abiertas)
+
+
+def estado_pool() -> dict:
+    """Métricas del pool del engine del proceso: esperas por conexión, conexiones y utilización."""
+    capacidad = settings.db_pool_tamano + max(settings.db_pool_desborde, 0)
+    prestadas = engine.pool.checkedout()
+    return {
+        **metricas_pool.como_dict(),
+        'tamano': settings.db_pool_tamano,
+        'desborde_maximo': settings.db_pool_desborde,
+        'abiertas': engine.pool.checkedin() + prestadas,
+        'prestadas': prestadas,
+        'utilizacion': round(prestadas / capacidad, 3) if capacidad > 0 else 0.0,
+    }
+
+
 def init_db_flask(app):
     """Inicializa la base de datos para Flask."""
     db.init_app(app)
+    with app.app_context():
+        medir_pool(db.engine)
     logger.info("Base de datos Flask inicializada")
 
 
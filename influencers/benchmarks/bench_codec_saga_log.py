@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Benchmark del codec del saga log: tamaño almacenado y throughput de escritura y lectura, JSON vs Avro.
+
+Registra ``--sagas`` sagas de seis pasos con contenidos como los que produce el
+coordinador (eventos de influencer, campaña y contrato) en dos bases SQLite
+temporales, una por codec. Reporta los bytes del contenido por entrada, el
+tamaño del archivo de la base, las entradas por segundo al escribir con
+``insertar_ignorando_duplicados`` y al leer con ``obtener_por_correlacion``,
+tanto decodificando el contenido completo como accediendo a un solo campo
+(con Avro la lectura es perezosa y solo decodifica al acceder), y el costo del
+codec por entrada sin base de datos.
+
+    python benchmarks/bench_codec_saga_log.py --sagas 2000
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from flask import Flask
+from sqlalchemy import func, select
+
+src_path = os.path.join(os.path.dirname(__file__), '..', 'src')
+sys.path.insert(0, src_path)
+
+from alpes_partners.seedwork.infraestructura.database import db
+from alpes_partners.modulos.sagas.dominio.entidades import SagaLog
+from alpes_partners.modulos.sagas.infraestructura.codec_saga_log import (
+    CodecAvro, CodecJson, codec_saga_log, datos_de_fila
+)
+from alpes_partners.modulos.sagas.infraestructura.repositorio_saga_log import (
+    RepositorioSagaLogSQLAlchemy, SagaEstadoModelo, SagaLogEsquemaModelo, SagaLogModelo,
+    insertar_ignorando_duplicados, valores_saga_log
+)
+
+
+def _contenidos(n: int):
+    influencer_id, campana_id, contrato_id = str(uuid.uuid4()), str(uuid.uuid4()), str(uuid.uuid4())
+    return [
+        ('Inicio', {'index': 0}),
+        ('EventoDominioInfluencerRegistrado', {
+            'influencer_id': influencer_id, 'nombre': f'Influencer {n}', 'email': f'influencer{n}@alpes.com',
+            'categorias': ['moda', 'lifestyle'], 'plataformas': ['instagram', 'tiktok'],
+            'fecha_registro': '2024-05-01T10:00:00', 'id_correlacion': f'saga-{n}',
+        }),
+        ('EventoDominioCampanaCreada', {
+            'campana_id': campana_id, 'nombre': f'Campaña {n}', 'descripcion': 'Campaña automática',
+            'tipo_comision': 'cpa', 'valor_comision': 15.5, 'moneda': 'USD', 'categorias_objetivo': ['moda'],
+            'influencer_id': influencer_id, 'fecha_creacion': '2024-05-01T10:00:01',
+        }),
+        ('EventoDominioContratoCreado', {
+            'contrato_id': contrato_id, 'influencer_id': influencer_id, 'campana_id': campana_id,
+            'monto_base': 1000.0, 'monto_total': 1150.0, 'moneda': 'USD', 'tipo_contrato': 'puntual',
+            'estado': 'activo', 'fecha_creacion': '2024-05-01T10:00:02',
+        }),
+        ('CompensacionEjecutada', {'comando': 'EliminarCampana', 'exitosa': True, 'error': None}),
+        ('Fin', {'index': 5}),
+    ]
+
+
+def _ejecutar(codec, sagas: int, ruta: str):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{ruta}'
+    db.init_app(app)
+    inicio = datetime(2024, 5, 1)
+    with app.app_context():
+        for modelo in (SagaLogModelo, SagaEstadoModelo, SagaLogEsquemaModelo):
+            modelo.__table__.create(db.engine)
+
+        entradas = [
+            SagaLog(id_correlacion=f'saga-{n}', evento_tipo=tipo, evento_datos=datos, paso_index=paso,
+                    fecha_procesamiento=inicio + timedelta(seconds=n, milliseconds=paso))
+            for n in range(sagas) for paso, (tipo, datos) in enumerate(_contenidos(n))
+        ]
+        t0 = time.perf_counter()
+        filas = [valores_saga_log(entrada, codec) for entrada in entradas]
+        for i in range(0, len(filas), 200):
+            insertar_ignorando_duplicados(db.session, filas[i:i + 200])
+            db.session.commit()
+        escritura = len(entradas) / (time.perf_counter() - t0)
+
+        bytes_contenido = db.session.execute(select(func.sum(
+            func.length(SagaLogModelo.evento_datos) + func.coalesce(func.length(SagaLogModelo.evento_datos_binario), 0)
+        ))).scalar_one()
+        db.session.remove()
+
+        repositorio = RepositorioSagaLogSQLAlchemy()
+        t0 = time.perf_counter()
+        for n in range(sagas):
+            for entrada in repositorio.obtener_por_correlacion(f'saga-{n}'):
+                dict(entrada.evento_datos)
+        lectura_completa = len(entradas) / (time.perf_counter() - t0)
+        db.session.remove()
+
+        t0 = time.perf_counter()
+        for n in range(sagas):
+            for entrada in repositorio.obtener_por_correlacion(f'saga-{n}'):
+                entrada.evento_datos.get('influencer_id')
+        lectura_campo = len(entradas) / (time.perf_counter() - t0)
+        db.session.remove()
+
+        t0 = time.perf_counter()
+        for n in range(sagas):
+            [entrada.evento_tipo for entrada in repositorio.obtener_por_correlacion(f'saga-{n}')]
+        lectura_sin_contenido = len(entradas) / (time.perf_counter() - t0)
+        db.session.remove()
+        db.engine.dispose()
+
+    return (bytes_contenido / len(entradas), os.path.getsize(ruta), escritura, lectura_completa, lectura_campo,
+            lectura_sin_contenido)
+
+
+def _codec_puro(codec, sagas: int):
+    """Microsegundos por entrada al codificar y al decodificar, sin base de datos."""
+    contenidos = [datos for n in range(sagas) for _, datos in _contenidos(n)]
+    t0 = time.perf_counter()
+    valores = [codec.columnas(datos) for datos in contenidos]
+    codificar = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for valor in valores:
+        datos_de_fila(valor['evento_datos'], valor['evento_datos_binario'])
+    decodificar = time.perf_counter() - t0
+    return 1e6 * codificar / len(contenidos), 1e6 * decodificar / len(contenidos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sagas', type=int, default=2000)
+    args = parser.parse_args()
+
+    # Sin registros en logging.INFO para medir el codec y no los mensajes del repositorio
+    logging.disable(logging.INFO)
+
+    with tempfile.TemporaryDirectory() as directorio:
+        resultados = [
+            ('json', _ejecutar(CodecJson(), args.sagas, os.path.join(directorio, 'json.db'))),
+            ('avro', _ejecutar(codec_saga_log(CodecAvro.nombre), args.sagas, os.path.join(directorio, 'avro.db'))),
+        ]
+
+    print(f"{'codec':<6} {'B/entrada':>10} {'archivo KB':>11} {'escritura/s':>12} "
+          f"{'lect. completa/s':>17} {'lect. 1 campo/s':>16} {'lect. sin datos/s':>18}")
+    for nombre, (por_entrada, archivo, escritura, completa, campo, sin_contenido) in resultados:
+        print(f"{nombre:<6} {por_entrada:>10.1f} {archivo / 1024:>11.0f} {escritura:>12.0f} "
+              f"{completa:>17.0f} {campo:>16.0f} {sin_contenido:>18.0f}")
+
+    print(f"\n{'codec':<6} {'codificar us':>13} {'decodificar us':>15}")
+    for nombre, codec in (('json', CodecJson()), ('avro', codec_saga_log(CodecAvro.nombre))):
+        codificar, decodificar = _codec_puro(codec, args.sagas)
+        print(f"{nombre:<6} {codificar:>13.2f} {decodificar:>15.2f}")
+    json_bytes, avro_bytes = resultados[0][1][0], resultados[1][1][0]
+    print(f"contenido avro / json: {avro_bytes / json_bytes:.2f}")
+
+
+if __name__ == '__main__':
+    main()
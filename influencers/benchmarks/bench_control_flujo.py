@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark del control de flujo: latencia de los manejadores con el pool saturado, con y sin ventana adaptativa.
+
+Publica ``--mensajes`` mensajes de golpe en el broker en memoria y los consume
+con ``--concurrencia`` hilos. Cada manejador pide una conexión a un
+``QueuePool`` de ``--pool`` conexiones (con ``--pool-timeout-ms`` de espera
+máxima, medido con ``medir_pool``) y la retiene ``--servicio-ms``. Sin control
+de flujo los hilos se acumulan esperando el pool y parte de los mensajes falla
+por timeout y se reintenta; con control de flujo la ventana en vuelo se ajusta
+a lo que el pool atiende. Las latencias incluyen los intentos fallidos.
+
+    python benchmarks/bench_control_flujo.py --mensajes 3000 --concurrencia 32 --pool 4 --servicio-ms 10
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+
+src_path = os.path.join(os.path.dirname(__file__), '..', 'src')
+sys.path.insert(0, src_path)
+
+from alpes_partners.seedwork.infraestructura.broker_memoria import BrokerMemoria, ClienteMemoria
+from alpes_partners.seedwork.infraestructura.consumidores import RuntimeConsumidores
+from alpes_partners.seedwork.infraestructura.control_flujo import PoliticaFlujo
+from alpes_partners.seedwork.infraestructura.database import MetricasPool, medir_pool
+from alpes_partners.seedwork.infraestructura.reintentos import PoliticaReintentos
+
+TOPICO = 'comandos-campanas'
+
+
+def ejecutar(con_flujo: bool, args):
+    motor = create_engine('sqlite://', poolclass=QueuePool, pool_size=args.pool, max_overflow=0,
+                          pool_timeout=args.pool_timeout_ms / 1000.0,
+                          creator=lambda: sqlite3.connect(':memory:', check_same_thread=False))
+    metricas = MetricasPool()
+    medir_pool(motor, metricas)
+
+    politica_flujo = (PoliticaFlujo(latencia_maxima_ms=args.latencia_maxima_ms,
+                                    espera_pool_maxima_ms=args.espera_pool_maxima_ms, pausa_ms=500)
+                      if con_flujo else PoliticaFlujo(latencia_maxima_ms=0, espera_pool_maxima_ms=0))
+    broker = BrokerMemoria()
+    cliente = ClienteMemoria(broker=broker)
+    runtime = RuntimeConsumidores(fabrica_cliente=lambda: cliente, concurrencia=args.concurrencia,
+                                  timeout_recepcion_ms=50, politica_flujo=politica_flujo,
+                                  espera_pool_ms=metricas.espera_reciente_ms,
+                                  politica_reintentos=PoliticaReintentos(max_intentos=1000, retardo_base_ms=20,
+                                                                         retardo_maximo_ms=100))
+    latencias = []
+    procesados = []
+    lock = threading.Lock()
+    terminado = threading.Event()
+
+    def manejar(mensaje):
+        # Se mide cada intento, también los que fallan por timeout del pool
+        inicio = time.perf_counter()
+        try:
+            with motor.connect():
+                time.sleep(args.servicio_ms / 1000.0)
+        finally:
+            with lock:
+                latencias.append(time.perf_counter() - inicio)
+        with lock:
+            procesados.append(mensaje.value())
+            if len(procesados) == args.mensajes:
+                terminado.set()
+
+    suscripcion = runtime.registrar(TOPICO, 'bench', None, manejar)
+    runtime.iniciar()
+
+    inicio = time.perf_counter()
+    for numero in range(args.mensajes):
+        broker.almacenar(TOPICO, numero)
+    terminado.wait()
+    segundos = time.perf_counter() - inicio
+    runtime.detener()
+    motor.dispose()
+
+    latencias.sort()
+    percentiles = [1000 * latencias[int(p * (len(latencias) - 1))] for p in (0.5, 0.95, 0.99)]
+    return args.mensajes / segundos, percentiles, suscripcion.metricas.fallidos, suscripcion.flujo.como_dict()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--mensajes', type=int, default=1000)
+    parser.add_argument('--concurrencia', type=int, default=32)
+    parser.add_argument('--pool', type=int, default=4)
+    parser.add_argument('--servicio-ms', type=float, default=10.0)
+    parser.add_argument('--pool-timeout-ms', type=float, default=100.0)
+    parser.add_argument('--latencia-maxima-ms', type=float, default=50.0)
+    parser.add_argument('--espera-pool-maxima-ms', type=float, default=5.0)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    print(f"{'control de flujo':>16} {'msg/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'timeouts':>9} "
+          f"{'ventana final':>14} {'reducciones':>12} {'pausas':>7}")
+    for con_flujo in (False, True):
+        throughput, (p50, p95, p99), timeouts, flujo = ejecutar(con_flujo, args)
+        print(f"{'sí' if con_flujo else 'no':>16} {throughput:>8.1f} {p50:>8.1f} {p95:>8.1f} {p99:>8.1f} {timeouts:>9} "
+              f"{flujo['ventana']:>14} {flujo['reducciones']:>12} {flujo['pausas']:>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Benchmark de latencia de la saga: orquestación vs coreografía sobre un broker simulado.
+
+Cada salto por el broker es una cola con latencia fija y cada servicio un hilo
+que procesa sus mensajes en orden. En orquestación el flujo hasta el contrato
+pasa por el coordinador entre pasos (evento -> saga -> comando -> servicio, cinco
+saltos); en coreografía campañas y contratos reaccionan directamente a los
+eventos (dos saltos) y la saga solo observa. Mide la latencia de extremo a
+extremo desde InfluencerRegistrado hasta ContratoCreado. Es un modelo: no
+requiere Pulsar y los tiempos se controlan con los parámetros.
+
+    python benchmarks/bench_coreografia_saga.py --flujos 300 --latencia-broker-ms 2 --intervalo-llegadas-ms 5
+"""
+
+import argparse
+import queue
+import statistics
+import threading
+import time
+from typing import Callable, Dict, List
+
+
+class BrokerSimulado:
+    """Tópicos como colas atendidas por un hilo consumidor con retardo de entrega."""
+
+    def __init__(self, latencia_segundos: float):
+        self._latencia = latencia_segundos
+        self._colas: Dict[str, queue.Queue] = {}
+        self._hilos: List[threading.Thread] = []
+
+    def suscribir(self, topico: str, manejador: Callable, procesamiento_segundos: float):
+        cola = self._colas[topico] = queue.Queue()
+
+        def consumir():
+            while True:
+                entrega, mensaje = cola.get()
+                if mensaje is None:
+                    return
+                espera = entrega - time.perf_counter()
+                if espera > 0:
+                    time.sleep(espera)
+                if procesamiento_segundos:
+                    time.sleep(procesamiento_segundos)
+                manejador(mensaje)
+
+        hilo = threading.Thread(target=consumir, daemon=True)
+        hilo.start()
+        self._hilos.append(hilo)
+
+    def publicar(self, topico: str, mensaje):
+        self._colas[topico].put((time.perf_counter() + self._latencia, mensaje))
+
+    def cerrar(self):
+        for cola in self._colas.values():
+            cola.put((0, None))
+        for hilo in self._hilos:
+            hilo.join()
+
+
+def orquestacion(broker: BrokerSimulado, saga_s: float, servicio_s: float, terminado: Callable):
+    # El coordinador recibe cada evento y envía el comando del siguiente paso
+    def saga(mensaje):
+        tipo, flujo = mensaje
+        if tipo == 'InfluencerRegistrado':
+            broker.publicar('comandos-campanas', flujo)
+        elif tipo == 'CampanaCreada':
+            broker.publicar('comandos-contratos', flujo)
+        elif tipo == 'ContratoCreado':
+            terminado(flujo)
+
+    broker.suscribir('eventos-saga', saga, saga_s)
+    broker.suscribir('comandos-campanas', lambda flujo: broker.publicar('eventos-saga', ('CampanaCreada', flujo)), servicio_s)
+    broker.suscribir('comandos-contratos', lambda flujo: broker.publicar('eventos-saga', ('ContratoCreado', flujo)), servicio_s)
+    return lambda flujo: broker.publicar('eventos-saga', ('InfluencerRegistrado', flujo))
+
+
+def coreografia(broker: BrokerSimulado, saga_s: float, servicio_s: float, terminado: Callable):
+    # Contratos publica ContratoCreado; la saga lo registra fuera del camino crítico
+    broker.suscribir('eventos-influencers', lambda flujo: broker.publicar('eventos-campanas', flujo), servicio_s)
+    broker.suscribir('eventos-campanas', lambda flujo: terminado(flujo), servicio_s)
+    return lambda flujo: broker.publicar('eventos-influencers', flujo)
+
+
+def ejecutar(modo: Callable, flujos: int, intervalo_s: float, latencia_s: float, saga_s: float,
+             servicio_s: float) -> List[float]:
+    broker = BrokerSimulado(latencia_s)
+    inicios: Dict[int, float] = {}
+    latencias: List[float] = []
+    listos = threading.Semaphore(0)
+
+    def terminado(flujo: int):
+        latencias.append(time.perf_counter() - inicios[flujo])
+        listos.release()
+
+    iniciar = modo(broker, saga_s, servicio_s, terminado)
+    for flujo in range(flujos):
+        inicios[flujo] = time.perf_counter()
+        iniciar(flujo)
+        # Con llegadas más seguidas que lo que atiende el coordinador se mide su cola
+        time.sleep(intervalo_s)
+    for _ in range(flujos):
+        listos.acquire()
+    broker.cerrar()
+    return latencias
+
+
+def _percentil(valores: List[float], p: float) -> float:
+    return 1000 * statistics.quantiles(valores, n=100)[int(p) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--flujos', type=int, default=300)
+    parser.add_argument('--intervalo-llegadas-ms', type=float, default=5)
+    parser.add_argument('--latencia-broker-ms', type=float, default=2)
+    parser.add_argument('--procesamiento-saga-ms', type=float, default=0.5)
+    parser.add_argument('--procesamiento-servicio-ms', type=float, default=0.2)
+    args = parser.parse_args()
+
+    parametros = (args.flujos, args.intervalo_llegadas_ms / 1000, args.latencia_broker_ms / 1000,
+                  args.procesamiento_saga_ms / 1000, args.procesamiento_servicio_ms / 1000)
+    orq = ejecutar(orquestacion, *parametros)
+    coreo = ejecutar(coreografia, *parametros)
+
+    print(f"{'modo':<14} {'p50':>10} {'p95':>10}")
+    for nombre, latencias in (('orquestacion', orq), ('coreografia', coreo)):
+        print(f"{nombre:<14} {_percentil(latencias, 50):>7.2f} ms {_percentil(latencias, 95):>7.2f} ms")
+    print(f"mejora p50: {_percentil(orq, 50) / _percentil(coreo, 50):.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark del despacho de eventos de la saga: búsqueda lineal vs tabla compilada.
+
+Compara el costo por evento de ubicar el paso de la saga recorriendo ``pasos`` con
+isinstance (comportamiento anterior de ``obtener_paso_dado_un_evento``) contra la
+búsqueda en la ``TablaDespacho``, para la saga de Alpes Partners y para sagas
+sintéticas con más pasos. No ejecuta comandos ni escribe en el saga log.
+
+    python benchmarks/bench_despacho_saga.py --eventos 200000 --pasos 3 10 50
+"""
+
+import argparse
+import os
+import sys
+import time
+
+src_path = os.path.join(os.path.dirname(__file__), '..', 'src')
+sys.path.insert(0, src_path)
+# Algunos módulos de dominio importan con el prefijo ``src.``
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from alpes_partners.seedwork.aplicacion.sagas import Fin, Inicio, TablaDespacho, Transaccion
+from alpes_partners.seedwork.dominio.eventos import EventoDominio
+from alpes_partners.modulos.sagas.aplicacion.coordinadores.saga_alpes_partners import (
+    CoordinadorInfluencersCampanasContratos
+)
+
+
+def buscar_lineal(pasos, evento):
+    """Comportamiento anterior: recorre los pasos comparando con isinstance."""
+    for i, paso in enumerate(pasos):
+        if not isinstance(paso, Transaccion):
+            continue
+        if isinstance(evento, paso.evento) or isinstance(evento, paso.error):
+            return paso, i
+    raise Exception("Evento no hace parte de la transacción")
+
+
+def buscar_en_tabla(tabla: TablaDespacho, evento):
+    index, _ = tabla.resolver(type(evento))
+    return tabla.pasos[index], index
+
+
+def pasos_sinteticos(cantidad: int):
+    pasos = [Inicio(index=0)]
+    for i in range(1, cantidad + 1):
+        evento = type(f'Paso{i}Listo', (EventoDominio,), {})
+        error = type(f'Paso{i}Fallo', (EventoDominio,), {})
+        pasos.append(Transaccion(index=i, comando=None, evento=evento, error=error, compensacion=None))
+    pasos.append(Fin(index=cantidad + 1))
+    return pasos
+
+
+def eventos_de(pasos, total: int):
+    """Eventos de éxito y error de todas las transacciones, repartidos uniformemente."""
+    tipos = [tipo for paso in pasos if isinstance(paso, Transaccion) for tipo in (paso.evento, paso.error)]
+    instancias = [tipo.__new__(tipo) for tipo in tipos]
+    return [instancias[i % len(instancias)] for i in range(total)]
+
+
+def medir(buscar, destino, eventos) -> float:
+    inicio = time.perf_counter()
+    for evento in eventos:
+        buscar(destino, evento)
+    return 1e9 * (time.perf_counter() - inicio) / len(eventos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--eventos', type=int, default=200000)
+    parser.add_argument('--pasos', type=int, nargs='+', default=[3, 10, 50])
+    args = parser.parse_args()
+
+    escenarios = [('alpes partners', CoordinadorInfluencersCampanasContratos.pasos)]
+    escenarios += [(f'{cantidad} pasos', pasos_sinteticos(cantidad)) for cantidad in args.pasos]
+
+    print(f"{'saga':<16} {'lineal':>12} {'tabla':>12} {'mejora':>8}")
+    for nombre, pasos in escenarios:
+        eventos = eventos_de(pasos, args.eventos)
+        lineal = medir(buscar_lineal, pasos, eventos)
+        tabla = medir(buscar_en_tabla, TablaDespacho(pasos), eventos)
+        print(f"{nombre:<16} {lineal:>9.0f} ns {tabla:>9.0f} ns {lineal / tabla:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
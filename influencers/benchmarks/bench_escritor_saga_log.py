@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark del saga log: un commit por paso vs escritor diferido con group commit.
+
+Cada saga registra seis pasos (como el flujo de compensación por error de
+contrato); en modo diferido los cinco primeros son asíncronos y el último
+síncrono. Usa SQLite en un archivo temporal para que cada commit pague la
+sincronización a disco.
+
+    python benchmarks/bench_escritor_saga_log.py --sagas 200 --hilos 8
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+src_path = os.path.join(os.path.dirname(__file__), '..', 'src')
+sys.path.insert(0, src_path)
+
+from alpes_partners.modulos.sagas.dominio.entidades import SagaLog
+from alpes_partners.modulos.sagas.infraestructura.escritor_saga_log import EscritorSagaLog
+from alpes_partners.modulos.sagas.infraestructura.repositorio_saga_log import (
+    SagaEstadoModelo, SagaLogModelo, insertar_ignorando_duplicados, valores_saga_log
+)
+
+PASOS_POR_SAGA = 6
+
+
+def _fabrica_sesion(ruta: str):
+    engine = create_engine(f'sqlite:///{ruta}', connect_args={'timeout': 60})
+
+    @event.listens_for(engine, 'connect')
+    def _wal(conexion, _):
+        conexion.execute('PRAGMA journal_mode=WAL')
+
+    SagaLogModelo.__table__.create(engine)
+    SagaEstadoModelo.__table__.create(engine)
+    return sessionmaker(bind=engine)
+
+
+def _entrada(saga: str, paso: int) -> SagaLog:
+    return SagaLog(id_correlacion=saga, evento_tipo=f'Paso{paso}',
+                   evento_datos={'campana_id': f'campana-{paso}'}, paso_index=paso)
+
+
+def ejecutar(persistir, sagas: int, hilos: int):
+    latencias = []
+    lock = threading.Lock()
+    siguiente = iter(range(sagas))
+
+    def trabajo():
+        propias = []
+        for i in siguiente:
+            for paso in range(PASOS_POR_SAGA):
+                inicio = time.perf_counter()
+                persistir(_entrada(f'saga-{i}', paso), paso == PASOS_POR_SAGA - 1)
+                propias.append(time.perf_counter() - inicio)
+        with lock:
+            latencias.extend(propias)
+
+    trabajadores = [threading.Thread(target=trabajo) for _ in range(hilos)]
+    inicio = time.perf_counter()
+    for t in trabajadores:
+        t.start()
+    for t in trabajadores:
+        t.join()
+    duracion = time.perf_counter() - inicio
+    return sagas / duracion, 1000 * sum(latencias) / len(latencias)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sagas', type=int, default=200)
+    parser.add_argument('--hilos', type=int, default=8)
+    parser.add_argument('--intervalo-ms', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        fabrica = _fabrica_sesion(os.path.join(directorio, 'commit_por_paso.db'))
+
+        def commit_por_paso(saga_log, _sincrono):
+            with fabrica() as sesion:
+                insertar_ignorando_duplicados(sesion, [valores_saga_log(saga_log)])
+                sesion.commit()
+
+        directo = ejecutar(commit_por_paso, args.sagas, args.hilos)
+
+        escritor = EscritorSagaLog(
+            fabrica_sesion=_fabrica_sesion(os.path.join(directorio, 'diferido.db')),
+            intervalo_ms=args.intervalo_ms
+        ).iniciar()
+        diferido = ejecutar(lambda saga_log, sincrono: escritor.agregar(saga_log, sincrono=sincrono),
+                            args.sagas, args.hilos)
+        escritor.detener()
+
+    print(f"{'modo':<18} {'sagas/s':>10} {'latencia paso':>15}")
+    print(f"{'commit por paso':<18} {directo[0]:>10.0f} {directo[1]:>12.2f} ms")
+    print(f"{'group commit':<18} {diferido[0]:>10.0f} {diferido[1]:>12.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Benchmark del procesamiento de comandos en lotes: un commit por comando frente a un commit por lote.
+
+Procesa ``--comandos`` comandos sobre una base SQLite en disco con el mismo
+camino que un manejador de comandos (agregado registrado en la unidad de
+trabajo, commit y publicación post-commit de sus eventos). En el modo mensaje a
+mensaje cada comando abre su contexto y confirma su transacción; en el modo por
+lotes ``procesar_en_lote`` agrupa ``--tamano-lote`` comandos en una transacción,
+con un savepoint por comando. Uno de cada ``--fallidos-cada`` comandos falla para
+mostrar que su savepoint se revierte sin tumbar el lote.
+
+    python benchmarks/bench_lote_comandos.py --comandos 500 --tamano-lote 1 10 100
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+src_path = os.path.join(os.path.dirname(__file__), '..', 'src')
+sys.path.insert(0, src_path)
+
+from flask import Flask
+from pydispatch import dispatcher
+from sqlalchemy import Column, String, event, func, select
+from sqlalchemy.orm import declarative_base
+
+from alpes_partners.seedwork.dominio.entidades import AgregacionRaiz
+from alpes_partners.seedwork.infraestructura.broker_memoria import BrokerMemoria
+from alpes_partners.seedwork.infraestructura.database import db
+from alpes_partners.seedwork.infraestructura.uow import UnidadTrabajoPuerto, procesar_en_lote
+
+TOPICO = 'comandos-campanas'
+
+Base = declarative_base()
+
+
+class CampanaBench(Base):
+    __tablename__ = "campanas_bench"
+
+    id = Column(String(36), primary_key=True)
+    nombre = Column(String(255), nullable=False)
+
+
+class CampanaBenchRegistrada:
+    def __init__(self, id_campana: str):
+        self.id_campana = id_campana
+
+
+def _crear_app(ruta: str) -> Flask:
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{ruta}'
+    db.init_app(app)
+    with app.app_context():
+        # pysqlite abre la transacción por su cuenta y trata cada SAVEPOINT como una
+        # transacción propia; con BEGIN explícito los savepoints quedan anidados
+        @event.listens_for(db.engine, 'connect')
+        def _sin_transaccion_implicita(conexion, _):
+            conexion.isolation_level = None
+
+        @event.listens_for(db.engine, 'begin')
+        def _begin(conexion):
+            conexion.exec_driver_sql('BEGIN')
+
+        Base.metadata.create_all(bind=db.engine)
+    return app
+
+
+def _ejecutar_comando(mensaje, fallidos_cada: int):
+    numero = mensaje.value()
+    campana = AgregacionRaiz(id=f'campana-{numero}')
+    campana.agregar_evento(CampanaBenchRegistrada(campana.id))
+    UnidadTrabajoPuerto.registrar_batch(
+        lambda agregado: db.session.add(CampanaBench(id=agregado.id, nombre=f'Campaña {numero}')), campana)
+    # El fallo llega después de escribir, como una validación de dominio dentro de la transacción
+    db.session.flush()
+    if fallidos_cada and numero % fallidos_cada == fallidos_cada - 1:
+        raise ValueError(f'comando {numero} inválido')
+    UnidadTrabajoPuerto.commit()
+
+
+def ejecutar(tamano_lote: int, comandos: int, fallidos_cada: int):
+    directorio = tempfile.mkdtemp()
+    app = _crear_app(os.path.join(directorio, 'bench.db'))
+    broker = BrokerMemoria()
+    mensajes = [broker.almacenar(TOPICO, numero) for numero in range(comandos)]
+    publicados = []
+
+    def publicar(evento):
+        publicados.append(evento.id_campana)
+    dispatcher.connect(publicar, signal='CampanaBenchRegistradaIntegracion', weak=False)
+
+    inicio = time.perf_counter()
+    if tamano_lote <= 1:
+        for mensaje in mensajes:
+            with app.app_context():
+                try:
+                    _ejecutar_comando(mensaje, fallidos_cada)
+                except ValueError:
+                    pass
+    else:
+        for desde in range(0, comandos, tamano_lote):
+            with app.app_context():
+                procesar_en_lote(db.session, mensajes[desde:desde + tamano_lote],
+                                 lambda mensaje: _ejecutar_comando(mensaje, fallidos_cada))
+    segundos = time.perf_counter() - inicio
+    dispatcher.disconnect(publicar, signal='CampanaBenchRegistradaIntegracion')
+
+    with app.app_context():
+        filas = db.session.execute(select(func.count()).select_from(CampanaBench)).scalar()
+        db.engine.dispose()
+    return comandos / segundos, filas, len(publicados)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--comandos', type=int, default=500)
+    parser.add_argument('--tamano-lote', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--fallidos-cada', type=int, default=50)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    print(f"{'lote':>6} {'commits':>8} {'comandos/s':>11} {'aceleración':>12} {'filas':>7} {'eventos':>8}")
+    base = None
+    for tamano_lote in args.tamano_lote:
+        throughput, filas, eventos = ejecutar(tamano_lote, args.comandos, args.fallidos_cada)
+        base = base or throughput
+        commits = -(-args.comandos // max(1, tamano_lote))
+        print(f"{tamano_lote:>6} {commits:>8} {throughput:>11.1f} {throughput / base:>11.1f}x {filas:>7} {eventos:>8}")
+
+
+if __name__ == '__main__':
+    main()
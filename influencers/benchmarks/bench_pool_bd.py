@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark del pool de conexiones: latencia por mensaje con NullPool y con el QueuePool precalentado.
+
+Consume ``--mensajes`` mensajes del broker en memoria con ``--concurrencia``
+hilos. Cada manejador abre una sesión y ejecuta una consulta sobre SQLite. La
+apertura de cada conexión nueva tarda además ``--connect-ms``, lo que cuesta
+el handshake (TCP, TLS y autenticación) de una conexión a PostgreSQL. Con
+NullPool ese costo se paga en cada mensaje; con QueuePool solo al precalentar.
+
+    python benchmarks/bench_pool_bd.py --mensajes 2000 --concurrencia 4 --connect-ms 5
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool, QueuePool
+
+src_path = os.path.join(os.path.dirname(__file__), '..', 'src')
+sys.path.insert(0, src_path)
+
+from alpes_partners.seedwork.infraestructura.broker_memoria import BrokerMemoria, ClienteMemoria
+from alpes_partners.seedwork.infraestructura.consumidores import RuntimeConsumidores
+
+TOPICO = 'comandos-campanas'
+
+
+def _motor(ruta: str, pool: str, concurrencia: int, connect_ms: float):
+    def conectar():
+        time.sleep(connect_ms / 1000.0)
+        return sqlite3.connect(ruta, check_same_thread=False)
+
+    if pool == 'NullPool':
+        return create_engine('sqlite://', poolclass=NullPool, creator=conectar)
+    motor = create_engine('sqlite://', poolclass=QueuePool, pool_size=concurrencia, max_overflow=0,
+                          pool_pre_ping=pool.endswith('pre_ping'), creator=conectar)
+    # Precalentamiento como precalentar_pool: se abren todas las conexiones antes de consumir
+    conexiones = [motor.pool.connect() for _ in range(concurrencia)]
+    for conexion in conexiones:
+        conexion.close()
+    return motor
+
+
+def ejecutar(pool: str, ruta: str, args):
+    motor = _motor(ruta, pool, args.concurrencia, args.connect_ms)
+    broker = BrokerMemoria()
+    cliente = ClienteMemoria(broker=broker)
+    runtime = RuntimeConsumidores(fabrica_cliente=lambda: cliente, concurrencia=args.concurrencia,
+                                  timeout_recepcion_ms=50)
+    latencias = []
+    lock = threading.Lock()
+    terminado = threading.Event()
+
+    def manejar(mensaje):
+        inicio = time.perf_counter()
+        with Session(motor) as sesion:
+            sesion.execute(text('SELECT 1')).scalar()
+        with lock:
+            latencias.append(time.perf_counter() - inicio)
+            if len(latencias) == args.mensajes:
+                terminado.set()
+
+    runtime.registrar(TOPICO, 'bench', None, manejar)
+    runtime.iniciar()
+
+    inicio = time.perf_counter()
+    for numero in range(args.mensajes):
+        broker.almacenar(TOPICO, numero)
+    terminado.wait()
+    segundos = time.perf_counter() - inicio
+    runtime.detener()
+    motor.dispose()
+
+    latencias.sort()
+    percentiles = [1000 * latencias[int(p * (len(latencias) - 1))] for p in (0.5, 0.95, 0.99)]
+    return args.mensajes / segundos, percentiles
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--mensajes', type=int, default=2000)
+    parser.add_argument('--concurrencia', type=int, default=4)
+    parser.add_argument('--connect-ms', type=float, default=5.0)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, 'bench.db')
+        print(f"{'pool':>18} {'msg/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for pool in ('NullPool', 'QueuePool', 'QueuePool+pre_ping'):
+            throughput, (p50, p95, p99) = ejecutar(pool, ruta, args)
+            print(f"{pool:>18} {throughput:>8.1f} {p50:>8.2f} {p95:>8.2f} {p99:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
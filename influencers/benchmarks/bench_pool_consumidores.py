@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark del procesamiento concurrente por clave: mensajes por segundo con 1, 4 y 16 trabajadores.
+
+Publica ``--mensajes`` mensajes repartidos entre ``--entidades`` claves en el
+broker en memoria y los consume con el runtime de consumidores en modo por
+clave. El manejador simula la latencia de un paso real (escritura en la base
+más publicación) con ``--latencia-ms``. Además del throughput verifica que los
+mensajes de cada clave se procesaron en el orden en que se publicaron.
+
+    python benchmarks/bench_pool_consumidores.py --mensajes 2000 --entidades 200 --latencia-ms 5
+"""
+
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+
+src_path = os.path.join(os.path.dirname(__file__), '..', 'src')
+sys.path.insert(0, src_path)
+
+from alpes_partners.seedwork.infraestructura.broker_memoria import BrokerMemoria, ClienteMemoria
+from alpes_partners.seedwork.infraestructura.consumidores import RuntimeConsumidores, clave_por_campos
+
+TOPICO = 'eventos-campanas'
+
+
+def ejecutar(trabajadores: int, mensajes: int, entidades: int, latencia_ms: float):
+    broker = BrokerMemoria()
+    cliente = ClienteMemoria(broker=broker)
+    runtime = RuntimeConsumidores(fabrica_cliente=lambda: cliente, concurrencia=trabajadores,
+                                  timeout_recepcion_ms=50)
+    procesados = defaultdict(list)
+    lock = threading.Lock()
+    terminado = threading.Event()
+
+    def manejar(mensaje):
+        time.sleep(latencia_ms / 1000.0)
+        with lock:
+            procesados[mensaje.partition_key()].append(mensaje.value())
+            if sum(len(numeros) for numeros in procesados.values()) == mensajes:
+                terminado.set()
+
+    suscripcion = runtime.registrar(TOPICO, 'bench', None, manejar, clave=clave_por_campos())
+    runtime.iniciar()
+
+    inicio = time.perf_counter()
+    productor = cliente.create_producer(TOPICO)
+    for numero in range(mensajes):
+        productor.send(numero, partition_key=f'campana-{numero % entidades}')
+    terminado.wait()
+    segundos = time.perf_counter() - inicio
+    runtime.detener()
+
+    en_orden = all(numeros == sorted(numeros) for numeros in procesados.values())
+    return mensajes / segundos, en_orden, suscripcion.consumidor.confirmados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--mensajes', type=int, default=2000)
+    parser.add_argument('--entidades', type=int, default=200)
+    parser.add_argument('--latencia-ms', type=float, default=5.0)
+    parser.add_argument('--trabajadores', type=int, nargs='+', default=[1, 4, 16])
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    print(f"{'trabajadores':>12} {'msg/s':>10} {'aceleración':>12} {'orden por clave':>16} {'confirmados':>12}")
+    base = None
+    for trabajadores in args.trabajadores:
+        throughput, en_orden, confirmados = ejecutar(trabajadores, args.mensajes, args.entidades, args.latencia_ms)
+        base = base or throughput
+        print(f"{trabajadores:>12} {throughput:>10.1f} {throughput / base:>11.1f}x "
+              f"{'sí' if en_orden else 'NO':>16} {confirmados:>12}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Benchmark de publicación: cliente por mensaje vs registro de productores compartido
+(síncrono y asíncrono con batching).
+
+Usa el broker en memoria con latencias simuladas de conexión, registro de
+productor y envío, de modo que no requiere un Pulsar en ejecución.
+
+    python benchmarks/bench_productores.py --mensajes 500 --hilos 4
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+src_path = os.path.join(os.path.dirname(__file__), '..', 'src')
+sys.path.insert(0, src_path)
+
+from alpes_partners.seedwork.infraestructura.broker_memoria import BrokerMemoria, ClienteMemoria
+from alpes_partners.seedwork.infraestructura.productores import RegistroProductores
+
+TOPICO = 'eventos-influencers'
+
+
+def publicar_con_cliente_por_mensaje(broker, latencias, mensaje):
+    """Comportamiento anterior de los despachadores."""
+    cliente = ClienteMemoria(broker=broker, **latencias)
+    publicador = cliente.create_producer(TOPICO)
+    publicador.send(mensaje)
+    cliente.close()
+
+
+def ejecutar(publicar, mensajes: int, hilos: int, al_terminar=None) -> float:
+    por_hilo = mensajes // hilos
+
+    def trabajo():
+        for i in range(por_hilo):
+            publicar(f'mensaje-{i}')
+
+    trabajadores = [threading.Thread(target=trabajo) for _ in range(hilos)]
+    inicio = time.perf_counter()
+    for t in trabajadores:
+        t.start()
+    for t in trabajadores:
+        t.join()
+    if al_terminar is not None:
+        al_terminar()
+    return (por_hilo * hilos) / (time.perf_counter() - inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--mensajes', type=int, default=400)
+    parser.add_argument('--hilos', type=int, default=4)
+    parser.add_argument('--latencia-conexion-ms', type=float, default=5.0)
+    parser.add_argument('--latencia-productor-ms', type=float, default=3.0)
+    parser.add_argument('--latencia-envio-ms', type=float, default=0.5)
+    parser.add_argument('--max-en-vuelo', type=int, default=1000)
+    args = parser.parse_args()
+
+    latencias = dict(
+        latencia_conexion_ms=args.latencia_conexion_ms,
+        latencia_productor_ms=args.latencia_productor_ms,
+        latencia_envio_ms=args.latencia_envio_ms,
+    )
+
+    broker_antes = BrokerMemoria()
+    antes = ejecutar(
+        lambda m: publicar_con_cliente_por_mensaje(broker_antes, latencias, m),
+        args.mensajes, args.hilos
+    )
+
+    broker_despues = BrokerMemoria()
+    registro = RegistroProductores(
+        fabrica_cliente=lambda url: ClienteMemoria(url, broker=broker_despues, **latencias)
+    )
+    despues = ejecutar(lambda m: registro.publicar(m, TOPICO, None), args.mensajes, args.hilos)
+    registro.cerrar()
+
+    broker_async = BrokerMemoria()
+    registro_async = RegistroProductores(
+        fabrica_cliente=lambda url: ClienteMemoria(url, broker=broker_async, **latencias),
+        asincrono=True,
+        max_en_vuelo=args.max_en_vuelo,
+    )
+    asincrono = ejecutar(lambda m: registro_async.publicar(m, TOPICO, None),
+                         args.mensajes, args.hilos, al_terminar=registro_async.vaciar)
+    registro_async.cerrar()
+
+    print(f"Cliente por mensaje:   {antes:10.1f} msg/s "
+          f"({broker_antes.conexiones} conexiones, {broker_antes.productores_creados} productores)")
+    print(f"Registro compartido:   {despues:10.1f} msg/s "
+          f"({broker_despues.conexiones} conexiones, {broker_despues.productores_creados} productores)")
+    print(f"Registro asíncrono:    {asincrono:10.1f} msg/s "
+          f"({registro_async.estadisticas()['enviados']} confirmados, "
+          f"{registro_async.estadisticas()['fallidos']} fallidos)")
+    print(f"Mejora: x{despues / antes:.1f} (síncrono), x{asincrono / antes:.1f} (asíncrono)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark de retención del saga log: tamaño de la tabla caliente y latencia de consulta en el tiempo.
+
+Simula ``--dias`` días de tráfico con ``--sagas-por-dia`` sagas de seis pasos cada
+uno y, en el modo con retención, compacta al final de cada día las sagas
+terminadas hace más de ``--retencion-dias``. Cada ``--cada`` días reporta las
+filas de saga_logs y la latencia de las consultas de la saga (estado y entradas
+por correlación) y de la primera página de ``obtener_todos``. Usa SQLite en
+archivos temporales.
+
+    python benchmarks/bench_retencion_saga_log.py --dias 60 --sagas-por-dia 200 --retencion-dias 7
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+src_path = os.path.join(os.path.dirname(__file__), '..', 'src')
+sys.path.insert(0, src_path)
+
+from alpes_partners.modulos.sagas.dominio.entidades import SagaLog
+from alpes_partners.modulos.sagas.infraestructura.repositorio_saga_log import (
+    SagaEstadoModelo, SagaLogModelo, SagaResumenModelo, insertar_ignorando_duplicados, obtener_estado_saga,
+    valores_saga_log
+)
+from alpes_partners.modulos.sagas.infraestructura.retencion_saga_log import ArchivoSagaLog, CompactadorSagaLog
+
+PASOS = ['Inicio', 'EventoDominioInfluencerRegistrado', 'EventoDominioCampanaCreada',
+         'EventoDominioContratoCreado', 'CompensacionEjecutada', 'Fin']
+
+
+def _fabrica_sesion(ruta: str):
+    engine = create_engine(f'sqlite:///{ruta}')
+    for modelo in (SagaLogModelo, SagaEstadoModelo, SagaResumenModelo):
+        modelo.__table__.create(engine)
+    return sessionmaker(bind=engine)
+
+
+def _registrar_dia(fabrica, dia: int, inicio: datetime, sagas: int):
+    filas = []
+    for n in range(sagas):
+        fecha = inicio + timedelta(days=dia, seconds=n)
+        for paso, tipo in enumerate(PASOS):
+            filas.append(valores_saga_log(SagaLog(
+                id_correlacion=f'saga-{dia}-{n}', evento_tipo=tipo, evento_datos={'campana_id': f'campana-{n}'},
+                paso_index=paso, fecha_procesamiento=fecha
+            )))
+    with fabrica() as sesion:
+        for i in range(0, len(filas), 500):
+            insertar_ignorando_duplicados(sesion, filas[i:i + 500])
+        sesion.commit()
+
+
+def _medir(fabrica, dia: int, sagas: int, repeticiones: int = 200) -> float:
+    """Mediana en ms de estado + entradas de una saga reciente + primera página del log."""
+    tiempos = []
+    with fabrica() as sesion:
+        for _ in range(repeticiones):
+            id_correlacion = f'saga-{dia}-{random.randrange(sagas)}'
+            inicio = time.perf_counter()
+            obtener_estado_saga(sesion, id_correlacion)
+            sesion.execute(select(SagaLogModelo).where(SagaLogModelo.id_correlacion == id_correlacion)).all()
+            sesion.execute(select(SagaLogModelo).order_by(
+                SagaLogModelo.fecha_procesamiento.desc(), SagaLogModelo.id.desc()).limit(100)).all()
+            tiempos.append(time.perf_counter() - inicio)
+    return 1000 * statistics.median(tiempos)
+
+
+def _filas(fabrica) -> int:
+    with fabrica() as sesion:
+        return sesion.execute(select(func.count()).select_from(SagaLogModelo)).scalar_one()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--dias', type=int, default=60)
+    parser.add_argument('--sagas-por-dia', type=int, default=200)
+    parser.add_argument('--retencion-dias', type=int, default=7)
+    parser.add_argument('--cada', type=int, default=15)
+    args = parser.parse_args()
+
+    inicio = datetime(2024, 1, 1)
+    with tempfile.TemporaryDirectory() as directorio:
+        sin_retencion = _fabrica_sesion(os.path.join(directorio, 'sin_retencion.db'))
+        con_retencion = _fabrica_sesion(os.path.join(directorio, 'con_retencion.db'))
+        compactador = CompactadorSagaLog(
+            ArchivoSagaLog(os.path.join(directorio, 'archivo')), timedelta(days=args.retencion_dias),
+            fabrica_sesion=con_retencion
+        )
+
+        print(f"{'día':>5} {'filas sin ret.':>15} {'ms sin ret.':>12} {'filas con ret.':>15} {'ms con ret.':>12}")
+        for dia in range(args.dias):
+            _registrar_dia(sin_retencion, dia, inicio, args.sagas_por_dia)
+            _registrar_dia(con_retencion, dia, inicio, args.sagas_por_dia)
+            compactador.compactar(ahora=inicio + timedelta(days=dia + 1))
+            if (dia + 1) % args.cada == 0:
+                print(f"{dia + 1:>5} {_filas(sin_retencion):>15} {_medir(sin_retencion, dia, args.sagas_por_dia):>12.3f} "
+                      f"{_filas(con_retencion):>15} {_medir(con_retencion, dia, args.sagas_por_dia):>12.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark del saga log: lectura completa + búsqueda lineal vs INSERT ... ON CONFLICT.
+
+Mide pasos de saga por segundo a medida que crece el número de entradas de la
+correlación. Usa SQLite en memoria para aislar el costo de las consultas del de
+sincronizar a disco, por lo que no requiere PostgreSQL.
+
+    python benchmarks/bench_saga_log.py --pasos 300 --tamanos 10 100 1000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from flask import Flask
+
+src_path = os.path.join(os.path.dirname(__file__), '..', 'src')
+sys.path.insert(0, src_path)
+
+from alpes_partners.seedwork.infraestructura.database import db
+from alpes_partners.modulos.sagas.dominio.entidades import SagaLog
+from alpes_partners.modulos.sagas.infraestructura.repositorio_saga_log import (
+    RepositorioSagaLogSQLAlchemy, SagaEstadoModelo, SagaLogModelo
+)
+
+
+def persistir_con_lectura_previa(repositorio, saga_log: SagaLog) -> bool:
+    """Comportamiento anterior de ``persistir_en_saga_log``."""
+    existentes = repositorio.obtener_por_correlacion(saga_log.id_correlacion)
+    if any(e.evento_tipo == saga_log.evento_tipo and e.paso_index == saga_log.paso_index for e in existentes):
+        return False
+    db.session.add(SagaLogModelo(
+        id=saga_log.id, id_correlacion=saga_log.id_correlacion, evento_tipo=saga_log.evento_tipo,
+        evento_datos=json.dumps(saga_log.evento_datos), paso_index=saga_log.paso_index,
+        fecha_procesamiento=saga_log.fecha_procesamiento, fecha_creacion=saga_log.fecha_creacion,
+        fecha_actualizacion=saga_log.fecha_actualizacion
+    ))
+    db.session.flush()
+    return True
+
+
+def persistir_con_insercion_condicional(repositorio, saga_log: SagaLog) -> bool:
+    return repositorio.agregar(saga_log)
+
+
+def _entrada(id_correlacion: str, paso: int) -> SagaLog:
+    return SagaLog(id_correlacion=id_correlacion, evento_tipo=f'Paso{paso}',
+                   evento_datos={'campana_id': f'campana-{paso}', 'razon': 'x' * 64}, paso_index=paso)
+
+
+def medir(persistir, repositorio, id_correlacion: str, tamano_log: int, pasos: int) -> float:
+    for i in range(tamano_log):
+        repositorio.agregar(_entrada(id_correlacion, i))
+    db.session.commit()
+
+    inicio = time.perf_counter()
+    for i in range(tamano_log, tamano_log + pasos):
+        persistir(repositorio, _entrada(id_correlacion, i))
+        db.session.commit()
+    return pasos / (time.perf_counter() - inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--pasos', type=int, default=300)
+    parser.add_argument('--tamanos', type=int, nargs='+', default=[10, 100, 1000])
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+
+    with app.app_context():
+        SagaLogModelo.__table__.create(db.engine)
+        SagaEstadoModelo.__table__.create(db.engine)
+        repositorio = RepositorioSagaLogSQLAlchemy()
+
+        print(f"{'entradas':>10} {'lectura previa':>16} {'on conflict':>14} {'mejora':>8}")
+        for tamano in args.tamanos:
+            anterior = medir(persistir_con_lectura_previa, repositorio, f'previa-{tamano}', tamano, args.pasos)
+            nuevo = medir(persistir_con_insercion_condicional, repositorio, f'conflicto-{tamano}', tamano, args.pasos)
+            print(f"{tamano:>10} {anterior:>12.0f} p/s {nuevo:>10.0f} p/s {nuevo / anterior:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -8,6 +8,7 @@ Incluye health check mínimo para compatibilidad con Cloud Run.
 import sys
 import os
 import threading
+from dataclasses import asdict
 from flask import Flask, jsonify
 
 # Agregar el directorio src al path
@@ -16,6 +17,10 @@ sys.path.insert(0, src_path)
 
 import logging
 from alpes_partners.config.settings import settings
+from alpes_partners.seedwork.infraestructura.consumidores import runtime_consumidores
+from alpes_partners.seedwork.infraestructura.outbox import iniciar_relay_outbox
+from alpes_partners.seedwork.infraestructura.database import SessionLocal, estado_pool, precalentar_pool
+from alpes_partners.modulos.sagas.infraestructura.repositorio_saga_log import contar_sagas_en_curso, obtener_estado_saga
 from alpes_partners.modulos.influencers.infraestructura.consumidores import suscribirse_a_eventos_crear_influencer
 
 # Configurar logging
@@ -37,6 +42,31 @@ def health_check():
         'service': 'influencers-microservice'
     })
 
+@app.route('/consumidores')
+def metricas_consumidores():
+    """Métricas de cada suscripción del runtime de consumidores."""
+    return jsonify(runtime_consumidores().metricas())
+
+@app.route('/pool')
+def metricas_pool_bd():
+    """Espera por conexión, conexiones y utilización del pool de base de datos."""
+    return jsonify(estado_pool())
+
+@app.route('/sagas/en-curso')
+def sagas_en_curso():
+    """Cantidad de sagas en curso o compensando, leída de la proyección saga_estado."""
+    with SessionLocal() as sesion:
+        return jsonify({'en_curso': contar_sagas_en_curso(sesion)})
+
+@app.route('/sagas/<id_correlacion>')
+def estado_saga(id_correlacion):
+    """Estado actual de una saga."""
+    with SessionLocal() as sesion:
+        estado = obtener_estado_saga(sesion, id_correlacion)
+    if estado is None:
+        return jsonify({'error': f'Saga {id_correlacion} no encontrada'}), 404
+    return jsonify(asdict(estado))
+
 def start_consumer():
     """Inicia el consumidor de eventos en un hilo separado."""
     try:
@@ -53,12 +83,19 @@ def main():
     # Obtener puerto de Cloud Run
     port = int(os.environ.get('PORT', 8080))
     
+    # Las conexiones se abren antes de recibir el primer mensaje
+    precalentar_pool()
+    
     try:
         # Iniciar consumidor en hilo daemon
         consumer_thread = threading.Thread(target=start_consumer, daemon=True)
         consumer_thread.start()
         logger.info("Consumidor de eventos iniciado")
         
+        # Iniciar relay del outbox si está habilitado
+        if iniciar_relay_outbox():
+            logger.info("Relay de outbox iniciado")
+        
         # Iniciar servidor HTTP
         logger.info(f"Servidor HTTP iniciado en puerto {port}")
         app.run(host='0.0.0.0', port=port, debug=False)
@@ -15,6 +15,8 @@ sys.path.insert(0, src_path)
 
 import logging
 from alpes_partners.config.settings import settings
+from alpes_partners.seedwork.infraestructura.consumidores import runtime_consumidores
+from alpes_partners.seedwork.infraestructura.database import estado_pool, precalentar_pool
 from alpes_partners.modulos.sagas.infraestructura.consumidores import suscribirse_a_eventos_saga
 
 # Configurar logging
@@ -42,6 +44,16 @@ def health():
     """Health check adicional."""
     return jsonify({'status': 'ok', 'service': 'saga'})
 
+@app.route('/consumidores')
+def metricas_consumidores():
+    """Métricas de cada suscripción del runtime de consumidores."""
+    return jsonify(runtime_consumidores().metricas())
+
+@app.route('/pool')
+def metricas_pool_bd():
+    """Espera por conexión, conexiones y utilización del pool de base de datos."""
+    return jsonify(estado_pool())
+
 def start_saga_consumers():
     """Inicia los consumidores de la saga en un hilo separado."""
     try:
@@ -58,6 +70,9 @@ def main():
     # Obtener puerto de Cloud Run
     port = int(os.environ.get('PORT', 8084))  # Puerto único para la saga
     
+    # Las conexiones se abren antes de recibir el primer mensaje
+    precalentar_pool()
+    
     try:
         # Iniciar consumidores en hilo daemon
         consumer_thread = threading.Thread(target=start_saga_consumers, daemon=True)
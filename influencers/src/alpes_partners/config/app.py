@@ -13,10 +13,11 @@ def crear_app_minima():
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     
     # Inicializar Flask-SQLAlchemy
-    from ..seedwork.infraestructura.database import db, init_db_flask_tables
+    from ..seedwork.infraestructura.database import db, init_db_flask_tables, medir_pool
     db.init_app(app)
     
     with app.app_context():
+        medir_pool(db.engine)
         # Importar modelos para registrarlos
         from ..modulos.influencers.infraestructura.modelos import Base
         # Crear tablas si no existen
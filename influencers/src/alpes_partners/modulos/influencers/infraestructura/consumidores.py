@@ -4,19 +4,21 @@ Se suscribe a eventos de crear influencer y ejecuta comandos para registrar infl
 """
 
 import logging
-import time
+from contextlib import nullcontext
 from datetime import datetime
 
 # Configurar logging
 logger = logging.getLogger(__name__)
 
 # Imports esenciales
-import pulsar
-import _pulsar
 from pulsar.schema import AvroSchema
 
 from alpes_partners.config.app import crear_app_minima
-from alpes_partners.seedwork.infraestructura import utils
+from alpes_partners.config.settings import settings
+from alpes_partners.seedwork.infraestructura.consumidores import clave_por_campos, runtime_consumidores
+from alpes_partners.seedwork.infraestructura.contexto import agregar_compensacion
+from alpes_partners.seedwork.infraestructura.database import db
+from alpes_partners.seedwork.infraestructura.idempotencia import registro_idempotencia
 from alpes_partners.modulos.influencers.aplicacion.comandos.registrar_influencer import RegistrarInfluencer, ejecutar_comando_registrar_influencer
 
 # Esquema de eventos de crear influencer
@@ -25,56 +27,45 @@ from alpes_partners.modulos.influencers.infraestructura.schema.v1.crear_influenc
 # Crear instancia de aplicación Flask para el contexto
 app = crear_app_minima()
 
+CONSUMIDOR = 'influencers-crear-influencer'
+
 
 def suscribirse_a_eventos_crear_influencer():
     """
     Suscribirse a eventos de crear influencer para registrar influencers automáticamente.
+    La suscripción se atiende en el runtime de consumidores compartido del proceso.
     """
-    cliente = None
-    try:
-        logger.info("INFLUENCERS: Conectando a Pulsar...")
-        cliente = pulsar.Client(f'pulsar://{utils.broker_host()}:6650')
-        
-        # Consumidor para eventos de crear influencer
-        consumidor = cliente.subscribe(
-            'eventos-crear-influencer', 
-            consumer_type=_pulsar.ConsumerType.Shared,
-            subscription_name='influencers-sub-crear-influencer', 
-            schema=AvroSchema(EventoCrearInfluencer)
-        )
-
-        logger.info("INFLUENCERS: Suscrito a eventos de crear influencer")
-        logger.info("INFLUENCERS: Esperando eventos...")
-        
-        while True:
-            try:
-                mensaje = consumidor.receive()
-                logger.info(f"INFLUENCERS: Evento recibido - {mensaje.value()}")
-                
-                # Procesar evento
-                _procesar_evento_crear_influencer(mensaje.value())
-                
-                # Confirmar procesamiento
-                consumidor.acknowledge(mensaje)
-                logger.info("INFLUENCERS: Evento procesado y confirmado")
-                
-            except Exception as e:
-                logger.error(f"INFLUENCERS: Error procesando evento: {e}")
-                time.sleep(5)  # Esperar antes de continuar
-                
-    except Exception as e:
-        logger.error(f"INFLUENCERS: Error en consumidor: {e}")
-    finally:
-        if cliente:
-            cliente.close()
-
-
-def _procesar_evento_crear_influencer(evento):
+    runtime = runtime_consumidores()
+    runtime.registrar(
+        'eventos-crear-influencer',
+        'influencers-sub-crear-influencer',
+        AvroSchema(EventoCrearInfluencer),
+        _manejar_evento_crear_influencer,
+        nombre=CONSUMIDOR,
+        clave=clave_por_campos('id'),
+    )
+    runtime.iniciar()
+    logger.info("INFLUENCERS: Suscrito a eventos de crear influencer")
+
+
+def _manejar_evento_crear_influencer(mensaje):
+    logger.info(f"INFLUENCERS: Evento recibido - {mensaje.value()}")
+    _procesar_evento_crear_influencer(mensaje)
+    logger.info("INFLUENCERS: Evento procesado")
+
+
+def _procesar_evento_crear_influencer(mensaje):
     """
     Procesa un evento de crear influencer y ejecuta el comando para registrar el influencer.
+    El id del mensaje se registra en la misma transacción que el influencer; un
+    evento duplicado no toca el dominio.
     """
+    evento = mensaje.value()
     with app.app_context():
         try:
+            if not registro_idempotencia().registrar_si_nuevo(db.session, CONSUMIDOR, mensaje):
+                return
+
             # Extraer datos del evento
             datos = _extraer_datos_evento(evento)
             
@@ -88,8 +79,12 @@ def _procesar_evento_crear_influencer(evento):
             # Crear comando para registrar influencer
             comando = _crear_comando_influencer(datos)
             
-            # Ejecutar comando usando la función específica del módulo
-            ejecutar_comando_registrar_influencer(comando)
+            # Ejecutar comando usando la función específica del módulo; en coreografía
+            # InfluencerRegistrado lleva en el sobre la compensación de este paso
+            compensacion = (agregar_compensacion('EliminarInfluencer', influencer_id=comando.id)
+                            if settings.saga_modo == 'coreografia' else nullcontext())
+            with compensacion:
+                ejecutar_comando_registrar_influencer(comando)
             
             logger.info(f"INFLUENCERS: Influencer creado: {datos.get('id', 'N/A')}")
             
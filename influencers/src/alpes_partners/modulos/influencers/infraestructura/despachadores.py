@@ -4,7 +4,7 @@ from pulsar.schema import *
 from alpes_partners.modulos.influencers.infraestructura.schema.v1.eventos import (
     EventoInfluencerRegistrado, InfluencerRegistradoPayload
 )
-from alpes_partners.seedwork.infraestructura import utils
+from alpes_partners.seedwork.infraestructura.productores import registro_productores
 
 import datetime
 
@@ -15,11 +15,8 @@ def unix_time_millis(dt):
 
 
 class DespachadorInfluencers:
-    def _publicar_mensaje(self, mensaje, topico, schema):
-        cliente = pulsar.Client(f'pulsar://{utils.broker_host()}:6650')
-        publicador = cliente.create_producer(topico, schema=schema)
-        publicador.send(mensaje)
-        cliente.close()
+    def _publicar_mensaje(self, mensaje, topico, schema, clave=None):
+        registro_productores().publicar(mensaje, topico, schema, clave=clave)
 
     def publicar_evento_influencer_registrado(self, evento, topico='eventos-influencers'):
         """Publica evento cuando un influencer es registrado."""
@@ -40,4 +37,5 @@ class DespachadorInfluencers:
             service_name="alpes-partners-influencers",
             data=payload
         )
-        self._publicar_mensaje(evento_integracion, topico, AvroSchema(EventoInfluencerRegistrado))
+        self._publicar_mensaje(evento_integracion, topico, AvroSchema(EventoInfluencerRegistrado),
+                               clave=payload.id_influencer)
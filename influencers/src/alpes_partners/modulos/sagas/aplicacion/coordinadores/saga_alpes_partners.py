@@ -1,8 +1,12 @@
 import uuid
 import logging
-from datetime import datetime
-from typing import Dict, Any
-from dataclasses import dataclass
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Any, Iterable, List, Optional
+from flask import current_app, has_app_context
+from dataclasses import dataclass, asdict, is_dataclass
 from pydispatch import dispatcher
 
 from .....seedwork.aplicacion.comandos import Comando, ejecutar_commando
@@ -12,16 +16,22 @@ from .....seedwork.dominio.eventos import EventoDominio, EventoIntegracion
 from ....influencers.dominio.eventos import InfluencerRegistrado
 
 # Importar eventos y comandos locales (para evitar dependencias entre microservicios)
-from ...dominio.eventos import CampanaCreada, ContratoCreado, ErrorCreacionCampana, ErrorCreacionContrato, ErrorCreacionInfluencer, CompensacionEjecutada
+from ...dominio.eventos import CampanaCreada, ContratoCreado, ErrorCreacionCampana, ErrorCreacionContrato, ErrorCreacionInfluencer, CompensacionEjecutada, TimeoutPasoSaga
 from ..comandos.comandos_externos import RegistrarCampana, CrearContrato, EliminarCampana, EliminarInfluencer
 
 # Importar clases base para saga
-from .....seedwork.aplicacion.sagas import CoordinadorOrquestacion, Transaccion, Inicio, Fin
+from .....seedwork.aplicacion.sagas import (
+    CoordinadorCoreografia, CoordinadorOrquestacion, Paso, Transaccion, Inicio, Fin, RegistroInstanciasSaga,
+    PlanificadorTimeouts, ejecutar_ramas
+)
+from .....config.settings import settings
 
 # Importar repositorio para saga log
 from ...infraestructura.repositorio_saga_log import RepositorioSagaLogSQLAlchemy
-from ...dominio.entidades import SagaLog
+from ...infraestructura.escritor_saga_log import EscritorSagaLog, escritor_saga_log
+from ...dominio.entidades import SagaLog, SagaEstado, EstadoSaga, ESTADOS_TERMINADOS
 from .....seedwork.infraestructura.uow import UnidadTrabajoPuerto
+from .....seedwork.infraestructura.contexto import compensaciones_actuales, contexto_actual, contexto_mensaje
 
 # Importar handlers para registrar comandos externos
 from .. import handlers
@@ -41,6 +51,14 @@ class EventoDominioInfluencerRegistrado(EventoDominio):
         self.plataformas = evento_integracion.plataformas
         self.fecha_registro = evento_integracion.fecha_registro
 
+    def _datos_evento(self) -> Dict[str, Any]:
+        return {
+            'influencer_id': self.influencer_id,
+            'nombre': self.nombre,
+            'email': self.email,
+            'categorias': list(self.categorias or []),
+        }
+
 
 class EventoDominioCampanaCreada(EventoDominio):
     """Evento de dominio para campaña creada (conversión desde integración)."""
@@ -60,6 +78,15 @@ class EventoDominioCampanaCreada(EventoDominio):
         self.influencer_nombre = evento_integracion.influencer_nombre
         self.influencer_email = evento_integracion.influencer_email
 
+    def _datos_evento(self) -> Dict[str, Any]:
+        return {
+            'campana_id': self.campana_id,
+            'nombre': self.nombre,
+            'influencer_id': self.influencer_id,
+            'influencer_nombre': self.influencer_nombre,
+            'influencer_email': self.influencer_email,
+        }
+
 
 class EventoDominioContratoCreado(EventoDominio):
     """Evento de dominio para contrato creado (conversión desde integración)."""
@@ -76,6 +103,15 @@ class EventoDominioContratoCreado(EventoDominio):
         self.tipo_contrato = evento_integracion.tipo_contrato
         self.fecha_creacion = evento_integracion.fecha_creacion
 
+    def _datos_evento(self) -> Dict[str, Any]:
+        return {
+            'contrato_id': self.contrato_id,
+            'influencer_id': self.influencer_id,
+            'campana_id': self.campana_id,
+            'monto_total': self.monto_total,
+            'moneda': self.moneda,
+        }
+
 
 # Eventos de error para la saga - ahora importados desde dominio.eventos
 
@@ -90,111 +126,189 @@ class EliminarContrato(Comando):
 
 
 class CoordinadorInfluencersCampanasContratos(CoordinadorOrquestacion):
-    """Coordinador de saga para orquestar influencers, campañas y contratos."""
-    
-    # Instancia singleton
-    _instancia = None
-    _id_correlacion_global = None
-    
-    def __new__(cls):
-        if cls._instancia is None:
-            cls._instancia = super().__new__(cls)
-            # Inicializar solo una vez cuando se crea la instancia
-            cls._instancia._inicializado = False
-        return cls._instancia
-    
-    def __init__(self):
-        # Solo inicializar una vez
-        if hasattr(self, '_inicializado') and self._inicializado:
-            return
-            
-        # Usar el mismo id_correlacion para toda la saga
-        if CoordinadorInfluencersCampanasContratos._id_correlacion_global is None:
-            CoordinadorInfluencersCampanasContratos._id_correlacion_global = str(uuid.uuid4())
-        
-        self.id_correlacion = CoordinadorInfluencersCampanasContratos._id_correlacion_global
-        self.repositorio_saga_log = RepositorioSagaLogSQLAlchemy()
-        self.pasos = []
+    """
+    Coordinador de saga para orquestar influencers, campañas y contratos.
+    Cada instancia representa una única saga (un id de correlación); el estado
+    en memoria se reconstruye desde el saga log con ``rehidratar``.
+    """
+    
+    # Definición de la saga: el evento de cada paso dispara el comando del siguiente y su
+    # error compensa los pasos anteriores en orden inverso
+    pasos = [
+        Inicio(
+            index=0,
+            evento=EventoDominioInfluencerRegistrado,
+            compensacion=EliminarInfluencer
+        ),
+        Transaccion(
+            index=1, 
+            comando=RegistrarCampana, 
+            evento=EventoDominioCampanaCreada, 
+            error=ErrorCreacionCampana, 
+            compensacion=EliminarCampana,
+            timeout=settings.saga_timeout_paso_segundos
+        ),
+        Transaccion(
+            index=2, 
+            comando=CrearContrato, 
+            evento=EventoDominioContratoCreado, 
+            error=ErrorCreacionContrato, 
+            compensacion=EliminarContrato,
+            timeout=settings.saga_timeout_paso_segundos
+        ),
+        Fin(index=3)
+    ]
+    
+    # Eliminar la campaña y eliminar el influencer no dependen una de la otra
+    compensaciones_paralelas = [
+        (EliminarCampana, EliminarInfluencer),
+    ]
+    
+    # Contexto de compensación que guarda cada evento: atributo -> {clave: atributo del evento}
+    contextos = {
+        EventoDominioInfluencerRegistrado: ('contexto_influencer', {
+            'influencer_id': 'influencer_id', 'nombre': 'nombre', 'email': 'email'
+        }),
+        EventoDominioCampanaCreada: ('contexto_campana', {
+            'campana_id': 'campana_id', 'nombre': 'nombre', 'influencer_id': 'influencer_id'
+        }),
+    }
+    
+    def __init__(self, id_correlacion: str = None, repositorio_saga_log=None, escritor: EscritorSagaLog = None,
+                 planificador: PlanificadorTimeouts = None):
+        self.id_correlacion = id_correlacion or str(uuid.uuid4())
+        self.planificador = planificador or planificador_timeouts
+        if escritor is None and repositorio_saga_log is None and settings.saga_log_escritura_diferida:
+            escritor = escritor_saga_log()
+        self.repositorio_saga_log = repositorio_saga_log or RepositorioSagaLogSQLAlchemy()
+        # Con escritor, las entradas del log se confirman en lotes fuera del hilo de la saga
+        self.escritor = escritor
         self.index = 0
+        # Estado de la saga; los eventos que llegan después de terminarla no la hacen avanzar
+        self.estado = EstadoSaga.EN_CURSO.value
+        # Plazo de cada paso enviado que aún espera respuesta
+        self.plazos: Dict[int, datetime] = {}
         # Contexto de la saga para compensación
         self.contexto_influencer = None
         self.contexto_campana = None
+        # Serializa los eventos de una misma saga; sagas distintas avanzan en paralelo
+        self.lock = threading.RLock()
+        self._rehidratado = False
         self.inicializar_pasos()
-        self._inicializado = True
         logger.info(f"SAGA: Iniciando coordinador con correlación: {self.id_correlacion}")
     
-    def inicializar_pasos(self):
-        """Inicializar los pasos de la saga con influencers, campañas y contratos."""
-        self.pasos = [
-            Inicio(index=0),
-            Transaccion(
-                index=1, 
-                comando=RegistrarCampana, 
-                evento=EventoDominioCampanaCreada, 
-                error=ErrorCreacionCampana, 
-                compensacion=EliminarCampana
-            ),
-            Transaccion(
-                index=2, 
-                comando=CrearContrato, 
-                evento=EventoDominioContratoCreado, 
-                error=ErrorCreacionContrato, 
-                compensacion=EliminarContrato
-            ),
-            Transaccion(
-                index=3, 
-                comando=EliminarInfluencer, 
-                evento=None,
-                error=None,
-                compensacion=None
-            ),
-            Fin(index=4)
-        ]
+    def rehidratar(self):
+        """Reconstruye el contexto de compensación desde el estado proyectado de la saga (una vez por instancia)."""
+        if self._rehidratado:
+            return
+        
+        if self.escritor is not None:
+            # Las entradas aún en el buffer deben estar en la tabla antes de leerla
+            self.escritor.vaciar(timeout=30)
+        
+        self.restaurar(self.repositorio_saga_log.obtener_estado(self.id_correlacion))
+        if not self.despacho.lineal:
+            # Con ramas concurrentes el paso actual no basta: se reconstruye cada paso completado
+            self.restaurar_pasos(self.repositorio_saga_log.obtener_por_correlacion(self.id_correlacion))
+            self._rehidratado = True
     
-    @classmethod
-    def reset_correlacion(cls):
-        """Resetear el id_correlacion para una nueva saga."""
-        cls._id_correlacion_global = None
-        cls._instancia = None  # Forzar creación de nueva instancia
+    def restaurar_pasos(self, entradas: Iterable[SagaLog]):
+        """
+        Marca como completados los pasos cuyo evento está en el saga log y reprograma el
+        plazo de cada rama que aún espera respuesta (``saga_estado`` solo guarda uno).
+        """
+        entradas = list(entradas)
+        pasos_por_nombre = {tipo.__name__: index for tipo, index in self.despacho.paso_por_evento.items()}
+        self.marcar_completados(
+            pasos_por_nombre[entrada.evento_tipo] for entrada in entradas if entrada.evento_tipo in pasos_por_nombre
+        )
+        if self.terminada:
+            return
+        for entrada in entradas:
+            if entrada.fecha_limite is not None and entrada.paso_index not in self.completados:
+                self.plazos[entrada.paso_index] = entrada.fecha_limite
+        for paso_index, fecha_limite in self.plazos.items():
+            self.planificador.programar(self.id_correlacion, paso_index, fecha_limite)
+    
+    def restaurar(self, estado: Optional[SagaEstado]):
+        """Aplica un estado ya leído de ``saga_estado``; la recuperación al arrancar lo hace en bloque."""
+        if estado is not None:
+            self.estado = estado.estado
+        if estado is not None and estado.estado == EstadoSaga.EN_CURSO.value and estado.fecha_limite is not None:
+            self.plazos[estado.paso_actual] = estado.fecha_limite
+        if estado is not None and estado.influencer_id:
+            self.contexto_influencer = {
+                'influencer_id': estado.influencer_id,
+                'nombre': estado.influencer_nombre,
+                'email': estado.influencer_email
+            }
+        if estado is not None and estado.campana_id:
+            self.contexto_campana = {
+                'campana_id': estado.campana_id,
+                'nombre': estado.campana_nombre,
+                'influencer_id': estado.influencer_id
+            }
+        
+        # Las sagas con ramas concurrentes completan la rehidratación desde el log con su siguiente evento
+        self._rehidratado = self.despacho.lineal
+        if self.contexto_influencer or self.contexto_campana:
+            logger.info(f"SAGA: Contexto rehidratado desde saga_estado - Correlación: {self.id_correlacion}")
+    
+    @property
+    def terminada(self) -> bool:
+        return self.estado in ESTADOS_TERMINADOS
     
     def iniciar(self):
         """Iniciar la saga."""
-        self.persistir_en_saga_log(self.pasos[0])
+        self.persistir_en_saga_log(self.pasos[0], paso_index=self.pasos[0].index)
         logger.info(f"SAGA: Saga iniciada con correlación: {self.id_correlacion}")
     
     def terminar(self):
         """Terminar la saga."""
-        self.persistir_en_saga_log(self.pasos[-1])
+        self.planificador.cancelar(self.id_correlacion)
+        self.persistir_en_saga_log(self.pasos[-1], paso_index=self.pasos[-1].index, sincrono=True)
+        self.estado = EstadoSaga.COMPLETADA.value
         logger.info(f"SAGA: Saga terminada con correlación: {self.id_correlacion}")
     
-    def terminar_con_error(self, error: str):
-        """Terminar la saga con error."""
+    def terminar_con_error(self, error: str, estado: EstadoSaga = EstadoSaga.FALLIDA):
+        """Terminar la saga con error (``COMPENSADA`` si se ejecutó su cadena de compensación)."""
         logger.error(f"SAGA: Saga terminada con error: {error}")
         logger.error(f"SAGA: Correlación: {self.id_correlacion}")
-        # Aquí podrías persistir el estado de error en el log si es necesario
+        self.estado = estado.value
+        self.planificador.cancelar(self.id_correlacion)
+        if self.escritor is not None:
+            # Fin de la saga: los pasos encolados deben quedar confirmados
+            self.escritor.vaciar(timeout=30)
+    
+    def fecha_limite_paso(self, paso_index: int) -> Optional[datetime]:
+        """Fecha límite para la respuesta del paso según el timeout de su ``Transaccion``."""
+        paso = self.pasos[paso_index] if paso_index < len(self.pasos) else None
+        if not isinstance(paso, Transaccion) or not paso.timeout:
+            return None
+        return datetime.utcnow() + timedelta(seconds=paso.timeout)
     
-    def persistir_en_saga_log(self, evento, paso_index: int = None):
-        """Persistir evento en DB usando el repositorio de saga log (un registro por evento)."""
+    def persistir_en_saga_log(self, evento, paso_index: int = None, sincrono: bool = False,
+                              fecha_limite: datetime = None) -> Optional[bool]:
+        """
+        Persistir evento en DB usando el repositorio de saga log (un registro por evento).
+        La restricción única (correlación, tipo, paso) descarta los duplicados en la misma
+        sentencia de inserción; retorna True si el registro es nuevo.
+        
+        Con escritor diferido, los pasos intermedios se encolan y retornan None; los pasos
+        terminales (``sincrono=True``) esperan a que su lote quede confirmado. Si se indica
+        ``fecha_limite``, el paso queda programado en el planificador de timeouts.
+        """
         logger.info(f"SAGA: Persistiendo en log - Evento: {type(evento).__name__}")
         
         try:
-            # Verificar si ya existe un registro para este evento en esta correlación
-            entradas_existentes = self.repositorio_saga_log.obtener_por_correlacion(self.id_correlacion)
-            
-            # Buscar si ya existe un registro para este tipo de evento
-            evento_ya_registrado = any(
-                entrada.evento_tipo == type(evento).__name__ and 
-                entrada.paso_index == paso_index
-                for entrada in entradas_existentes
-            )
-            
-            if evento_ya_registrado:
-                logger.info(f"SAGA: Evento {type(evento).__name__} ya registrado, saltando duplicado")
-                return
-            
             # Preparar datos del evento
             if hasattr(evento, 'to_dict'):
                 evento_datos = evento.to_dict()
+            elif isinstance(evento, Paso):
+                # Los pasos referencian tipos de eventos y comandos, que no son serializables
+                evento_datos = {'index': evento.index}
+            elif is_dataclass(evento):
+                evento_datos = asdict(evento)
             elif isinstance(evento, dict):
                 evento_datos = evento
             else:
@@ -206,287 +320,575 @@ class CoordinadorInfluencersCampanasContratos(CoordinadorOrquestacion):
                 evento_tipo=type(evento).__name__,
                 evento_datos=evento_datos,
                 paso_index=paso_index,
-                fecha_procesamiento=datetime.utcnow()
+                fecha_procesamiento=datetime.utcnow(),
+                fecha_limite=fecha_limite
             )
             
-            # Usar el sistema de UoW para persistir
-            UnidadTrabajoPuerto.registrar_batch(self.repositorio_saga_log.agregar, saga_log)
-            UnidadTrabajoPuerto.savepoint()
-            UnidadTrabajoPuerto.commit()
+            if fecha_limite is not None:
+                self.planificador.programar(self.id_correlacion, paso_index, fecha_limite)
+            
+            if self.escritor is not None:
+                nuevo = self.escritor.agregar(saga_log, sincrono=sincrono)
+                if nuevo is None:
+                    logger.info(f"SAGA: Log encolado para escritura diferida - ID: {saga_log.id}")
+                    return None
+            else:
+                # El insert se ejecuta en la sesión de la UoW para conocer si el paso es nuevo
+                nuevo = self.repositorio_saga_log.agregar(saga_log)
+                UnidadTrabajoPuerto.commit()
             
-            logger.info(f"SAGA: Log persistido exitosamente - ID: {saga_log.id}")
+            if nuevo:
+                logger.info(f"SAGA: Log persistido exitosamente - ID: {saga_log.id}")
+            else:
+                logger.info(f"SAGA: Evento {type(evento).__name__} ya registrado, saltando duplicado")
+            return nuevo
             
         except Exception as e:
             logger.error(f"SAGA: Error al persistir log: {e}")
             raise
     
-    def construir_comando(self, evento: EventoDominio, tipo_comando: type) -> Comando:
+    def construir_comando(self, evento: EventoDominio, tipo_comando: type) -> Optional[Comando]:
         """Construir comando basado en el evento de dominio."""
         logger.info(f"SAGA: Construyendo comando {tipo_comando.__name__} desde evento {type(evento).__name__}")
         
+        constructor = self.constructores.get((type(evento), tipo_comando))
+        if constructor is None:
+            logger.warning(f"SAGA: No hay implementación para construir {tipo_comando.__name__} desde {type(evento).__name__}")
+            raise NotImplementedError(f"No se puede construir comando {tipo_comando.__name__} desde evento {type(evento).__name__}")
+        
         try:
-            if isinstance(evento, EventoDominioInfluencerRegistrado) and tipo_comando == RegistrarCampana:
-                # Cuando un influencer se registra, crear una campaña automáticamente
-                comando = RegistrarCampana(
-                    fecha_creacion=datetime.utcnow().isoformat(),
-                    fecha_actualizacion=datetime.utcnow().isoformat(),
-                    id=str(uuid.uuid4()),
-                    nombre=f"Campaña de bienvenida para {evento.nombre}",
-                    descripcion=f"Campaña automática creada para el influencer {evento.nombre}",
-                    tipo_comision="cpa",
-                    valor_comision=100.0,
-                    moneda="USD",
-                    fecha_inicio=datetime.utcnow().isoformat(),
-                    fecha_fin=None,
-                    titulo_material="Material de bienvenida",
-                    descripcion_material="Material promocional para nuevos influencers",
-                    categorias_objetivo=evento.categorias,
-                    tipos_afiliado_permitidos=["influencer"],
-                    paises_permitidos=["CO", "MX", "AR"],
-                    enlaces_material=[],
-                    imagenes_material=[],
-                    banners_material=[],
-                    metricas_minimas={},
-                    auto_activar=True,
-                    influencer_origen_id=evento.influencer_id,
-                    categoria_origen=evento.categorias[0] if evento.categorias else "general",
-                    influencer_origen_nombre=evento.nombre,
-                    influencer_origen_email=evento.email
-                )
-                logger.info(f"SAGA: Comando RegistrarCampana construido para influencer {evento.nombre}")
-                return comando
-                
-            elif isinstance(evento, EventoDominioCampanaCreada) and tipo_comando == CrearContrato:
-                # Cuando se crea una campaña, crear un contrato automáticamente
-                comando = CrearContrato(
-                    fecha_creacion=datetime.utcnow().isoformat(),
-                    fecha_actualizacion=datetime.utcnow().isoformat(),
-                    id=str(uuid.uuid4()),
-                    influencer_id=evento.influencer_id,
-                    influencer_nombre=evento.influencer_nombre,
-                    influencer_email=evento.influencer_email,
-                    campana_id=evento.campana_id,
-                    campana_nombre=evento.nombre,
-                    categorias=evento.categorias_objetivo or [],
-                    descripcion=f"Contrato automático para la campaña: {evento.nombre}",
-                    monto_base=evento.valor_comision,
-                    moneda=evento.moneda,
-                    fecha_inicio=evento.fecha_inicio.isoformat() if hasattr(evento.fecha_inicio, 'isoformat') else str(evento.fecha_inicio),
-                    fecha_fin=evento.fecha_fin.isoformat() if evento.fecha_fin and hasattr(evento.fecha_fin, 'isoformat') else str(evento.fecha_fin) if evento.fecha_fin else None,
-                    entregables="Contenido promocional según especificaciones de la campaña",
-                    tipo_contrato="puntual"
-                )
-                logger.info(f"SAGA: Comando CrearContrato construido para campaña {evento.nombre}")
-                return comando
-            
-            # Comandos de compensación
-            elif isinstance(evento, ErrorCreacionContrato) and tipo_comando == EliminarCampana:
-                # Si falla la creación del contrato, eliminar la campaña
-                logger.info(f"SAGA: DEBUG - Contexto influencer: {self.contexto_influencer}")
-                influencer_id = self.contexto_influencer.get('influencer_id', '') if self.contexto_influencer else ''
-                
-                # Si no tenemos el influencer_id del contexto, intentar obtenerlo del saga log
-                if not influencer_id:
-                    logger.warning(f"SAGA: No se encontró influencer_id en contexto, buscando en saga log")
-                    entradas_existentes = self.repositorio_saga_log.obtener_por_correlacion(self.id_correlacion)
-                    for entrada in entradas_existentes:
-                        if entrada.evento_tipo == 'EventoDominioInfluencerRegistrado':
-                            datos = entrada.evento_datos
-                            if isinstance(datos, dict) and 'influencer_id' in datos:
-                                influencer_id = datos['influencer_id']
-                                logger.info(f"SAGA: Influencer_id encontrado en saga log: {influencer_id}")
-                                break
-                
-                # Si aún no tenemos influencer_id, usar None (opcional para compensación)
-                if not influencer_id:
-                    logger.warning(f"SAGA: No se pudo obtener influencer_id, procediendo sin él")
-                    influencer_id = None
-                
-                comando = EliminarCampana(
-                    campana_id=evento.campana_id,
-                    influencer_id=influencer_id,
-                    razon=f"Compensación por error en creación de contrato: {evento.error}"
-                )
-                logger.info(f"SAGA: Comando EliminarCampana construido para compensación - Campaña: {evento.campana_id}, Influencer: {influencer_id or 'N/A'}")
-                return comando
-            
-            elif isinstance(evento, ErrorCreacionCampana) and tipo_comando == EliminarContrato:
-                # Si falla la creación de campaña, no hay contrato que eliminar
-                logger.info(f"SAGA: No se requiere compensación para error de campaña")
-                return None
-            
-            elif isinstance(evento, ErrorCreacionContrato) and tipo_comando == EliminarInfluencer:
-                # Si falla la creación del contrato, también eliminar el influencer
-                influencer_id = self.contexto_influencer.get('influencer_id', '') if self.contexto_influencer else ''
-                
-                if not influencer_id:
-                    logger.warning(f"SAGA: No se encontró influencer_id en contexto para compensación")
-                    return None
-                
-                comando = EliminarInfluencer(
-                    influencer_id=influencer_id,
-                    razon=f"Compensación por error en creación de contrato: {evento.error}"
-                )
-                logger.info(f"SAGA: Comando EliminarInfluencer construido para compensación - Influencer: {influencer_id}")
-                return comando
-            
-            else:
-                logger.warning(f"SAGA: No hay implementación para construir {tipo_comando.__name__} desde {type(evento).__name__}")
-                raise NotImplementedError(f"No se puede construir comando {tipo_comando.__name__} desde evento {type(evento).__name__}")
-                
+            return constructor(self, evento)
         except Exception as e:
             logger.error(f"SAGA: Error al construir comando: {e}")
             raise
     
-    def procesar_evento_influencer_registrado(self, evento: EventoDominioInfluencerRegistrado):
-        """Procesar evento de influencer registrado - inicio de la saga."""
-        logger.info(f"SAGA: Procesando InfluencerRegistrado para {evento.nombre}")
+    def _registrar_campana(self, evento: EventoDominioInfluencerRegistrado) -> RegistrarCampana:
+        # Cuando un influencer se registra, crear una campaña automáticamente
+        comando = RegistrarCampana(
+            fecha_creacion=datetime.utcnow().isoformat(),
+            fecha_actualizacion=datetime.utcnow().isoformat(),
+            id=str(uuid.uuid4()),
+            nombre=f"Campaña de bienvenida para {evento.nombre}",
+            descripcion=f"Campaña automática creada para el influencer {evento.nombre}",
+            tipo_comision="cpa",
+            valor_comision=100.0,
+            moneda="USD",
+            fecha_inicio=datetime.utcnow().isoformat(),
+            fecha_fin=None,
+            titulo_material="Material de bienvenida",
+            descripcion_material="Material promocional para nuevos influencers",
+            categorias_objetivo=evento.categorias,
+            tipos_afiliado_permitidos=["influencer"],
+            paises_permitidos=["CO", "MX", "AR"],
+            enlaces_material=[],
+            imagenes_material=[],
+            banners_material=[],
+            metricas_minimas={},
+            auto_activar=True,
+            influencer_origen_id=evento.influencer_id,
+            categoria_origen=evento.categorias[0] if evento.categorias else "general",
+            influencer_origen_nombre=evento.nombre,
+            influencer_origen_email=evento.email
+        )
+        logger.info(f"SAGA: Comando RegistrarCampana construido para influencer {evento.nombre}")
+        return comando
+    
+    def _crear_contrato(self, evento: EventoDominioCampanaCreada) -> Optional[CrearContrato]:
+        # Solo crear contrato si hay información del influencer
+        if not evento.influencer_id:
+            logger.info(f"SAGA: CampanaCreada sin influencer asociado, saltando creación de contrato")
+            return None
         
-        try:
-            # Guardar contexto del influencer para compensación
-            self.contexto_influencer = {
-                'influencer_id': evento.influencer_id,
-                'nombre': evento.nombre,
-                'email': evento.email
-            }
-            
-            # Iniciar la saga
-            self.iniciar()
-            
-            # 1. Persistir el evento en el log
-            self.persistir_en_saga_log(evento, paso_index=1)
-            
-            # 2. Construir y ejecutar comando para crear campaña
-            comando_campana = self.construir_comando(evento, RegistrarCampana)
-            
-            # 3. Ejecutar el comando
-            ejecutar_commando(comando_campana)
-            
-            logger.info(f"SAGA: InfluencerRegistrado procesado exitosamente")
-            
-        except Exception as e:
-            logger.error(f"SAGA: Error procesando InfluencerRegistrado: {e}")
-            raise
+        # Cuando se crea una campaña, crear un contrato automáticamente
+        comando = CrearContrato(
+            fecha_creacion=datetime.utcnow().isoformat(),
+            fecha_actualizacion=datetime.utcnow().isoformat(),
+            id=str(uuid.uuid4()),
+            influencer_id=evento.influencer_id,
+            influencer_nombre=evento.influencer_nombre,
+            influencer_email=evento.influencer_email,
+            campana_id=evento.campana_id,
+            campana_nombre=evento.nombre,
+            categorias=evento.categorias_objetivo or [],
+            descripcion=f"Contrato automático para la campaña: {evento.nombre}",
+            monto_base=evento.valor_comision,
+            moneda=evento.moneda,
+            fecha_inicio=evento.fecha_inicio.isoformat() if hasattr(evento.fecha_inicio, 'isoformat') else str(evento.fecha_inicio),
+            fecha_fin=evento.fecha_fin.isoformat() if evento.fecha_fin and hasattr(evento.fecha_fin, 'isoformat') else str(evento.fecha_fin) if evento.fecha_fin else None,
+            entregables="Contenido promocional según especificaciones de la campaña",
+            tipo_contrato="puntual"
+        )
+        logger.info(f"SAGA: Comando CrearContrato construido para campaña {evento.nombre}")
+        return comando
     
-    def procesar_evento_campana_creada(self, evento: EventoDominioCampanaCreada):
-        """Procesar evento de campaña creada - segundo paso de la saga."""
-        logger.info(f"SAGA: Procesando CampanaCreada para {evento.nombre}")
+    def _eliminar_campana(self, evento: ErrorCreacionContrato) -> EliminarCampana:
+        # Si falla la creación del contrato, eliminar la campaña
+        logger.debug(f"SAGA: Contexto influencer: {self.contexto_influencer}")
+        influencer_id = self.contexto_influencer.get('influencer_id', '') if self.contexto_influencer else ''
         
-        try:
-            # Guardar contexto de la campaña para compensación
-            self.contexto_campana = {
-                'campana_id': evento.campana_id,
-                'nombre': evento.nombre,
-                'influencer_id': evento.influencer_id
-            }
-            
-            # Solo crear contrato si hay información del influencer
-            if not evento.influencer_id:
-                logger.info(f"SAGA: CampanaCreada sin influencer asociado, saltando creación de contrato")
-                return
-            
-            # 1. Persistir el evento en el log
-            self.persistir_en_saga_log(evento, paso_index=2)
-            
-            # 2. Construir y ejecutar comando para crear contrato
-            comando_contrato = self.construir_comando(evento, CrearContrato)
-            
-            # 3. Ejecutar el comando (envía evento al microservicio de contratos)
-            ejecutar_commando(comando_contrato)
-            
-            # 4. NO marcar como exitoso aquí - esperar respuesta del microservicio de contratos
-            logger.info(f"SAGA: Comando CrearContrato enviado - esperando respuesta del microservicio de contratos")
-            
-        except Exception as e:
-            logger.error(f"SAGA: Error procesando CampanaCreada: {e}")
-            raise
+        # Si no tenemos el influencer_id del contexto, obtenerlo del estado de la saga
+        if not influencer_id:
+            logger.warning(f"SAGA: No se encontró influencer_id en contexto, buscando en estado de la saga")
+            estado = self.repositorio_saga_log.obtener_estado(self.id_correlacion)
+            if estado is not None and estado.influencer_id:
+                influencer_id = estado.influencer_id
+                logger.info(f"SAGA: Influencer_id encontrado en estado de la saga: {influencer_id}")
+        
+        # Si aún no tenemos influencer_id, usar None (opcional para compensación)
+        if not influencer_id:
+            logger.warning(f"SAGA: No se pudo obtener influencer_id, procediendo sin él")
+            influencer_id = None
+        
+        comando = EliminarCampana(
+            campana_id=evento.campana_id,
+            influencer_id=influencer_id,
+            razon=f"Compensación por error en creación de contrato: {evento.error}"
+        )
+        logger.info(f"SAGA: Comando EliminarCampana construido para compensación - Campaña: {evento.campana_id}, Influencer: {influencer_id or 'N/A'}")
+        return comando
     
-    def procesar_evento_contrato_creado(self, evento: EventoDominioContratoCreado):
-        """Procesar evento de contrato creado - final de la saga."""
-        logger.info(f"SAGA: Procesando ContratoCreado - ID: {evento.contrato_id}")
+    def _eliminar_influencer(self, evento: ErrorCreacionContrato) -> Optional[EliminarInfluencer]:
+        # Si falla la creación del contrato, también eliminar el influencer
+        influencer_id = self.contexto_influencer.get('influencer_id', '') if self.contexto_influencer else ''
+        influencer_id = influencer_id or evento.influencer_id
         
-        try:
-            # 1. Persistir el evento en el log (final de la saga)
-            self.persistir_en_saga_log(evento, paso_index=3)
-            
-            # 2. Terminar la saga
-            self.terminar()
-            
-            logger.info(f"SAGA: ContratoCreado procesado exitosamente - Saga completada")
-            
-        except Exception as e:
-            logger.error(f"SAGA: Error procesando ContratoCreado: {e}")
-            raise
+        if not influencer_id:
+            logger.warning(f"SAGA: No se encontró influencer_id en contexto para compensación")
+            return None
+        
+        comando = EliminarInfluencer(
+            influencer_id=influencer_id,
+            razon=f"Compensación por error en creación de contrato: {evento.error}"
+        )
+        logger.info(f"SAGA: Comando EliminarInfluencer construido para compensación - Influencer: {influencer_id}")
+        return comando
+    
+    def _eliminar_campana_tardia(self, evento: EventoDominioCampanaCreada) -> EliminarCampana:
+        # La campaña se creó después de que la saga terminara sin ella
+        return EliminarCampana(
+            campana_id=evento.campana_id,
+            influencer_id=evento.influencer_id,
+            razon=f"Compensación por respuesta tardía: la saga ya estaba {self.estado}"
+        )
+    
+    # (tipo de evento, tipo de comando) -> constructor del comando
+    constructores = {
+        (EventoDominioInfluencerRegistrado, RegistrarCampana): _registrar_campana,
+        (EventoDominioCampanaCreada, CrearContrato): _crear_contrato,
+        (ErrorCreacionContrato, EliminarCampana): _eliminar_campana,
+        (ErrorCreacionContrato, EliminarInfluencer): _eliminar_influencer,
+        (ErrorCreacionCampana, EliminarInfluencer): _eliminar_influencer,
+        (EventoDominioCampanaCreada, EliminarCampana): _eliminar_campana_tardia,
+    }
     
-    def procesar_evento_error_contrato(self, evento: ErrorCreacionContrato):
-        """Procesar evento de error de contrato - iniciar compensación."""
-        logger.error(f"SAGA: Procesando ErrorCreacionContrato - Campaña: {evento.campana_id}, Error: {evento.error}")
+    def procesar_evento(self, evento: EventoDominio) -> bool:
+        """
+        Avanzar la saga con un evento de sus pasos. El paso y el comando siguiente salen de la
+        tabla de despacho; retorna True si la saga terminó (completada o compensada).
+        """
+        index, es_error = self.despacho.resolver(type(evento))
+        if self.terminada:
+            return self.procesar_evento_tardio(evento, index, es_error)
+        if es_error:
+            self.compensar(evento, index)
+            return True
         
-        try:
-            # 1. Persistir el evento de error en el log
-            self.persistir_en_saga_log(evento, paso_index=2)
-            
-            # 2. Iniciar compensación - eliminar la campaña creada
-            logger.info(f"SAGA: Iniciando compensación - eliminando campaña {evento.campana_id}")
-            
-            # Construir comando de compensación para campaña
-            comando_compensacion_campana = self.construir_comando(evento, EliminarCampana)
-            
-            if comando_compensacion_campana:
-                # Persistir el comando de compensación en el log
-                self.persistir_en_saga_log(comando_compensacion_campana, paso_index=3)
-                
-                # Ejecutar compensación de campaña
-                ejecutar_commando(comando_compensacion_campana)
-                logger.info(f"SAGA: Compensación de campaña ejecutada exitosamente")
-                
-                # Persistir evento de compensación ejecutada
-                evento_compensacion_ejecutada = CompensacionEjecutada(
-                    comando='EliminarCampana',
-                    campana_id=evento.campana_id,
-                    influencer_id=comando_compensacion_campana.influencer_id,
-                    razon=comando_compensacion_campana.razon,
-                    fecha_ejecucion=datetime.utcnow()
-                )
-                self.persistir_en_saga_log(evento_compensacion_ejecutada, paso_index=4)
-                
+        logger.info(f"SAGA: Procesando {type(evento).__name__} - paso {index}")
+        contexto = self.contextos.get(type(evento))
+        if contexto is not None:
+            atributo, campos = contexto
+            setattr(self, atributo, {clave: getattr(evento, campo) for clave, campo in campos.items()})
+        
+        if index == 0:
+            self.iniciar()
+        
+        self.completados.add(index)
+        # El paso respondió: su plazo deja de correr, los de las otras ramas siguen vigentes
+        self.plazos.pop(index, None)
+        self.planificador.cancelar(self.id_correlacion, index)
+        if self.despacho.completa(self.completados):
+            self.persistir_en_saga_log(evento, paso_index=index + 1)
+            self.terminar()
+            logger.info(f"SAGA: {type(evento).__name__} procesado exitosamente - Saga completada")
+            return True
+        
+        # Todos los pasos cuyas dependencias ya se completaron se envían a la vez; un paso que
+        # depende de varios espera (join) a que llegue el evento del último
+        listos = [paso for paso in self.despacho.listos(index, self.completados) if paso not in self.emitidos]
+        if not listos:
+            if self.plazos:
+                # saga_estado conserva el plazo más próximo de las ramas que siguen esperando
+                pendiente = min(self.plazos, key=self.plazos.get)
+                self.persistir_en_saga_log(evento, paso_index=pendiente, fecha_limite=self.plazos[pendiente])
             else:
-                logger.warning(f"SAGA: No se pudo construir comando de compensación de campaña")
-            
-            # 3. Compensación adicional - eliminar el influencer
-            logger.info(f"SAGA: Iniciando compensación adicional - eliminando influencer")
-            
-            comando_compensacion_influencer = self.construir_comando(evento, EliminarInfluencer)
-            
-            if comando_compensacion_influencer:
-                # Persistir el comando de compensación en el log
-                self.persistir_en_saga_log(comando_compensacion_influencer, paso_index=5)
-                
-                # Ejecutar compensación de influencer
-                ejecutar_commando(comando_compensacion_influencer)
-                logger.info(f"SAGA: Compensación de influencer ejecutada exitosamente")
-                
-                # Persistir evento de compensación ejecutada
-                evento_compensacion_influencer = CompensacionEjecutada(
-                    comando='EliminarInfluencer',
-                    campana_id=evento.campana_id,
-                    influencer_id=comando_compensacion_influencer.influencer_id,
-                    razon=comando_compensacion_influencer.razon,
-                    fecha_ejecucion=datetime.utcnow()
-                )
-                self.persistir_en_saga_log(evento_compensacion_influencer, paso_index=6)
-                
+                self.persistir_en_saga_log(evento, paso_index=index + 1)
+            logger.info(f"SAGA: Paso {index} completado - esperando las ramas concurrentes")
+            return False
+        
+        comandos = []
+        for siguiente in listos:
+            comando = self.construir_comando(evento, self.despacho.pasos[siguiente].comando)
+            if comando is not None:
+                comandos.append((siguiente, comando))
+        if not comandos:
+            return False
+        
+        # Una entrada del evento por paso enviado, con el plazo de ese paso: cada rama vence por
+        # separado y la rehidratación recupera todos los plazos desde el log
+        for paso, _ in comandos:
+            fecha_limite = self.fecha_limite_paso(paso)
+            if fecha_limite is not None:
+                self.plazos[paso] = fecha_limite
+            self.persistir_en_saga_log(evento, paso_index=paso, fecha_limite=fecha_limite)
+        for paso, comando in comandos:
+            self.emitidos.add(paso)
+            ejecutar_commando(comando)
+            logger.info(f"SAGA: Comando {type(comando).__name__} enviado - esperando respuesta del paso {paso}")
+        return False
+    
+    def compensar(self, evento: EventoDominio, index: int):
+        """
+        Ejecutar la cadena de compensación del paso que falló, del paso más reciente al inicio.
+        Las compensaciones de una misma etapa se despachan en paralelo y la etapa registra un
+        único ``CompensacionEjecutada`` con el resultado de cada rama.
+        """
+        logger.error(f"SAGA: Procesando {type(evento).__name__} en el paso {index} - Error: {getattr(evento, 'error', None)}")
+        self.planificador.cancelar(self.id_correlacion)
+        
+        # 1. Persistir el evento de error en el log
+        self.persistir_en_saga_log(evento, paso_index=index)
+        
+        # 2. Cada comando de la etapa y el resumen de la etapa ocupan pasos consecutivos del log
+        # Solo se deshacen los pasos completados: los ancestros del que falló y las ramas
+        # concurrentes que ya respondieron
+        cadena = self.despacho.compensaciones_para(self.completados | self.despacho.ancestros[index])
+        paso_index = index + 1
+        for n, etapa in enumerate(cadena):
+            comandos = []
+            for tipo_comando in etapa:
+                comando = self.construir_comando(evento, tipo_comando)
+                if comando is None:
+                    logger.warning(f"SAGA: No se pudo construir comando de compensación {tipo_comando.__name__}")
+                    continue
+                self.persistir_en_saga_log(comando, paso_index=paso_index)
+                paso_index += 1
+                comandos.append(comando)
+            if not comandos:
+                continue
+            
+            nombres = ','.join(type(comando).__name__ for comando in comandos)
+            logger.info(f"SAGA: Iniciando compensación {nombres}")
+            inicio = time.perf_counter()
+            ramas = self.ejecutar_compensaciones(comandos)
+            fallidas = {nombre: error for nombre, error in ramas.items() if error}
+            logger.info(f"SAGA: Etapa de compensación {nombres} terminada en {1000 * (time.perf_counter() - inicio):.1f} ms")
+            
+            ultima = n == len(cadena) - 1
+            self.persistir_en_saga_log(CompensacionEjecutada(
+                comando=nombres,
+                campana_id=getattr(evento, 'campana_id', None),
+                influencer_id=next((c.influencer_id for c in comandos if getattr(c, 'influencer_id', None)), None),
+                razon=comandos[0].razon,
+                fecha_ejecucion=datetime.utcnow(),
+                ramas=ramas,
+                final=ultima and not fallidas
+            ), paso_index=paso_index, sincrono=ultima or bool(fallidas))
+            paso_index += 1
+            
+            if fallidas:
+                # Se propaga para que el mensaje se reentregue; los pasos ya registrados se deduplican
+                raise RuntimeError(f"Compensaciones fallidas: {fallidas}")
+        
+        # 3. Marcar saga como compensada
+        self.terminar_con_error(f"{type(evento).__name__}: {getattr(evento, 'error', None)}", EstadoSaga.COMPENSADA)
+        logger.error(f"SAGA: {type(evento).__name__} procesado - Compensación ejecutada")
+    
+    def procesar_evento_tardio(self, evento: EventoDominio, index: int, es_error: bool) -> bool:
+        """
+        Evento de una saga que ya terminó (p. ej. la respuesta de un paso cuyo plazo venció).
+        No hace avanzar la saga: los errores y los eventos de una saga completada se
+        descartan. Si la saga falló o se compensó, el recurso que creó el paso tardío se
+        deshace con la compensación de ese paso, cuando el coordinador sabe construirla.
+        """
+        nombre = type(evento).__name__
+        if es_error or self.estado == EstadoSaga.COMPLETADA.value:
+            logger.info(f"SAGA: Saga {self.id_correlacion} ya terminada ({self.estado}), se ignora {nombre}")
+            return True
+        
+        # Un evento que ya está en el log quedó cubierto por la compensación de la saga
+        if any(entrada.evento_tipo == nombre
+               for entrada in self.repositorio_saga_log.obtener_por_correlacion(self.id_correlacion)):
+            logger.info(f"SAGA: {nombre} ya registrado en la saga {self.id_correlacion}, se ignora")
+            return True
+        
+        compensacion = getattr(self.despacho.pasos[index], 'compensacion', None)
+        if (type(evento), compensacion) not in self.constructores:
+            logger.error(f"SAGA: {nombre} llegó con la saga {self.id_correlacion} ya {self.estado} y el paso {index} "
+                         f"no tiene compensación disponible; el recurso queda sin deshacer")
+            self.persistir_en_saga_log(evento, paso_index=index + 1, sincrono=True)
+            return True
+        
+        logger.warning(f"SAGA: {nombre} llegó con la saga {self.id_correlacion} ya {self.estado}, se compensa el paso {index}")
+        comando = self.construir_comando(evento, compensacion)
+        # La compensación se ejecuta antes de registrar el evento: si falla, la reentrega la repite
+        ramas = self.ejecutar_compensaciones([comando])
+        self.persistir_en_saga_log(evento, paso_index=index + 1)
+        self.persistir_en_saga_log(comando, paso_index=index + 2)
+        self.persistir_en_saga_log(CompensacionEjecutada(
+            comando=type(comando).__name__,
+            campana_id=getattr(comando, 'campana_id', None),
+            influencer_id=getattr(comando, 'influencer_id', None),
+            razon=comando.razon,
+            fecha_ejecucion=datetime.utcnow(),
+            ramas=ramas,
+            final=True
+        ), paso_index=index + 3, sincrono=True)
+        return True
+    
+    def ejecutar_compensaciones(self, comandos: List[Comando]) -> Dict[str, Optional[str]]:
+        """Ejecutar los comandos de una etapa; retorna el error de cada rama (None si terminó bien)."""
+        if len(comandos) == 1:
+            comando = comandos[0]
+            ejecutar_commando(comando)
+            logger.info(f"SAGA: Compensación {type(comando).__name__} ejecutada exitosamente")
+            return {type(comando).__name__: None}
+        
+        app = current_app._get_current_object() if has_app_context() else None
+        
+        def rama(comando: Comando):
+            def ejecutar():
+                # Los handlers de compensación usan la sesión de Flask-SQLAlchemy del hilo
+                if app is None:
+                    return ejecutar_commando(comando)
+                with app.app_context():
+                    return ejecutar_commando(comando)
+            return ejecutar
+        
+        errores = ejecutar_ramas(
+            {type(comando).__name__: rama(comando) for comando in comandos}, ejecutor_compensaciones
+        )
+        ramas = {}
+        for nombre, error in errores.items():
+            if error is None:
+                logger.info(f"SAGA: Compensación {nombre} ejecutada exitosamente")
             else:
-                logger.warning(f"SAGA: No se pudo construir comando de compensación de influencer")
-            
-            # 3. Marcar saga como fallida
-            self.terminar_con_error(f"Error en creación de contrato: {evento.error}")
-            
-            logger.error(f"SAGA: ErrorCreacionContrato procesado - Compensación ejecutada")
-            
-        except Exception as e:
-            logger.error(f"SAGA: Error procesando ErrorCreacionContrato: {e}")
-            raise
+                logger.error(f"SAGA: Compensación {nombre} falló: {error}")
+            ramas[nombre] = None if error is None else str(error)
+        return ramas
+
+    def procesar_timeout(self, paso_index: int) -> bool:
+        """
+        Procesar el vencimiento del plazo de un paso: compensar si hay campaña, o marcar la
+        saga fallida. Retorna False si la saga ya avanzó o terminó y el timeout es obsoleto.
+        Con ramas concurrentes el paso actual no identifica al paso vencido: se revisa si
+        ese paso ya está completado.
+        """
+        if self.escritor is not None:
+            self.escritor.vaciar(timeout=30)
+        
+        estado = self.repositorio_saga_log.obtener_estado(self.id_correlacion)
+        if self.despacho.lineal:
+            pendiente = estado is not None and estado.paso_actual == paso_index
+        else:
+            pendiente = paso_index not in self.completados
+        if estado is None or estado.estado != EstadoSaga.EN_CURSO.value or not pendiente:
+            logger.info(f"SAGA: Timeout del paso {paso_index} obsoleto para {self.id_correlacion}, se ignora")
+            return False
+        
+        fecha_limite = self.plazos.pop(paso_index, None) or estado.fecha_limite
+        logger.warning(f"SAGA: Paso {paso_index} sin respuesta antes de {fecha_limite} - Correlación: {self.id_correlacion}")
+        compensa = bool(self.contexto_campana and self.contexto_campana.get('campana_id'))
+        self.persistir_en_saga_log(
+            TimeoutPasoSaga(paso_index=paso_index, fecha_limite=fecha_limite, compensa=compensa),
+            paso_index=paso_index, sincrono=True
+        )
+        
+        if compensa:
+            # Sin respuesta de contratos: misma compensación que un error de contrato
+            self.procesar_evento(ErrorCreacionContrato(
+                campana_id=self.contexto_campana['campana_id'],
+                error=f"Timeout esperando respuesta del paso {paso_index}",
+                influencer_id=self.contexto_campana.get('influencer_id')
+            ))
+        else:
+            self.terminar_con_error(f"Timeout esperando respuesta del paso {paso_index}")
+        return True
+
+
+class CoordinadorCoreografiaInfluencersCampanasContratos(CoordinadorCoreografia, CoordinadorInfluencersCampanasContratos):
+    """
+    Misma saga en modo coreografía (``SAGA_MODO=coreografia``): campañas reacciona a
+    InfluencerRegistrado y contratos a CampanaCreada sin comandos del coordinador. Cada
+    servicio agrega al sobre del mensaje la compensación de su paso, de modo que el error
+    de contrato llega con la cadena completa; el coordinador solo registra el avance en el
+    saga log y ejecuta esa cadena. Reutiliza el saga log y la ejecución de compensaciones
+    del coordinador de orquestación.
+    """
+    
+    comandos_compensacion = {
+        'EliminarCampana': EliminarCampana,
+        'EliminarInfluencer': EliminarInfluencer,
+    }
+    
+    def compensaciones_del_sobre(self) -> List[Dict[str, str]]:
+        return compensaciones_actuales()
+    
+    def construir_compensacion(self, compensacion: Dict[str, str], evento: EventoDominio) -> Optional[Comando]:
+        datos = dict(compensacion)
+        if datos.get('comando') == 'EliminarInfluencer' and not datos.get('influencer_id'):
+            datos['influencer_id'] = getattr(evento, 'influencer_id', None) or (self.contexto_influencer or {}).get('influencer_id')
+            if not datos['influencer_id']:
+                logger.warning(f"SAGA: No se encontró influencer_id para compensación")
+                return None
+        datos['razon'] = f"Compensación por {type(evento).__name__}: {getattr(evento, 'error', None)}"
+        return super().construir_compensacion(datos, evento)
+    
+    def procesar_evento(self, evento: EventoDominio) -> bool:
+        """
+        Registrar el avance de la saga; los servicios ya reaccionaron al evento, por lo que no
+        se envían comandos ni se programan plazos. Retorna True si la saga terminó.
+        """
+        index, es_error = self.despacho.resolver(type(evento))
+        if self.terminada:
+            # Los servicios ya reaccionaron al evento; una compensación llegaría en el sobre de un error
+            logger.info(f"SAGA: Saga {self.id_correlacion} ya terminada ({self.estado}), se ignora {type(evento).__name__}")
+            return True
+        if es_error:
+            self.compensar(evento, index)
+            return True
+        
+        logger.info(f"SAGA: Coreografía - {type(evento).__name__} observado en el paso {index}")
+        contexto = self.contextos.get(type(evento))
+        if contexto is not None:
+            atributo, campos = contexto
+            setattr(self, atributo, {clave: getattr(evento, campo) for clave, campo in campos.items()})
+        
+        if index == 0:
+            self.iniciar()
+        self.persistir_en_saga_log(evento, paso_index=index + 1)
+        
+        self.completados.add(index)
+        if self.despacho.completa(self.completados):
+            self.terminar()
+            return True
+        return False
+    
+    def compensar(self, evento: EventoDominio, index: int):
+        """
+        Ejecutar en orden inverso las compensaciones del sobre del evento de error. Los pasos
+        ejecutados se registran igual que en orquestación; si la saga ya quedó compensada
+        (el error llegó dos veces), no se repite la cadena.
+        """
+        logger.error(f"SAGA: Coreografía - {type(evento).__name__} en el paso {index} - Error: {getattr(evento, 'error', None)}")
+        self.persistir_en_saga_log(evento, paso_index=index, sincrono=True)
+        estado = self.repositorio_saga_log.obtener_estado(self.id_correlacion)
+        if estado is not None and estado.estado == EstadoSaga.COMPENSADA.value:
+            logger.info(f"SAGA: Saga {self.id_correlacion} ya compensada, se ignora {type(evento).__name__} repetido")
+            return
+        
+        comandos = [
+            comando for comando in (
+                self.construir_compensacion(compensacion, evento)
+                for compensacion in reversed(self.compensaciones_del_sobre())
+            ) if comando is not None
+        ]
+        if not comandos:
+            logger.warning(f"SAGA: {type(evento).__name__} sin compensaciones en el sobre")
+            self.terminar_con_error(f"{type(evento).__name__}: {getattr(evento, 'error', None)}")
+            return
+        
+        # La cadena del sobre es secuencial: cada compensación deshace el paso anterior. Si una
+        # falla, la excepción reentrega el mensaje y la cadena se repite (los pasos se deduplican)
+        paso_index = index + 1
+        ramas = {}
+        for comando in comandos:
+            self.persistir_en_saga_log(comando, paso_index=paso_index)
+            paso_index += 1
+            ramas.update(self.ejecutar_compensaciones([comando]))
+        
+        self.persistir_en_saga_log(CompensacionEjecutada(
+            comando=','.join(ramas),
+            campana_id=getattr(evento, 'campana_id', None),
+            influencer_id=next((c.influencer_id for c in comandos if getattr(c, 'influencer_id', None)), None),
+            razon=comandos[0].razon,
+            fecha_ejecucion=datetime.utcnow(),
+            ramas=ramas,
+            final=True
+        ), paso_index=paso_index, sincrono=True)
+        
+        self.terminar_con_error(f"{type(evento).__name__}: {getattr(evento, 'error', None)}", EstadoSaga.COMPENSADA)
+        logger.error(f"SAGA: {type(evento).__name__} procesado - Compensación ejecutada desde el sobre")
+
+
+# Espacio de nombres para derivar el id de correlación a partir del influencer de la saga
+NAMESPACE_SAGA = uuid.UUID('6f1c3a52-9d0e-4b8a-a7a5-3d2f1e0c9b41')
+
+# Coordinador según SAGA_MODO
+coordinadores_por_modo = {
+    'orquestacion': CoordinadorInfluencersCampanasContratos,
+    'coreografia': CoordinadorCoreografiaInfluencersCampanasContratos,
+}
+
+# Sagas activas por id de correlación
+sagas_activas = RegistroInstanciasSaga(
+    coordinadores_por_modo[settings.saga_modo],
+    max_instancias=settings.saga_max_instancias_activas
+)
+
+# Hilos compartidos por las ramas de las etapas de compensación paralelas
+ejecutor_compensaciones = ThreadPoolExecutor(
+    max_workers=settings.saga_compensacion_max_hilos, thread_name_prefix='compensacion-saga'
+)
+
+# Hilos propios para los vencimientos: un timeout que compensa espera a las ramas de
+# ejecutor_compensaciones, así que no puede ocupar uno de sus hilos
+ejecutor_timeouts = ThreadPoolExecutor(
+    max_workers=settings.saga_timeout_max_hilos, thread_name_prefix='timeout-saga'
+)
+
+# Plazos pendientes de todas las sagas; se inicia junto con los consumidores de la saga
+planificador_timeouts = PlanificadorTimeouts(ejecutor=ejecutor_timeouts)
+
+
+def vencer_paso_saga(id_correlacion: str, paso_index: int):
+    """Callback del planificador: procesa el timeout dentro del lock de la saga."""
+    with sagas_activas.usar(id_correlacion) as coordinador, coordinador.lock, \
+            contexto_mensaje(id_correlacion=str(coordinador.id_correlacion)):
+        coordinador.rehidratar()
+        if coordinador.procesar_timeout(paso_index):
+            sagas_activas.descartar(coordinador.id_correlacion)
+
+
+def recuperar_sagas_en_curso(lotes: Iterable[List[SagaEstado]]) -> int:
+    """
+    Fase de recuperación al arrancar: reconstruye en bloque las sagas sin terminar a partir
+    de los lotes de ``saga_estado`` y reprograma sus plazos, sin consultas por saga. Las
+    sagas que no caben en ``sagas_activas`` se rehidratan al llegar su siguiente evento.
+    """
+    inicio = time.perf_counter()
+    total = plazos = 0
+    for lote in lotes:
+        for estado in lote:
+            with sagas_activas.usar(estado.id_correlacion) as coordinador, coordinador.lock:
+                coordinador.restaurar(estado)
+            if estado.estado == EstadoSaga.EN_CURSO.value and estado.fecha_limite is not None:
+                planificador_timeouts.programar(estado.id_correlacion, estado.paso_actual, estado.fecha_limite)
+                plazos += 1
+        total += len(lote)
+    logger.info(f"SAGA: {total} sagas en curso recuperadas y {plazos} plazos reprogramados "
+                f"en {1000 * (time.perf_counter() - inicio):.0f} ms")
+    return total
+
+
+def id_correlacion_para(mensaje) -> Optional[str]:
+    """
+    Id de correlación de la saga a la que pertenece el mensaje. Todos los eventos del
+    flujo llevan el influencer que lo originó, por lo que se deriva de forma determinista.
+    """
+    influencer_id = getattr(mensaje, 'influencer_id', None)
+    if not influencer_id:
+        return None
+    return str(uuid.uuid5(NAMESPACE_SAGA, str(influencer_id)))
 
 
 # Función para convertir eventos de integración a eventos de dominio y procesarlos
@@ -494,33 +896,39 @@ def oir_mensaje(mensaje):
     """Escuchar eventos de integración y convertirlos a eventos de dominio."""
     logger.info(f"SAGA: Recibiendo mensaje de tipo: {type(mensaje).__name__}")
     
+    # La correlación propagada en las propiedades del mensaje tiene prioridad
+    id_correlacion = contexto_actual().id_correlacion or id_correlacion_para(mensaje)
+    if id_correlacion is None:
+        logger.info(f"SAGA: {type(mensaje).__name__} sin influencer asociado, no pertenece a una saga")
+        return
+    
+    with sagas_activas.usar(id_correlacion) as coordinador, coordinador.lock, \
+            contexto_mensaje(id_correlacion=str(coordinador.id_correlacion)):
+        _procesar_en_saga(coordinador, mensaje)
+
+
+# Mensaje de integración -> evento de dominio de la saga (None si ya es evento de dominio)
+eventos_dominio_saga = {
+    InfluencerRegistrado: EventoDominioInfluencerRegistrado,
+    CampanaCreada: EventoDominioCampanaCreada,
+    ContratoCreado: EventoDominioContratoCreado,
+    ErrorCreacionContrato: None,
+}
+
+
+def _procesar_en_saga(coordinador: CoordinadorInfluencersCampanasContratos, mensaje):
     try:
-        # Si es el primer evento de la saga (InfluencerRegistrado), resetear correlación
-        if isinstance(mensaje, InfluencerRegistrado):
-            CoordinadorInfluencersCampanasContratos.reset_correlacion()
+        coordinador.rehidratar()
         
-        coordinador = CoordinadorInfluencersCampanasContratos()
+        tipo = type(mensaje)
+        if tipo not in eventos_dominio_saga:
+            logger.warning(f"SAGA: Tipo de evento no soportado: {tipo.__name__}")
+            raise NotImplementedError(f"El evento {tipo.__name__} no es soportado por la saga")
         
-        if isinstance(mensaje, InfluencerRegistrado):
-            evento_dominio = EventoDominioInfluencerRegistrado(mensaje)
-            coordinador.procesar_evento_influencer_registrado(evento_dominio)
-            
-        elif isinstance(mensaje, CampanaCreada):
-            evento_dominio = EventoDominioCampanaCreada(mensaje)
-            coordinador.procesar_evento_campana_creada(evento_dominio)
-            
-        elif isinstance(mensaje, ContratoCreado):
-            evento_dominio = EventoDominioContratoCreado(mensaje)
-            coordinador.procesar_evento_contrato_creado(evento_dominio)
-            
-        elif isinstance(mensaje, ErrorCreacionContrato):
-            logger.error(f"SAGA: Procesando evento de error de contrato - Campaña: {mensaje.campana_id}, Error: {mensaje.error}")
-            logger.error(f"SAGA: Tipo de mensaje: {type(mensaje).__name__}")
-            coordinador.procesar_evento_error_contrato(mensaje)
-            
-        else:
-            logger.warning(f"SAGA: Tipo de evento no soportado: {type(mensaje).__name__}")
-            raise NotImplementedError(f"El evento {type(mensaje).__name__} no es soportado por la saga")
+        convertir = eventos_dominio_saga[tipo]
+        evento_dominio = convertir(mensaje) if convertir is not None else mensaje
+        if coordinador.procesar_evento(evento_dominio):
+            sagas_activas.descartar(coordinador.id_correlacion)
             
     except Exception as e:
         logger.error(f"SAGA: Error procesando mensaje: {e}")
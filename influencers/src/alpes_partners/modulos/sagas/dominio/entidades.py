@@ -1,5 +1,8 @@
+from collections.abc import Mapping
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Any, Dict
+from enum import Enum
+from typing import Any, Dict, Optional
 from ....seedwork.dominio.entidades import AgregacionRaiz
 from ....seedwork.dominio.objetos_valor import ObjetoValor
 import uuid
@@ -13,10 +16,123 @@ class SagaLog(AgregacionRaiz):
                  evento_tipo: str,
                  evento_datos: Dict[str, Any],
                  paso_index: int = None,
-                 fecha_procesamiento: datetime = None):
+                 fecha_procesamiento: datetime = None,
+                 fecha_limite: datetime = None):
         super().__init__()
         self.id_correlacion = id_correlacion
         self.evento_tipo = evento_tipo
-        self.evento_datos = evento_datos or {}
+        # Puede ser un Mapping que decodifica el contenido al primer acceso
+        self.evento_datos = evento_datos if evento_datos is not None else {}
         self.paso_index = paso_index
         self.fecha_procesamiento = fecha_procesamiento or datetime.utcnow()
+        # Plazo para recibir la respuesta del paso; None si el paso no espera respuesta
+        self.fecha_limite = fecha_limite
+
+
+class EstadoSaga(str, Enum):
+    EN_CURSO = "EN_CURSO"
+    COMPENSANDO = "COMPENSANDO"
+    COMPLETADA = "COMPLETADA"
+    COMPENSADA = "COMPENSADA"
+    FALLIDA = "FALLIDA"
+
+
+# Estados finales: la proyección de una saga terminada ya no cambia
+ESTADOS_TERMINADOS = (EstadoSaga.COMPLETADA.value, EstadoSaga.COMPENSADA.value, EstadoSaga.FALLIDA.value)
+
+
+@dataclass
+class SagaEstado:
+    """
+    Proyección del estado actual de una saga (una por correlación). Se actualiza con
+    cada entrada nueva del saga log, de modo que consultar dónde va una saga o qué
+    compensar no requiere recorrer el log.
+    """
+    id_correlacion: str
+    estado: str = EstadoSaga.EN_CURSO.value
+    paso_actual: Optional[int] = None
+    ultimo_evento: Optional[str] = None
+    influencer_id: Optional[str] = None
+    influencer_nombre: Optional[str] = None
+    influencer_email: Optional[str] = None
+    campana_id: Optional[str] = None
+    campana_nombre: Optional[str] = None
+    contrato_id: Optional[str] = None
+    error: Optional[str] = None
+    fecha_inicio: Optional[datetime] = None
+    fecha_actualizacion: Optional[datetime] = None
+    fecha_fin: Optional[datetime] = None
+    fecha_limite: Optional[datetime] = None
+
+    # Campos que cada entrada del log reemplaza aunque sea por None
+    CAMPOS_REEMPLAZABLES = ('fecha_limite',)
+
+    @staticmethod
+    def cambios(evento_tipo: str, evento_datos: Dict[str, Any], paso_index: Optional[int],
+                fecha: datetime, fecha_limite: Optional[datetime] = None) -> Dict[str, Any]:
+        """Campos de la proyección que modifica una entrada del log (los None se conservan)."""
+        datos = evento_datos if isinstance(evento_datos, Mapping) else {}
+        cambios = {'paso_actual': paso_index, 'ultimo_evento': evento_tipo, 'fecha_actualizacion': fecha,
+                   'fecha_limite': fecha_limite}
+
+        if evento_tipo == 'Inicio':
+            cambios.update(estado=EstadoSaga.EN_CURSO.value, fecha_inicio=fecha)
+        elif evento_tipo == 'EventoDominioInfluencerRegistrado':
+            cambios.update(influencer_id=datos.get('influencer_id'), influencer_nombre=datos.get('nombre'),
+                           influencer_email=datos.get('email'))
+        elif evento_tipo == 'EventoDominioCampanaCreada':
+            cambios.update(campana_id=datos.get('campana_id'), campana_nombre=datos.get('nombre'),
+                           influencer_id=datos.get('influencer_id'))
+        elif evento_tipo == 'EventoDominioContratoCreado':
+            cambios.update(contrato_id=datos.get('contrato_id'), campana_id=datos.get('campana_id'))
+        elif evento_tipo.startswith('Error'):
+            cambios.update(estado=EstadoSaga.COMPENSANDO.value, error=datos.get('error'),
+                           campana_id=datos.get('campana_id'), influencer_id=datos.get('influencer_id'))
+        elif evento_tipo == 'CompensacionEjecutada' and (datos.get('final') or datos.get('comando') == 'EliminarInfluencer'):
+            # Última etapa de la cadena; los logs previos a ``final`` terminaban con EliminarInfluencer
+            cambios.update(estado=EstadoSaga.COMPENSADA.value, fecha_fin=fecha)
+        elif evento_tipo == 'TimeoutPasoSaga' and datos.get('compensa'):
+            # La saga sigue abierta hasta que termine la compensación que dispara el timeout
+            cambios.update(estado=EstadoSaga.COMPENSANDO.value, error=f"Timeout en el paso {paso_index}")
+        elif evento_tipo == 'TimeoutPasoSaga':
+            cambios.update(estado=EstadoSaga.FALLIDA.value, error=f"Timeout en el paso {paso_index}", fecha_fin=fecha)
+        elif evento_tipo == 'Fin':
+            cambios.update(estado=EstadoSaga.COMPLETADA.value, fecha_fin=fecha)
+        return cambios
+
+    @classmethod
+    def efectivos(cls, cambios: Dict[str, Any]) -> Dict[str, Any]:
+        """Cambios a escribir: los valores presentes y los campos reemplazables."""
+        return {campo: valor for campo, valor in cambios.items()
+                if valor is not None or campo in cls.CAMPOS_REEMPLAZABLES}
+
+    @property
+    def terminada(self) -> bool:
+        return self.estado in ESTADOS_TERMINADOS
+
+    def aplicar(self, cambios: Dict[str, Any]):
+        """Aplica los cambios de una entrada del log; una saga terminada no se modifica."""
+        if self.terminada:
+            return
+        for campo, valor in self.efectivos(cambios).items():
+            setattr(self, campo, valor)
+
+
+@dataclass
+class SagaResumen:
+    """
+    Fila compacta de una saga terminada cuyas entradas del log se archivaron. Conserva el
+    resultado y el recorrido de pasos; el detalle de cada entrada queda en ``segmento``.
+    """
+    id_correlacion: str
+    estado: str
+    pasos: int
+    recorrido: str  # "paso:evento" separados por espacio, en orden de procesamiento
+    segmento: str
+    influencer_id: Optional[str] = None
+    campana_id: Optional[str] = None
+    contrato_id: Optional[str] = None
+    error: Optional[str] = None
+    fecha_inicio: Optional[datetime] = None
+    fecha_fin: Optional[datetime] = None
+    fecha_compactacion: Optional[datetime] = None
@@ -9,6 +9,10 @@ from typing import List, Dict, Any, Optional
 from ....seedwork.dominio.eventos import EventoDominio, EventoIntegracion
 
 
+def _iso(fecha):
+    return fecha.isoformat() if hasattr(fecha, 'isoformat') else fecha
+
+
 class CampanaCreada(EventoIntegracion):
     """Evento local que representa cuando se crea una campaña (desde microservicio campanas)."""
     
@@ -39,6 +43,15 @@ class CampanaCreada(EventoIntegracion):
         self.influencer_nombre = influencer_nombre
         self.influencer_email = influencer_email
 
+    def _datos_evento(self) -> Dict[str, Any]:
+        return {
+            'campana_id': self.campana_id,
+            'nombre': self.nombre,
+            'influencer_id': self.influencer_id,
+            'influencer_nombre': self.influencer_nombre,
+            'influencer_email': self.influencer_email,
+        }
+
 
 class ContratoCreado(EventoIntegracion):
     """Evento local que representa cuando se crea un contrato (desde microservicio contratos)."""
@@ -64,6 +77,15 @@ class ContratoCreado(EventoIntegracion):
         self.tipo_contrato = tipo_contrato
         self.fecha_creacion = fecha_creacion
 
+    def _datos_evento(self) -> Dict[str, Any]:
+        return {
+            'contrato_id': self.contrato_id,
+            'influencer_id': self.influencer_id,
+            'campana_id': self.campana_id,
+            'monto_total': self.monto_total,
+            'moneda': self.moneda,
+        }
+
 
 class ErrorCreacionCampana(EventoDominio):
     """Evento de error cuando falla la creación de campaña."""
@@ -73,14 +95,21 @@ class ErrorCreacionCampana(EventoDominio):
         self.influencer_id = influencer_id
         self.error = error
 
+    def _datos_evento(self) -> Dict[str, Any]:
+        return {'influencer_id': self.influencer_id, 'error': self.error}
+
 
 class ErrorCreacionContrato(EventoDominio):
     """Evento de error cuando falla la creación de contrato."""
     
-    def __init__(self, campana_id: str, error: str):
+    def __init__(self, campana_id: str, error: str, influencer_id: str = None):
         super().__init__()
         self.campana_id = campana_id
         self.error = error
+        self.influencer_id = influencer_id
+
+    def _datos_evento(self) -> Dict[str, Any]:
+        return {'campana_id': self.campana_id, 'influencer_id': self.influencer_id, 'error': self.error}
 
 
 class ErrorCreacionInfluencer(EventoDominio):
@@ -91,17 +120,50 @@ class ErrorCreacionInfluencer(EventoDominio):
         self.influencer_id = influencer_id
         self.error = error
 
+    def _datos_evento(self) -> Dict[str, Any]:
+        return {'influencer_id': self.influencer_id, 'error': self.error}
+
 
 class CompensacionEjecutada(EventoDominio):
-    """Evento que indica que una compensación fue ejecutada exitosamente."""
+    """
+    Evento que indica que una etapa de compensación fue ejecutada. Una etapa paralela
+    registra un solo evento con el resultado de cada rama (None si terminó bien).
+    """
     
-    def __init__(self, comando: str, campana_id: str, influencer_id: str, razon: str, fecha_ejecucion: datetime):
+    def __init__(self, comando: str, campana_id: str, influencer_id: str, razon: str, fecha_ejecucion: datetime,
+                 ramas: Dict[str, Optional[str]] = None, final: bool = False):
         super().__init__()
         self.comando = comando
         self.campana_id = campana_id
         self.influencer_id = influencer_id
         self.razon = razon
         self.fecha_ejecucion = fecha_ejecucion
+        self.ramas = ramas or {}
+        self.final = final  # Última etapa de la cadena de compensación
+
+    def _datos_evento(self) -> Dict[str, Any]:
+        return {
+            'comando': self.comando,
+            'campana_id': self.campana_id,
+            'influencer_id': self.influencer_id,
+            'razon': self.razon,
+            'fecha_ejecucion': _iso(self.fecha_ejecucion),
+            'ramas': self.ramas,
+            'final': self.final,
+        }
+
+
+class TimeoutPasoSaga(EventoDominio):
+    """Evento que indica que un paso de la saga no recibió respuesta antes de su fecha límite."""
+    
+    def __init__(self, paso_index: int, fecha_limite: Optional[datetime], compensa: bool = False):
+        super().__init__()
+        self.paso_index = paso_index
+        self.fecha_limite = fecha_limite
+        self.compensa = compensa  # El timeout dispara la compensación de los pasos completados
+
+    def _datos_evento(self) -> Dict[str, Any]:
+        return {'paso_index': self.paso_index, 'fecha_limite': _iso(self.fecha_limite), 'compensa': self.compensa}
 
 
 class CampanaEliminacionRequerida(EventoIntegracion):
@@ -1,15 +1,15 @@
 from abc import ABC, abstractmethod
 from typing import List, Optional
 from ....seedwork.dominio.repositorios import Repositorio
-from .entidades import SagaLog
+from .entidades import SagaLog, SagaEstado
 
 
 class RepositorioSagaLog(Repositorio, ABC):
     """Repositorio para el log de sagas."""
     
     @abstractmethod
-    def agregar(self, saga_log: SagaLog):
-        """Agregar una entrada al log de saga."""
+    def agregar(self, saga_log: SagaLog) -> bool:
+        """Agregar una entrada al log de saga; retorna False si el paso ya estaba registrado."""
         ...
     
     @abstractmethod
@@ -17,6 +17,16 @@ class RepositorioSagaLog(Repositorio, ABC):
         """Obtener todas las entradas de una saga por ID de correlación."""
         ...
     
+    @abstractmethod
+    def obtener_estado(self, id_correlacion: str) -> Optional[SagaEstado]:
+        """Obtener el estado proyectado de una saga sin recorrer su log."""
+        ...
+    
+    @abstractmethod
+    def contar_en_curso(self) -> int:
+        """Cantidad de sagas en curso o compensando."""
+        ...
+    
     @abstractmethod
     def obtener_por_id(self, id_entrada: str) -> Optional[SagaLog]:
         """Obtener una entrada específica del log."""
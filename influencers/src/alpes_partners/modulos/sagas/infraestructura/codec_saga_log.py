@@ -0,0 +1,240 @@
+"""
+Codecs del contenido (``evento_datos``) de las entradas del saga log.
+
+``CodecJson`` conserva el formato original: texto JSON en ``saga_logs.evento_datos``.
+``CodecAvro`` guarda en ``saga_logs.evento_datos_binario`` un id de esquema de 4 bytes
+seguido del registro Avro sin las claves. El esquema se deriva de las claves del
+contenido y del tipo de cada valor (los valores anidados se guardan como texto
+JSON). Su id es un hash estable de esa definición, así que todos los procesos
+asignan el mismo id sin coordinarse. Cada esquema se registra en
+``saga_log_esquemas`` en la misma transacción que las entradas que lo usan,
+hasta que el proceso lo ve confirmado en la tabla.
+
+Al leer, las entradas se envuelven en ``DatosPerezosos``, que decodifica el
+contenido solo cuando se accede a un campo. Ambos formatos conviven en la tabla:
+cada fila se lee según la columna que tenga datos.
+"""
+
+import io
+import json
+import logging
+import re
+import struct
+import threading
+import zlib
+from abc import ABC, abstractmethod
+from collections.abc import Mapping
+from typing import Any, Dict, Iterable, Iterator, Optional, Set, Tuple
+
+from fastavro import parse_schema, schemaless_reader, schemaless_writer
+
+logger = logging.getLogger(__name__)
+
+# Id reservado para contenidos que no caben en un esquema (claves no válidas en Avro)
+ESQUEMA_JSON = 0
+
+_NOMBRE_AVRO = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+_LONG_MIN, _LONG_MAX = -(2 ** 63), 2 ** 63 - 1
+
+# Tipo Avro de cada etiqueta; los valores anidados viajan como texto JSON en un campo 'json'
+_TIPOS_AVRO = {
+    'null': 'null', 'boolean': 'boolean', 'long': 'long', 'double': 'double', 'string': 'string',
+    'strings': {'type': 'array', 'items': 'string'}, 'json': 'string',
+}
+
+
+def _tipo(valor) -> str:
+    if valor is None:
+        return 'null'
+    if isinstance(valor, bool):
+        return 'boolean'
+    if isinstance(valor, int):
+        return 'long' if _LONG_MIN <= valor <= _LONG_MAX else 'json'
+    if isinstance(valor, float):
+        return 'double'
+    if isinstance(valor, str):
+        return 'string'
+    if isinstance(valor, (list, tuple)) and all(isinstance(v, str) for v in valor):
+        return 'strings'
+    return 'json'
+
+
+class CodecSagaLog(ABC):
+    """Convierte el contenido de una entrada en el valor de sus columnas y viceversa."""
+    nombre: str
+
+    @abstractmethod
+    def columnas(self, datos: Dict[str, Any]) -> Dict[str, Any]:
+        """Valores de ``evento_datos`` y ``evento_datos_binario`` para el contenido."""
+        ...
+
+
+class CodecJson(CodecSagaLog):
+    nombre = 'json'
+
+    def columnas(self, datos: Dict[str, Any]) -> Dict[str, Any]:
+        return {'evento_datos': json.dumps(datos), 'evento_datos_binario': None}
+
+
+class CodecAvro(CodecSagaLog):
+    """Registros Avro sin claves ni uniones, con el id del esquema como prefijo."""
+    nombre = 'avro'
+
+    def __init__(self):
+        self._esquemas: Dict[int, Tuple[Tuple[Tuple[str, str], ...], Any]] = {}
+        self._por_campos: Dict[Tuple[Tuple[str, str], ...], int] = {}
+        # Esquemas que ya se vieron confirmados en saga_log_esquemas
+        self._confirmados: Set[int] = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def id_esquema(campos: Tuple[Tuple[str, str], ...]) -> int:
+        return zlib.crc32(_definicion(campos).encode('utf-8')) & 0x7fffffff or 1
+
+    def _esquema(self, campos: Tuple[Tuple[str, str], ...]) -> int:
+        id_esquema = self._por_campos.get(campos)
+        if id_esquema is not None:
+            return id_esquema
+        if not all(_NOMBRE_AVRO.match(campo) for campo, _ in campos):
+            return ESQUEMA_JSON
+
+        id_esquema = self.id_esquema(campos)
+        with self._lock:
+            registrado = self._esquemas.get(id_esquema)
+            if registrado is not None and registrado[0] != campos:
+                logger.warning(f"SAGA LOG: Colisión de id de esquema {id_esquema}, se usa JSON")
+                return ESQUEMA_JSON
+            self._agregar(id_esquema, campos)
+        return id_esquema
+
+    def _agregar(self, id_esquema: int, campos: Tuple[Tuple[str, str], ...]):
+        esquema = parse_schema({
+            'type': 'record', 'name': f'DatosSagaLog{id_esquema}',
+            'fields': [{'name': campo, 'type': _TIPOS_AVRO[tipo]} for campo, tipo in campos],
+        })
+        self._esquemas[id_esquema] = (campos, esquema)
+        self._por_campos[campos] = id_esquema
+
+    @staticmethod
+    def esquema_de(valor: bytes) -> int:
+        return struct.unpack_from('>I', valor)[0]
+
+    def definicion(self, id_esquema: int) -> str:
+        return _definicion(self._esquemas[id_esquema][0])
+
+    def sin_confirmar(self, ids: Iterable[int]) -> Set[int]:
+        return {id_esquema for id_esquema in ids if id_esquema != ESQUEMA_JSON and id_esquema not in self._confirmados}
+
+    def confirmar(self, ids: Iterable[int]):
+        self._confirmados.update(ids)
+
+    def columnas(self, datos: Dict[str, Any]) -> Dict[str, Any]:
+        return {'evento_datos': '', 'evento_datos_binario': self.codificar(datos)}
+
+    def codificar(self, datos: Dict[str, Any]) -> bytes:
+        campos = tuple((campo, _tipo(datos[campo])) for campo in sorted(datos))
+        id_esquema = self._esquema(campos)
+        if id_esquema == ESQUEMA_JSON:
+            return struct.pack('>I', ESQUEMA_JSON) + json.dumps(datos).encode('utf-8')
+        salida = io.BytesIO()
+        salida.write(struct.pack('>I', id_esquema))
+        schemaless_writer(salida, self._esquemas[id_esquema][1], {
+            campo: json.dumps(datos[campo]) if tipo == 'json' else datos[campo] for campo, tipo in campos
+        })
+        return salida.getvalue()
+
+    def decodificar(self, valor: bytes) -> Dict[str, Any]:
+        id_esquema = self.esquema_de(valor)
+        if id_esquema == ESQUEMA_JSON:
+            return json.loads(valor[4:].decode('utf-8'))
+        registrado = self._esquemas.get(id_esquema)
+        if registrado is None:
+            registrado = self._cargar(id_esquema)
+        campos, esquema = registrado
+        registro = schemaless_reader(io.BytesIO(valor[4:]), esquema, None)
+        for campo, tipo in campos:
+            if tipo == 'json':
+                registro[campo] = json.loads(registro[campo])
+        return registro
+
+    def _cargar(self, id_esquema: int):
+        # Esquema creado por otro proceso
+        definicion = _cargar_definicion_desde_bd(id_esquema)
+        if definicion is None:
+            raise ValueError(f"Esquema {id_esquema} del saga log no registrado")
+        campos = tuple(tuple(campo.split(':')) for campo in definicion.split(',') if campo)
+        with self._lock:
+            self._agregar(id_esquema, campos)
+            self._confirmados.add(id_esquema)
+            return self._esquemas[id_esquema]
+
+
+def _definicion(campos: Tuple[Tuple[str, str], ...]) -> str:
+    return ','.join(f'{campo}:{tipo}' for campo, tipo in campos)
+
+
+def _cargar_definicion_desde_bd(id_esquema: int) -> Optional[str]:
+    from ....seedwork.infraestructura.database import SessionLocal
+    from .repositorio_saga_log import obtener_definicion_esquema
+    with SessionLocal() as sesion:
+        return obtener_definicion_esquema(sesion, id_esquema)
+
+
+class DatosPerezosos(Mapping):
+    """Contenido de una entrada que se decodifica la primera vez que se accede a un campo."""
+    __slots__ = ('_valor', '_codec', '_datos')
+
+    def __init__(self, valor: bytes, codec: CodecAvro):
+        self._valor = valor
+        self._codec = codec
+        self._datos: Optional[Dict[str, Any]] = None
+
+    @property
+    def decodificado(self) -> bool:
+        return self._datos is not None
+
+    def _decodificar(self) -> Dict[str, Any]:
+        if self._datos is None:
+            self._datos = self._codec.decodificar(self._valor)
+        return self._datos
+
+    def __getitem__(self, clave):
+        return self._decodificar()[clave]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._decodificar())
+
+    def __len__(self) -> int:
+        return len(self._decodificar())
+
+    def __repr__(self) -> str:
+        return repr(self._datos) if self._datos is not None else f'DatosPerezosos({len(self._valor)} bytes)'
+
+
+_codecs: Dict[str, CodecSagaLog] = {}
+_codecs_lock = threading.Lock()
+
+
+def codec_saga_log(nombre: Optional[str] = None) -> CodecSagaLog:
+    """Codec del proceso; por defecto el configurado en ``SAGA_LOG_CODEC``."""
+    if nombre is None:
+        from ....config.settings import settings
+        nombre = settings.saga_log_codec
+    codec = _codecs.get(nombre)
+    if codec is None:
+        with _codecs_lock:
+            codec = _codecs.get(nombre)
+            if codec is None:
+                tipos = {CodecJson.nombre: CodecJson, CodecAvro.nombre: CodecAvro}
+                if nombre not in tipos:
+                    raise ValueError(f"Codec de saga log desconocido: {nombre}")
+                codec = _codecs[nombre] = tipos[nombre]()
+    return codec
+
+
+def datos_de_fila(evento_datos: Optional[str], evento_datos_binario: Optional[bytes], perezoso: bool = False):
+    """Contenido de una fila de ``saga_logs`` en cualquiera de los dos formatos."""
+    if evento_datos_binario is not None:
+        codec = codec_saga_log(CodecAvro.nombre)
+        return DatosPerezosos(evento_datos_binario, codec) if perezoso else codec.decodificar(evento_datos_binario)
+    return json.loads(evento_datos) if evento_datos else {}
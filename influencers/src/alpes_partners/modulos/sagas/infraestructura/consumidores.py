@@ -3,28 +3,33 @@ Consumidor de eventos para la saga.
 Se suscribe a eventos de influencers, campañas y contratos para orquestar el flujo completo.
 """
 
+import functools
 import logging
-import time
-import threading
 from datetime import datetime
 
 # Configurar logging
 logger = logging.getLogger(__name__)
 
 # Imports esenciales
-import pulsar
-import _pulsar
 from pulsar.schema import AvroSchema, Record, String, Array, Float, Long
 
 from alpes_partners.config.app import crear_app_minima
-from alpes_partners.seedwork.infraestructura import utils
+from alpes_partners.config.settings import settings
+from alpes_partners.seedwork.infraestructura.consumidores import (
+    DespachoPorTopico, clave_por_campos, runtime_consumidores
+)
 
 # Importar eventos de dominio de los diferentes módulos
 from ..dominio.eventos import CampanaCreada, ContratoCreado
 from ...influencers.dominio.eventos import InfluencerRegistrado
 
 # Importar coordinador de saga
-from ..aplicacion.coordinadores.saga_alpes_partners import oir_mensaje
+from ..aplicacion.coordinadores.saga_alpes_partners import (
+    oir_mensaje, planificador_timeouts, recuperar_sagas_en_curso, vencer_paso_saga
+)
+from .repositorio_saga_log import obtener_sagas_en_curso
+from .retencion_saga_log import iniciar_compactacion_saga_log
+from alpes_partners.seedwork.infraestructura.database import SessionLocal
 
 # Definir esquemas de eventos (compatible con los microservicios)
 class InfluencerRegistradoPayload(Record):
@@ -100,240 +105,81 @@ app = crear_app_minima()
 
 def suscribirse_a_eventos_saga():
     """
-    Función principal que inicia los tres consumidores de la saga en paralelo.
+    Función principal que registra los consumidores de la saga en el runtime de
+    consumidores compartido y bloquea hasta que se detenga.
+    Con ``saga_suscripcion_unica`` la saga recibe todos sus tópicos por una sola
+    suscripción (``saga-sub-eventos``) y una tabla de despacho por tópico; si no,
+    usa una suscripción por tópico.
     """
     logger.info("SAGA: Iniciando consumidores de eventos...")
     
-    # Crear hilos para cada consumidor
-    threads = []
+    _recuperar_sagas()
     
-    # Hilo para eventos de influencers
-    thread_influencers = threading.Thread(
-        target=_consumir_eventos_influencers,
-        name="saga-influencers-consumer",
-        daemon=True
-    )
-    threads.append(thread_influencers)
-    
-    # Hilo para eventos de campañas
-    thread_campanas = threading.Thread(
-        target=_consumir_eventos_campanas,
-        name="saga-campanas-consumer", 
-        daemon=True
-    )
-    threads.append(thread_campanas)
-    
-    # Hilo para eventos de contratos
-    thread_contratos = threading.Thread(
-        target=_consumir_eventos_contratos,
-        name="saga-contratos-consumer",
-        daemon=True
-    )
-    threads.append(thread_contratos)
+    runtime = runtime_consumidores()
+    if settings.saga_suscripcion_unica:
+        despacho = DespachoPorTopico()
+        for topico, schema, convertir, _, campo_clave in _topicos_saga():
+            despacho.agregar(topico, AvroSchema(schema), functools.partial(_procesar_en_saga, convertir),
+                             (campo_clave,))
+        runtime.registrar_despacho(despacho, 'saga-sub-eventos', nombre='saga-eventos')
+    else:
+        for topico, schema, convertir, nombre, campo_clave in _topicos_saga():
+            runtime.registrar(
+                topico,
+                f'saga-sub-{topico}',
+                AvroSchema(schema),
+                functools.partial(_procesar_en_saga, convertir),
+                nombre=f'saga-{nombre}',
+                clave=clave_por_campos(campo_clave),
+            )
+    runtime.iniciar()
+    logger.info("SAGA: Suscrito a eventos de influencers, campañas, contratos y errores de contratos")
     
-    # Hilo para eventos de error de contratos
-    thread_contratos_error = threading.Thread(
-        target=_consumir_eventos_contratos_error,
-        name="saga-contratos-error-consumer",
-        daemon=True
-    )
-    threads.append(thread_contratos_error)
-    
-    # Iniciar todos los hilos
-    for thread in threads:
-        thread.start()
-        logger.info(f"SAGA: Iniciado hilo {thread.name}")
-    
-    # Esperar a que todos los hilos terminen
     try:
-        for thread in threads:
-            thread.join()
+        runtime.esperar()
     except KeyboardInterrupt:
         logger.info("SAGA: Deteniendo consumidores...")
+        runtime.detener()
 
 
-def _consumir_eventos_influencers():
-    """
-    Consumidor específico para eventos de influencers.
-    """
-    cliente = None
-    try:
-        logger.info("SAGA: Conectando a Pulsar para eventos de influencers...")
-        cliente = pulsar.Client(f'pulsar://{utils.broker_host()}:6650')
-        
-        consumidor = cliente.subscribe(
-            'eventos-influencers',
-            consumer_type=_pulsar.ConsumerType.Shared,
-            subscription_name='saga-sub-eventos-influencers',
-            schema=AvroSchema(EventoInfluencerRegistrado)
-        )
+def _topicos_saga():
+    """Tópicos que escucha la saga: schema, conversión a evento de dominio, nombre y campo de la clave."""
+    return (
+        ('eventos-influencers', EventoInfluencerRegistrado, _convertir_evento_influencer, 'influencers', 'id_influencer'),
+        ('eventos-campanas', EventoCampanaCreada, _convertir_evento_campana, 'campanas', 'campana_id'),
+        ('eventos-contratos', EventoContratoCreado, _convertir_evento_contrato, 'contratos', 'id_campana'),
+        ('eventos-contratos-error', EventoContratoError, _convertir_evento_contrato_error, 'contratos-error',
+         'id_campana'),
+    )
 
-        logger.info("SAGA: Suscrito a eventos de influencers")
-        logger.info("SAGA: Esperando eventos de influencers...")
-        
-        while True:
-            try:
-                mensaje = consumidor.receive()
-                logger.info(f"SAGA: Evento de influencer recibido - {mensaje.value()}")
-                
-                # Convertir evento Pulsar a evento de dominio
-                evento_dominio = _convertir_evento_influencer(mensaje.value())
-                
-                # Procesar con la saga
-                with app.app_context():
-                    oir_mensaje(evento_dominio)
-                
-                # Confirmar procesamiento
-                consumidor.acknowledge(mensaje)
-                logger.info("SAGA: Evento de influencer procesado y confirmado")
-                
-            except Exception as e:
-                logger.error(f"SAGA: Error procesando evento de influencer: {e}")
-                time.sleep(5)
-                
-    except Exception as e:
-        logger.error(f"SAGA: Error en consumidor de influencers: {e}")
-    finally:
-        if cliente:
-            cliente.close()
 
+def _procesar_en_saga(convertir, mensaje):
+    """Convierte el evento de integración a evento de dominio y lo procesa con la saga."""
+    logger.info(f"SAGA: Evento recibido de {mensaje.topic_name()} - {mensaje.value()}")
+    evento_dominio = convertir(mensaje.value())
+    with app.app_context():
+        oir_mensaje(evento_dominio)
+    logger.info(f"SAGA: Evento {type(evento_dominio).__name__} procesado")
 
-def _consumir_eventos_campanas():
-    """
-    Consumidor específico para eventos de campañas.
-    """
-    cliente = None
-    try:
-        logger.info("SAGA: Conectando a Pulsar para eventos de campañas...")
-        cliente = pulsar.Client(f'pulsar://{utils.broker_host()}:6650')
-        
-        consumidor = cliente.subscribe(
-            'eventos-campanas',
-            consumer_type=_pulsar.ConsumerType.Shared,
-            subscription_name='saga-sub-eventos-campanas',
-            schema=AvroSchema(EventoCampanaCreada)
-        )
-
-        logger.info("SAGA: Suscrito a eventos de campañas")
-        logger.info("SAGA: Esperando eventos de campañas...")
-        
-        while True:
-            try:
-                mensaje = consumidor.receive()
-                logger.info(f"SAGA: Evento de campaña recibido - {mensaje.value()}")
-                
-                # Convertir evento Pulsar a evento de dominio
-                evento_dominio = _convertir_evento_campana(mensaje.value())
-                
-                # Procesar con la saga
-                with app.app_context():
-                    oir_mensaje(evento_dominio)
-                
-                # Confirmar procesamiento
-                consumidor.acknowledge(mensaje)
-                logger.info("SAGA: Evento de campaña procesado y confirmado")
-                
-            except Exception as e:
-                logger.error(f"SAGA: Error procesando evento de campaña: {e}")
-                time.sleep(5)
-                
-    except Exception as e:
-        logger.error(f"SAGA: Error en consumidor de campañas: {e}")
-    finally:
-        if cliente:
-            cliente.close()
 
-
-def _consumir_eventos_contratos():
+def _recuperar_sagas():
     """
-    Consumidor específico para eventos de contratos.
+    Reconstruye las sagas sin terminar desde saga_estado e inicia el planificador de timeouts
+    antes de consumir, para que las respuestas tardías encuentren su saga. También inicia el
+    compactador que archiva las sagas terminadas.
     """
-    cliente = None
     try:
-        logger.info("SAGA: Conectando a Pulsar para eventos de contratos...")
-        cliente = pulsar.Client(f'pulsar://{utils.broker_host()}:6650')
-        
-        consumidor = cliente.subscribe(
-            'eventos-contratos',
-            consumer_type=_pulsar.ConsumerType.Shared,
-            subscription_name='saga-sub-eventos-contratos',
-            schema=AvroSchema(EventoContratoCreado)
-        )
-
-        logger.info("SAGA: Suscrito a eventos de contratos")
-        logger.info("SAGA: Esperando eventos de contratos...")
-        
-        while True:
-            try:
-                mensaje = consumidor.receive()
-                logger.info(f"SAGA: Evento de contrato recibido - {mensaje.value()}")
-                
-                # Convertir evento Pulsar a evento de dominio
-                evento_dominio = _convertir_evento_contrato(mensaje.value())
-                
-                # Procesar con la saga
-                with app.app_context():
-                    oir_mensaje(evento_dominio)
-                
-                # Confirmar procesamiento
-                consumidor.acknowledge(mensaje)
-                logger.info("SAGA: Evento de contrato procesado y confirmado")
-                
-            except Exception as e:
-                logger.error(f"SAGA: Error procesando evento de contrato: {e}")
-                time.sleep(5)
-                
+        with SessionLocal() as sesion:
+            recuperar_sagas_en_curso(obtener_sagas_en_curso(sesion, tamano_lote=settings.saga_recuperacion_tamano_lote))
     except Exception as e:
-        logger.error(f"SAGA: Error en consumidor de contratos: {e}")
-    finally:
-        if cliente:
-            cliente.close()
+        logger.error(f"SAGA: Error recuperando sagas en curso: {e}")
+    planificador_timeouts.iniciar(_vencer_paso_en_contexto)
+    iniciar_compactacion_saga_log()
 
 
-def _consumir_eventos_contratos_error():
-    """
-    Consumidor específico para eventos de error de contratos.
-    """
-    cliente = None
-    try:
-        logger.info("SAGA: Conectando a Pulsar para eventos de error de contratos...")
-        cliente = pulsar.Client(f'pulsar://{utils.broker_host()}:6650')
-        
-        consumidor = cliente.subscribe(
-            'eventos-contratos-error',
-            consumer_type=_pulsar.ConsumerType.Shared,
-            subscription_name='saga-sub-eventos-contratos-error',
-            schema=AvroSchema(EventoContratoError)
-        )
-
-        logger.info("SAGA: Suscrito a eventos de error de contratos")
-        logger.info("SAGA: Esperando eventos de error de contratos...")
-        
-        while True:
-            try:
-                mensaje = consumidor.receive()
-                logger.info(f"SAGA: Evento de error de contrato recibido - {mensaje.value()}")
-                
-                # Convertir evento Pulsar a evento de dominio
-                evento_dominio = _convertir_evento_contrato_error(mensaje.value())
-                
-                # Procesar con la saga
-                with app.app_context():
-                    oir_mensaje(evento_dominio)
-                
-                # Confirmar procesamiento
-                consumidor.acknowledge(mensaje)
-                logger.info("SAGA: Evento de error de contrato procesado y confirmado")
-                
-            except Exception as e:
-                logger.error(f"SAGA: Error procesando evento de error de contrato: {e}")
-                time.sleep(5)
-                
-    except Exception as e:
-        logger.error(f"SAGA: Error en consumidor de errores de contratos: {e}")
-    finally:
-        if cliente:
-            cliente.close()
+def _vencer_paso_en_contexto(id_correlacion: str, paso_index: int):
+    with app.app_context():
+        vencer_paso_saga(id_correlacion, paso_index)
 
 
 def _convertir_evento_influencer(evento_pulsar):
@@ -412,7 +258,8 @@ def _convertir_evento_contrato_error(evento_pulsar):
         from ..dominio.eventos import ErrorCreacionContrato
         evento_dominio = ErrorCreacionContrato(
             campana_id=str(data.id_campana),
-            error=str(data.error)
+            error=str(data.error),
+            influencer_id=str(data.id_influencer) if data.id_influencer else None
         )
         
         logger.error(f"SAGA: Evento de error de contrato convertido - Campaña: {evento_dominio.campana_id}, Error: {evento_dominio.error}")
@@ -1,7 +1,7 @@
 import pulsar
 from pulsar.schema import *
 import logging
-from alpes_partners.seedwork.infraestructura import utils
+from alpes_partners.seedwork.infraestructura.productores import registro_productores
 
 logger = logging.getLogger(__name__)
 
@@ -13,16 +13,10 @@ def unix_time_millis(dt):
 class DespachadorContratos:
     """Despachador para enviar comandos al microservicio de contratos."""
 
-    def publicar(self, evento, topico, schema=None):
+    def publicar(self, evento, topico, schema=None, clave=None):
         try:
-            cliente = pulsar.Client(f'pulsar://{utils.broker_host()}:6650')
-            publicador = cliente.create_producer(
-                topico,
-                schema=schema
-            )
-            publicador.send(evento)
+            registro_productores().publicar(evento, topico, schema, clave=clave)
             logger.info(f"SAGA DESPACHADOR: Comando enviado a {topico}")
-            cliente.close()
         except Exception as e:
             logger.error(f"SAGA DESPACHADOR: Error enviando comando: {e}")
             raise
@@ -64,7 +58,7 @@ class DespachadorContratos:
                 data=payload
             )
             
-            self.publicar(comando_integracion, topico, AvroSchema(ComandoCrearContrato))
+            self.publicar(comando_integracion, topico, AvroSchema(ComandoCrearContrato), clave=payload.campana_id)
             
         except Exception as e:
             logger.error(f"SAGA DESPACHADOR: Error publicando comando de crear contrato: {e}")
@@ -74,16 +68,10 @@ class DespachadorContratos:
 class DespachadorCampanas:
     """Despachador para enviar comandos al microservicio de campañas."""
 
-    def publicar(self, evento, topico, schema=None):
+    def publicar(self, evento, topico, schema=None, clave=None):
         try:
-            cliente = pulsar.Client(f'pulsar://{utils.broker_host()}:6650')
-            publicador = cliente.create_producer(
-                topico,
-                schema=schema
-            )
-            publicador.send(evento)
+            registro_productores().publicar(evento, topico, schema, clave=clave)
             logger.info(f"SAGA DESPACHADOR: Comando enviado a {topico}")
-            cliente.close()
         except Exception as e:
             logger.error(f"SAGA DESPACHADOR: Error enviando comando: {e}")
             raise
@@ -140,7 +128,7 @@ class DespachadorCampanas:
                 data=payload
             )
             
-            self.publicar(comando_integracion, topico, AvroSchema(ComandoCrearCampana))
+            self.publicar(comando_integracion, topico, AvroSchema(ComandoCrearCampana), clave=payload.id)
             
         except Exception as e:
             logger.error(f"SAGA DESPACHADOR: Error publicando comando de crear campaña: {e}")
@@ -174,7 +162,8 @@ class DespachadorCampanas:
                 data=payload
             )
             
-            self.publicar(evento_integracion, topico, AvroSchema(EventoCampanaEliminacionRequerida))
+            self.publicar(evento_integracion, topico, AvroSchema(EventoCampanaEliminacionRequerida),
+                         clave=payload.campana_id)
             
         except Exception as e:
             logger.error(f"SAGA DESPACHADOR: Error publicando evento de eliminación: {e}")
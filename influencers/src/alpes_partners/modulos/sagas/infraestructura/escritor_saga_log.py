@@ -0,0 +1,179 @@
+"""
+Escritura diferida (write-behind) del saga log.
+
+Los coordinadores encolan entradas desde cualquier hilo y un hilo escritor las
+confirma en lotes con un único INSERT multi-fila cada ``intervalo_ms`` o cada
+``max_filas`` entradas (group commit). Las entradas síncronas adelantan el lote
+en curso y bloquean al llamador hasta que se confirma; las asíncronas retornan
+de inmediato.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Tuple
+
+from ....config.settings import settings
+from ..dominio.entidades import SagaLog
+from .repositorio_saga_log import insertar_ignorando_duplicados, valores_saga_log
+
+logger = logging.getLogger(__name__)
+
+
+class EscritorSagaLog:
+    """Agrupa las entradas del saga log de todas las sagas y las confirma en lotes."""
+
+    def __init__(self,
+                 fabrica_sesion: Optional[Callable] = None,
+                 intervalo_ms: int = 50,
+                 max_filas: int = 200,
+                 reintentos: int = 3,
+                 timeout_sincrono_segundos: float = 30):
+        if fabrica_sesion is None:
+            from ....seedwork.infraestructura.database import SessionLocal
+            fabrica_sesion = SessionLocal
+        self._fabrica_sesion = fabrica_sesion
+        self._intervalo_segundos = intervalo_ms / 1000.0
+        self._max_filas = max_filas
+        self._reintentos = reintentos
+        self._timeout_sincrono_segundos = timeout_sincrono_segundos
+
+        self._pendientes: List[Tuple[dict, Future, bool]] = []
+        self._sincronos_pendientes = 0
+        self._en_escritura = 0
+        self._condicion = threading.Condition()
+        self._detenido = False
+        self._hilo: Optional[threading.Thread] = None
+
+    def iniciar(self):
+        with self._condicion:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._ejecutar, daemon=True, name='escritor-saga-log')
+                self._hilo.start()
+        return self
+
+    def agregar(self, saga_log: SagaLog, sincrono: bool = False) -> Optional[bool]:
+        """
+        Encola la entrada. En modo síncrono espera la confirmación del lote y retorna
+        True si el paso es nuevo o False si ya estaba registrado; en modo asíncrono
+        retorna None.
+        """
+        futuro = self.encolar(saga_log, sincrono=sincrono)
+        if not sincrono:
+            return None
+        return futuro.result(timeout=self._timeout_sincrono_segundos)
+
+    def encolar(self, saga_log: SagaLog, sincrono: bool = False) -> Future:
+        futuro: Future = Future()
+        with self._condicion:
+            if self._detenido:
+                raise RuntimeError("El escritor del saga log está detenido")
+            self._pendientes.append((valores_saga_log(saga_log), futuro, sincrono))
+            if sincrono:
+                self._sincronos_pendientes += 1
+            self._condicion.notify_all()
+        if self._hilo is None:
+            self.iniciar()
+        return futuro
+
+    def vaciar(self, timeout: Optional[float] = None) -> bool:
+        """Espera a que se confirmen todas las entradas encoladas hasta el momento."""
+        limite = None if timeout is None else time.monotonic() + timeout
+        with self._condicion:
+            # Adelanta el lote en curso como si hubiera una entrada síncrona
+            self._sincronos_pendientes += 1
+            self._condicion.notify_all()
+            try:
+                while self._pendientes or self._en_escritura:
+                    restante = None if limite is None else limite - time.monotonic()
+                    if restante is not None and restante <= 0:
+                        return False
+                    self._condicion.wait(restante)
+                return True
+            finally:
+                self._sincronos_pendientes -= 1
+
+    def detener(self, timeout: float = 30):
+        self.vaciar(timeout=timeout)
+        with self._condicion:
+            self._detenido = True
+            self._condicion.notify_all()
+        if self._hilo is not None:
+            self._hilo.join(timeout=timeout)
+
+    def _tomar_lote(self) -> List[Tuple[dict, Future, bool]]:
+        with self._condicion:
+            while not self._pendientes and not self._detenido:
+                self._condicion.wait()
+
+            # Espera a completar el lote salvo que haya una entrada síncrona esperando
+            limite = time.monotonic() + self._intervalo_segundos
+            while (len(self._pendientes) < self._max_filas and not self._sincronos_pendientes
+                   and not self._detenido):
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                self._condicion.wait(restante)
+
+            lote = self._pendientes[:self._max_filas]
+            del self._pendientes[:self._max_filas]
+            self._sincronos_pendientes -= sum(1 for _, _, sincrono in lote if sincrono)
+            self._en_escritura = len(lote)
+            return lote
+
+    def _ejecutar(self):
+        logger.info("SAGA LOG: Escritor diferido iniciado")
+        while True:
+            lote = self._tomar_lote()
+            if not lote:
+                break
+            try:
+                self._escribir(lote)
+            finally:
+                with self._condicion:
+                    self._en_escritura = 0
+                    self._condicion.notify_all()
+        logger.info("SAGA LOG: Escritor diferido detenido")
+
+    def _escribir(self, lote: List[Tuple[dict, Future, bool]]):
+        filas = [fila for fila, _, _ in lote]
+        for intento in range(1, self._reintentos + 1):
+            sesion = self._fabrica_sesion()
+            try:
+                insertados = insertar_ignorando_duplicados(sesion, filas)
+                sesion.commit()
+                break
+            except Exception as e:
+                sesion.rollback()
+                logger.error(f"SAGA LOG: Error escribiendo lote de {len(filas)} entradas (intento {intento}): {e}")
+                if intento == self._reintentos:
+                    for _, futuro, _ in lote:
+                        futuro.set_exception(e)
+                    return
+                time.sleep(0.1 * intento)
+            finally:
+                sesion.close()
+
+        logger.debug(f"SAGA LOG: Lote confirmado - {len(insertados)}/{len(filas)} entradas nuevas")
+        for fila, futuro, _ in lote:
+            futuro.set_result(fila['id'] in insertados)
+
+
+_escritor: Optional[EscritorSagaLog] = None
+_escritor_lock = threading.Lock()
+
+
+def escritor_saga_log() -> EscritorSagaLog:
+    """Escritor diferido global del proceso."""
+    global _escritor
+    if _escritor is None:
+        with _escritor_lock:
+            if _escritor is None:
+                _escritor = EscritorSagaLog(
+                    intervalo_ms=settings.saga_log_intervalo_ms,
+                    max_filas=settings.saga_log_max_filas,
+                ).iniciar()
+                atexit.register(_escritor.detener)
+    return _escritor
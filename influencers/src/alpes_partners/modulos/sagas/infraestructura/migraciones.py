@@ -3,8 +3,11 @@ Script para crear las tablas necesarias para el saga log.
 Ejecutar este script una vez para inicializar la base de datos.
 """
 
-from sqlalchemy import create_engine, text
-from .repositorio_saga_log import Base, SagaLogModelo
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.orm import Session
+from .repositorio_saga_log import (
+    Base, SagaLogModelo, SagaEstadoModelo, SagaLogEsquemaModelo, SagaResumenModelo, actualizar_estados
+)
 import logging
 
 logger = logging.getLogger(__name__)
@@ -37,7 +40,128 @@ def crear_tabla_saga_logs(database_url: str = None):
         logger.error(f"SAGA MIGRATION: Error creando tabla saga_logs: {e}")
         raise
 
+def agregar_restriccion_unica_saga_logs(database_url: str = None):
+    """
+    Aplicar la restricción única (id_correlacion, evento_tipo, paso_index) a una tabla
+    saga_logs existente, eliminando antes los pasos duplicados.
+    """
+    
+    if not database_url:
+        database_url = "sqlite:///saga_logs.db"
+    
+    try:
+        logger.info(f"SAGA MIGRATION: Conectando a la base de datos: {database_url}")
+        engine = create_engine(database_url)
+        
+        with engine.begin() as conn:
+            eliminados = conn.execute(text(
+                "DELETE FROM saga_logs WHERE paso_index IS NOT NULL AND id NOT IN ("
+                "SELECT MIN(id) FROM saga_logs WHERE paso_index IS NOT NULL "
+                "GROUP BY id_correlacion, evento_tipo, paso_index)"
+            )).rowcount
+            logger.info(f"SAGA MIGRATION: {eliminados} entradas duplicadas eliminadas")
+            
+            conn.execute(text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS uq_saga_logs_paso "
+                "ON saga_logs (id_correlacion, evento_tipo, paso_index)"
+            ))
+        
+        logger.info("SAGA MIGRATION: Restricción única uq_saga_logs_paso aplicada")
+        
+    except Exception as e:
+        logger.error(f"SAGA MIGRATION: Error aplicando restricción única: {e}")
+        raise
+
+def agregar_columnas_fecha_limite(database_url: str = None):
+    """Agregar la columna fecha_limite a saga_logs y saga_estado en tablas existentes."""
+    
+    if not database_url:
+        database_url = "sqlite:///saga_logs.db"
+    
+    engine = create_engine(database_url)
+    for tabla in ('saga_logs', 'saga_estado'):
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {tabla} ADD COLUMN fecha_limite TIMESTAMP"))
+            logger.info(f"SAGA MIGRATION: Columna fecha_limite agregada a {tabla}")
+        except Exception as e:
+            # La columna ya existe (o la tabla se creará con ella)
+            logger.info(f"SAGA MIGRATION: fecha_limite no agregada a {tabla}: {e}")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_saga_estado_plazos ON saga_estado (estado, fecha_limite)"
+        ))
+
+
+def poblar_saga_estado(database_url: str = None, tamano_lote: int = 1000):
+    """Construir la proyección saga_estado a partir de las entradas existentes de saga_logs."""
+    
+    if not database_url:
+        database_url = "sqlite:///saga_logs.db"
+    
+    try:
+        logger.info(f"SAGA MIGRATION: Conectando a la base de datos: {database_url}")
+        engine = create_engine(database_url)
+        Base.metadata.create_all(engine, tables=[SagaEstadoModelo.__table__])
+        
+        columnas = [c for c in SagaLogModelo.__table__.columns]
+        consulta = select(*columnas).order_by(SagaLogModelo.id_correlacion, SagaLogModelo.fecha_procesamiento)
+        total = 0
+        with Session(engine) as sesion:
+            sesion.execute(SagaEstadoModelo.__table__.delete())
+            resultado = sesion.execute(consulta.execution_options(yield_per=tamano_lote)).mappings()
+            for lote in resultado.partitions():
+                actualizar_estados(sesion, [dict(fila) for fila in lote])
+                total += len(lote)
+            sesion.commit()
+        
+        logger.info(f"SAGA MIGRATION: saga_estado poblada desde {total} entradas de saga_logs")
+        
+    except Exception as e:
+        logger.error(f"SAGA MIGRATION: Error poblando saga_estado: {e}")
+        raise
+
+def crear_tabla_saga_resumen(database_url: str = None):
+    """Crear saga_resumen y los índices que usan la compactación y la paginación del log."""
+    
+    if not database_url:
+        database_url = "sqlite:///saga_logs.db"
+    
+    engine = create_engine(database_url)
+    Base.metadata.create_all(engine, tables=[SagaResumenModelo.__table__])
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_saga_estado_terminadas ON saga_estado (estado, fecha_fin)"
+        ))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_saga_logs_fecha_procesamiento ON saga_logs (fecha_procesamiento, id)"
+        ))
+    logger.info("SAGA MIGRATION: Tabla saga_resumen e índices de retención creados")
+
+def agregar_codec_binario_saga_logs(database_url: str = None):
+    """Agregar la columna evento_datos_binario a saga_logs y crear saga_log_esquemas."""
+    
+    if not database_url:
+        database_url = "sqlite:///saga_logs.db"
+    
+    engine = create_engine(database_url)
+    tipo = "BYTEA" if engine.dialect.name == 'postgresql' else "BLOB"
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE saga_logs ADD COLUMN evento_datos_binario {tipo}"))
+        logger.info("SAGA MIGRATION: Columna evento_datos_binario agregada a saga_logs")
+    except Exception as e:
+        # La columna ya existe (o la tabla se creará con ella)
+        logger.info(f"SAGA MIGRATION: evento_datos_binario no agregada a saga_logs: {e}")
+    Base.metadata.create_all(engine, tables=[SagaLogEsquemaModelo.__table__])
+    logger.info("SAGA MIGRATION: Tabla saga_log_esquemas creada")
+
 if __name__ == "__main__":
     # Ejecutar migración
     logging.basicConfig(level=logging.INFO)
     crear_tabla_saga_logs()
+    agregar_restriccion_unica_saga_logs()
+    agregar_columnas_fecha_limite()
+    poblar_saga_estado()
+    crear_tabla_saga_resumen()
+    agregar_codec_binario_saga_logs()
@@ -1,12 +1,17 @@
-from typing import List, Optional
-from sqlalchemy import Column, String, DateTime, Text, Integer
+from datetime import datetime
+from typing import Iterator, List, Optional, Set, Tuple
+from sqlalchemy import (
+    BigInteger, Column, String, DateTime, LargeBinary, Text, Index, Integer, UniqueConstraint, func, insert, select
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-import json
 import logging
 
 from ....seedwork.infraestructura.uow import UnidadTrabajoPuerto
 from ..dominio.repositorios import RepositorioSagaLog
-from ..dominio.entidades import SagaLog
+from ..dominio.entidades import SagaLog, SagaEstado, SagaResumen, EstadoSaga, ESTADOS_TERMINADOS
+from .codec_saga_log import CodecAvro, CodecSagaLog, codec_saga_log, datos_de_fila
 
 # Usar la misma Base que los modelos de influencers para creación automática
 from ...influencers.infraestructura.modelos import Base
@@ -24,11 +29,265 @@ class SagaLogModelo(Base):
     id = Column(String, primary_key=True)
     id_correlacion = Column(String, nullable=False, index=True)
     evento_tipo = Column(String, nullable=False)
-    evento_datos = Column(Text, nullable=False)  # JSON serializado
+    evento_datos = Column(Text, nullable=False)  # JSON serializado; vacío si se usa el codec binario
+    evento_datos_binario = Column(LargeBinary, nullable=True)  # Id de esquema + registro Avro
     paso_index = Column(Integer, nullable=True)
     fecha_procesamiento = Column(DateTime, nullable=False)
+    fecha_limite = Column(DateTime, nullable=True)
     fecha_creacion = Column(DateTime, nullable=False)
     fecha_actualizacion = Column(DateTime, nullable=False)
+    
+    __table_args__ = (
+        # Un paso se registra una sola vez por saga
+        UniqueConstraint('id_correlacion', 'evento_tipo', 'paso_index', name='uq_saga_logs_paso'),
+        # Paginación de obtener_todos por (fecha_procesamiento, id)
+        Index('ix_saga_logs_fecha_procesamiento', 'fecha_procesamiento', 'id'),
+    )
+
+
+class SagaEstadoModelo(Base):
+    """Proyección con el estado actual de cada saga, mantenida junto con saga_logs."""
+    __tablename__ = 'saga_estado'
+    
+    id_correlacion = Column(String, primary_key=True)
+    estado = Column(String, nullable=False, index=True)
+    paso_actual = Column(Integer, nullable=True)
+    ultimo_evento = Column(String, nullable=True)
+    influencer_id = Column(String, nullable=True)
+    influencer_nombre = Column(String, nullable=True)
+    influencer_email = Column(String, nullable=True)
+    campana_id = Column(String, nullable=True)
+    campana_nombre = Column(String, nullable=True)
+    contrato_id = Column(String, nullable=True)
+    error = Column(Text, nullable=True)
+    fecha_inicio = Column(DateTime, nullable=True)
+    fecha_actualizacion = Column(DateTime, nullable=False)
+    fecha_fin = Column(DateTime, nullable=True)
+    fecha_limite = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        # Plazos pendientes que se recargan al iniciar el planificador de timeouts
+        Index('ix_saga_estado_plazos', 'estado', 'fecha_limite'),
+        # Sagas terminadas candidatas a compactar
+        Index('ix_saga_estado_terminadas', 'estado', 'fecha_fin'),
+    )
+
+
+class SagaLogEsquemaModelo(Base):
+    """Definición de cada esquema Avro usado en ``saga_logs.evento_datos_binario``."""
+    __tablename__ = 'saga_log_esquemas'
+    
+    id = Column(BigInteger, primary_key=True, autoincrement=False)
+    definicion = Column(Text, nullable=False)  # "campo:tipo" separados por coma, en orden
+
+
+class SagaResumenModelo(Base):
+    """Resumen de una saga terminada, compactada y archivada fuera de saga_logs."""
+    __tablename__ = 'saga_resumen'
+    
+    id_correlacion = Column(String, primary_key=True)
+    estado = Column(String, nullable=False)
+    pasos = Column(Integer, nullable=False)
+    recorrido = Column(Text, nullable=False)
+    segmento = Column(String, nullable=False)
+    influencer_id = Column(String, nullable=True, index=True)
+    campana_id = Column(String, nullable=True)
+    contrato_id = Column(String, nullable=True)
+    error = Column(Text, nullable=True)
+    fecha_inicio = Column(DateTime, nullable=True)
+    fecha_fin = Column(DateTime, nullable=True, index=True)
+    fecha_compactacion = Column(DateTime, nullable=False)
+
+
+def valores_saga_log(saga_log: SagaLog, codec: Optional[CodecSagaLog] = None) -> dict:
+    """Columnas de ``saga_logs`` para una entrada del log, con el contenido en el formato del codec."""
+    return dict(
+        id=saga_log.id,
+        id_correlacion=saga_log.id_correlacion,
+        evento_tipo=saga_log.evento_tipo,
+        **(codec or codec_saga_log()).columnas(saga_log.evento_datos),
+        paso_index=saga_log.paso_index,
+        fecha_procesamiento=saga_log.fecha_procesamiento,
+        fecha_limite=saga_log.fecha_limite,
+        fecha_creacion=saga_log.fecha_creacion,
+        fecha_actualizacion=saga_log.fecha_actualizacion,
+    )
+
+
+def insertar_ignorando_duplicados(sesion: Session, filas: List[dict]) -> Set[str]:
+    """
+    Inserta las filas en una sola sentencia INSERT ... ON CONFLICT DO NOTHING y retorna
+    los ids insertados; los pasos ya registrados se omiten.
+    """
+    if not filas:
+        return set()
+    
+    registrar_esquemas(sesion, filas)
+    dialecto = sesion.get_bind().dialect.name
+    if dialecto in ('postgresql', 'sqlite'):
+        modulo_dialecto = postgresql if dialecto == 'postgresql' else sqlite
+        sentencia = (
+            modulo_dialecto.insert(SagaLogModelo)
+            .values(filas)
+            .on_conflict_do_nothing(index_elements=['id_correlacion', 'evento_tipo', 'paso_index'])
+            .returning(SagaLogModelo.id)
+        )
+        insertados = set(sesion.execute(sentencia).scalars().all())
+    else:
+        insertados = set()
+        for fila in filas:
+            try:
+                with sesion.begin_nested():
+                    sesion.execute(insert(SagaLogModelo).values(**fila))
+                insertados.add(fila['id'])
+            except IntegrityError:
+                pass
+    
+    actualizar_estados(sesion, [fila for fila in filas if fila['id'] in insertados])
+    return insertados
+
+
+def registrar_esquemas(sesion: Session, filas: List[dict]):
+    """
+    Registra en la transacción de ``sesion`` los esquemas Avro de las filas que el proceso
+    aún no vio confirmados. Un esquema se confirma cuando una escritura posterior lo
+    encuentra en la tabla, así que si la transacción se revierte se vuelve a registrar.
+    """
+    binarios = [fila['evento_datos_binario'] for fila in filas if fila.get('evento_datos_binario') is not None]
+    if not binarios:
+        return
+    codec = codec_saga_log(CodecAvro.nombre)
+    ids = codec.sin_confirmar({codec.esquema_de(valor) for valor in binarios})
+    if not ids:
+        return
+    
+    existentes = set(sesion.execute(
+        select(SagaLogEsquemaModelo.id).where(SagaLogEsquemaModelo.id.in_(ids))
+    ).scalars().all())
+    codec.confirmar(existentes)
+    nuevos = [{'id': id_esquema, 'definicion': codec.definicion(id_esquema)} for id_esquema in ids - existentes]
+    if not nuevos:
+        return
+    
+    logger.info(f"SAGA LOG: Registrando esquemas {sorted(fila['id'] for fila in nuevos)}")
+    dialecto = sesion.get_bind().dialect.name
+    if dialecto in ('postgresql', 'sqlite'):
+        modulo_dialecto = postgresql if dialecto == 'postgresql' else sqlite
+        sesion.execute(modulo_dialecto.insert(SagaLogEsquemaModelo).values(nuevos).on_conflict_do_nothing())
+        return
+    for fila in nuevos:
+        try:
+            with sesion.begin_nested():
+                sesion.execute(insert(SagaLogEsquemaModelo).values(**fila))
+        except IntegrityError:
+            pass
+
+
+def obtener_definicion_esquema(sesion: Session, id_esquema: int) -> Optional[str]:
+    return sesion.execute(
+        select(SagaLogEsquemaModelo.definicion).where(SagaLogEsquemaModelo.id == id_esquema)
+    ).scalar_one_or_none()
+
+
+def actualizar_estados(sesion: Session, filas: List[dict]):
+    """
+    Aplica a ``saga_estado`` las entradas nuevas del log con un upsert por correlación. Una
+    saga terminada (``ESTADOS_TERMINADOS``) no se modifica: las entradas que llegan tarde
+    quedan en el log, pero no reabren ni reescriben su estado.
+    """
+    por_correlacion = {}
+    for fila in filas:
+        acumulados = por_correlacion.setdefault(fila['id_correlacion'], {})
+        if acumulados.get('estado') in ESTADOS_TERMINADOS:
+            continue
+        cambios = SagaEstado.cambios(
+            fila['evento_tipo'], datos_de_fila(fila['evento_datos'], fila.get('evento_datos_binario')),
+            fila['paso_index'], fila['fecha_procesamiento'], fila.get('fecha_limite')
+        )
+        acumulados.update(SagaEstado.efectivos(cambios))
+    if not por_correlacion:
+        return
+    
+    dialecto = sesion.get_bind().dialect.name
+    if dialecto not in ('postgresql', 'sqlite'):
+        for id_correlacion, cambios in por_correlacion.items():
+            modelo = sesion.get(SagaEstadoModelo, id_correlacion) or SagaEstadoModelo(
+                id_correlacion=id_correlacion, estado=EstadoSaga.EN_CURSO.value
+            )
+            if modelo.estado in ESTADOS_TERMINADOS:
+                continue
+            for campo, valor in cambios.items():
+                setattr(modelo, campo, valor)
+            sesion.add(modelo)
+        sesion.flush()
+        return
+    
+    # Un upsert por correlación que solo sobrescribe las columnas que cambiaron, y solo si la
+    # saga no terminó
+    modulo_dialecto = postgresql if dialecto == 'postgresql' else sqlite
+    for id_correlacion, cambios in por_correlacion.items():
+        sentencia = modulo_dialecto.insert(SagaEstadoModelo).values(
+            id_correlacion=id_correlacion, **{'estado': EstadoSaga.EN_CURSO.value, **cambios}
+        )
+        sentencia = sentencia.on_conflict_do_update(
+            index_elements=['id_correlacion'],
+            set_={campo: getattr(sentencia.excluded, campo) for campo in cambios},
+            where=SagaEstadoModelo.estado.not_in(ESTADOS_TERMINADOS)
+        )
+        sesion.execute(sentencia)
+
+
+def _a_entidad(modelo: SagaLogModelo) -> SagaLog:
+    entrada = SagaLog(
+        id_correlacion=modelo.id_correlacion,
+        evento_tipo=modelo.evento_tipo,
+        evento_datos=datos_de_fila(modelo.evento_datos, modelo.evento_datos_binario, perezoso=True),
+        paso_index=modelo.paso_index,
+        fecha_procesamiento=modelo.fecha_procesamiento,
+        fecha_limite=modelo.fecha_limite
+    )
+    entrada.id = modelo.id
+    entrada.fecha_creacion = modelo.fecha_creacion
+    entrada.fecha_actualizacion = modelo.fecha_actualizacion
+    return entrada
+
+
+def _a_estado(modelo: SagaEstadoModelo) -> SagaEstado:
+    return SagaEstado(**{columna.name: getattr(modelo, columna.name) for columna in SagaEstadoModelo.__table__.columns})
+
+
+def obtener_estado_saga(sesion: Session, id_correlacion: str) -> Optional[SagaEstado]:
+    modelo = sesion.get(SagaEstadoModelo, id_correlacion)
+    return _a_estado(modelo) if modelo is not None else None
+
+
+def obtener_sagas_en_curso(sesion: Session, tamano_lote: int = 1000) -> Iterator[List[SagaEstado]]:
+    """
+    Estado de las sagas sin terminar (sin ``Fin`` ni compensación completa), en lotes de
+    ``tamano_lote`` leídos de un único cursor y ordenados por última actualización.
+    """
+    columnas = SagaEstadoModelo.__table__.columns
+    consulta = select(*columnas).where(
+        SagaEstadoModelo.estado.in_([EstadoSaga.EN_CURSO.value, EstadoSaga.COMPENSANDO.value])
+    ).order_by(SagaEstadoModelo.fecha_actualizacion).execution_options(yield_per=tamano_lote)
+    for particion in sesion.execute(consulta).partitions():
+        yield [SagaEstado(**fila._mapping) for fila in particion]
+
+
+def obtener_resumen_saga(sesion: Session, id_correlacion: str) -> Optional[SagaResumen]:
+    modelo = sesion.get(SagaResumenModelo, id_correlacion)
+    if modelo is None:
+        return None
+    return SagaResumen(**{columna.name: getattr(modelo, columna.name) for columna in SagaResumenModelo.__table__.columns})
+
+
+def contar_sagas_en_curso(sesion: Session) -> int:
+    """Sagas que aún no terminan (en curso o compensando)."""
+    return sesion.execute(
+        select(func.count()).select_from(SagaEstadoModelo).where(
+            SagaEstadoModelo.estado.in_([EstadoSaga.EN_CURSO.value, EstadoSaga.COMPENSANDO.value])
+        )
+    ).scalar_one()
 
 
 class RepositorioSagaLogSQLAlchemy(RepositorioSagaLog):
@@ -38,24 +297,28 @@ class RepositorioSagaLogSQLAlchemy(RepositorioSagaLog):
         # Sin parámetros, usa db.session directamente como en el tutorial
         pass
     
-    def agregar(self, saga_log: SagaLog):
-        """Agregar una entrada al log de saga."""
+    def agregar(self, saga_log: SagaLog) -> bool:
+        """
+        Agregar una entrada al log de saga con un único INSERT ... ON CONFLICT DO NOTHING.
+        Retorna True si la entrada es nueva y False si el paso ya estaba registrado.
+        """
         logger.info(f"SAGA LOG: Agregando entrada - Correlación: {saga_log.id_correlacion}")
         
-        saga_log_modelo = SagaLogModelo()
-        saga_log_modelo.id = saga_log.id
-        saga_log_modelo.id_correlacion = saga_log.id_correlacion
-        saga_log_modelo.evento_tipo = saga_log.evento_tipo
-        saga_log_modelo.evento_datos = json.dumps(saga_log.evento_datos)
-        saga_log_modelo.paso_index = saga_log.paso_index
-        saga_log_modelo.fecha_procesamiento = saga_log.fecha_procesamiento
-        saga_log_modelo.fecha_creacion = saga_log.fecha_creacion
-        saga_log_modelo.fecha_actualizacion = saga_log.fecha_actualizacion
+        nueva = saga_log.id in insertar_ignorando_duplicados(db.session, [valores_saga_log(saga_log)])
         
-        db.session.add(saga_log_modelo)
-        db.session.flush()
-        
-        logger.info(f"SAGA LOG: Entrada agregada exitosamente - ID: {saga_log.id}")
+        if nueva:
+            logger.info(f"SAGA LOG: Entrada agregada exitosamente - ID: {saga_log.id}")
+        else:
+            logger.info(f"SAGA LOG: Paso {saga_log.evento_tipo}/{saga_log.paso_index} ya registrado, se omite")
+        return nueva
+    
+    def obtener_estado(self, id_correlacion: str) -> Optional[SagaEstado]:
+        """Obtener el estado proyectado de una saga sin recorrer su log."""
+        return obtener_estado_saga(db.session, id_correlacion)
+    
+    def contar_en_curso(self) -> int:
+        """Cantidad de sagas en curso o compensando."""
+        return contar_sagas_en_curso(db.session)
     
     def obtener_por_correlacion(self, id_correlacion: str) -> List[SagaLog]:
         """Obtener todas las entradas de una saga por ID de correlación."""
@@ -65,19 +328,7 @@ class RepositorioSagaLogSQLAlchemy(RepositorioSagaLog):
             SagaLogModelo.id_correlacion == id_correlacion
         ).order_by(SagaLogModelo.fecha_procesamiento).all()
         
-        entradas = []
-        for modelo in modelos:
-            entrada = SagaLog(
-                id_correlacion=modelo.id_correlacion,
-                evento_tipo=modelo.evento_tipo,
-                evento_datos=json.loads(modelo.evento_datos),
-                paso_index=modelo.paso_index,
-                fecha_procesamiento=modelo.fecha_procesamiento
-            )
-            entrada.id = modelo.id
-            entrada.fecha_creacion = modelo.fecha_creacion
-            entrada.fecha_actualizacion = modelo.fecha_actualizacion
-            entradas.append(entrada)
+        entradas = [_a_entidad(modelo) for modelo in modelos]
         
         logger.info(f"SAGA LOG: Encontradas {len(entradas)} entradas")
         return entradas
@@ -91,18 +342,7 @@ class RepositorioSagaLogSQLAlchemy(RepositorioSagaLog):
         if not modelo:
             return None
         
-        entrada = SagaLog(
-            id_correlacion=modelo.id_correlacion,
-            evento_tipo=modelo.evento_tipo,
-            evento_datos=json.loads(modelo.evento_datos),
-            paso_index=modelo.paso_index,
-            fecha_procesamiento=modelo.fecha_procesamiento
-        )
-        entrada.id = modelo.id
-        entrada.fecha_creacion = modelo.fecha_creacion
-        entrada.fecha_actualizacion = modelo.fecha_actualizacion
-        
-        return entrada
+        return _a_entidad(modelo)
     
     def actualizar(self, saga_log: SagaLog):
         """Actualizar una entrada del log."""
@@ -129,30 +369,30 @@ class RepositorioSagaLogSQLAlchemy(RepositorioSagaLog):
         else:
             logger.warning(f"SAGA LOG: No se encontró entrada para eliminar - ID: {saga_log.id}")
     
-    def obtener_todos(self) -> List[SagaLog]:
-        """Obtener todas las entradas del log."""
-        logger.info("SAGA LOG: Obteniendo todas las entradas")
-        
-        modelos = db.session.query(SagaLogModelo).order_by(
-            SagaLogModelo.fecha_procesamiento.desc()
-        ).all()
+    def obtener_resumen(self, id_correlacion: str) -> Optional[SagaResumen]:
+        """Resumen de una saga terminada cuyas entradas ya se archivaron."""
+        return obtener_resumen_saga(db.session, id_correlacion)
+    
+    def obtener_todos(self, limite: int = 100, antes_de: Optional[Tuple[datetime, str]] = None) -> List[SagaLog]:
+        """
+        Obtener una página de entradas del log, de la más reciente a la más antigua. Para la
+        página siguiente se pasa en ``antes_de`` la (fecha_procesamiento, id) de la última
+        entrada recibida; la consulta recorre el índice sin ordenar la tabla completa.
+        """
+        logger.info(f"SAGA LOG: Obteniendo página de {limite} entradas")
         
-        entradas = []
-        for modelo in modelos:
-            entrada = SagaLog(
-                id_correlacion=modelo.id_correlacion,
-                evento_tipo=modelo.evento_tipo,
-                evento_datos=json.loads(modelo.evento_datos),
-                comando_tipo=modelo.comando_tipo,
-                comando_datos=json.loads(modelo.comando_datos) if modelo.comando_datos else None,
-                paso_index=modelo.paso_index,
-                estado=modelo.estado,
-                fecha_procesamiento=modelo.fecha_procesamiento
+        consulta = db.session.query(SagaLogModelo)
+        if antes_de is not None:
+            fecha, id_entrada = antes_de
+            consulta = consulta.filter(
+                (SagaLogModelo.fecha_procesamiento < fecha)
+                | ((SagaLogModelo.fecha_procesamiento == fecha) & (SagaLogModelo.id < id_entrada))
             )
-            entrada.id = modelo.id
-            entrada.fecha_creacion = modelo.fecha_creacion
-            entrada.fecha_actualizacion = modelo.fecha_actualizacion
-            entradas.append(entrada)
+        modelos = consulta.order_by(
+            SagaLogModelo.fecha_procesamiento.desc(), SagaLogModelo.id.desc()
+        ).limit(limite).all()
         
-        logger.info(f"SAGA LOG: Encontradas {len(entradas)} entradas totales")
-        return entradas
\ No newline at end of file
+        entradas = [_a_entidad(modelo) for modelo in modelos]
+        
+        logger.info(f"SAGA LOG: Encontradas {len(entradas)} entradas")
+        return entradas
@@ -0,0 +1,213 @@
+"""
+Retención del saga log: compactación y archivo de sagas terminadas.
+
+Las sagas que terminaron (completadas, compensadas o fallidas) hace más de
+``retencion`` se compactan en lotes: sus entradas de ``saga_logs`` se escriben en
+segmentos JSONL comprimidos con gzip (solo se agregan datos, nunca se reescriben),
+se reemplazan por una fila en ``saga_resumen`` y se eliminan junto con su fila de
+``saga_estado``. Así las tablas calientes solo contienen las sagas recientes.
+
+El segmento se sincroniza a disco antes de confirmar el borrado. Si la transacción
+falla después de escribirlo, las entradas se vuelven a archivar en la siguiente
+pasada, por lo que un segmento puede repetir entradas (se identifican por ``id``).
+"""
+
+import gzip
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from ....config.settings import settings
+from ..dominio.entidades import ESTADOS_TERMINADOS
+from .codec_saga_log import datos_de_fila
+from .repositorio_saga_log import SagaEstadoModelo, SagaLogModelo, SagaResumenModelo
+
+logger = logging.getLogger(__name__)
+
+def _serializable(valor):
+    return valor.isoformat() if isinstance(valor, datetime) else valor
+
+
+class ArchivoSagaLog:
+    """
+    Segmentos ``saga_logs-<fecha>.jsonl.gz`` en un directorio local. Cada escritura agrega un
+    miembro gzip al segmento vigente y se rota a uno nuevo al superar ``max_bytes_segmento``.
+    """
+
+    def __init__(self, directorio: str, max_bytes_segmento: int = 64 * 1024 * 1024):
+        self.directorio = directorio
+        self._max_bytes_segmento = max_bytes_segmento
+        self._lock = threading.Lock()
+        os.makedirs(directorio, exist_ok=True)
+        existentes = self.segmentos()
+        self._segmento: Optional[str] = existentes[-1] if existentes else None
+
+    def segmentos(self) -> List[str]:
+        return sorted(nombre for nombre in os.listdir(self.directorio) if nombre.endswith('.jsonl.gz'))
+
+    def _segmento_vigente(self) -> str:
+        if self._segmento is not None:
+            ruta = os.path.join(self.directorio, self._segmento)
+            if os.path.getsize(ruta) < self._max_bytes_segmento:
+                return self._segmento
+        nombre = f"saga_logs-{datetime.utcnow():%Y%m%dT%H%M%S%f}.jsonl.gz"
+        self._segmento = nombre
+        return nombre
+
+    def escribir(self, registros: Iterable[Dict]) -> str:
+        """Agrega los registros al segmento vigente, sincroniza a disco y retorna su nombre."""
+        contenido = ''.join(
+            json.dumps({clave: _serializable(valor) for clave, valor in registro.items()}, ensure_ascii=False) + '\n'
+            for registro in registros
+        ).encode('utf-8')
+        with self._lock:
+            segmento = self._segmento_vigente()
+            with open(os.path.join(self.directorio, segmento), 'ab') as archivo:
+                archivo.write(gzip.compress(contenido))
+                archivo.flush()
+                os.fsync(archivo.fileno())
+            return segmento
+
+    def leer(self, segmento: str, id_correlacion: Optional[str] = None) -> Iterator[Dict]:
+        """Entradas archivadas de un segmento, opcionalmente solo las de una saga."""
+        with gzip.open(os.path.join(self.directorio, segmento), 'rt', encoding='utf-8') as archivo:
+            for linea in archivo:
+                registro = json.loads(linea)
+                if id_correlacion is None or registro['id_correlacion'] == id_correlacion:
+                    yield registro
+
+
+def compactar_lote(sesion: Session, archivo: ArchivoSagaLog, corte: datetime, tamano_lote: int = 500) -> int:
+    """
+    Compacta hasta ``tamano_lote`` sagas terminadas antes de ``corte`` y retorna cuántas.
+    Las sagas se eligen por el índice (estado, fecha_fin) y sus entradas por id_correlacion.
+    """
+    consulta = (
+        select(SagaEstadoModelo)
+        .where(SagaEstadoModelo.estado.in_(ESTADOS_TERMINADOS), SagaEstadoModelo.fecha_fin < corte)
+        .order_by(SagaEstadoModelo.fecha_fin)
+        .limit(tamano_lote)
+    )
+    if sesion.get_bind().dialect.name == 'postgresql':
+        # Varias réplicas pueden compactar a la vez sin tomar las mismas sagas
+        consulta = consulta.with_for_update(skip_locked=True)
+    estados = sesion.execute(consulta).scalars().all()
+    if not estados:
+        return 0
+
+    ids = [estado.id_correlacion for estado in estados]
+    columnas = SagaLogModelo.__table__.columns
+    filas = sesion.execute(
+        select(*columnas)
+        .where(SagaLogModelo.id_correlacion.in_(ids))
+        .order_by(SagaLogModelo.id_correlacion, SagaLogModelo.fecha_procesamiento)
+    ).mappings().all()
+
+    # El archivo guarda el contenido como JSON sin importar el codec de la fila
+    registros = [
+        {**{clave: valor for clave, valor in fila.items() if clave != 'evento_datos_binario'},
+         'evento_datos': datos_de_fila(fila['evento_datos'], fila['evento_datos_binario'])}
+        for fila in filas
+    ]
+    segmento = archivo.escribir(registros) if registros else ''
+
+    recorridos: Dict[str, List[str]] = {}
+    for fila in filas:
+        recorridos.setdefault(fila['id_correlacion'], []).append(f"{fila['paso_index']}:{fila['evento_tipo']}")
+
+    ahora = datetime.utcnow()
+    sesion.execute(delete(SagaResumenModelo).where(SagaResumenModelo.id_correlacion.in_(ids)))
+    sesion.add_all([
+        SagaResumenModelo(
+            id_correlacion=estado.id_correlacion,
+            estado=estado.estado,
+            pasos=len(recorridos.get(estado.id_correlacion, [])),
+            recorrido=' '.join(recorridos.get(estado.id_correlacion, [])),
+            segmento=segmento,
+            influencer_id=estado.influencer_id,
+            campana_id=estado.campana_id,
+            contrato_id=estado.contrato_id,
+            error=estado.error,
+            fecha_inicio=estado.fecha_inicio,
+            fecha_fin=estado.fecha_fin,
+            fecha_compactacion=ahora,
+        )
+        for estado in estados
+    ])
+    sesion.execute(delete(SagaLogModelo).where(SagaLogModelo.id_correlacion.in_(ids)))
+    sesion.execute(delete(SagaEstadoModelo).where(SagaEstadoModelo.id_correlacion.in_(ids)))
+    sesion.commit()
+
+    logger.info(f"SAGA LOG: {len(ids)} sagas compactadas, {len(filas)} entradas archivadas en {segmento or '-'}")
+    return len(ids)
+
+
+class CompactadorSagaLog:
+    """Compacta en lotes las sagas terminadas con más antigüedad que ``retencion``."""
+
+    def __init__(self,
+                 archivo: ArchivoSagaLog,
+                 retencion: timedelta,
+                 fabrica_sesion: Optional[Callable] = None,
+                 tamano_lote: int = 500,
+                 intervalo_segundos: float = 3600):
+        if fabrica_sesion is None:
+            from ....seedwork.infraestructura.database import SessionLocal
+            fabrica_sesion = SessionLocal
+        self._archivo = archivo
+        self._retencion = retencion
+        self._fabrica_sesion = fabrica_sesion
+        self._tamano_lote = tamano_lote
+        self._intervalo_segundos = intervalo_segundos
+        self._detener = threading.Event()
+
+    def compactar(self, ahora: Optional[datetime] = None) -> int:
+        """Compacta todas las sagas vencidas, lote a lote; retorna el total."""
+        corte = (ahora or datetime.utcnow()) - self._retencion
+        total = 0
+        while not self._detener.is_set():
+            with self._fabrica_sesion() as sesion:
+                try:
+                    compactadas = compactar_lote(sesion, self._archivo, corte, self._tamano_lote)
+                except Exception:
+                    sesion.rollback()
+                    raise
+            total += compactadas
+            if compactadas < self._tamano_lote:
+                break
+        return total
+
+    def ejecutar(self):
+        logger.info("SAGA LOG: Compactador iniciado")
+        while not self._detener.is_set():
+            try:
+                self.compactar()
+            except Exception as e:
+                logger.error(f"SAGA LOG: Error compactando saga log: {e}")
+            self._detener.wait(self._intervalo_segundos)
+        logger.info("SAGA LOG: Compactador detenido")
+
+    def detener(self):
+        self._detener.set()
+
+
+def iniciar_compactacion_saga_log() -> Optional[threading.Thread]:
+    """Inicia el compactador en un hilo daemon si la retención está habilitada."""
+    if settings.saga_retencion_dias <= 0:
+        return None
+    compactador = CompactadorSagaLog(
+        archivo=ArchivoSagaLog(settings.saga_archivo_directorio,
+                               max_bytes_segmento=settings.saga_archivo_segmento_max_mb * 1024 * 1024),
+        retencion=timedelta(days=settings.saga_retencion_dias),
+        tamano_lote=settings.saga_compactacion_tamano_lote,
+        intervalo_segundos=settings.saga_compactacion_intervalo_segundos,
+    )
+    hilo = threading.Thread(target=compactador.ejecutar, daemon=True, name='compactador-saga-log')
+    hilo.start()
+    return hilo
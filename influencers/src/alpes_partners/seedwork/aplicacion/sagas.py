@@ -1,11 +1,22 @@
 from abc import ABC, abstractmethod
 from alpes_partners.seedwork.aplicacion.comandos import Comando
 from alpes_partners.seedwork.dominio.eventos import EventoDominio
+from collections import OrderedDict
+from concurrent.futures import Executor
+from contextlib import contextmanager
 from dataclasses import dataclass
+from typing import AbstractSet, Callable, Dict, FrozenSet, Iterable, Iterator, List, Optional, Set, Tuple
 from .comandos import ejecutar_commando
+import contextvars
+import heapq
+import logging
+import threading
+import time
 import uuid
 import datetime
 
+logger = logging.getLogger(__name__)
+
 class CoordinadorSaga(ABC):
     id_correlacion: uuid.UUID
 
@@ -45,6 +56,8 @@ class Paso():
 @dataclass
 class Inicio(Paso):
     index: int = 0
+    evento: Optional[type] = None  # Evento que abre la saga y dispara el comando del paso siguiente
+    compensacion: Optional[type] = None  # Deshace el efecto del evento de inicio
 
 @dataclass
 class Fin(Paso):
@@ -58,34 +71,466 @@ class Transaccion(Paso):
     error: EventoDominio
     compensacion: Comando
     exitosa: bool = False
+    timeout: Optional[float] = None  # Segundos para recibir el evento del paso; None sin plazo
+    depende_de: Optional[Tuple[int, ...]] = None  # Pasos que deben completarse antes; None es el paso anterior
+
+class TablaDespacho:
+    """
+    Tablas de búsqueda compiladas una sola vez a partir de los pasos de una saga:
+    tipo de evento -> paso, paso -> pasos que desbloquea y error -> cadena de compensación.
+
+    Los pasos forman un grafo acíclico: cada ``Transaccion`` declara en ``depende_de``
+    los pasos que deben completarse antes de enviar su comando (por defecto, el paso
+    anterior), y ``Fin`` espera a todos los pasos de los que no depende ningún otro.
+    Los pasos sin dependencia entre sí se envían a la vez.
+
+    La cadena de compensación es una secuencia de etapas que deshace solo los pasos
+    completados, del nivel más profundo del grafo al inicio. Los pasos de un mismo nivel
+    no dependen entre sí y forman una etapa; las etapas consecutivas cuyas compensaciones
+    pertenecen a un mismo grupo de ``grupos_paralelos`` también se unen. Las
+    compensaciones de una etapa pueden ejecutarse en paralelo.
+    """
+
+    def __init__(self, pasos: List[Paso], grupos_paralelos: Iterable[Iterable[type]] = ()):
+        self.pasos: Tuple[Paso, ...] = tuple(pasos)
+        self.paso_por_evento: Dict[type, int] = {}
+        self.paso_por_error: Dict[type, int] = {}
+        self.dependencias: Dict[int, FrozenSet[int]] = {}
+        self.ancestros: Dict[int, FrozenSet[int]] = {}
+        self.siguientes: Dict[int, Tuple[int, ...]] = {}
+        self.siguiente_comando: Dict[int, Optional[type]] = {}
+        self.compensaciones: Dict[int, Tuple[Tuple[type, ...], ...]] = {}
+        self._grupo: Dict[type, int] = {
+            tipo: n for n, grupo in enumerate(grupos_paralelos) for tipo in grupo
+        }
+        self._resueltos: Dict[type, Tuple[int, bool]] = {}
+        self._cadenas: Dict[FrozenSet[int], Tuple[Tuple[type, ...], ...]] = {}
+
+        transacciones = [i for i, paso in enumerate(self.pasos) if isinstance(paso, Transaccion)]
+        if not transacciones:
+            raise ValueError("La saga no tiene transacciones")
+        self.ultima_transaccion = transacciones[-1]
+
+        for i, paso in enumerate(self.pasos):
+            self._registrar(self.paso_por_evento, getattr(paso, 'evento', None), i)
+            self._registrar(self.paso_por_error, getattr(paso, 'error', None), i)
+            self.dependencias[i] = self._dependencias(i, paso)
+            self.ancestros[i] = self.dependencias[i].union(*(self.ancestros[d] for d in self.dependencias[i]))
+
+        # Nivel de cada paso: longitud del camino más largo desde el inicio
+        self.nivel: Dict[int, int] = {}
+        for i in range(len(self.pasos)):
+            self.nivel[i] = 1 + max((self.nivel[d] for d in self.dependencias[i]), default=-1)
+
+        self.lineal = all(self.dependencias[i] == (frozenset({i - 1}) if i else frozenset())
+                          for i in range(len(self.pasos)))
+        self.fin = next((i for i, paso in enumerate(self.pasos) if isinstance(paso, Fin)), None)
+
+        for i in range(len(self.pasos)):
+            self.siguientes[i] = tuple(
+                j for j in transacciones if i in self.dependencias[j]
+            )
+            siguiente = self.pasos[self.siguientes[i][0]] if len(self.siguientes[i]) == 1 else None
+            self.siguiente_comando[i] = getattr(siguiente, 'comando', None)
+            # Al fallar un paso, sus ancestros ya están confirmados
+            self.compensaciones[i] = self.compensaciones_para(self.ancestros[i])
+
+    def _dependencias(self, i: int, paso: Paso) -> FrozenSet[int]:
+        if isinstance(paso, Inicio):
+            return frozenset()
+        if isinstance(paso, Fin):
+            # Se une a todos los pasos anteriores de los que no depende ningún otro
+            requeridos = set(range(i))
+            for j in range(i):
+                requeridos -= self.dependencias[j]
+            return frozenset(requeridos)
+        depende_de = getattr(paso, 'depende_de', None)
+        dependencias = frozenset(depende_de if depende_de is not None else ([i - 1] if i else []))
+        if any(d < 0 or d >= i for d in dependencias):
+            raise ValueError(f"El paso {i} solo puede depender de pasos anteriores: {sorted(dependencias)}")
+        return dependencias
+
+    def compensaciones_para(self, completados: AbstractSet[int]) -> Tuple[Tuple[type, ...], ...]:
+        """Cadena de compensación de los pasos completados; se calcula una vez por combinación."""
+        clave = frozenset(completados)
+        cadena = self._cadenas.get(clave)
+        if cadena is None:
+            niveles: Dict[int, List[type]] = {}
+            for i in sorted(clave, reverse=True):
+                compensacion = getattr(self.pasos[i], 'compensacion', None)
+                if compensacion is not None:
+                    niveles.setdefault(self.nivel[i], []).append(compensacion)
+            cadena = self._etapas([niveles[n] for n in sorted(niveles, reverse=True)])
+            self._cadenas[clave] = cadena
+        return cadena
+
+    def _etapas(self, niveles: List[List[type]]) -> Tuple[Tuple[type, ...], ...]:
+        etapas: List[List[type]] = []
+        for nivel in niveles:
+            grupos = {self._grupo.get(tipo) for tipo in nivel}
+            if (etapas and len(grupos) == 1 and None not in grupos
+                    and {self._grupo.get(tipo) for tipo in etapas[-1]} == grupos):
+                etapas[-1].extend(nivel)
+            else:
+                etapas.append(list(nivel))
+        return tuple(tuple(etapa) for etapa in etapas)
+
+    def _registrar(self, tabla: Dict[type, int], tipo: Optional[type], index: int):
+        if tipo is None:
+            return
+        if tipo in self.paso_por_evento or tipo in self.paso_por_error:
+            raise ValueError(f"El evento {tipo.__name__} está asociado a más de un paso")
+        tabla[tipo] = index
+
+    def resolver(self, tipo_evento: type) -> Tuple[int, bool]:
+        """Índice del paso y si el evento es su error. Las subclases se resuelven por MRO una vez."""
+        resuelto = self._resueltos.get(tipo_evento)
+        if resuelto is not None:
+            return resuelto
+
+        for tipo in tipo_evento.__mro__:
+            if tipo in self.paso_por_error:
+                resuelto = (self.paso_por_error[tipo], True)
+                break
+            if tipo in self.paso_por_evento:
+                resuelto = (self.paso_por_evento[tipo], False)
+                break
+        else:
+            raise ValueError(f"El evento {tipo_evento.__name__} no hace parte de la saga")
+        self._resueltos[tipo_evento] = resuelto
+        return resuelto
+
+    def listos(self, index: int, completados: AbstractSet[int]) -> List[int]:
+        """Pasos que quedan listos para enviar su comando al completarse ``index``."""
+        return [j for j in self.siguientes[index] if self.dependencias[j] <= completados]
+
+    def completa(self, completados: AbstractSet[int]) -> bool:
+        """True si los pasos completados cubren todo lo que espera ``Fin``."""
+        if self.fin is None:
+            return self.ultima_transaccion in completados
+        return self.dependencias[self.fin] <= completados
+
+    def es_ultima_transaccion(self, index: int) -> bool:
+        return index == self.ultima_transaccion
 
-class CoordinadorCoreografia(CoordinadorSaga, ABC):
-    # TODO Piense como podemos hacer un Coordinador con coreografía y Sagas
-    # Piense en como se tiene la clase Transaccion, donde se cuenta con un atributo de compensación
-    # ¿Tal vez un manejo de tuplas o diccionarios?
-    ...
 
 class CoordinadorOrquestacion(CoordinadorSaga, ABC):
-    pasos: list[Paso]
+    """
+    Orquestador declarativo: las subclases definen ``pasos`` como atributo de clase y
+    la tabla de despacho se compila la primera vez que se usa.
+    """
+    pasos: List[Paso]
+    # Compensaciones independientes entre sí que pueden ejecutarse en paralelo
+    compensaciones_paralelas: List[Tuple[type, ...]] = []
     index: int
-    
+
+    @classmethod
+    def tabla_despacho(cls) -> TablaDespacho:
+        tabla = cls.__dict__.get('_tabla_despacho')
+        if tabla is None:
+            tabla = TablaDespacho(cls.pasos, cls.compensaciones_paralelas)
+            cls._tabla_despacho = tabla
+        return tabla
+
+    def inicializar_pasos(self):
+        self.despacho = self.tabla_despacho()
+        # Pasos cuyo evento ya llegó y pasos cuyo comando ya se envió
+        self.completados = set()
+        self.emitidos = set()
+
+    def marcar_completados(self, indices: Iterable[int]):
+        """Restaura pasos completados; los pasos que ya estaban listos se dan por enviados."""
+        self.completados.update(indices)
+        self.emitidos.update(
+            index for index, paso in enumerate(self.despacho.pasos)
+            if isinstance(paso, Transaccion) and self.despacho.dependencias[index] <= self.completados
+        )
+
     def obtener_paso_dado_un_evento(self, evento: EventoDominio):
-        for i, paso in enumerate(self.pasos):
-            if not isinstance(paso, Transaccion):
-                continue
+        index, _ = self.despacho.resolver(type(evento))
+        return self.pasos[index], index
 
-            if isinstance(evento, paso.evento) or isinstance(evento, paso.error):
-                return paso, i
-        raise Exception("Evento no hace parte de la transacción")
-                
     def es_ultima_transaccion(self, index):
-        return len(self.pasos) - 1
+        return self.despacho.es_ultima_transaccion(index)
+
+    def compensar(self, evento: EventoDominio, index: int):
+        for etapa in self.despacho.compensaciones_para(self.completados | self.despacho.ancestros[index]):
+            for tipo_comando in etapa:
+                self.publicar_comando(evento, tipo_comando)
+
+    def procesar_evento(self, evento: EventoDominio):
+        index, es_error = self.despacho.resolver(type(evento))
+        if es_error:
+            self.compensar(evento, index)
+            return
+        self.completados.add(index)
+        if self.despacho.completa(self.completados):
+            self.terminar()
+            return
+        # Todos los pasos que quedaron listos se envían sin esperar la respuesta de los otros
+        for siguiente in self.despacho.listos(index, self.completados):
+            if siguiente not in self.emitidos:
+                self.emitidos.add(siguiente)
+                self.publicar_comando(evento, self.despacho.pasos[siguiente].comando)
+
+
+class CoordinadorCoreografia(CoordinadorSaga, ABC):
+    """
+    Saga por coreografía: cada servicio reacciona directamente al evento del paso anterior
+    y agrega al sobre del mensaje la compensación que deshace su paso. El coordinador no
+    envía comandos del flujo; registra el avance y, ante un evento de error, ejecuta en
+    orden inverso las compensaciones que trae el sobre.
+    """
+    pasos: List[Paso]
+    # Nombre del comando de compensación en el sobre -> tipo del comando
+    comandos_compensacion: Dict[str, type] = {}
+
+    @classmethod
+    def tabla_despacho(cls) -> TablaDespacho:
+        tabla = cls.__dict__.get('_tabla_despacho')
+        if tabla is None:
+            tabla = TablaDespacho(cls.pasos)
+            cls._tabla_despacho = tabla
+        return tabla
+
+    def inicializar_pasos(self):
+        self.despacho = self.tabla_despacho()
+        self.completados = set()
+
+    def marcar_completados(self, indices: Iterable[int]):
+        self.completados.update(indices)
+
+    @abstractmethod
+    def compensaciones_del_sobre(self) -> List[Dict[str, str]]:
+        """Compensaciones que trae el mensaje en proceso, de la más antigua a la más reciente."""
+        ...
+
+    def construir_compensacion(self, compensacion: Dict[str, str], evento: EventoDominio) -> Optional[Comando]:
+        """Construye el comando de una compensación del sobre con los datos que registró su paso."""
+        tipo_comando = self.comandos_compensacion.get(compensacion.get('comando'))
+        if tipo_comando is None:
+            logger.warning(f"SAGA: Compensación desconocida en el sobre: {compensacion.get('comando')}")
+            return None
+        return tipo_comando(**{campo: valor for campo, valor in compensacion.items() if campo != 'comando'})
+
+    def compensar(self, evento: EventoDominio, index: int):
+        for compensacion in reversed(self.compensaciones_del_sobre()):
+            comando = self.construir_compensacion(compensacion, evento)
+            if comando is not None:
+                ejecutar_commando(comando)
 
     def procesar_evento(self, evento: EventoDominio):
-        paso, index = self.obtener_paso_dado_un_evento(evento)
-        if self.es_ultima_transaccion(index) and not isinstance(evento, paso.error):
+        index, es_error = self.despacho.resolver(type(evento))
+        if es_error:
+            self.compensar(evento, index)
+            return
+        self.completados.add(index)
+        if index == 0:
+            self.iniciar()
+        elif self.despacho.completa(self.completados):
             self.terminar()
-        elif isinstance(evento, paso.error):
-            self.publicar_comando(evento, self.pasos[index-1].compensacion)
-        elif isinstance(evento, paso.evento):
-            self.publicar_comando(evento, self.pasos[index+1].comando)
+
+
+def ejecutar_ramas(ramas: Dict[str, Callable[[], None]], ejecutor: Executor) -> Dict[str, Optional[BaseException]]:
+    """
+    Ejecuta en paralelo las ramas independientes de una etapa y espera a que terminen todas.
+    Cada rama corre con una copia del contexto del llamador; retorna la excepción de cada
+    rama, o None si terminó bien.
+    """
+    futuros = {
+        nombre: ejecutor.submit(contextvars.copy_context().run, rama)
+        for nombre, rama in ramas.items()
+    }
+    return {nombre: futuro.exception() for nombre, futuro in futuros.items()}
+
+
+class RegistroInstanciasSaga:
+    """
+    Instancias de saga activas indexadas por id de correlación, acotadas con política LRU.
+    Una instancia desalojada se reconstruye con la fábrica en el siguiente acceso,
+    por lo que el estado durable debe poder rehidratarse desde el saga log.
+
+    Cada instancia cuenta los hilos que la usan (o esperan su lock) dentro de ``usar``;
+    el LRU y ``descartar`` solo retiran instancias sin usuarios, para que dos eventos de
+    una misma saga nunca queden en instancias distintas con locks distintos.
+    """
+
+    def __init__(self, fabrica: Callable[[str], CoordinadorSaga], max_instancias: int = 1000):
+        self._fabrica = fabrica
+        self._max_instancias = max_instancias
+        self._instancias: "OrderedDict[str, CoordinadorSaga]" = OrderedDict()
+        self._usuarios: Dict[str, int] = {}
+        self._descartadas: Set[str] = set()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def usar(self, id_correlacion: str) -> Iterator[CoordinadorSaga]:
+        """Instancia de la saga, protegida del desalojo mientras dura el bloque."""
+        with self._lock:
+            instancia = self._instancias.get(id_correlacion)
+            if instancia is None:
+                instancia = self._fabrica(id_correlacion)
+                self._instancias[id_correlacion] = instancia
+            else:
+                self._instancias.move_to_end(id_correlacion)
+            self._usuarios[id_correlacion] = self._usuarios.get(id_correlacion, 0) + 1
+            self._desalojar()
+        try:
+            yield instancia
+        finally:
+            with self._lock:
+                self._usuarios[id_correlacion] -= 1
+                if not self._usuarios[id_correlacion]:
+                    del self._usuarios[id_correlacion]
+                    if id_correlacion in self._descartadas:
+                        self._descartadas.discard(id_correlacion)
+                        self._instancias.pop(id_correlacion, None)
+                self._desalojar()
+
+    def _desalojar(self):
+        # Las instancias en uso se saltan; el registro excede el máximo mientras todas lo estén
+        exceso = len(self._instancias) - self._max_instancias
+        if exceso <= 0:
+            return
+        inactivas = [id_correlacion for id_correlacion in self._instancias if id_correlacion not in self._usuarios]
+        for id_correlacion in inactivas[:exceso]:
+            del self._instancias[id_correlacion]
+
+    def descartar(self, id_correlacion: str):
+        """Retira la instancia; si está en uso, al salir del último ``usar``."""
+        with self._lock:
+            if id_correlacion in self._usuarios:
+                self._descartadas.add(id_correlacion)
+            else:
+                self._instancias.pop(id_correlacion, None)
+
+    def __contains__(self, id_correlacion: str) -> bool:
+        with self._lock:
+            return id_correlacion in self._instancias
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._instancias)
+
+
+class PlanificadorTimeouts:
+    """
+    Plazos pendientes de las sagas en un heap ordenado por fecha límite.
+
+    Cada paso enviado tiene su propio plazo, indexado por (id de correlación, paso), de
+    modo que las ramas concurrentes de una saga vencen por separado. Reprogramar o
+    cancelar no busca en el heap, solo reemplaza la entrada del diccionario de vigentes
+    y la entrada antigua se descarta al llegar a la cima. Programar y vencer cuestan
+    O(log n), lo que permite mantener cientos de miles de sagas pendientes.
+
+    Con un ``ejecutor``, cada vencimiento se procesa en sus hilos, de modo que un
+    callback lento no retrasa los plazos siguientes.
+    """
+
+    def __init__(self, al_vencer: Optional[Callable[[str, int], None]] = None,
+                 ejecutor: Optional[Executor] = None):
+        self._al_vencer = al_vencer
+        self._ejecutor = ejecutor
+        self._heap: List[Tuple[float, str, int]] = []
+        self._vigentes: Dict[Tuple[str, int], float] = {}
+        # Pasos con plazo vigente de cada saga, para cancelarlos todos al terminarla
+        self._pasos: Dict[str, Set[int]] = {}
+        self._condicion = threading.Condition()
+        self._detenido = False
+        self._hilo: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _instante(fecha_limite: datetime.datetime) -> float:
+        # Las fechas de la saga se manejan en UTC sin zona horaria
+        return fecha_limite.replace(tzinfo=datetime.timezone.utc).timestamp()
+
+    def programar(self, id_correlacion: str, paso_index: int, fecha_limite: datetime.datetime):
+        """Programa (o reemplaza) el plazo de un paso de la saga."""
+        instante = self._instante(fecha_limite)
+        with self._condicion:
+            self._vigentes[(id_correlacion, paso_index)] = instante
+            self._pasos.setdefault(id_correlacion, set()).add(paso_index)
+            heapq.heappush(self._heap, (instante, id_correlacion, paso_index))
+            if self._heap[0][1:] == (id_correlacion, paso_index):
+                self._condicion.notify()
+
+    def cancelar(self, id_correlacion: str, paso_index: Optional[int] = None):
+        """Cancela el plazo de un paso, o todos los de la saga si no se indica el paso."""
+        with self._condicion:
+            pasos = self._pasos.get(id_correlacion, set())
+            for paso in (list(pasos) if paso_index is None else [paso_index]):
+                self._quitar(id_correlacion, paso)
+
+    def _quitar(self, id_correlacion: str, paso_index: int):
+        self._vigentes.pop((id_correlacion, paso_index), None)
+        pasos = self._pasos.get(id_correlacion)
+        if pasos is not None:
+            pasos.discard(paso_index)
+            if not pasos:
+                del self._pasos[id_correlacion]
+
+    def tomar_vencidos(self, ahora: Optional[float] = None) -> List[Tuple[str, int]]:
+        """Retira y retorna los plazos vencidos como (id_correlacion, paso_index)."""
+        ahora = time.time() if ahora is None else ahora
+        vencidos = []
+        with self._condicion:
+            while self._heap and self._heap[0][0] <= ahora:
+                instante, id_correlacion, paso_index = heapq.heappop(self._heap)
+                if self._vigentes.get((id_correlacion, paso_index)) != instante:
+                    continue  # Plazo reprogramado o cancelado
+                self._quitar(id_correlacion, paso_index)
+                vencidos.append((id_correlacion, paso_index))
+            self._compactar()
+        return vencidos
+
+    def _compactar(self):
+        # Evita que las entradas obsoletas crezcan sin límite cuando se cancelan muchos plazos
+        if len(self._heap) > 2 * len(self._vigentes) + 1024:
+            self._heap = [(instante, id_correlacion, paso_index)
+                          for (id_correlacion, paso_index), instante in self._vigentes.items()]
+            heapq.heapify(self._heap)
+
+    def iniciar(self, al_vencer: Optional[Callable[[str, int], None]] = None):
+        if al_vencer is not None:
+            self._al_vencer = al_vencer
+        with self._condicion:
+            if self._hilo is None:
+                self._detenido = False
+                self._hilo = threading.Thread(target=self._ejecutar, daemon=True, name='planificador-timeouts')
+                self._hilo.start()
+        return self
+
+    def detener(self):
+        with self._condicion:
+            self._detenido = True
+            self._condicion.notify()
+        if self._hilo is not None:
+            self._hilo.join(timeout=5)
+            self._hilo = None
+
+    def _ejecutar(self):
+        while True:
+            with self._condicion:
+                while not self._detenido:
+                    if self._heap and self._heap[0][0] <= time.time():
+                        break
+                    espera = self._heap[0][0] - time.time() if self._heap else None
+                    self._condicion.wait(espera)
+                if self._detenido:
+                    return
+
+            for id_correlacion, paso_index in self.tomar_vencidos():
+                if self._ejecutor is None:
+                    self._vencer(id_correlacion, paso_index)
+                else:
+                    self._ejecutor.submit(self._vencer, id_correlacion, paso_index)
+
+    def _vencer(self, id_correlacion: str, paso_index: int):
+        try:
+            self._al_vencer(id_correlacion, paso_index)
+        except Exception as e:
+            logger.error(f"SAGA: Error procesando timeout de {id_correlacion} (paso {paso_index}): {e}")
+
+    def __len__(self) -> int:
+        with self._condicion:
+            return len(self._vigentes)
@@ -0,0 +1,319 @@
+"""
+Broker de Pulsar en memoria para pruebas y benchmarks.
+
+Implementa el subconjunto de la API de ``pulsar.Client`` que usan los
+despachadores y consumidores del proyecto. Las latencias de conexión, registro
+de productor y envío son configurables para simular el costo de un broker real.
+"""
+
+import itertools
+import queue
+import threading
+import time
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import pulsar
+
+
+class MensajeMemoria:
+    def __init__(self, contenido, topico: str, id_mensaje: int, propiedades: Optional[Dict[str, str]] = None,
+                 clave: Optional[str] = None, reentregas: int = 0):
+        self._contenido = contenido
+        self._topico = topico
+        self._id_mensaje = id_mensaje
+        self._propiedades = dict(propiedades or {})
+        self._clave = clave or ''
+        self._reentregas = reentregas
+
+    def value(self):
+        return self._contenido
+
+    def data(self):
+        return self._contenido
+
+    def properties(self) -> Dict[str, str]:
+        return self._propiedades
+
+    def topic_name(self) -> str:
+        return self._topico
+
+    def message_id(self) -> int:
+        return self._id_mensaje
+
+    def partition_key(self) -> str:
+        return self._clave
+
+    def redelivery_count(self) -> int:
+        return self._reentregas
+
+    def reentregado(self) -> "MensajeMemoria":
+        """Copia del mensaje tal como se vuelve a entregar tras un rechazo."""
+        return MensajeMemoria(self._contenido, self._topico, self._id_mensaje, self._propiedades, self._clave,
+                              self._reentregas + 1)
+
+
+class BrokerMemoria:
+    """
+    Almacén de mensajes por tópico compartido por los clientes en memoria. Cada
+    suscripción recibe los mensajes publicados después de crearse, repartidos
+    entre sus consumidores como en una suscripción Shared. En los tópicos
+    particionados (``particionar``) cada mensaje se guarda en la partición que
+    corresponde a su clave, o en ronda si no tiene.
+    """
+
+    def __init__(self):
+        self.topicos: Dict[str, List[MensajeMemoria]] = defaultdict(list)
+        self.suscripciones: Dict[str, Dict[str, "queue.Queue"]] = defaultdict(dict)
+        self.particiones: Dict[str, int] = {}
+        self._ronda = itertools.count()
+        self.conexiones = 0
+        self.productores_creados = 0
+        self.consumidores_creados = 0
+        self._lock = threading.Lock()
+
+    def almacenar(self, topico: str, contenido, propiedades: Optional[Dict[str, str]] = None,
+                  clave: Optional[str] = None) -> MensajeMemoria:
+        with self._lock:
+            destino = self._destino(topico, clave)
+            mensaje = MensajeMemoria(contenido, destino, len(self.topicos[destino]), propiedades, clave)
+            self.topicos[destino].append(mensaje)
+            for nombre in {topico, destino}:
+                for cola in self.suscripciones[nombre].values():
+                    cola.put(mensaje)
+            return mensaje
+
+    def particionar(self, topico: str, particiones: int):
+        with self._lock:
+            self.particiones[topico] = particiones
+
+    def nombres_particiones(self, topico: str) -> List[str]:
+        with self._lock:
+            if topico not in self.particiones:
+                return [topico]
+            return [f'{topico}-partition-{i}' for i in range(self.particiones[topico])]
+
+    def _destino(self, topico: str, clave: Optional[str]) -> str:
+        particiones = self.particiones.get(topico)
+        if not particiones:
+            return topico
+        indice = zlib.crc32(clave.encode()) if clave else next(self._ronda)
+        return f'{topico}-partition-{indice % particiones}'
+
+    def suscribir(self, topicos, suscripcion: str) -> "queue.Queue":
+        """Cola de la suscripción; con una lista de tópicos, una sola cola para todos."""
+        nombres = [topicos] if isinstance(topicos, str) else list(topicos)
+        with self._lock:
+            self.consumidores_creados += 1
+            cola = next((self.suscripciones[nombre][suscripcion] for nombre in nombres
+                         if suscripcion in self.suscripciones[nombre]), None) or queue.Queue()
+            for nombre in nombres:
+                self.suscripciones[nombre].setdefault(suscripcion, cola)
+            return cola
+
+    def total_mensajes(self) -> int:
+        with self._lock:
+            return sum(len(mensajes) for mensajes in self.topicos.values())
+
+
+class ProductorMemoria:
+    """
+    Productor en memoria. ``send_async`` agrupa los mensajes encolados en lotes de
+    hasta ``batching_max_messages`` y paga la latencia de envío una vez por lote.
+    """
+
+    def __init__(self, broker: BrokerMemoria, topico: str, latencia_envio_ms: float,
+                 batching_max_messages: int = 1):
+        self._broker = broker
+        self._topico = topico
+        self._latencia_envio_ms = latencia_envio_ms
+        self._batching_max_messages = max(1, batching_max_messages)
+        self._cola: "queue.Queue" = queue.Queue()
+        self._hilo: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.cerrado = False
+
+    def topic(self) -> str:
+        return self._topico
+
+    def send(self, contenido, properties: Optional[Dict[str, str]] = None, partition_key: Optional[str] = None,
+             **kwargs):
+        if self.cerrado:
+            raise RuntimeError(f"Productor de {self._topico} cerrado")
+        _esperar(self._latencia_envio_ms)
+        return self._broker.almacenar(self._topico, contenido, properties, partition_key).message_id()
+
+    def send_async(self, contenido, callback, properties: Optional[Dict[str, str]] = None,
+                   partition_key: Optional[str] = None, **kwargs):
+        if self.cerrado:
+            raise RuntimeError(f"Productor de {self._topico} cerrado")
+        with self._lock:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._enviar_lotes, daemon=True)
+                self._hilo.start()
+        self._cola.put((contenido, callback, properties, partition_key))
+
+    def _enviar_lotes(self):
+        while True:
+            lote = [self._cola.get()]
+            while len(lote) < self._batching_max_messages:
+                try:
+                    lote.append(self._cola.get_nowait())
+                except queue.Empty:
+                    break
+            _esperar(self._latencia_envio_ms)
+            for contenido, callback, propiedades, clave in lote:
+                id_mensaje = self._broker.almacenar(self._topico, contenido, propiedades, clave).message_id()
+                callback(pulsar.Result.Ok, id_mensaje)
+                self._cola.task_done()
+
+    def flush(self):
+        self._cola.join()
+
+    def close(self):
+        self.flush()
+        self.cerrado = True
+
+
+class ConsumidorMemoria:
+    """
+    Consumidor en memoria de una suscripción. Los mensajes rechazados se vuelven a
+    entregar tras ``negative_ack_redelivery_delay_ms`` con su contador de reentregas incrementado.
+    """
+
+    def __init__(self, broker: BrokerMemoria, topico, suscripcion: str,
+                 negative_ack_redelivery_delay_ms: int = 0, batch_receive_policy=None):
+        self._topico = topico
+        self._cola = broker.suscribir(topico, suscripcion)
+        self._retardo_reentrega_ms = negative_ack_redelivery_delay_ms
+        self._politica_lote = batch_receive_policy.policy() if batch_receive_policy is not None else None
+        self._lock = threading.Lock()
+        self.confirmados = 0
+        self.rechazados = 0
+        self.cerrado = False
+
+    def topic(self) -> str:
+        return self._topico
+
+    def receive(self, timeout_millis: Optional[int] = None) -> MensajeMemoria:
+        try:
+            return self._cola.get(timeout=None if timeout_millis is None else timeout_millis / 1000.0)
+        except queue.Empty:
+            raise pulsar.Timeout(f"Sin mensajes en {self._topico}")
+
+    def batch_receive(self) -> List[MensajeMemoria]:
+        """Hasta el máximo de mensajes de la política, esperando como mucho su timeout."""
+        maximo, timeout_ms = ((self._politica_lote.getMaxNumMessages(), self._politica_lote.getTimeoutMs())
+                              if self._politica_lote is not None else (100, 100))
+        limite = time.monotonic() + timeout_ms / 1000.0
+        mensajes = []
+        while len(mensajes) < maximo:
+            try:
+                mensajes.append(self._cola.get(timeout=max(0.0, limite - time.monotonic())))
+            except queue.Empty:
+                break
+        return mensajes
+
+    def acknowledge(self, mensaje: MensajeMemoria):
+        with self._lock:
+            self.confirmados += 1
+
+    def negative_acknowledge(self, mensaje: MensajeMemoria):
+        with self._lock:
+            self.rechazados += 1
+        if self._retardo_reentrega_ms > 0:
+            temporizador = threading.Timer(self._retardo_reentrega_ms / 1000.0, self._cola.put, (mensaje.reentregado(),))
+            temporizador.daemon = True
+            temporizador.start()
+        else:
+            self._cola.put(mensaje.reentregado())
+
+    def close(self):
+        self.cerrado = True
+
+
+class LectorMemoria:
+    """Lector en memoria de un tópico (o partición) desde una posición, sin suscripción."""
+
+    def __init__(self, broker: BrokerMemoria, topico: str, posicion: int):
+        self._broker = broker
+        self._topico = topico
+        self._posicion = posicion
+        self.cerrado = False
+
+    def topic(self) -> str:
+        return self._topico
+
+    def has_message_available(self) -> bool:
+        with self._broker._lock:
+            return self._posicion < len(self._broker.topicos[self._topico])
+
+    def read_next(self, timeout_millis: Optional[int] = None) -> MensajeMemoria:
+        limite = time.monotonic() + (timeout_millis or 0) / 1000.0
+        while not self.has_message_available():
+            if time.monotonic() >= limite:
+                raise pulsar.Timeout(f"Sin mensajes en {self._topico}")
+            time.sleep(0.001)
+        with self._broker._lock:
+            mensaje = self._broker.topicos[self._topico][self._posicion]
+        self._posicion += 1
+        return mensaje
+
+    def close(self):
+        self.cerrado = True
+
+
+class ClienteMemoria:
+    """Sustituto de ``pulsar.Client`` respaldado por un ``BrokerMemoria``."""
+
+    def __init__(self,
+                 url: str = 'pulsar://memoria:6650',
+                 broker: Optional[BrokerMemoria] = None,
+                 latencia_conexion_ms: float = 0,
+                 latencia_productor_ms: float = 0,
+                 latencia_envio_ms: float = 0):
+        self.url = url
+        self.broker = broker or BrokerMemoria()
+        self._latencia_productor_ms = latencia_productor_ms
+        self._latencia_envio_ms = latencia_envio_ms
+        _esperar(latencia_conexion_ms)
+        with self.broker._lock:
+            self.broker.conexiones += 1
+
+    def create_producer(self, topico: str, schema=None, batching_enabled: bool = False,
+                        batching_max_messages: int = 1000, **kwargs) -> ProductorMemoria:
+        _esperar(self._latencia_productor_ms)
+        with self.broker._lock:
+            self.broker.productores_creados += 1
+        return ProductorMemoria(self.broker, topico, self._latencia_envio_ms,
+                                batching_max_messages if batching_enabled else 1)
+
+    def subscribe(self, topico, subscription_name: str, schema=None,
+                  negative_ack_redelivery_delay_ms: int = 0, batch_receive_policy=None,
+                  **kwargs) -> ConsumidorMemoria:
+        return ConsumidorMemoria(self.broker, topico, subscription_name, negative_ack_redelivery_delay_ms,
+                                 batch_receive_policy)
+
+    def create_reader(self, topico: str, start_message_id, schema=None, start_message_id_inclusive: bool = False,
+                      **kwargs) -> LectorMemoria:
+        """``start_message_id`` es un id de ``MensajeMemoria`` o ``pulsar.MessageId.earliest``/``latest``."""
+        if isinstance(start_message_id, int):
+            posicion = start_message_id if start_message_id_inclusive else start_message_id + 1
+        elif start_message_id is pulsar.MessageId.latest:
+            with self.broker._lock:
+                posicion = len(self.broker.topicos[topico])
+        else:
+            posicion = 0
+        return LectorMemoria(self.broker, topico, posicion)
+
+    def get_topic_partitions(self, topico: str) -> List[str]:
+        return self.broker.nombres_particiones(topico)
+
+    def close(self):
+        pass
+
+
+def _esperar(milisegundos: float):
+    if milisegundos > 0:
+        time.sleep(milisegundos / 1000.0)
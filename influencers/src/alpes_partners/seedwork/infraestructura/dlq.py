@@ -0,0 +1,285 @@
+"""
+Herramientas para los tópicos de mensajes muertos (DLQ) de todos los servicios.
+
+El runtime de consumidores publica en ``<tópico>-<suscripción>-DLQ`` los
+mensajes que agotaron sus reintentos (ver ``reintentos.py``). Este módulo
+permite:
+
+- ``inspeccionar``: contar los mensajes de las DLQ agrupados por tópico de
+  origen y tipo de error, leyéndolos sin consumirlos.
+- ``ReproductorDLQ``: volver a publicar los mensajes en su tópico de origen,
+  en lotes y a una tasa máxima configurable, conservando clave y propiedades.
+  Cada partición de la DLQ se reproduce en su propio hilo y su avance se guarda
+  en un checkpoint tras cada lote confirmado, de modo que una reproducción
+  interrumpida continúa donde quedó.
+
+Los mensajes no se borran de la DLQ: reproducir de nuevo sin checkpoint los
+vuelve a publicar.
+
+    python -m alpes_partners.seedwork.infraestructura.dlq inspeccionar
+    python -m alpes_partners.seedwork.infraestructura.dlq reproducir comandos-campanas-campanas-sub-comandos-DLQ \\
+        --tasa 200 --lote 50 --checkpoint dlq.checkpoint.json
+"""
+
+import argparse
+import base64
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pulsar
+
+from .outbox import _resolver_schema
+from .reintentos import (
+    PROPIEDAD_DLQ_ERROR_TIPO, PROPIEDAD_DLQ_FECHA, PROPIEDAD_DLQ_SCHEMA, PROPIEDAD_DLQ_TOPICO, topico_dlq
+)
+
+logger = logging.getLogger(__name__)
+
+# Suscripciones registradas en el runtime de consumidores de cada servicio
+SUSCRIPCIONES_SERVICIOS: Tuple[Tuple[str, str], ...] = (
+    ('eventos-influencers', 'saga-sub-eventos-influencers'),
+    ('eventos-campanas', 'saga-sub-eventos-campanas'),
+    ('eventos-contratos', 'saga-sub-eventos-contratos'),
+    ('eventos-contratos-error', 'saga-sub-eventos-contratos-error'),
+    # Saga con saga_suscripcion_unica: una suscripción para los cuatro tópicos
+    ('eventos-influencers', 'saga-sub-eventos'),
+    ('eventos-campanas', 'saga-sub-eventos'),
+    ('eventos-contratos', 'saga-sub-eventos'),
+    ('eventos-contratos-error', 'saga-sub-eventos'),
+    ('eventos-crear-influencer', 'influencers-sub-crear-influencer'),
+    ('eventos-influencers', 'campanas-sub-eventos-influencers'),
+    ('eventos-campanas-eliminacion-v2', 'campanas-sub-eventos-eliminacion-v2'),
+    ('comandos-campanas', 'campanas-sub-comandos'),
+    ('eventos-campanas', 'contratos-sub-eventos-campanas'),
+    ('comandos-contratos-v2', 'contratos-sub-comandos-v2'),
+    ('eventos-contratos', 'bff-contratos-stream'),
+)
+
+
+def topicos_dlq() -> List[str]:
+    """Tópicos de mensajes muertos de todas las suscripciones de los servicios."""
+    return [topico_dlq(topico, suscripcion) for topico, suscripcion in SUSCRIPCIONES_SERVICIOS]
+
+
+@dataclass(frozen=True)
+class ConteoDLQ:
+    topico_dlq: str
+    topico_origen: str
+    error_tipo: str
+    mensajes: int
+    primera_fecha: Optional[str]
+    ultima_fecha: Optional[str]
+
+
+def _leer(cliente, topico: str, timeout_ms: int = 1000) -> Iterable[Any]:
+    """Mensajes de cada partición de ``topico`` desde el principio hasta el final actual."""
+    for particion in cliente.get_topic_partitions(topico):
+        lector = cliente.create_reader(particion, pulsar.MessageId.earliest)
+        try:
+            while lector.has_message_available():
+                yield lector.read_next(timeout_millis=timeout_ms)
+        finally:
+            lector.close()
+
+
+def inspeccionar(cliente, topicos: Optional[Iterable[str]] = None) -> List[ConteoDLQ]:
+    """Cuenta los mensajes de las DLQ por tópico de origen y tipo de error, sin consumirlos."""
+    conteos: Counter = Counter()
+    fechas: Dict[Tuple[str, str, str], List[str]] = {}
+    for topico in topicos or topicos_dlq():
+        try:
+            mensajes = list(_leer(cliente, topico))
+        except Exception as e:
+            logger.warning(f"DLQ: No se pudo leer {topico}: {e}")
+            continue
+        for mensaje in mensajes:
+            propiedades = mensaje.properties() or {}
+            grupo = (topico, propiedades.get(PROPIEDAD_DLQ_TOPICO, ''), propiedades.get(PROPIEDAD_DLQ_ERROR_TIPO, ''))
+            conteos[grupo] += 1
+            fecha = propiedades.get(PROPIEDAD_DLQ_FECHA)
+            if fecha:
+                fechas.setdefault(grupo, []).append(fecha)
+    resultado = []
+    for (dlq, origen, error_tipo), cantidad in sorted(conteos.items(), key=lambda item: (-item[1], item[0])):
+        fechas_grupo = fechas.get((dlq, origen, error_tipo))
+        resultado.append(ConteoDLQ(dlq, origen, error_tipo, cantidad,
+                                   min(fechas_grupo) if fechas_grupo else None,
+                                   max(fechas_grupo) if fechas_grupo else None))
+    return resultado
+
+
+class CheckpointDLQ:
+    """Último mensaje reproducido de cada partición, persistido en un archivo JSON."""
+
+    def __init__(self, ruta: Optional[str] = None):
+        self._ruta = ruta
+        self._lock = threading.Lock()
+        self._posiciones: Dict[str, str] = {}
+        if ruta and os.path.exists(ruta):
+            with open(ruta) as archivo:
+                self._posiciones = json.load(archivo)
+
+    def posicion(self, particion: str):
+        """Id del último mensaje reproducido de la partición, o None si no se empezó."""
+        with self._lock:
+            texto = self._posiciones.get(particion)
+        if texto is None:
+            return None
+        if texto.startswith('b64:'):
+            return pulsar.MessageId.deserialize(base64.b64decode(texto[4:]))
+        return int(texto)
+
+    def avanzar(self, particion: str, id_mensaje):
+        texto = (f'b64:{base64.b64encode(id_mensaje.serialize()).decode()}'
+                 if hasattr(id_mensaje, 'serialize') else str(id_mensaje))
+        with self._lock:
+            self._posiciones[particion] = texto
+            if self._ruta:
+                temporal = f'{self._ruta}.tmp'
+                with open(temporal, 'w') as archivo:
+                    json.dump(self._posiciones, archivo)
+                os.replace(temporal, self._ruta)
+
+
+class _LimitadorTasa:
+    """Reparte ``por_segundo`` mensajes por segundo entre todos los hilos que lo comparten."""
+
+    def __init__(self, por_segundo: float):
+        self._intervalo = 1.0 / por_segundo if por_segundo > 0 else 0.0
+        self._siguiente = time.monotonic()
+        self._lock = threading.Lock()
+
+    def adquirir(self, mensajes: int):
+        if not self._intervalo:
+            return
+        with self._lock:
+            ahora = time.monotonic()
+            inicio = max(self._siguiente, ahora)
+            self._siguiente = inicio + mensajes * self._intervalo
+        if inicio > ahora:
+            time.sleep(inicio - ahora)
+
+
+class ReproductorDLQ:
+    """Reproduce los mensajes de una DLQ en su tópico de origen."""
+
+    def __init__(self,
+                 cliente,
+                 registro=None,
+                 tasa_por_segundo: float = 100,
+                 tamano_lote: int = 50,
+                 checkpoint: Optional[CheckpointDLQ] = None,
+                 timeout_confirmacion_segundos: float = 30,
+                 timeout_lectura_ms: int = 1000):
+        if registro is None:
+            from .productores import RegistroProductores
+            registro = RegistroProductores(fabrica_cliente=lambda url: cliente, asincrono=True,
+                                           batching_max_mensajes=tamano_lote)
+        self._cliente = cliente
+        self._registro = registro
+        self._limitador = _LimitadorTasa(tasa_por_segundo)
+        self._tamano_lote = tamano_lote
+        self._checkpoint = checkpoint or CheckpointDLQ()
+        self._timeout_confirmacion_segundos = timeout_confirmacion_segundos
+        self._timeout_lectura_ms = timeout_lectura_ms
+
+    def reproducir(self, topico: str) -> int:
+        """Reproduce todas las particiones de ``topico`` en paralelo y retorna los mensajes publicados."""
+        particiones = self._cliente.get_topic_partitions(topico)
+        logger.info(f"DLQ: Reproduciendo {topico} ({len(particiones)} partición(es))")
+        with ThreadPoolExecutor(max_workers=len(particiones), thread_name_prefix='reproductor-dlq') as ejecutor:
+            reproducidos = sum(ejecutor.map(self._reproducir_particion, particiones))
+        self._registro.vaciar()
+        logger.info(f"DLQ: {reproducidos} mensajes de {topico} reproducidos")
+        return reproducidos
+
+    def _reproducir_particion(self, particion: str) -> int:
+        desde = self._checkpoint.posicion(particion)
+        lector = self._cliente.create_reader(particion, desde if desde is not None else pulsar.MessageId.earliest)
+        reproducidos = 0
+        try:
+            while lector.has_message_available():
+                lote = []
+                while len(lote) < self._tamano_lote and lector.has_message_available():
+                    lote.append(lector.read_next(timeout_millis=self._timeout_lectura_ms))
+                self._limitador.adquirir(len(lote))
+                confirmaciones = [self._publicar(mensaje) for mensaje in lote]
+                wait(confirmaciones, timeout=self._timeout_confirmacion_segundos)
+                if not all(f.done() and f.result() == pulsar.Result.Ok for f in confirmaciones):
+                    raise RuntimeError(f"Lote de {particion} sin confirmar; se reanuda desde el checkpoint")
+                # Solo se avanza cuando el broker confirmó todo el lote
+                self._checkpoint.avanzar(particion, lote[-1].message_id())
+                reproducidos += len(lote)
+        finally:
+            lector.close()
+        return reproducidos
+
+    def _publicar(self, mensaje) -> Future:
+        futuro: Future = Future()
+        propiedades = dict(mensaje.properties() or {})
+        topico = propiedades.get(PROPIEDAD_DLQ_TOPICO)
+        schema = _schema(propiedades.get(PROPIEDAD_DLQ_SCHEMA))
+        contenido = schema.decode(mensaje.data()) if schema is not None else mensaje.data()
+        # Se publican las propiedades originales, sin las que describen el fallo
+        propiedades = {nombre: valor for nombre, valor in propiedades.items() if not nombre.startswith('dlq-')}
+        try:
+            self._registro.publicar_async(contenido, topico, schema,
+                                          callback=futuro.set_result,
+                                          propiedades=propiedades,
+                                          clave=mensaje.partition_key() or None)
+        except Exception as e:
+            logger.error(f"DLQ: Error reproduciendo mensaje en {topico}: {e}")
+            futuro.set_result(None)
+        return futuro
+
+
+@lru_cache(maxsize=None)
+def _schema(ruta: Optional[str]):
+    """Schema Avro del tópico de origen, o None para publicar los bytes tal cual."""
+    try:
+        return _resolver_schema(ruta)
+    except (ImportError, AttributeError) as e:
+        logger.warning(f"DLQ: Schema {ruta} no disponible en este servicio, se publican los bytes: {e}")
+        return None
+
+
+def main():
+    from . import utils
+
+    parser = argparse.ArgumentParser(description="Inspección y reproducción de los tópicos de mensajes muertos.")
+    comandos = parser.add_subparsers(dest='comando', required=True)
+    inspeccion = comandos.add_parser('inspeccionar')
+    inspeccion.add_argument('topicos', nargs='*', help="DLQ a inspeccionar (por defecto las de todos los servicios)")
+    reproduccion = comandos.add_parser('reproducir')
+    reproduccion.add_argument('topico')
+    reproduccion.add_argument('--tasa', type=float, default=100, help="Mensajes por segundo")
+    reproduccion.add_argument('--lote', type=int, default=50)
+    reproduccion.add_argument('--checkpoint', default=None, help="Archivo JSON de avance por partición")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    cliente = pulsar.Client(f'pulsar://{utils.broker_host()}:6650')
+    try:
+        if args.comando == 'inspeccionar':
+            print(f"{'dlq':<60} {'tópico origen':<32} {'error':<24} {'mensajes':>9} {'último':>26}")
+            for conteo in inspeccionar(cliente, args.topicos or None):
+                print(f"{conteo.topico_dlq:<60} {conteo.topico_origen:<32} {conteo.error_tipo:<24} "
+                      f"{conteo.mensajes:>9} {conteo.ultima_fecha or '':>26}")
+        else:
+            reproductor = ReproductorDLQ(cliente, tasa_por_segundo=args.tasa, tamano_lote=args.lote,
+                                         checkpoint=CheckpointDLQ(args.checkpoint))
+            print(f"{reproductor.reproducir(args.topico)} mensajes reproducidos")
+    finally:
+        cliente.close()
+
+
+if __name__ == '__main__':
+    main()
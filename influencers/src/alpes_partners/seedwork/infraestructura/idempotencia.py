@@ -0,0 +1,116 @@
+"""
+Consumidores idempotentes.
+
+Pulsar vuelve a entregar mensajes ya procesados cuando se pierde una
+confirmación (reconexiones, timeouts) y el relay del outbox puede publicar dos
+veces la misma fila. ``RegistroIdempotencia`` guarda en ``mensajes_procesados``
+los ids de los mensajes que ya procesó cada consumidor. El id es la propiedad
+``id-mensaje`` que estampan los productores (ver ``contexto.py``) o, en los
+mensajes que no la traen, el id del mensaje en Pulsar.
+
+La fila se agrega a la sesión del manejador y se confirma en su misma
+transacción: un mensaje queda registrado si y solo si sus efectos se
+confirmaron. Un LRU en memoria con los ids confirmados recientemente evita
+consultar la tabla en el caso común. Los duplicados se confirman sin ejecutar
+el manejador.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import Column, DateTime, String, event, inspect
+from sqlalchemy.orm import declarative_base, scoped_session
+
+from .contexto import PROPIEDAD_ID_MENSAJE
+from ...config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+Base = declarative_base()
+
+
+class MensajeProcesadoModelo(Base):
+    """Mensaje ya procesado por un consumidor."""
+    __tablename__ = "mensajes_procesados"
+
+    consumidor = Column(String(255), primary_key=True)
+    id_mensaje = Column(String(255), primary_key=True)
+    fecha_procesado = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+def id_mensaje(mensaje) -> str:
+    """Id con el que se deduplica un mensaje recibido."""
+    propiedades = mensaje.properties() or {}
+    return propiedades.get(PROPIEDAD_ID_MENSAJE) or str(mensaje.message_id())
+
+
+class RegistroIdempotencia:
+    """Ids procesados por consumidor: LRU en memoria delante de la tabla ``mensajes_procesados``."""
+
+    def __init__(self, capacidad: int = 10000):
+        self._capacidad = capacidad
+        self._recientes: "OrderedDict[Tuple[str, str], None]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.duplicados = 0
+
+    def procesado(self, sesion, consumidor: str, id_mensaje: str) -> bool:
+        clave = (consumidor, id_mensaje)
+        with self._lock:
+            if clave in self._recientes:
+                self._recientes.move_to_end(clave)
+                return True
+        if sesion.get(MensajeProcesadoModelo, clave) is None:
+            return False
+        self._recordar(clave)
+        return True
+
+    def registrar(self, sesion, consumidor: str, id_mensaje: str):
+        """Agrega el id a la transacción de ``sesion``; entra al LRU cuando esa transacción se confirma."""
+        fila = MensajeProcesadoModelo(consumidor=consumidor, id_mensaje=id_mensaje, fecha_procesado=datetime.utcnow())
+        if isinstance(sesion, scoped_session):
+            sesion = sesion()
+        sesion.add(fila)
+
+        def confirmado(_):
+            # Si el savepoint del mensaje se revirtió la fila ya no pertenece a la sesión
+            if inspect(fila).persistent:
+                self._recordar((consumidor, id_mensaje))
+        event.listen(sesion, 'after_commit', confirmado, once=True)
+
+    def registrar_si_nuevo(self, sesion, consumidor: str, mensaje) -> bool:
+        """
+        Registra el mensaje en la transacción de ``sesion`` y devuelve True si no se
+        había procesado; si es un duplicado devuelve False y no registra nada.
+        """
+        id_recibido = id_mensaje(mensaje)
+        if self.procesado(sesion, consumidor, id_recibido):
+            with self._lock:
+                self.duplicados += 1
+            logger.info(f"IDEMPOTENCIA: Mensaje {id_recibido} ya procesado por {consumidor}, se omite")
+            return False
+        self.registrar(sesion, consumidor, id_recibido)
+        return True
+
+    def _recordar(self, clave: Tuple[str, str]):
+        with self._lock:
+            self._recientes[clave] = None
+            self._recientes.move_to_end(clave)
+            while len(self._recientes) > self._capacidad:
+                self._recientes.popitem(last=False)
+
+
+_registro: Optional[RegistroIdempotencia] = None
+_registro_lock = threading.Lock()
+
+
+def registro_idempotencia() -> RegistroIdempotencia:
+    """Registro de idempotencia global del proceso."""
+    global _registro
+    if _registro is None:
+        with _registro_lock:
+            if _registro is None:
+                _registro = RegistroIdempotencia(capacidad=settings.idempotencia_cache_tamano)
+    return _registro
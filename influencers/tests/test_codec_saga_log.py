@@ -0,0 +1,119 @@
+"""
+Tests del codec binario del saga log: ida y vuelta, decodificación perezosa y filas mixtas.
+"""
+
+import os
+import sys
+
+import pytest
+from flask import Flask
+
+src_path = os.path.join(os.path.dirname(__file__), '..', 'src')
+sys.path.insert(0, src_path)
+
+from alpes_partners.seedwork.infraestructura.database import db
+from alpes_partners.modulos.sagas.dominio.entidades import SagaLog
+from alpes_partners.modulos.sagas.infraestructura.codec_saga_log import (
+    ESQUEMA_JSON, CodecAvro, CodecJson, DatosPerezosos, codec_saga_log
+)
+from alpes_partners.modulos.sagas.infraestructura.repositorio_saga_log import (
+    RepositorioSagaLogSQLAlchemy, SagaEstadoModelo, SagaLogEsquemaModelo, SagaLogModelo, insertar_ignorando_duplicados,
+    obtener_definicion_esquema, valores_saga_log
+)
+
+
+@pytest.fixture
+def sesion():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        for modelo in (SagaLogModelo, SagaEstadoModelo, SagaLogEsquemaModelo):
+            modelo.__table__.create(db.engine)
+        yield db.session
+        db.session.remove()
+
+
+class TestCodecAvro:
+    """Tests de codificación de contenidos con esquema derivado de sus claves."""
+
+    def test_ida_y_vuelta_conserva_el_contenido(self):
+        codec = CodecAvro()
+        datos = {
+            'influencer_id': 'influencer-1', 'seguidores': 12000, 'tasa': 0.035, 'activo': True, 'error': None,
+            'categorias': ['moda', 'viajes'], 'plataformas': {'instagram': 'ana'},
+            'metricas': {'alcance': 10, 'historial': [1, 2]}, 'grande': 2 ** 70,
+        }
+
+        assert codec.decodificar(codec.codificar(datos)) == datos
+
+    def test_esquema_depende_del_tipo_de_cada_valor(self):
+        codec = CodecAvro()
+        con_error = codec.codificar({'comando': 'EliminarCampana', 'error': 'timeout'})
+        sin_error = codec.codificar({'comando': 'EliminarCampana', 'error': None})
+
+        assert codec.esquema_de(con_error) != codec.esquema_de(sin_error)
+        assert codec.decodificar(sin_error) == {'comando': 'EliminarCampana', 'error': None}
+        assert codec.definicion(codec.esquema_de(con_error)) == 'comando:string,error:string'
+
+    def test_mismas_claves_usan_el_mismo_esquema(self):
+        codec = CodecAvro()
+        primero = codec.codificar({'campana_id': 'c-1', 'nombre': 'Verano'})
+        segundo = codec.codificar({'nombre': 'Invierno', 'campana_id': 'c-2'})
+
+        assert codec.esquema_de(primero) == codec.esquema_de(segundo)
+        assert len(primero) < len(CodecJson().columnas({'campana_id': 'c-1', 'nombre': 'Verano'})['evento_datos'])
+
+    def test_claves_no_validas_en_avro_se_guardan_como_json(self):
+        codec = CodecAvro()
+        valor = codec.codificar({'clave con espacios': 1})
+
+        assert codec.esquema_de(valor) == ESQUEMA_JSON
+        assert codec.decodificar(valor) == {'clave con espacios': 1}
+
+    def test_datos_perezosos_decodifican_al_primer_acceso(self):
+        codec = CodecAvro()
+        datos = DatosPerezosos(codec.codificar({'campana_id': 'c-1'}), codec)
+
+        assert not datos.decodificado
+        assert datos['campana_id'] == 'c-1'
+        assert datos.decodificado
+        assert dict(datos) == {'campana_id': 'c-1'}
+
+
+class TestRepositorioConCodec:
+    """Tests del repositorio con entradas en ambos formatos."""
+
+    def test_filas_json_y_avro_conviven(self, sesion):
+        avro = codec_saga_log(CodecAvro.nombre)
+        insertar_ignorando_duplicados(sesion, [
+            valores_saga_log(SagaLog(id_correlacion='saga-1', evento_tipo='Inicio', evento_datos={'paso': 0},
+                                     paso_index=0), CodecJson()),
+            valores_saga_log(SagaLog(id_correlacion='saga-1', evento_tipo='EventoDominioInfluencerRegistrado',
+                                     evento_datos={'influencer_id': 'influencer-1', 'nombre': 'Ana'},
+                                     paso_index=1), avro),
+        ])
+        sesion.commit()
+
+        repositorio = RepositorioSagaLogSQLAlchemy()
+        entradas = repositorio.obtener_por_correlacion('saga-1')
+        assert isinstance(entradas[1].evento_datos, DatosPerezosos)
+        assert [dict(e.evento_datos) for e in entradas] == [
+            {'paso': 0}, {'influencer_id': 'influencer-1', 'nombre': 'Ana'}
+        ]
+        assert repositorio.obtener_estado('saga-1').influencer_nombre == 'Ana'
+
+    def test_esquema_se_registra_con_las_entradas(self, sesion):
+        avro = codec_saga_log(CodecAvro.nombre)
+        fila = valores_saga_log(SagaLog(id_correlacion='saga-2', evento_tipo='EventoDominioContratoCreado',
+                                        evento_datos={'contrato_id': 'k-1', 'monto_total': 1500.0},
+                                        paso_index=3), avro)
+        id_esquema = avro.esquema_de(fila['evento_datos_binario'])
+
+        insertar_ignorando_duplicados(sesion, [fila])
+        sesion.rollback()
+        # La transacción revertida no deja el esquema confirmado y se vuelve a registrar
+        insertar_ignorando_duplicados(sesion, [fila])
+        sesion.commit()
+
+        assert obtener_definicion_esquema(sesion, id_esquema) == 'contrato_id:string,monto_total:double'
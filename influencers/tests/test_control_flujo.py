@@ -0,0 +1,119 @@
+"""
+Tests del control de flujo adaptativo de los consumidores.
+"""
+
+import os
+import sys
+import threading
+import time
+
+src_path = os.path.join(os.path.dirname(__file__), '..', 'src')
+sys.path.insert(0, src_path)
+
+from alpes_partners.seedwork.infraestructura.broker_memoria import BrokerMemoria, ClienteMemoria
+from alpes_partners.seedwork.infraestructura.consumidores import RuntimeConsumidores
+from alpes_partners.seedwork.infraestructura.control_flujo import ControlFlujo, PoliticaFlujo
+
+POLITICA = PoliticaFlujo(latencia_maxima_ms=50, espera_pool_maxima_ms=20, pausa_ms=50, intervalo_ajuste_ms=0,
+                         suavizado=1.0)
+
+
+def _control(maximo=8, espera_pool_ms=None):
+    return ControlFlujo('prueba', maximo, POLITICA, espera_pool_ms)
+
+
+def _procesar(control, segundos):
+    assert control.adquirir(0)
+    control.liberar(segundos)
+
+
+class TestControlFlujo:
+    """Tests de ControlFlujo."""
+
+    def test_latencia_alta_reduce_la_ventana_una_vez_por_latencia(self):
+        control = _control()
+
+        _procesar(control, 0.1)
+        _procesar(control, 0.1)
+
+        # La segunda muestra llega antes de una latencia: refleja la misma saturación
+        assert (control.limite, control.reducciones) == (4, 1)
+        time.sleep(0.1)
+        _procesar(control, 0.1)
+        assert (control.limite, control.reducciones) == (2, 2)
+
+    def test_ventana_crece_de_a_uno_por_intervalo(self):
+        control = _control()
+        control.limite = 2
+
+        _procesar(control, 0.02)
+        _procesar(control, 0.02)
+        assert control.limite == 3
+        time.sleep(0.03)
+        _procesar(control, 0.02)
+        assert control.limite == 4
+
+    def test_con_ventana_uno_saturada_se_pausa_y_reanuda_con_un_mensaje(self):
+        control = _control()
+        control.limite = 1
+
+        _procesar(control, 0.1)
+
+        assert control.pausado and control.pausas == 1
+        assert control.adquirir(0) is False
+        assert control.adquirir(1) is True
+        assert (control.pausado, control.limite, control.latencia_ms) == (False, 1, None)
+
+    def test_espera_del_pool_reduce_la_ventana_aunque_el_manejador_sea_rapido(self):
+        espera_pool_ms = [50.0]
+        control = _control(espera_pool_ms=lambda: espera_pool_ms[0])
+
+        _procesar(control, 0.001)
+        assert control.limite == 4
+
+        espera_pool_ms[0] = 0.0
+        time.sleep(0.01)
+        _procesar(control, 0.001)
+        assert control.limite == 5
+
+    def test_ventana_llena_bloquea_hasta_que_se_libera_un_lugar(self):
+        control = _control(maximo=1)
+        assert control.adquirir(0)
+
+        threading.Timer(0.02, control.liberar, args=(0.001,)).start()
+
+        assert control.adquirir(0) is False
+        assert control.adquirir(1) is True
+
+
+class TestRuntimeConControlFlujo:
+    """Tests del control de flujo en el runtime de consumidores."""
+
+    def test_manejador_lento_achica_la_ventana_de_la_suscripcion(self):
+        broker = BrokerMemoria()
+        cliente = ClienteMemoria(broker=broker)
+        runtime = RuntimeConsumidores(fabrica_cliente=lambda: cliente, timeout_recepcion_ms=20,
+                                      politica_flujo=POLITICA)
+        en_vuelo = []
+        procesados = []
+
+        def manejar(mensaje):
+            en_vuelo.append(suscripcion.flujo.en_vuelo)
+            time.sleep(0.06)
+            procesados.append(mensaje.value())
+
+        suscripcion = runtime.registrar('eventos-influencers', 'sub', None, manejar, nombre='influencers',
+                                        concurrencia=4)
+        runtime.iniciar()
+        for i in range(12):
+            broker.almacenar('eventos-influencers', f'i-{i}')
+        limite = time.monotonic() + 5
+        while len(procesados) < 12 and time.monotonic() < limite:
+            time.sleep(0.01)
+        runtime.detener()
+
+        flujo = runtime.metricas()['influencers']['flujo']
+        assert len(procesados) == 12
+        assert flujo['ventana_maxima'] == 4
+        assert flujo['reducciones'] >= 1
+        assert max(en_vuelo) <= 4
@@ -0,0 +1,157 @@
+"""
+Tests de inspección y reproducción de las DLQ sobre el broker en memoria.
+"""
+
+import os
+import sys
+import time
+
+import pulsar
+import pytest
+
+src_path = os.path.join(os.path.dirname(__file__), '..', 'src')
+sys.path.insert(0, src_path)
+
+from alpes_partners.seedwork.infraestructura.broker_memoria import BrokerMemoria, ClienteMemoria
+from alpes_partners.seedwork.infraestructura.consumidores import RuntimeConsumidores
+from alpes_partners.seedwork.infraestructura.contexto import PROPIEDAD_CORRELACION
+from alpes_partners.seedwork.infraestructura.dlq import CheckpointDLQ, ReproductorDLQ, inspeccionar, topicos_dlq
+from alpes_partners.seedwork.infraestructura.productores import RegistroProductores
+from alpes_partners.seedwork.infraestructura.reintentos import (
+    PROPIEDAD_DLQ_ERROR_TIPO, PROPIEDAD_DLQ_FECHA, PROPIEDAD_DLQ_TOPICO, PoliticaReintentos
+)
+
+DLQ = 'comandos-campanas-campanas-sub-comandos-DLQ'
+
+
+def _muerto(broker, contenido, error_tipo='ValueError', fecha='2024-05-01T10:00:00', topico_dlq=DLQ,
+            origen='comandos-campanas', clave=None):
+    return broker.almacenar(topico_dlq, contenido, {
+        PROPIEDAD_DLQ_TOPICO: origen, PROPIEDAD_DLQ_ERROR_TIPO: error_tipo, PROPIEDAD_DLQ_FECHA: fecha,
+        PROPIEDAD_CORRELACION: f'saga-{contenido}',
+    }, clave=clave)
+
+
+def _esperar(condicion, timeout: float = 2.0):
+    limite = time.monotonic() + timeout
+    while not condicion():
+        assert time.monotonic() < limite, "La condición no se cumplió a tiempo"
+        time.sleep(0.005)
+
+
+class _RegistroConFallo:
+    """Registro que no confirma la publicación de un contenido dado."""
+
+    def __init__(self, registro, contenido_fallido):
+        self._registro = registro
+        self._contenido_fallido = contenido_fallido
+
+    def publicar_async(self, mensaje, topico, schema, callback=None, propiedades=None, clave=None):
+        if mensaje == self._contenido_fallido:
+            callback(pulsar.Result.Timeout)
+            return
+        self._registro.publicar_async(mensaje, topico, schema, callback=callback, propiedades=propiedades, clave=clave)
+
+    def vaciar(self):
+        return self._registro.vaciar()
+
+
+class TestInspeccionDLQ:
+    """Tests del conteo de mensajes muertos."""
+
+    def test_agrupa_por_topico_de_origen_y_tipo_de_error(self):
+        broker = BrokerMemoria()
+        cliente = ClienteMemoria(broker=broker)
+        _muerto(broker, 'c-1', fecha='2024-05-01T10:00:00')
+        _muerto(broker, 'c-2', fecha='2024-05-02T10:00:00')
+        _muerto(broker, 'c-3', error_tipo='IntegrityError')
+        _muerto(broker, 'k-1', topico_dlq='comandos-contratos-v2-contratos-sub-comandos-v2-DLQ',
+                origen='comandos-contratos-v2')
+
+        conteos = inspeccionar(cliente)
+
+        assert [(c.topico_origen, c.error_tipo, c.mensajes) for c in conteos] == [
+            ('comandos-campanas', 'ValueError', 2),
+            ('comandos-campanas', 'IntegrityError', 1),
+            ('comandos-contratos-v2', 'ValueError', 1),
+        ]
+        assert (conteos[0].primera_fecha, conteos[0].ultima_fecha) == ('2024-05-01T10:00:00', '2024-05-02T10:00:00')
+        # Leer no consume: la DLQ conserva los mensajes
+        assert len(inspeccionar(cliente, [DLQ])) == 2
+
+    def test_cubre_las_suscripciones_de_todos_los_servicios(self):
+        dlqs = topicos_dlq()
+
+        assert 'eventos-influencers-saga-sub-eventos-influencers-DLQ' in dlqs
+        assert 'eventos-influencers-campanas-sub-eventos-influencers-DLQ' in dlqs
+        assert 'comandos-contratos-v2-contratos-sub-comandos-v2-DLQ' in dlqs
+        assert 'eventos-contratos-bff-contratos-stream-DLQ' in dlqs
+
+
+class TestReproduccionDLQ:
+    """Tests de la reproducción de mensajes muertos."""
+
+    def test_mensaje_corregido_vuelve_al_consumidor_con_su_clave_y_propiedades(self):
+        broker = BrokerMemoria()
+        cliente = ClienteMemoria(broker=broker)
+        runtime = RuntimeConsumidores(fabrica_cliente=lambda: cliente, timeout_recepcion_ms=20,
+                                      politica_reintentos=PoliticaReintentos(max_intentos=1))
+        corregido, procesados = [False], []
+
+        def manejar(mensaje):
+            if not corregido[0]:
+                raise ValueError('bug')
+            procesados.append((mensaje.value(), mensaje.partition_key(), dict(mensaje.properties())))
+
+        runtime.registrar('comandos-campanas', 'campanas-sub-comandos', None, manejar)
+        runtime.iniciar()
+        broker.almacenar('comandos-campanas', 'c-1', {PROPIEDAD_CORRELACION: 'saga-1'}, clave='campana-1')
+        _esperar(lambda: broker.topicos[DLQ])
+
+        corregido[0] = True
+        assert ReproductorDLQ(cliente).reproducir(DLQ) == 1
+        _esperar(lambda: procesados)
+        runtime.detener()
+
+        contenido, clave, propiedades = procesados[0]
+        assert (contenido, clave, propiedades[PROPIEDAD_CORRELACION]) == ('c-1', 'campana-1', 'saga-1')
+        assert not any(nombre.startswith('dlq-') for nombre in propiedades)
+
+    def test_reproduccion_por_particion_se_reanuda_desde_el_checkpoint(self, tmp_path):
+        broker = BrokerMemoria()
+        broker.particionar(DLQ, 3)
+        cliente = ClienteMemoria(broker=broker)
+        enviados = [f'c-{i}' for i in range(30)]
+        for i, contenido in enumerate(enviados):
+            _muerto(broker, contenido, clave=f'campana-{i}')
+        ruta = str(tmp_path / 'checkpoint.json')
+
+        registro = RegistroProductores(fabrica_cliente=lambda url: cliente, asincrono=True)
+        fallido = ReproductorDLQ(cliente, registro=_RegistroConFallo(registro, 'c-17'), tasa_por_segundo=0,
+                                 tamano_lote=4, checkpoint=CheckpointDLQ(ruta))
+        with pytest.raises(RuntimeError):
+            fallido.reproducir(DLQ)
+        parcial = len(broker.topicos['comandos-campanas'])
+        assert 0 < parcial < 30
+
+        reanudado = ReproductorDLQ(cliente, tasa_por_segundo=0, tamano_lote=4, checkpoint=CheckpointDLQ(ruta))
+        reanudado.reproducir(DLQ)
+
+        publicados = [m.value() for m in broker.topicos['comandos-campanas']]
+        assert sorted(set(publicados)) == sorted(enviados)
+        # Solo se repite lo que quedó en el lote sin confirmar
+        assert len(publicados) - len(enviados) < 4
+        assert ReproductorDLQ(cliente, checkpoint=CheckpointDLQ(ruta)).reproducir(DLQ) == 0
+
+    def test_reproduccion_respeta_la_tasa(self):
+        broker = BrokerMemoria()
+        cliente = ClienteMemoria(broker=broker)
+        for i in range(40):
+            _muerto(broker, f'c-{i}')
+
+        inicio = time.monotonic()
+        ReproductorDLQ(cliente, tasa_por_segundo=200, tamano_lote=10).reproducir(DLQ)
+
+        # Cuatro lotes de 10 a 200 msg/s: el último sale 150 ms después del primero
+        assert time.monotonic() - inicio >= 0.14
+        assert len(broker.topicos['comandos-campanas']) == 40
@@ -0,0 +1,77 @@
+"""
+Tests del escritor diferido del saga log (group commit).
+"""
+
+import os
+import sys
+import threading
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+src_path = os.path.join(os.path.dirname(__file__), '..', 'src')
+sys.path.insert(0, src_path)
+
+from alpes_partners.modulos.sagas.dominio.entidades import SagaLog
+from alpes_partners.modulos.sagas.infraestructura.escritor_saga_log import EscritorSagaLog
+from alpes_partners.modulos.sagas.infraestructura.repositorio_saga_log import SagaEstadoModelo, SagaLogModelo
+
+
+class FabricaSesionContada:
+    """Fábrica de sesiones sobre SQLite en memoria que cuenta los lotes escritos."""
+
+    def __init__(self):
+        engine = create_engine('sqlite://', poolclass=StaticPool, connect_args={'check_same_thread': False})
+        SagaLogModelo.__table__.create(engine)
+        SagaEstadoModelo.__table__.create(engine)
+        self._fabrica = sessionmaker(bind=engine)
+        self.sesiones = 0
+
+    def __call__(self):
+        self.sesiones += 1
+        return self._fabrica()
+
+    def filas(self):
+        with self._fabrica() as sesion:
+            return sesion.execute(select(SagaLogModelo)).scalars().all()
+
+
+def _entrada(id_correlacion: str, paso_index: int, evento_tipo: str = 'Paso') -> SagaLog:
+    return SagaLog(id_correlacion=id_correlacion, evento_tipo=evento_tipo,
+                   evento_datos={}, paso_index=paso_index)
+
+
+class TestEscritorSagaLog:
+    """Tests del escritor diferido."""
+
+    def test_agrupa_entradas_de_varios_hilos_en_pocos_lotes(self):
+        fabrica = FabricaSesionContada()
+        escritor = EscritorSagaLog(fabrica_sesion=fabrica, intervalo_ms=200, max_filas=1000).iniciar()
+
+        def saga(i):
+            for paso in range(5):
+                assert escritor.agregar(_entrada(f'saga-{i}', paso)) is None
+
+        hilos = [threading.Thread(target=saga, args=(i,)) for i in range(20)]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+
+        assert escritor.vaciar(timeout=5)
+        assert len(fabrica.filas()) == 100
+        assert fabrica.sesiones <= 3
+        escritor.detener()
+
+    def test_entrada_sincrona_confirma_el_lote_y_reporta_duplicados(self):
+        fabrica = FabricaSesionContada()
+        escritor = EscritorSagaLog(fabrica_sesion=fabrica, intervalo_ms=60_000).iniciar()
+
+        escritor.agregar(_entrada('saga-1', 1))
+        assert escritor.agregar(_entrada('saga-1', 4, evento_tipo='Fin'), sincrono=True) is True
+        # El paso asíncrono previo quedó en el mismo lote, sin esperar el intervalo
+        assert len(fabrica.filas()) == 2
+
+        assert escritor.agregar(_entrada('saga-1', 4, evento_tipo='Fin'), sincrono=True) is False
+        escritor.detener()
@@ -0,0 +1,136 @@
+"""
+Tests de los consumidores idempotentes.
+"""
+
+import os
+import sys
+
+import pytest
+from flask import Flask
+from sqlalchemy import Column, String, func, select
+from sqlalchemy.orm import declarative_base
+
+src_path = os.path.join(os.path.dirname(__file__), '..', 'src')
+sys.path.insert(0, src_path)
+
+from alpes_partners.seedwork.infraestructura.broker_memoria import BrokerMemoria
+from alpes_partners.seedwork.infraestructura.contexto import PROPIEDAD_ID_MENSAJE
+from alpes_partners.seedwork.infraestructura.database import db
+from alpes_partners.seedwork.infraestructura.idempotencia import (
+    Base as BaseIdempotencia, MensajeProcesadoModelo, RegistroIdempotencia, id_mensaje
+)
+from alpes_partners.seedwork.infraestructura.uow import procesar_en_lote
+
+Base = declarative_base()
+
+CONSUMIDOR = 'campanas-comandos'
+
+
+class FilaIdempotente(Base):
+    __tablename__ = "filas_idempotentes"
+
+    id = Column(String(36), primary_key=True)
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        Base.metadata.create_all(bind=db.engine)
+        BaseIdempotencia.metadata.create_all(bind=db.engine)
+        yield app
+
+
+def _mensaje(valor, id_propiedad=None):
+    propiedades = {PROPIEDAD_ID_MENSAJE: id_propiedad} if id_propiedad else {}
+    return BrokerMemoria().almacenar('comandos-campanas', valor, propiedades)
+
+
+def _filas():
+    return sorted(db.session.execute(select(FilaIdempotente.id)).scalars())
+
+
+class TestRegistroIdempotencia:
+    """Tests de RegistroIdempotencia."""
+
+    def _procesar(self, registro, mensaje, fallar=False):
+        """Manejador como el de un consumidor: registra el id y el efecto en la misma transacción."""
+        if not registro.registrar_si_nuevo(db.session, CONSUMIDOR, mensaje):
+            return False
+        db.session.add(FilaIdempotente(id=mensaje.value()))
+        if fallar:
+            db.session.rollback()
+            return False
+        db.session.commit()
+        return True
+
+    def test_id_sale_de_la_propiedad_o_del_id_de_pulsar(self):
+        assert id_mensaje(_mensaje('a', 'id-1')) == 'id-1'
+        mensaje = _mensaje('a')
+        assert id_mensaje(mensaje) == str(mensaje.message_id())
+
+    def test_duplicado_se_omite_sin_tocar_el_dominio(self, app):
+        registro = RegistroIdempotencia()
+
+        assert self._procesar(registro, _mensaje('a', 'id-1')) is True
+        assert self._procesar(registro, _mensaje('b', 'id-1')) is False
+
+        assert _filas() == ['a']
+        assert registro.duplicados == 1
+
+    def test_rollback_no_marca_el_mensaje(self, app):
+        registro = RegistroIdempotencia()
+
+        assert self._procesar(registro, _mensaje('a', 'id-1'), fallar=True) is False
+        assert self._procesar(registro, _mensaje('a', 'id-1')) is True
+
+        assert _filas() == ['a']
+        assert db.session.scalar(select(func.count()).select_from(MensajeProcesadoModelo)) == 1
+
+    def test_confirmados_recientes_no_consultan_la_tabla(self, app):
+        registro = RegistroIdempotencia()
+        self._procesar(registro, _mensaje('a', 'id-1'))
+        db.session.execute(MensajeProcesadoModelo.__table__.delete())
+        db.session.commit()
+
+        assert registro.procesado(db.session, CONSUMIDOR, 'id-1') is True
+        # Otro proceso (sin el id en memoria) lo encuentra en la tabla
+        self._procesar(registro, _mensaje('b', 'id-2'))
+        assert RegistroIdempotencia().procesado(db.session, CONSUMIDOR, 'id-2') is True
+
+    def test_el_lru_descarta_los_mas_antiguos(self, app):
+        registro = RegistroIdempotencia(capacidad=1)
+        self._procesar(registro, _mensaje('a', 'id-1'))
+        self._procesar(registro, _mensaje('b', 'id-2'))
+        db.session.execute(MensajeProcesadoModelo.__table__.delete())
+        db.session.commit()
+
+        assert registro.procesado(db.session, CONSUMIDOR, 'id-1') is False
+        assert registro.procesado(db.session, CONSUMIDOR, 'id-2') is True
+
+    def test_consumidores_distintos_no_comparten_ids(self, app):
+        registro = RegistroIdempotencia()
+        self._procesar(registro, _mensaje('a', 'id-1'))
+
+        assert registro.procesado(db.session, 'contratos-comandos', 'id-1') is False
+
+    def test_en_lote_solo_se_marcan_los_mensajes_confirmados(self, app):
+        registro = RegistroIdempotencia()
+
+        def procesar(mensaje):
+            if registro.registrar_si_nuevo(db.session, CONSUMIDOR, mensaje):
+                db.session.add(FilaIdempotente(id=mensaje.value()))
+                db.session.flush()
+                if mensaje.value() == 'malo':
+                    raise ValueError('comando inválido')
+
+        mensajes = [_mensaje('a', 'id-1'), _mensaje('malo', 'id-2'), _mensaje('a', 'id-1')]
+        fallidos = procesar_en_lote(db.session, mensajes, procesar)
+
+        assert [m.value() for m, _ in fallidos] == ['malo']
+        assert _filas() == ['a']
+        assert registro.duplicados == 1
+        assert registro.procesado(db.session, CONSUMIDOR, 'id-1') is True
+        assert registro.procesado(db.session, CONSUMIDOR, 'id-2') is False
@@ -0,0 +1,111 @@
+"""
+Tests para el outbox transaccional y su relay.
+"""
+
+import os
+import sys
+
+from pulsar.schema import AvroSchema
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+src_path = os.path.join(os.path.dirname(__file__), '..', 'src')
+sys.path.insert(0, src_path)
+
+from alpes_partners.seedwork.infraestructura.broker_memoria import BrokerMemoria, ClienteMemoria
+from alpes_partners.seedwork.infraestructura.outbox import Base, OutboxModelo, RelayOutbox, capturar_en_outbox
+from alpes_partners.seedwork.infraestructura.productores import RegistroProductores
+from alpes_partners.modulos.influencers.infraestructura.schema.v1.eventos import (
+    EventoInfluencerRegistrado, InfluencerRegistradoPayload
+)
+
+TOPICO = 'eventos-influencers'
+
+
+def _evento(numero: int) -> EventoInfluencerRegistrado:
+    return EventoInfluencerRegistrado(
+        id=f'evento-{numero}',
+        time=numero,
+        ingestion=numero,
+        specversion="1.0",
+        type="InfluencerRegistrado",
+        datacontenttype="application/json",
+        service_name="alpes-partners-influencers",
+        data=InfluencerRegistradoPayload(
+            id_influencer=f'influencer-{numero}', nombre='Ana', email='ana@test.com',
+            categorias=['moda'], fecha_registro=numero
+        )
+    )
+
+
+def _fabrica_sesion():
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+
+class TestOutbox:
+    """Tests del outbox."""
+
+    def test_publicacion_capturada_no_llega_al_broker_hasta_el_relay(self):
+        broker = BrokerMemoria()
+        registro = RegistroProductores(fabrica_cliente=lambda url: ClienteMemoria(url, broker=broker))
+        fabrica_sesion = _fabrica_sesion()
+
+        sesion = fabrica_sesion()
+        with capturar_en_outbox(sesion):
+            for i in range(3):
+                registro.publicar(_evento(i), TOPICO, AvroSchema(EventoInfluencerRegistrado))
+        sesion.commit()
+        sesion.close()
+
+        assert broker.total_mensajes() == 0
+
+        relay_registro = RegistroProductores(
+            fabrica_cliente=lambda url: ClienteMemoria(url, broker=broker), asincrono=True
+        )
+        relay = RelayOutbox(fabrica_sesion=fabrica_sesion, registro=relay_registro, tamano_lote=2)
+
+        assert relay.drenar_lote() == 2
+        assert relay.drenar_lote() == 1
+        assert relay.drenar_lote() == 0
+
+        publicados = [m.value() for m in broker.topicos[TOPICO]]
+        assert [e.data.id_influencer for e in publicados] == ['influencer-0', 'influencer-1', 'influencer-2']
+
+        sesion = fabrica_sesion()
+        filas = sesion.execute(select(OutboxModelo)).scalars().all()
+        assert all(fila.enviado for fila in filas)
+
+    def test_rollback_descarta_mensajes(self):
+        registro = RegistroProductores(fabrica_cliente=lambda url: ClienteMemoria(url))
+        fabrica_sesion = _fabrica_sesion()
+
+        sesion = fabrica_sesion()
+        with capturar_en_outbox(sesion):
+            registro.publicar(_evento(1), TOPICO, AvroSchema(EventoInfluencerRegistrado))
+        sesion.rollback()
+
+        assert fabrica_sesion().execute(select(OutboxModelo)).first() is None
+
+    def test_relay_conserva_la_clave_de_particion(self):
+        broker = BrokerMemoria()
+        registro = RegistroProductores(fabrica_cliente=lambda url: ClienteMemoria(url, broker=broker))
+        fabrica_sesion = _fabrica_sesion()
+
+        sesion = fabrica_sesion()
+        with capturar_en_outbox(sesion):
+            registro.publicar(_evento(1), TOPICO, AvroSchema(EventoInfluencerRegistrado),
+                              propiedades={'origen': 'test'}, clave='influencer-1')
+        sesion.commit()
+        sesion.close()
+
+        relay = RelayOutbox(fabrica_sesion=fabrica_sesion, registro=RegistroProductores(
+            fabrica_cliente=lambda url: ClienteMemoria(url, broker=broker), asincrono=True
+        ))
+        assert relay.drenar_lote() == 1
+
+        publicado = broker.topicos[TOPICO][0]
+        assert publicado.partition_key() == 'influencer-1'
+        assert publicado.properties()['origen'] == 'test'
+        assert '__clave_particion' not in publicado.properties()
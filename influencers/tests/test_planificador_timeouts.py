@@ -0,0 +1,103 @@
+"""
+Tests del planificador de timeouts de sagas.
+"""
+
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+src_path = os.path.join(os.path.dirname(__file__), '..', 'src')
+sys.path.insert(0, src_path)
+
+from alpes_partners.seedwork.aplicacion.sagas import PlanificadorTimeouts
+
+
+def _en(segundos: float) -> datetime:
+    return datetime.utcnow() + timedelta(seconds=segundos)
+
+
+class TestPlanificadorTimeouts:
+    """Tests del heap de plazos."""
+
+    def test_vence_en_orden_de_fecha_limite(self):
+        planificador = PlanificadorTimeouts()
+        planificador.programar('saga-3', 1, _en(30))
+        planificador.programar('saga-1', 1, _en(10))
+        planificador.programar('saga-2', 2, _en(20))
+
+        assert planificador.tomar_vencidos(ahora=time.time() + 25) == [('saga-1', 1), ('saga-2', 2)]
+        assert len(planificador) == 1
+
+    def test_reprogramar_y_cancelar_descartan_el_plazo_anterior(self):
+        planificador = PlanificadorTimeouts()
+        planificador.programar('saga-1', 1, _en(10))
+        planificador.programar('saga-1', 1, _en(100))
+        planificador.programar('saga-2', 1, _en(10))
+        planificador.cancelar('saga-2')
+
+        assert planificador.tomar_vencidos(ahora=time.time() + 50) == []
+        assert planificador.tomar_vencidos(ahora=time.time() + 150) == [('saga-1', 1)]
+
+    def test_pasos_concurrentes_tienen_plazos_independientes(self):
+        planificador = PlanificadorTimeouts()
+        planificador.programar('saga-1', 1, _en(10))
+        planificador.programar('saga-1', 2, _en(20))
+        planificador.programar('saga-1', 3, _en(30))
+        assert len(planificador) == 3
+
+        # Responde la rama 1: las otras dos siguen con su plazo
+        planificador.cancelar('saga-1', 1)
+        assert planificador.tomar_vencidos(ahora=time.time() + 25) == [('saga-1', 2)]
+
+        planificador.cancelar('saga-1')
+        assert planificador.tomar_vencidos(ahora=time.time() + 3600) == []
+        assert len(planificador) == 0
+
+    def test_escala_a_cien_mil_sagas(self):
+        planificador = PlanificadorTimeouts()
+        base = datetime.utcnow()
+        for i in range(100_000):
+            planificador.programar(f'saga-{i}', 2, base + timedelta(milliseconds=i))
+        for i in range(0, 100_000, 2):
+            planificador.cancelar(f'saga-{i}')
+
+        vencidos = planificador.tomar_vencidos(ahora=time.time() + 3600)
+        assert len(vencidos) == 50_000
+        assert vencidos[0] == ('saga-1', 2)
+
+    def test_hilo_invoca_callback_al_vencer(self):
+        vencidos = []
+        evento = threading.Event()
+
+        def al_vencer(id_correlacion, paso_index):
+            vencidos.append((id_correlacion, paso_index))
+            evento.set()
+
+        planificador = PlanificadorTimeouts().iniciar(al_vencer)
+        planificador.programar('saga-1', 2, _en(0.05))
+
+        assert evento.wait(timeout=2)
+        assert vencidos == [('saga-1', 2)]
+        planificador.detener()
+
+    def test_callback_lento_no_bloquea_otro_vencimiento(self):
+        liberar = threading.Event()
+        segundo = threading.Event()
+
+        def al_vencer(id_correlacion, paso_index):
+            if id_correlacion == 'saga-lenta':
+                liberar.wait(timeout=5)
+            else:
+                segundo.set()
+
+        with ThreadPoolExecutor(max_workers=2) as ejecutor:
+            planificador = PlanificadorTimeouts(ejecutor=ejecutor).iniciar(al_vencer)
+            planificador.programar('saga-lenta', 1, _en(0.05))
+            planificador.programar('saga-2', 1, _en(0.1))
+
+            assert segundo.wait(timeout=2)
+            liberar.set()
+            planificador.detener()
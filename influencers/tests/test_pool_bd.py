@@ -0,0 +1,98 @@
+"""
+Tests del engine compartido y su pool de conexiones.
+"""
+
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import pytest
+from flask import Flask
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+
+src_path = os.path.join(os.path.dirname(__file__), '..', 'src')
+sys.path.insert(0, src_path)
+
+from alpes_partners.config.settings import settings
+from alpes_partners.seedwork.infraestructura import database
+from alpes_partners.seedwork.infraestructura.database import (
+    MetricasPool, db, estado_pool, medir_pool, metricas_pool, precalentar_pool
+)
+
+
+def _app(uri):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    db.init_app(app)
+    return app
+
+
+@pytest.fixture
+def motor(monkeypatch):
+    """Engine del proceso reemplazado por un QueuePool sobre SQLite de 3 conexiones."""
+    motor = create_engine('sqlite://', poolclass=QueuePool, pool_size=3, max_overflow=2,
+                          creator=lambda: sqlite3.connect(':memory:', check_same_thread=False))
+    monkeypatch.setattr(database, 'engine', motor)
+    monkeypatch.setattr(settings, 'db_pool_tamano', 3)
+    monkeypatch.setattr(settings, 'db_pool_desborde', 2)
+    yield motor
+    motor.dispose()
+
+
+class TestEngineCompartido:
+    """Tests del engine compartido con Flask-SQLAlchemy."""
+
+    def test_apps_con_la_url_del_servicio_usan_el_engine_del_proceso(self):
+        with _app(settings.database_url).app_context():
+            assert db.engine is database.engine
+        assert isinstance(database.engine.pool, QueuePool)
+        assert database.engine.pool.size() == settings.db_pool_tamano
+
+    def test_apps_con_otra_url_tienen_su_propio_engine(self):
+        with _app('sqlite://').app_context():
+            assert db.engine is not database.engine
+
+    def test_precalentar_deja_abiertas_las_conexiones_del_pool(self, motor):
+        esperas = metricas_pool.esperas
+
+        assert precalentar_pool() == 3
+
+        assert motor.pool.checkedin() == 3
+        # El precalentamiento no cuenta como espera de los manejadores
+        assert metricas_pool.esperas == esperas
+
+    def test_estado_del_pool_incluye_utilizacion(self, motor):
+        conexiones = [motor.pool.connect() for _ in range(2)]
+        try:
+            estado = estado_pool()
+        finally:
+            for conexion in conexiones:
+                conexion.close()
+
+        assert (estado['prestadas'], estado['abiertas'], estado['utilizacion']) == (2, 2, 0.4)
+        assert estado_pool()['prestadas'] == 0
+
+
+class TestMedirPool:
+    """Tests de las métricas tomadas con los eventos del pool."""
+
+    def test_espera_con_el_pool_agotado_y_aperturas_aparte(self):
+        motor = create_engine('sqlite://', poolclass=QueuePool, pool_size=1, max_overflow=0,
+                              creator=lambda: sqlite3.connect(':memory:', check_same_thread=False))
+        metricas = MetricasPool()
+        medir_pool(motor, metricas)
+
+        conexion = motor.pool.connect()
+        hilo = threading.Thread(target=lambda: motor.pool.connect().close())
+        hilo.start()
+        time.sleep(0.05)
+        conexion.close()
+        hilo.join(timeout=2)
+        motor.dispose()
+
+        # La conexión nueva no esperó; el hilo esperó mientras el pool estaba agotado
+        assert (metricas.aperturas, metricas.esperas, metricas.en_uso) == (1, 1, 0)
+        assert metricas.espera_maxima >= 0.04
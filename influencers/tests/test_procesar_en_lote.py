@@ -0,0 +1,86 @@
+"""
+Tests del procesamiento de mensajes en lotes transaccionales.
+"""
+
+import os
+import sys
+
+import pytest
+from flask import Flask
+from pydispatch import dispatcher
+from sqlalchemy import Column, String, select
+from sqlalchemy.orm import declarative_base
+
+src_path = os.path.join(os.path.dirname(__file__), '..', 'src')
+sys.path.insert(0, src_path)
+
+from alpes_partners.seedwork.dominio.entidades import AgregacionRaiz
+from alpes_partners.seedwork.infraestructura.broker_memoria import BrokerMemoria
+from alpes_partners.seedwork.infraestructura.contexto import PROPIEDAD_CORRELACION, contexto_actual
+from alpes_partners.seedwork.infraestructura.database import db
+from alpes_partners.seedwork.infraestructura.uow import UnidadTrabajoPuerto, lote_actual, procesar_en_lote
+
+Base = declarative_base()
+
+
+class FilaLote(Base):
+    __tablename__ = "filas_lote"
+
+    id = Column(String(36), primary_key=True)
+
+
+class EventoLotePrueba:
+    def __init__(self, valor: str):
+        self.valor = valor
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        Base.metadata.create_all(bind=db.engine)
+        yield app
+
+
+def _procesar(mensaje):
+    """Manejador como el de un comando: registra el agregado en la UoW y confirma."""
+    agregado = AgregacionRaiz(id=mensaje.value())
+    agregado.agregar_evento(EventoLotePrueba(mensaje.value()))
+    UnidadTrabajoPuerto.registrar_batch(lambda a: db.session.add(FilaLote(id=a.id)), agregado)
+    UnidadTrabajoPuerto.commit()
+    if mensaje.value() == 'malo':
+        raise ValueError('comando inválido')
+
+
+def _mensajes(*valores):
+    broker = BrokerMemoria()
+    return [broker.almacenar('comandos-campanas', valor, {PROPIEDAD_CORRELACION: f'saga-{valor}'})
+            for valor in valores]
+
+
+class TestProcesarEnLote:
+    """Tests de procesar_en_lote."""
+
+    def test_un_mensaje_fallido_solo_revierte_su_savepoint(self, app):
+        fallidos = procesar_en_lote(db.session, _mensajes('a', 'malo', 'b'), _procesar)
+
+        assert [(m.value(), type(e)) for m, e in fallidos] == [('malo', ValueError)]
+        assert sorted(db.session.execute(select(FilaLote.id)).scalars()) == ['a', 'b']
+
+    def test_eventos_se_publican_tras_el_commit_en_el_contexto_de_su_mensaje(self, app):
+        publicados = []
+
+        def registrar(evento):
+            # Sin transacción abierta: el lote ya se confirmó
+            confirmada = not db.session().in_transaction()
+            publicados.append((evento.valor, contexto_actual().id_correlacion, lote_actual() is None, confirmada))
+
+        dispatcher.connect(registrar, signal='EventoLotePruebaIntegracion')
+        try:
+            procesar_en_lote(db.session, _mensajes('a', 'malo', 'b'), _procesar)
+        finally:
+            dispatcher.disconnect(registrar, signal='EventoLotePruebaIntegracion')
+
+        assert publicados == [('a', 'saga-a', True, True), ('b', 'saga-b', True, True)]
@@ -0,0 +1,168 @@
+"""
+Tests para el registro de productores de Pulsar compartido.
+"""
+
+import json
+import os
+import sys
+import threading
+
+import pulsar
+
+src_path = os.path.join(os.path.dirname(__file__), '..', 'src')
+sys.path.insert(0, src_path)
+
+from alpes_partners.seedwork.infraestructura.broker_memoria import BrokerMemoria, ClienteMemoria
+from alpes_partners.seedwork.infraestructura.contexto import (
+    PROPIEDAD_CAUSACION, PROPIEDAD_COMPENSACIONES, PROPIEDAD_CORRELACION, PROPIEDAD_ID_MENSAJE, agregar_compensacion,
+    compensaciones_actuales, contexto_desde_mensaje, contexto_mensaje
+)
+from alpes_partners.seedwork.infraestructura.productores import RegistroProductores
+
+
+def _registro(broker, **kwargs):
+    return RegistroProductores(fabrica_cliente=lambda url: ClienteMemoria(url, broker=broker), **kwargs)
+
+
+class TestRegistroProductores:
+    """Tests del registro de productores."""
+
+    def test_reutiliza_cliente_y_productor_entre_hilos(self):
+        broker = BrokerMemoria()
+        registro = _registro(broker)
+
+        def publicar():
+            for i in range(50):
+                registro.publicar(f'm-{i}', 'eventos-influencers', None)
+
+        hilos = [threading.Thread(target=publicar) for _ in range(8)]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+
+        assert broker.conexiones == 1
+        assert broker.productores_creados == 1
+        assert len(broker.topicos['eventos-influencers']) == 400
+
+    def test_un_productor_por_topico(self):
+        broker = BrokerMemoria()
+        registro = _registro(broker)
+
+        registro.publicar('a', 'eventos-campanas', None)
+        registro.publicar('b', 'eventos-contratos', None)
+        registro.publicar('c', 'eventos-campanas', None)
+
+        assert broker.productores_creados == 2
+
+    def test_limpia_productores_inactivos(self):
+        broker = BrokerMemoria()
+        registro = _registro(broker, inactividad_segundos=0)
+        productor = registro.obtener_productor('eventos-campanas', None)
+
+        assert registro.limpiar_inactivos() == 1
+        assert productor.cerrado
+        registro.publicar('x', 'eventos-campanas', None)
+        assert broker.productores_creados == 2
+
+    def test_cerrar_cierra_productores(self):
+        broker = BrokerMemoria()
+        registro = _registro(broker)
+        productor = registro.obtener_productor('eventos-campanas', None)
+
+        registro.cerrar()
+
+        assert productor.cerrado
+
+
+class TestPublicacionAsincrona:
+    """Tests del modo asíncrono con batching."""
+
+    def test_vaciar_espera_confirmaciones(self):
+        broker = BrokerMemoria()
+        registro = _registro(broker, asincrono=True, max_en_vuelo=10)
+
+        for i in range(100):
+            registro.publicar(f'm-{i}', 'eventos-influencers', None)
+
+        assert registro.vaciar(timeout=5)
+        assert len(broker.topicos['eventos-influencers']) == 100
+        assert registro.estadisticas()['enviados'] == 100
+        assert registro.estadisticas()['en_vuelo'] == 0
+
+    def test_cuenta_fallos_de_confirmacion(self):
+        class ProductorFallido:
+            def send_async(self, mensaje, callback, **kwargs):
+                callback(pulsar.Result.Timeout, None)
+
+            def flush(self):
+                pass
+
+            def close(self):
+                pass
+
+        class ClienteFallido:
+            def create_producer(self, topico, **kwargs):
+                return ProductorFallido()
+
+            def close(self):
+                pass
+
+        registro = RegistroProductores(fabrica_cliente=lambda url: ClienteFallido(), asincrono=True)
+        registro.publicar('m', 'eventos-influencers', None)
+
+        assert registro.vaciar(timeout=1)
+        assert registro.estadisticas()['fallidos'] == 1
+
+
+class TestPropagacionContexto:
+    """Tests de la propagación de correlación y causación en las propiedades."""
+
+    def test_publicacion_estampa_correlacion_y_causacion(self):
+        broker = BrokerMemoria()
+        registro = _registro(broker)
+
+        registro.publicar('sin-contexto', 'eventos-influencers', None)
+        with contexto_mensaje(id_correlacion='corr-1'):
+            registro.publicar('origen', 'eventos-influencers', None)
+        sin_contexto, origen = broker.topicos['eventos-influencers']
+
+        # Cada publicación lleva su propio id
+        ids = {m.properties().pop(PROPIEDAD_ID_MENSAJE) for m in (sin_contexto, origen)}
+        assert len(ids) == 2
+        assert sin_contexto.properties() == {}
+        assert origen.properties() == {PROPIEDAD_CORRELACION: 'corr-1'}
+
+        # Lo publicado al procesar un mensaje conserva la correlación y lo tiene como causa
+        with contexto_desde_mensaje(origen):
+            registro.publicar('derivado', 'comandos-campanas', None)
+        derivado = broker.topicos['comandos-campanas'][0]
+
+        assert derivado.properties().pop(PROPIEDAD_ID_MENSAJE) not in ids
+        assert derivado.properties() == {
+            PROPIEDAD_CORRELACION: 'corr-1',
+            PROPIEDAD_CAUSACION: str(origen.message_id()),
+        }
+
+    def test_compensaciones_se_acumulan_en_el_sobre(self):
+        broker = BrokerMemoria()
+        registro = _registro(broker)
+
+        with contexto_mensaje(id_correlacion='corr-1'), agregar_compensacion('EliminarInfluencer', influencer_id='i-1'):
+            registro.publicar('influencer', 'eventos-influencers', None)
+        influencer = broker.topicos['eventos-influencers'][0]
+
+        # El siguiente paso recibe el sobre y agrega su propia compensación
+        with contexto_desde_mensaje(influencer), agregar_compensacion('EliminarCampana', campana_id='c-1'):
+            registro.publicar('campana', 'eventos-campanas', None)
+        campana = broker.topicos['eventos-campanas'][0]
+
+        assert json.loads(influencer.properties()[PROPIEDAD_COMPENSACIONES]) == [
+            {'comando': 'EliminarInfluencer', 'influencer_id': 'i-1'}
+        ]
+        with contexto_desde_mensaje(campana):
+            assert compensaciones_actuales() == [
+                {'comando': 'EliminarInfluencer', 'influencer_id': 'i-1'},
+                {'comando': 'EliminarCampana', 'campana_id': 'c-1'},
+            ]
+        assert compensaciones_actuales() == []
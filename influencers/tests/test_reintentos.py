@@ -0,0 +1,73 @@
+"""
+Tests de la política de reintentos y del programador de rechazos.
+"""
+
+import os
+import sys
+import threading
+
+src_path = os.path.join(os.path.dirname(__file__), '..', 'src')
+sys.path.insert(0, src_path)
+
+from alpes_partners.seedwork.infraestructura.broker_memoria import BrokerMemoria
+from alpes_partners.seedwork.infraestructura.reintentos import (
+    PoliticaReintentos, ProgramadorRechazos, intento_de, topico_dlq
+)
+
+
+class _Consumidor:
+    def __init__(self):
+        self.rechazados = []
+        self.rechazo = threading.Event()
+
+    def negative_acknowledge(self, mensaje):
+        self.rechazados.append(mensaje)
+        self.rechazo.set()
+
+
+class TestPoliticaReintentos:
+    """Tests del cálculo de retardos."""
+
+    def test_retardo_crece_exponencialmente_con_jitter_acotado(self):
+        politica = PoliticaReintentos(max_intentos=10, retardo_base_ms=100, retardo_maximo_ms=1000)
+
+        for intento, tope in ((1, 100), (2, 200), (3, 400), (4, 800), (5, 1000), (9, 1000)):
+            retardos = [politica.retardo_ms(intento) for _ in range(50)]
+            assert all(tope / 2 <= retardo <= tope for retardo in retardos)
+            assert len(set(retardos)) > 1
+
+    def test_agotada_al_llegar_al_maximo_de_intentos(self):
+        politica = PoliticaReintentos(max_intentos=3)
+
+        assert not politica.agotada(2)
+        assert politica.agotada(3)
+
+    def test_intento_sale_del_contador_de_reentregas(self):
+        mensaje = BrokerMemoria().almacenar('comandos-campanas', 'c-1')
+
+        assert intento_de(mensaje) == 1
+        assert intento_de(mensaje.reentregado().reentregado()) == 3
+        assert topico_dlq('comandos-campanas', 'campanas-sub-comandos') == 'comandos-campanas-campanas-sub-comandos-DLQ'
+
+
+class TestProgramadorRechazos:
+    """Tests del rechazo diferido de mensajes."""
+
+    def test_rechaza_al_vencer_el_retardo(self):
+        programador, consumidor = ProgramadorRechazos(), _Consumidor()
+
+        programador.programar(consumidor, 'lento', 0.2)
+        programador.programar(consumidor, 'rapido', 0.01)
+
+        assert consumidor.rechazo.wait(1)
+        assert consumidor.rechazados == ['rapido']
+        programador.detener()
+
+    def test_detener_rechaza_los_pendientes(self):
+        programador, consumidor = ProgramadorRechazos(), _Consumidor()
+        programador.programar(consumidor, 'm-1', 60)
+
+        programador.detener()
+
+        assert consumidor.rechazados == ['m-1']
+        assert programador.pendientes() == 0
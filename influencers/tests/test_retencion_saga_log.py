@@ -0,0 +1,119 @@
+"""
+Tests de la retención del saga log: compactación de sagas terminadas y archivo en segmentos.
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+src_path = os.path.join(os.path.dirname(__file__), '..', 'src')
+sys.path.insert(0, src_path)
+
+from alpes_partners.seedwork.infraestructura.database import db
+from alpes_partners.modulos.sagas.dominio.entidades import EstadoSaga, SagaLog
+from alpes_partners.modulos.sagas.infraestructura.repositorio_saga_log import (
+    RepositorioSagaLogSQLAlchemy, SagaEstadoModelo, SagaLogModelo, SagaResumenModelo, insertar_ignorando_duplicados,
+    obtener_resumen_saga, valores_saga_log
+)
+from alpes_partners.modulos.sagas.infraestructura.retencion_saga_log import ArchivoSagaLog, CompactadorSagaLog
+
+
+@pytest.fixture
+def fabrica_sesion():
+    engine = create_engine('sqlite://')
+    for modelo in (SagaLogModelo, SagaEstadoModelo, SagaResumenModelo):
+        modelo.__table__.create(engine)
+    return sessionmaker(bind=engine)
+
+
+def _registrar_saga(fabrica_sesion, id_correlacion: str, fecha: datetime, terminada: bool = True):
+    pasos = [('Inicio', 0, {}), ('EventoDominioInfluencerRegistrado', 1, {'influencer_id': f'inf-{id_correlacion}'})]
+    if terminada:
+        pasos.append(('Fin', 3, {}))
+    with fabrica_sesion() as sesion:
+        insertar_ignorando_duplicados(sesion, [
+            valores_saga_log(SagaLog(id_correlacion=id_correlacion, evento_tipo=tipo, evento_datos=datos,
+                                     paso_index=paso, fecha_procesamiento=fecha))
+            for tipo, paso, datos in pasos
+        ])
+        sesion.commit()
+
+
+def _contar(fabrica_sesion, modelo) -> int:
+    with fabrica_sesion() as sesion:
+        return sesion.execute(select(func.count()).select_from(modelo)).scalar_one()
+
+
+class TestCompactacionSagaLog:
+    """Tests del compactador de sagas terminadas."""
+
+    def test_compacta_solo_sagas_terminadas_antes_del_corte(self, fabrica_sesion, tmp_path):
+        ahora = datetime.utcnow()
+        _registrar_saga(fabrica_sesion, 'vieja-1', ahora - timedelta(days=40))
+        _registrar_saga(fabrica_sesion, 'vieja-2', ahora - timedelta(days=35))
+        _registrar_saga(fabrica_sesion, 'reciente', ahora - timedelta(days=1))
+        _registrar_saga(fabrica_sesion, 'en-curso', ahora - timedelta(days=40), terminada=False)
+        archivo = ArchivoSagaLog(str(tmp_path))
+        compactador = CompactadorSagaLog(archivo, timedelta(days=30), fabrica_sesion=fabrica_sesion, tamano_lote=1)
+
+        assert compactador.compactar(ahora) == 2
+
+        with fabrica_sesion() as sesion:
+            calientes = set(sesion.execute(select(SagaLogModelo.id_correlacion)).scalars())
+            estados = set(sesion.execute(select(SagaEstadoModelo.id_correlacion)).scalars())
+            resumen = obtener_resumen_saga(sesion, 'vieja-1')
+        assert calientes == estados == {'reciente', 'en-curso'}
+        assert _contar(fabrica_sesion, SagaResumenModelo) == 2
+        assert resumen.estado == EstadoSaga.COMPLETADA.value
+        assert resumen.pasos == 3
+        assert resumen.recorrido == '0:Inicio 1:EventoDominioInfluencerRegistrado 3:Fin'
+        assert resumen.influencer_id == 'inf-vieja-1'
+
+        # Las entradas crudas quedan en el segmento del resumen
+        archivadas = list(archivo.leer(resumen.segmento, 'vieja-1'))
+        assert [e['evento_tipo'] for e in archivadas] == ['Inicio', 'EventoDominioInfluencerRegistrado', 'Fin']
+        assert archivadas[1]['evento_datos'] == {'influencer_id': 'inf-vieja-1'}
+
+    def test_segmentos_solo_agregan_y_rotan(self, tmp_path):
+        archivo = ArchivoSagaLog(str(tmp_path), max_bytes_segmento=1)
+
+        primero = archivo.escribir([{'id': '1', 'id_correlacion': 'a'}])
+        segundo = archivo.escribir([{'id': '2', 'id_correlacion': 'b'}])
+
+        assert primero != segundo
+        assert archivo.segmentos() == sorted([primero, segundo])
+        # Un archivo reabierto continúa en el último segmento si aún tiene espacio
+        continuo = ArchivoSagaLog(str(tmp_path))
+        assert continuo.escribir([{'id': '3', 'id_correlacion': 'b'}]) == segundo
+        assert [e['id'] for e in continuo.leer(segundo)] == ['2', '3']
+
+
+class TestPaginacionSagaLog:
+    """``obtener_todos`` pagina por (fecha_procesamiento, id)."""
+
+    def test_obtener_todos_por_paginas(self):
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(app)
+        with app.app_context():
+            SagaLogModelo.__table__.create(db.engine)
+            SagaEstadoModelo.__table__.create(db.engine)
+            repositorio = RepositorioSagaLogSQLAlchemy()
+            inicio = datetime(2024, 1, 1)
+            for i in range(5):
+                repositorio.agregar(SagaLog(id_correlacion=f'saga-{i}', evento_tipo='Inicio', evento_datos={},
+                                            paso_index=0, fecha_procesamiento=inicio + timedelta(minutes=i)))
+            db.session.commit()
+
+            primera = repositorio.obtener_todos(limite=2)
+            ultima = primera[-1]
+            segunda = repositorio.obtener_todos(limite=2, antes_de=(ultima.fecha_procesamiento, ultima.id))
+            tercera = repositorio.obtener_todos(limite=2, antes_de=(segunda[-1].fecha_procesamiento, segunda[-1].id))
+
+            assert [e.id_correlacion for e in primera + segunda + tercera] == [f'saga-{i}' for i in range(4, -1, -1)]
+            db.session.remove()
@@ -0,0 +1,363 @@
+"""
+Tests del runtime de consumidores compartido sobre el broker en memoria.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+
+import _pulsar
+from pulsar.schema import AvroSchema, Record, String
+
+src_path = os.path.join(os.path.dirname(__file__), '..', 'src')
+sys.path.insert(0, src_path)
+
+from alpes_partners.seedwork.infraestructura.broker_memoria import BrokerMemoria, ClienteMemoria
+from alpes_partners.seedwork.infraestructura.consumidores import (
+    DespachoPorTopico, RuntimeConsumidores, clave_por_campos, topico_corto
+)
+from alpes_partners.seedwork.infraestructura.contexto import PROPIEDAD_CORRELACION, contexto_actual
+from alpes_partners.seedwork.infraestructura.reintentos import (
+    PROPIEDAD_DLQ_ERROR_TIPO, PROPIEDAD_DLQ_INTENTOS, PROPIEDAD_DLQ_TOPICO, PoliticaReintentos
+)
+
+
+def _runtime(broker, **kwargs):
+    cliente = ClienteMemoria(broker=broker)
+    kwargs.setdefault('timeout_recepcion_ms', 20)
+    return RuntimeConsumidores(fabrica_cliente=lambda: cliente, **kwargs)
+
+
+def _esperar(condicion, timeout: float = 2.0):
+    limite = time.monotonic() + timeout
+    while not condicion():
+        assert time.monotonic() < limite, "La condición no se cumplió a tiempo"
+        time.sleep(0.005)
+
+
+class TestRuntimeConsumidores:
+    """Tests del runtime de consumidores."""
+
+    def test_suscripciones_comparten_el_cliente(self):
+        broker = BrokerMemoria()
+        runtime = _runtime(broker)
+        recibidos = []
+        runtime.registrar('eventos-influencers', 'sub-a', None, lambda m: recibidos.append(('a', m.value())))
+        runtime.registrar('eventos-campanas', 'sub-b', None, lambda m: recibidos.append(('b', m.value())))
+        runtime.iniciar()
+
+        broker.almacenar('eventos-influencers', 'i-1')
+        broker.almacenar('eventos-campanas', 'c-1')
+        _esperar(lambda: len(recibidos) == 2)
+        runtime.detener()
+
+        assert sorted(recibidos) == [('a', 'i-1'), ('b', 'c-1')]
+        assert broker.conexiones == 1
+        assert broker.consumidores_creados == 2
+
+    def test_manejador_corre_en_el_contexto_del_mensaje(self):
+        broker = BrokerMemoria()
+        runtime = _runtime(broker)
+        correlaciones = []
+        runtime.registrar('eventos-influencers', 'sub', None,
+                          lambda m: correlaciones.append(contexto_actual().id_correlacion))
+        runtime.iniciar()
+
+        broker.almacenar('eventos-influencers', 'i-1', {PROPIEDAD_CORRELACION: 'saga-1'})
+        _esperar(lambda: correlaciones)
+        runtime.detener()
+
+        assert correlaciones == ['saga-1']
+
+    def test_metricas_por_manejador(self):
+        broker = BrokerMemoria()
+        runtime = _runtime(broker, pausa_error_segundos=0)
+
+        def manejar(mensaje):
+            if mensaje.value() == 'malo':
+                raise ValueError('contenido inválido')
+
+        suscripcion = runtime.registrar('eventos-influencers', 'sub', None, manejar, nombre='influencers')
+        runtime.iniciar()
+        for valor in ('ok-1', 'malo', 'ok-2'):
+            broker.almacenar('eventos-influencers', valor)
+        _esperar(lambda: suscripcion.metricas.recibidos == 3)
+        runtime.detener()
+
+        metricas = runtime.metricas()['influencers']
+        assert (metricas['procesados'], metricas['fallidos']) == (2, 1)
+        assert metricas['ultimo_error'] == 'contenido inválido'
+        # Solo se confirman los mensajes procesados sin error
+        assert suscripcion.consumidor.confirmados == 2
+
+    def test_mensaje_envenenado_se_reintenta_y_pasa_a_la_dlq_sin_frenar_al_resto(self):
+        broker = BrokerMemoria()
+        runtime = _runtime(broker, politica_reintentos=PoliticaReintentos(
+            max_intentos=3, retardo_base_ms=20, retardo_maximo_ms=100))
+        procesados = []
+
+        def manejar(mensaje):
+            if mensaje.value() == 'malo':
+                raise ValueError('contenido inválido')
+            time.sleep(0.002)
+            procesados.append(mensaje.value())
+
+        suscripcion = runtime.registrar('comandos-campanas', 'campanas-sub-comandos', None, manejar)
+        runtime.iniciar()
+        broker.almacenar('comandos-campanas', 'malo', {PROPIEDAD_CORRELACION: 'saga-1'}, clave='campana-1')
+        for i in range(20):
+            broker.almacenar('comandos-campanas', f'ok-{i}')
+        # Los mensajes sanos no esperan a los reintentos del envenenado
+        _esperar(lambda: len(procesados) == 20, timeout=0.5)
+        dlq = 'comandos-campanas-campanas-sub-comandos-DLQ'
+        _esperar(lambda: broker.topicos[dlq])
+        runtime.detener()
+
+        muerto = broker.topicos[dlq][0]
+        assert muerto.value() == 'malo'
+        assert muerto.partition_key() == 'campana-1'
+        assert muerto.properties()[PROPIEDAD_CORRELACION] == 'saga-1'
+        assert muerto.properties()[PROPIEDAD_DLQ_TOPICO] == 'comandos-campanas'
+        assert muerto.properties()[PROPIEDAD_DLQ_ERROR_TIPO] == 'ValueError'
+        assert muerto.properties()[PROPIEDAD_DLQ_INTENTOS] == '3'
+        metricas = suscripcion.metricas.como_dict()
+        assert (metricas['fallidos'], metricas['reintentados'], metricas['enviados_dlq']) == (3, 2, 1)
+        assert suscripcion.consumidor.confirmados == 21
+
+    def test_concurrencia_procesa_mensajes_en_paralelo(self):
+        broker = BrokerMemoria()
+        runtime = _runtime(broker, concurrencia=4)
+        en_proceso, maximo = [0], [0]
+        lock = threading.Lock()
+
+        def manejar(mensaje):
+            with lock:
+                en_proceso[0] += 1
+                maximo[0] = max(maximo[0], en_proceso[0])
+            time.sleep(0.02)
+            with lock:
+                en_proceso[0] -= 1
+
+        suscripcion = runtime.registrar('comandos-campanas', 'sub', None, manejar)
+        runtime.iniciar()
+        for i in range(8):
+            broker.almacenar('comandos-campanas', i)
+        _esperar(lambda: suscripcion.metricas.procesados == 8)
+        runtime.detener()
+
+        assert maximo[0] > 1
+        assert len(suscripcion.hilos) == 4
+
+    def test_detener_espera_el_mensaje_en_proceso(self):
+        broker = BrokerMemoria()
+        runtime = _runtime(broker)
+        empezado, terminados = threading.Event(), []
+
+        def manejar(mensaje):
+            empezado.set()
+            time.sleep(0.05)
+            terminados.append(mensaje.value())
+
+        suscripcion = runtime.registrar('eventos-contratos', 'sub', None, manejar)
+        runtime.iniciar()
+        broker.almacenar('eventos-contratos', 'k-1')
+        empezado.wait(1)
+        runtime.detener()
+
+        assert terminados == ['k-1']
+        assert suscripcion.consumidor.confirmados == 1
+        assert suscripcion.consumidor.cerrado
+        assert not any(hilo.is_alive() for hilo in suscripcion.hilos)
+
+
+class TestProcesamientoPorClave:
+    """Tests del modo concurrente con orden por clave."""
+
+    def test_misma_clave_en_orden_y_claves_distintas_en_paralelo(self):
+        broker = BrokerMemoria()
+        runtime = _runtime(broker, concurrencia=4)
+        procesados = defaultdict(list)
+        en_proceso, maximo, claves_en_proceso = [0], [0], set()
+        lock = threading.Lock()
+
+        def manejar(mensaje):
+            clave, numero = mensaje.value()
+            with lock:
+                assert clave not in claves_en_proceso, "Dos mensajes de la misma clave a la vez"
+                claves_en_proceso.add(clave)
+                en_proceso[0] += 1
+                maximo[0] = max(maximo[0], en_proceso[0])
+            time.sleep(0.005)
+            with lock:
+                procesados[clave].append(numero)
+                claves_en_proceso.discard(clave)
+                en_proceso[0] -= 1
+
+        suscripcion = runtime.registrar('eventos-campanas', 'sub', None, manejar,
+                                        clave=lambda m: m.value()[0])
+        runtime.iniciar()
+        for numero in range(10):
+            for clave in ('campana-1', 'campana-2', 'campana-3', 'campana-4'):
+                broker.almacenar('eventos-campanas', (clave, numero))
+        _esperar(lambda: suscripcion.metricas.procesados == 40)
+        runtime.detener()
+
+        assert all(numeros == list(range(10)) for numeros in procesados.values())
+        assert maximo[0] > 1
+        assert suscripcion.consumidor.confirmados == 40
+        assert len(suscripcion.colas) == 4
+
+    def test_suscripcion_con_clave_es_key_shared(self):
+        suscripciones = []
+
+        class Cliente(ClienteMemoria):
+            def subscribe(self, topico, subscription_name, schema=None, **kwargs):
+                suscripciones.append((subscription_name, kwargs['consumer_type']))
+                return super().subscribe(topico, subscription_name, schema, **kwargs)
+
+        cliente = Cliente(broker=BrokerMemoria())
+        runtime = RuntimeConsumidores(fabrica_cliente=lambda: cliente, timeout_recepcion_ms=20)
+        runtime.registrar('eventos-campanas', 'con-clave', None, lambda m: None, clave=clave_por_campos('campana_id'))
+        runtime.registrar('eventos-campanas', 'sin-clave', None, lambda m: None)
+        runtime.iniciar()
+        runtime.detener()
+
+        assert dict(suscripciones) == {
+            'con-clave': _pulsar.ConsumerType.KeyShared,
+            'sin-clave': _pulsar.ConsumerType.Shared,
+        }
+
+    def test_clave_por_campos_prefiere_la_clave_de_particion(self):
+        broker = BrokerMemoria()
+        clave = clave_por_campos('campana_id', 'influencer_id')
+        evento = SimpleNamespace(data=SimpleNamespace(campana_id=None, influencer_id='influencer-1'))
+
+        assert clave(broker.almacenar('eventos-campanas', evento, clave='campana-9')) == 'campana-9'
+        assert clave(broker.almacenar('eventos-campanas', evento)) == 'influencer-1'
+        assert clave(broker.almacenar('eventos-campanas', SimpleNamespace(data=None))) is None
+
+
+class TestProcesamientoEnLote:
+    """Tests de las suscripciones procesadas en lotes."""
+
+    def test_lote_confirma_los_procesados_y_reintenta_los_fallidos(self):
+        broker = BrokerMemoria()
+        runtime = _runtime(broker, politica_reintentos=PoliticaReintentos(
+            max_intentos=2, retardo_base_ms=20, retardo_maximo_ms=40))
+        lotes = []
+
+        def manejar_lote(mensajes):
+            lotes.append([m.value() for m in mensajes])
+            return [(m, ValueError('comando inválido')) for m in mensajes if m.value() == 'malo']
+
+        suscripcion = runtime.registrar_lote('comandos-campanas', 'campanas-sub-comandos', None, manejar_lote,
+                                             tamano_lote=10, espera_lote_ms=50)
+        runtime.iniciar()
+        valores = ['ok-0', 'malo'] + [f'ok-{i}' for i in range(1, 15)]
+        for valor in valores:
+            broker.almacenar('comandos-campanas', valor)
+        dlq = 'comandos-campanas-campanas-sub-comandos-DLQ'
+        _esperar(lambda: broker.topicos[dlq])
+        runtime.detener()
+
+        assert lotes[0] == valores[:10]
+        assert all(len(lote) <= 10 for lote in lotes)
+        # Solo el mensaje que falló se vuelve a entregar
+        assert sorted(valor for lote in lotes for valor in lote) == sorted(valores + ['malo'])
+        assert broker.topicos[dlq][0].value() == 'malo'
+        metricas = suscripcion.metricas.como_dict()
+        assert (metricas['procesados'], metricas['fallidos'], metricas['lotes']) == (15, 2, len(lotes))
+        assert suscripcion.consumidor.confirmados == 16
+
+    def test_error_del_manejador_falla_todo_el_lote(self):
+        broker = BrokerMemoria()
+        runtime = _runtime(broker)
+
+        def manejar_lote(mensajes):
+            raise RuntimeError('commit fallido')
+
+        suscripcion = runtime.registrar_lote('comandos-contratos-v2', 'sub', None, manejar_lote, tamano_lote=5)
+        runtime.iniciar()
+        for i in range(3):
+            broker.almacenar('comandos-contratos-v2', i)
+        _esperar(lambda: suscripcion.metricas.recibidos == 3)
+        runtime.detener()
+
+        assert suscripcion.metricas.como_dict()['fallidos'] == 3
+        assert suscripcion.consumidor.confirmados == 0
+
+
+class CampanaPrueba(Record):
+    campana_id = String()
+
+
+class ContratoPrueba(Record):
+    id_campana = String()
+    error = String()
+
+
+class TestSuscripcionConDespacho:
+    """Tests de una suscripción a varios tópicos con tabla de despacho."""
+
+    def test_un_consumidor_para_varios_topicos_decodifica_con_el_schema_de_cada_uno(self):
+        broker = BrokerMemoria()
+        runtime = _runtime(broker, concurrencia=2)
+        recibidos = []
+        campanas, contratos = AvroSchema(CampanaPrueba), AvroSchema(ContratoPrueba)
+        despacho = (DespachoPorTopico()
+                    .agregar('eventos-campanas', campanas,
+                             lambda m: recibidos.append(('campana', m.value().campana_id, m.partition_key())),
+                             ('campana_id',))
+                    .agregar('eventos-contratos', contratos,
+                             lambda m: recibidos.append(('contrato', m.value().id_campana, m.partition_key())),
+                             ('id_campana',)))
+        suscripcion = runtime.registrar_despacho(despacho, 'saga-sub-eventos')
+        runtime.iniciar()
+
+        broker.almacenar('eventos-campanas', campanas.encode(CampanaPrueba(campana_id='campana-1')),
+                         clave='campana-1')
+        broker.almacenar('eventos-contratos', contratos.encode(ContratoPrueba(id_campana='campana-1', error='')),
+                         clave='campana-1')
+        _esperar(lambda: suscripcion.metricas.procesados == 2)
+        runtime.detener()
+
+        assert recibidos == [('campana', 'campana-1', 'campana-1'), ('contrato', 'campana-1', 'campana-1')]
+        assert broker.consumidores_creados == 1
+        assert suscripcion.por_clave and len(suscripcion.colas) == 2
+
+    def test_clave_sale_del_payload_del_topico_si_no_viene_en_el_mensaje(self):
+        broker = BrokerMemoria()
+        contratos = AvroSchema(ContratoPrueba)
+        despacho = DespachoPorTopico().agregar('eventos-contratos', contratos, lambda m: None, ('id_campana',))
+
+        mensaje = broker.almacenar('eventos-contratos', contratos.encode(ContratoPrueba(id_campana='campana-7')))
+
+        assert despacho.clave(mensaje) == 'campana-7'
+        assert topico_corto('persistent://public/default/eventos-contratos-partition-3') == 'eventos-contratos'
+
+    def test_mensaje_fallido_va_a_la_dlq_de_su_topico_de_origen(self):
+        broker = BrokerMemoria()
+        runtime = _runtime(broker, politica_reintentos=PoliticaReintentos(max_intentos=1))
+        contratos = AvroSchema(ContratoPrueba)
+
+        def fallar(mensaje):
+            raise ValueError(mensaje.value().error)
+
+        despacho = (DespachoPorTopico()
+                    .agregar('eventos-campanas', AvroSchema(CampanaPrueba), lambda m: None)
+                    .agregar('eventos-contratos', contratos, fallar))
+        runtime.registrar_despacho(despacho, 'saga-sub-eventos', por_clave=False)
+        runtime.iniciar()
+        contenido = contratos.encode(ContratoPrueba(id_campana='campana-1', error='sin presupuesto'))
+        broker.almacenar('eventos-contratos', contenido)
+        dlq = 'eventos-contratos-saga-sub-eventos-DLQ'
+        _esperar(lambda: broker.topicos[dlq])
+        runtime.detener()
+
+        muerto = broker.topicos[dlq][0]
+        assert muerto.data() == contenido
+        assert muerto.properties()[PROPIEDAD_DLQ_TOPICO] == 'eventos-contratos'
+        assert muerto.properties()[PROPIEDAD_DLQ_ERROR_TIPO] == 'ValueError'
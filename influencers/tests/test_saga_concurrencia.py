@@ -0,0 +1,526 @@
+"""
+Tests de concurrencia del coordinador de saga: muchas sagas intercaladas en
+paralelo, cada una con su propio estado y correlación.
+"""
+
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+src_path = os.path.join(os.path.dirname(__file__), '..', 'src')
+sys.path.insert(0, src_path)
+
+from alpes_partners.seedwork.aplicacion.sagas import Fin, Inicio, PlanificadorTimeouts, RegistroInstanciasSaga, Transaccion
+from alpes_partners.seedwork.infraestructura.contexto import agregar_compensacion
+from alpes_partners.modulos.influencers.dominio.eventos import InfluencerRegistrado
+from alpes_partners.modulos.sagas.dominio.entidades import EstadoSaga, SagaEstado
+from alpes_partners.modulos.sagas.dominio.eventos import (
+    CampanaCreada, ContratoCreado, ErrorCreacionCampana, ErrorCreacionContrato
+)
+from alpes_partners.modulos.sagas.aplicacion.comandos.comandos_externos import (
+    RegistrarCampana, CrearContrato, EliminarCampana, EliminarInfluencer
+)
+from alpes_partners.modulos.sagas.aplicacion.coordinadores import saga_alpes_partners as saga
+
+
+class RepositorioSagaLogMemoria:
+    """Saga log en memoria y seguro entre hilos."""
+
+    def __init__(self):
+        self.entradas = defaultdict(list)
+        self.estados = {}
+        self._claves = set()
+        self._lock = threading.Lock()
+
+    def agregar(self, saga_log):
+        clave = (saga_log.id_correlacion, saga_log.evento_tipo, saga_log.paso_index)
+        with self._lock:
+            if clave in self._claves:
+                return False
+            self._claves.add(clave)
+            self.entradas[saga_log.id_correlacion].append(saga_log)
+            estado = self.estados.setdefault(saga_log.id_correlacion, SagaEstado(saga_log.id_correlacion))
+            estado.aplicar(SagaEstado.cambios(
+                saga_log.evento_tipo, saga_log.evento_datos, saga_log.paso_index, saga_log.fecha_procesamiento,
+                saga_log.fecha_limite
+            ))
+            return True
+
+    def obtener_estado(self, id_correlacion):
+        with self._lock:
+            return self.estados.get(id_correlacion)
+
+    def contar_en_curso(self):
+        with self._lock:
+            return sum(1 for e in self.estados.values()
+                       if e.estado in (EstadoSaga.EN_CURSO.value, EstadoSaga.COMPENSANDO.value))
+
+    def obtener_por_correlacion(self, id_correlacion):
+        with self._lock:
+            return list(self.entradas[id_correlacion])
+
+
+class SagaRamasConcurrentes(saga.CoordinadorInfluencersCampanasContratos):
+    """La campaña y el contrato se piden a la vez al registrarse el influencer, con plazos distintos."""
+
+    pasos = [
+        Inicio(index=0, evento=saga.EventoDominioInfluencerRegistrado, compensacion=EliminarInfluencer),
+        Transaccion(index=1, comando=RegistrarCampana, evento=saga.EventoDominioCampanaCreada,
+                    error=ErrorCreacionCampana, compensacion=EliminarCampana, timeout=10),
+        Transaccion(index=2, comando=CrearContrato, evento=saga.EventoDominioContratoCreado,
+                    error=ErrorCreacionContrato, compensacion=saga.EliminarContrato, timeout=60, depende_de=(0,)),
+        Fin(index=3),
+    ]
+    constructores = {
+        **saga.CoordinadorInfluencersCampanasContratos.constructores,
+        (saga.EventoDominioInfluencerRegistrado, CrearContrato):
+            lambda self, evento: SimpleNamespace(influencer_id=evento.influencer_id),
+    }
+
+
+class UnidadTrabajoInmediata:
+    """Ejecuta los batches al registrarlos (sin base de datos)."""
+
+    @staticmethod
+    def registrar_batch(operacion, *args, **kwargs):
+        operacion(*args, **kwargs)
+
+    @staticmethod
+    def savepoint():
+        pass
+
+    @staticmethod
+    def commit():
+        pass
+
+
+@pytest.fixture
+def entorno_saga(monkeypatch):
+    repositorio = RepositorioSagaLogMemoria()
+    comandos = defaultdict(list)
+    lock_comandos = threading.Lock()
+
+    def ejecutar_commando(comando):
+        influencer_id = getattr(comando, 'influencer_origen_id', None) or comando.influencer_id
+        with lock_comandos:
+            comandos[influencer_id].append(comando)
+
+    def fabrica(id_correlacion):
+        return saga.CoordinadorInfluencersCampanasContratos(id_correlacion, repositorio_saga_log=repositorio)
+
+    monkeypatch.setattr(saga, 'ejecutar_commando', ejecutar_commando)
+    monkeypatch.setattr(saga, 'UnidadTrabajoPuerto', UnidadTrabajoInmediata)
+    monkeypatch.setattr(saga, 'sagas_activas', RegistroInstanciasSaga(fabrica, max_instancias=16))
+    monkeypatch.setattr(saga, 'planificador_timeouts', PlanificadorTimeouts())
+    return repositorio, comandos
+
+
+def _influencer_registrado(i):
+    return InfluencerRegistrado(
+        influencer_id=f'influencer-{i}', nombre=f'Influencer {i}', email=f'i{i}@test.com',
+        categorias=['moda'], plataformas=[], fecha_registro=datetime.utcnow()
+    )
+
+
+def _campana_creada(i, comando: RegistrarCampana):
+    return CampanaCreada(
+        campana_id=comando.id, nombre=comando.nombre, descripcion=comando.descripcion,
+        tipo_comision='cpa', valor_comision=100.0, moneda='USD', categorias_objetivo=['moda'],
+        fecha_inicio=datetime.utcnow(), influencer_id=f'influencer-{i}',
+        influencer_nombre=f'Influencer {i}', influencer_email=f'i{i}@test.com'
+    )
+
+
+def _ejecutar_saga(i, comandos, falla_contrato: bool):
+    pausa = lambda: time.sleep(random.random() / 1000)
+
+    saga.oir_mensaje(_influencer_registrado(i))
+    pausa()
+    registrar_campana = comandos[f'influencer-{i}'][0]
+    saga.oir_mensaje(_campana_creada(i, registrar_campana))
+    pausa()
+
+    if falla_contrato:
+        saga.oir_mensaje(ErrorCreacionContrato(
+            campana_id=registrar_campana.id, error='sin presupuesto', influencer_id=f'influencer-{i}'
+        ))
+    else:
+        saga.oir_mensaje(ContratoCreado(
+            contrato_id=f'contrato-{i}', influencer_id=f'influencer-{i}', campana_id=registrar_campana.id,
+            monto_total=100.0, moneda='USD', fecha_inicio=datetime.utcnow(), fecha_fin=None,
+            tipo_contrato='puntual', fecha_creacion=datetime.utcnow()
+        ))
+
+
+class TestSagasConcurrentes:
+    """Sagas intercaladas sin estado compartido entre correlaciones."""
+
+    def test_cientos_de_sagas_intercaladas(self, entorno_saga):
+        repositorio, comandos = entorno_saga
+        total = 300
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            list(pool.map(lambda i: _ejecutar_saga(i, comandos, falla_contrato=(i % 5 == 0)), range(total)))
+
+        assert len(repositorio.entradas) == total
+        assert repositorio.contar_en_curso() == 0
+        for i in range(total):
+            influencer_id = f'influencer-{i}'
+            id_correlacion = saga.id_correlacion_para(_influencer_registrado(i))
+            tipos = [e.evento_tipo for e in repositorio.entradas[id_correlacion]]
+            enviados = comandos[influencer_id]
+            registrar_campana = enviados[0]
+
+            assert isinstance(registrar_campana, RegistrarCampana)
+            assert isinstance(enviados[1], CrearContrato)
+            assert enviados[1].influencer_id == influencer_id
+            assert enviados[1].campana_id == registrar_campana.id
+
+            if i % 5 == 0:
+                # Las compensaciones se despachan en paralelo: el orden de envío no está definido
+                compensaciones = {type(c): c for c in enviados[2:]}
+                eliminar_campana = compensaciones[EliminarCampana]
+                eliminar_influencer = compensaciones[EliminarInfluencer]
+                assert len(enviados) == 4
+                assert eliminar_campana.campana_id == registrar_campana.id
+                assert eliminar_campana.influencer_id == influencer_id
+                assert eliminar_influencer.influencer_id == influencer_id
+                assert tipos.count('CompensacionEjecutada') == 1
+                assert repositorio.obtener_estado(id_correlacion).estado == EstadoSaga.COMPENSADA.value
+            else:
+                assert len(enviados) == 2
+                assert tipos == [
+                    'Inicio', 'EventoDominioInfluencerRegistrado', 'EventoDominioCampanaCreada',
+                    'EventoDominioContratoCreado', 'Fin'
+                ]
+                estado = repositorio.obtener_estado(id_correlacion)
+                assert estado.estado == EstadoSaga.COMPLETADA.value
+                assert (estado.influencer_id, estado.campana_id, estado.contrato_id) == (
+                    influencer_id, registrar_campana.id, f'contrato-{i}'
+                )
+
+    def test_rehidrata_contexto_tras_desalojo(self, entorno_saga):
+        repositorio, comandos = entorno_saga
+        saga.oir_mensaje(_influencer_registrado(1))
+        registrar_campana = comandos['influencer-1'][0]
+        saga.oir_mensaje(_campana_creada(1, registrar_campana))
+
+        # Desalojar la saga 1 llenando el LRU con otras sagas
+        for i in range(2, 40):
+            saga.oir_mensaje(_influencer_registrado(i))
+        assert saga.id_correlacion_para(_influencer_registrado(1)) not in saga.sagas_activas
+
+        saga.oir_mensaje(ErrorCreacionContrato(
+            campana_id=registrar_campana.id, error='sin presupuesto', influencer_id='influencer-1'
+        ))
+
+        eliminar_campana = next(c for c in comandos['influencer-1'][2:] if isinstance(c, EliminarCampana))
+        assert eliminar_campana.influencer_id == 'influencer-1'
+
+    def test_instancia_en_uso_no_se_desaloja(self):
+        registro = RegistroInstanciasSaga(lambda id_correlacion: SimpleNamespace(lock=threading.RLock()),
+                                          max_instancias=1)
+        dentro, soltar = threading.Event(), threading.Event()
+        instancias = []
+
+        def usar_saga_a():
+            with registro.usar('saga-a') as instancia, instancia.lock:
+                instancias.append(instancia)
+                dentro.set()
+                soltar.wait(5)
+
+        hilo = threading.Thread(target=usar_saga_a)
+        hilo.start()
+        dentro.wait(5)
+
+        # Otra saga llena el LRU y la saga en uso se descarta al terminar: ninguna la retira
+        with registro.usar('saga-b'):
+            pass
+        registro.descartar('saga-a')
+        assert 'saga-a' in registro and 'saga-b' not in registro
+        with registro.usar('saga-a') as instancia:
+            assert instancia is instancias[0]
+            # Un segundo evento de la saga espera el lock de la misma instancia
+            assert not instancia.lock.acquire(blocking=False)
+
+        soltar.set()
+        hilo.join(5)
+        assert 'saga-a' not in registro and len(registro) == 0
+
+    def test_reentrega_no_duplica_pasos(self, entorno_saga):
+        repositorio, comandos = entorno_saga
+        saga.oir_mensaje(_influencer_registrado(1))
+        saga.oir_mensaje(_influencer_registrado(1))
+
+        id_correlacion = saga.id_correlacion_para(_influencer_registrado(1))
+        tipos = [e.evento_tipo for e in repositorio.entradas[id_correlacion]]
+        assert tipos == ['Inicio', 'EventoDominioInfluencerRegistrado']
+
+
+class TestTimeoutsSaga:
+    """Plazos de los pasos que esperan respuesta de otro microservicio."""
+
+    def test_sagas_terminadas_no_dejan_plazos(self, entorno_saga):
+        repositorio, comandos = entorno_saga
+        for i in range(20):
+            _ejecutar_saga(i, comandos, falla_contrato=(i % 2 == 0))
+
+        assert len(saga.planificador_timeouts) == 0
+
+    def test_contrato_sin_respuesta_compensa(self, entorno_saga):
+        repositorio, comandos = entorno_saga
+        saga.oir_mensaje(_influencer_registrado(1))
+        saga.oir_mensaje(_campana_creada(1, comandos['influencer-1'][0]))
+        id_correlacion = saga.id_correlacion_para(_influencer_registrado(1))
+        assert repositorio.obtener_estado(id_correlacion).fecha_limite is not None
+
+        vencidos = saga.planificador_timeouts.tomar_vencidos(ahora=time.time() + 3600)
+        assert vencidos == [(id_correlacion, 2)]
+        for id_vencido, paso_index in vencidos:
+            saga.vencer_paso_saga(id_vencido, paso_index)
+
+        assert sorted(type(c).__name__ for c in comandos['influencer-1'][2:]) == ['EliminarCampana', 'EliminarInfluencer']
+        assert repositorio.obtener_estado(id_correlacion).estado == EstadoSaga.COMPENSADA.value
+
+    def test_campana_sin_respuesta_marca_saga_fallida(self, entorno_saga):
+        repositorio, comandos = entorno_saga
+        saga.oir_mensaje(_influencer_registrado(1))
+        id_correlacion = saga.id_correlacion_para(_influencer_registrado(1))
+
+        for id_vencido, paso_index in saga.planificador_timeouts.tomar_vencidos(ahora=time.time() + 3600):
+            saga.vencer_paso_saga(id_vencido, paso_index)
+
+        estado = repositorio.obtener_estado(id_correlacion)
+        assert estado.estado == EstadoSaga.FALLIDA.value
+        assert estado.fecha_limite is None
+        assert repositorio.contar_en_curso() == 0
+
+    def _vencer_plazos(self):
+        for id_vencido, paso_index in saga.planificador_timeouts.tomar_vencidos(ahora=time.time() + 3600):
+            saga.vencer_paso_saga(id_vencido, paso_index)
+
+    def test_campana_tardia_tras_timeout_se_compensa_sin_crear_contrato(self, entorno_saga):
+        repositorio, comandos = entorno_saga
+        saga.oir_mensaje(_influencer_registrado(1))
+        self._vencer_plazos()
+
+        campana_tardia = _campana_creada(1, comandos['influencer-1'][0])
+        saga.oir_mensaje(campana_tardia)
+        # La reentrega del evento tardío no repite la compensación
+        saga.oir_mensaje(campana_tardia)
+
+        enviados = comandos['influencer-1'][1:]
+        assert [type(c) for c in enviados] == [EliminarCampana]
+        assert enviados[0].campana_id == comandos['influencer-1'][0].id
+        id_correlacion = saga.id_correlacion_para(_influencer_registrado(1))
+        assert repositorio.obtener_estado(id_correlacion).estado == EstadoSaga.FALLIDA.value
+        assert len(saga.planificador_timeouts) == 0
+
+    def test_contrato_tardio_tras_timeout_no_termina_la_saga(self, entorno_saga):
+        repositorio, comandos = entorno_saga
+        saga.oir_mensaje(_influencer_registrado(1))
+        registrar_campana = comandos['influencer-1'][0]
+        saga.oir_mensaje(_campana_creada(1, registrar_campana))
+        self._vencer_plazos()
+        enviados = len(comandos['influencer-1'])
+
+        saga.oir_mensaje(ContratoCreado(
+            contrato_id='contrato-1', influencer_id='influencer-1', campana_id=registrar_campana.id,
+            monto_total=100.0, moneda='USD', fecha_inicio=datetime.utcnow(), fecha_fin=None,
+            tipo_contrato='puntual', fecha_creacion=datetime.utcnow()
+        ))
+
+        id_correlacion = saga.id_correlacion_para(_influencer_registrado(1))
+        tipos = [e.evento_tipo for e in repositorio.entradas[id_correlacion]]
+        assert 'Fin' not in tipos and tipos[-1] == 'EventoDominioContratoCreado'
+        assert len(comandos['influencer-1']) == enviados
+        assert repositorio.obtener_estado(id_correlacion).estado == EstadoSaga.COMPENSADA.value
+
+
+class TestTimeoutsRamasConcurrentes:
+    """Cada rama concurrente de la saga tiene su propio plazo."""
+
+    @pytest.fixture
+    def ramas(self, entorno_saga, monkeypatch):
+        repositorio, comandos = entorno_saga
+        self.fabrica = lambda id_correlacion: SagaRamasConcurrentes(id_correlacion, repositorio_saga_log=repositorio)
+        monkeypatch.setattr(saga, 'sagas_activas', RegistroInstanciasSaga(self.fabrica, max_instancias=16))
+        return repositorio, comandos
+
+    def test_la_rama_que_no_responde_vence_aunque_responda_la_otra(self, ramas):
+        repositorio, comandos = ramas
+        saga.oir_mensaje(_influencer_registrado(1))
+        id_correlacion = saga.id_correlacion_para(_influencer_registrado(1))
+        assert len(comandos['influencer-1']) == 2
+        assert len(saga.planificador_timeouts) == 2
+
+        saga.oir_mensaje(_campana_creada(1, comandos['influencer-1'][0]))
+
+        # saga_estado conserva el plazo de la rama del contrato para la recuperación
+        estado = repositorio.obtener_estado(id_correlacion)
+        assert (estado.paso_actual, estado.fecha_limite is not None) == (2, True)
+        assert saga.planificador_timeouts.tomar_vencidos(ahora=time.time() + 3600) == [(id_correlacion, 2)]
+        saga.vencer_paso_saga(id_correlacion, 2)
+
+        assert sorted(type(c).__name__ for c in comandos['influencer-1'][2:]) == ['EliminarCampana', 'EliminarInfluencer']
+        assert repositorio.obtener_estado(id_correlacion).estado == EstadoSaga.COMPENSADA.value
+
+    def test_rehidratar_reprograma_el_plazo_de_cada_rama(self, ramas, monkeypatch):
+        repositorio, comandos = ramas
+        saga.oir_mensaje(_influencer_registrado(1))
+        id_correlacion = saga.id_correlacion_para(_influencer_registrado(1))
+
+        # Reinicio: saga_estado guarda un solo plazo; las demás ramas salen del log
+        monkeypatch.setattr(saga, 'sagas_activas', RegistroInstanciasSaga(self.fabrica, max_instancias=16))
+        monkeypatch.setattr(saga, 'planificador_timeouts', PlanificadorTimeouts())
+        saga.recuperar_sagas_en_curso([[repositorio.obtener_estado(id_correlacion)]])
+        assert len(saga.planificador_timeouts) == 1
+        saga.oir_mensaje(ContratoCreado(
+            contrato_id='contrato-1', influencer_id='influencer-1', campana_id='campana-1',
+            monto_total=100.0, moneda='USD', fecha_inicio=datetime.utcnow(), fecha_fin=None,
+            tipo_contrato='puntual', fecha_creacion=datetime.utcnow()
+        ))
+
+        assert saga.planificador_timeouts.tomar_vencidos(ahora=time.time() + 30) == [(id_correlacion, 1)]
+
+
+class TestRecuperacionSagas:
+    """Reconstrucción de las sagas en curso al reiniciar el proceso."""
+
+    def test_reinicio_recupera_contexto_y_plazos(self, entorno_saga, monkeypatch):
+        repositorio, comandos = entorno_saga
+        for i in range(3):
+            saga.oir_mensaje(_influencer_registrado(i))
+            saga.oir_mensaje(_campana_creada(i, comandos[f'influencer-{i}'][0]))
+        _ejecutar_saga(3, comandos, falla_contrato=False)
+
+        # Reinicio: se pierden las instancias en memoria y los plazos
+        monkeypatch.setattr(saga, 'sagas_activas', RegistroInstanciasSaga(
+            lambda id_correlacion: saga.CoordinadorInfluencersCampanasContratos(
+                id_correlacion, repositorio_saga_log=repositorio
+            ), max_instancias=16
+        ))
+        monkeypatch.setattr(saga, 'planificador_timeouts', PlanificadorTimeouts())
+        en_curso = [e for e in repositorio.estados.values() if e.estado == EstadoSaga.EN_CURSO.value]
+
+        assert saga.recuperar_sagas_en_curso([en_curso[:2], en_curso[2:]]) == 3
+        assert len(saga.planificador_timeouts) == 3
+
+        # La respuesta tardía usa el contexto recuperado sin volver a leer el estado
+        monkeypatch.setattr(repositorio, 'obtener_estado', lambda _: pytest.fail('lectura por saga'))
+        saga.oir_mensaje(ErrorCreacionContrato(
+            campana_id=comandos['influencer-1'][0].id, error='sin presupuesto', influencer_id='influencer-1'
+        ))
+        eliminar_campana = next(c for c in comandos['influencer-1'] if isinstance(c, EliminarCampana))
+        assert eliminar_campana.influencer_id == 'influencer-1'
+        assert len(saga.planificador_timeouts) == 2
+
+
+class TestCompensacionParalela:
+    """Las compensaciones independientes se ejecutan en paralelo."""
+
+    def test_latencia_es_la_de_la_rama_mas_lenta(self, entorno_saga, monkeypatch):
+        repositorio, comandos = entorno_saga
+        saga.oir_mensaje(_influencer_registrado(1))
+        saga.oir_mensaje(_campana_creada(1, comandos['influencer-1'][0]))
+        ejecutar_original = saga.ejecutar_commando
+
+        def ejecutar_lento(comando):
+            if isinstance(comando, (EliminarCampana, EliminarInfluencer)):
+                time.sleep(0.2)
+            ejecutar_original(comando)
+
+        monkeypatch.setattr(saga, 'ejecutar_commando', ejecutar_lento)
+        inicio = time.perf_counter()
+        saga.oir_mensaje(ErrorCreacionContrato(
+            campana_id=comandos['influencer-1'][0].id, error='sin presupuesto', influencer_id='influencer-1'
+        ))
+
+        assert time.perf_counter() - inicio < 0.35
+        id_correlacion = saga.id_correlacion_para(_influencer_registrado(1))
+        resumen = [e for e in repositorio.entradas[id_correlacion] if e.evento_tipo == 'CompensacionEjecutada']
+        assert len(resumen) == 1
+        assert resumen[0].evento_datos['ramas'] == {'EliminarCampana': None, 'EliminarInfluencer': None}
+        assert repositorio.obtener_estado(id_correlacion).estado == EstadoSaga.COMPENSADA.value
+
+    def test_rama_fallida_queda_registrada_y_se_propaga(self, entorno_saga, monkeypatch):
+        repositorio, comandos = entorno_saga
+        saga.oir_mensaje(_influencer_registrado(1))
+        saga.oir_mensaje(_campana_creada(1, comandos['influencer-1'][0]))
+        ejecutar_original = saga.ejecutar_commando
+
+        def ejecutar_con_falla(comando):
+            if isinstance(comando, EliminarCampana):
+                raise ConnectionError('broker no disponible')
+            ejecutar_original(comando)
+
+        monkeypatch.setattr(saga, 'ejecutar_commando', ejecutar_con_falla)
+        with pytest.raises(RuntimeError):
+            saga.oir_mensaje(ErrorCreacionContrato(
+                campana_id=comandos['influencer-1'][0].id, error='sin presupuesto', influencer_id='influencer-1'
+            ))
+
+        id_correlacion = saga.id_correlacion_para(_influencer_registrado(1))
+        resumen = next(e for e in repositorio.entradas[id_correlacion] if e.evento_tipo == 'CompensacionEjecutada')
+        assert resumen.evento_datos['ramas']['EliminarCampana'] == 'broker no disponible'
+        assert resumen.evento_datos['ramas']['EliminarInfluencer'] is None
+        assert repositorio.obtener_estado(id_correlacion).estado == EstadoSaga.COMPENSANDO.value
+
+
+class TestCoreografia:
+    """Modo coreografía: el coordinador observa el flujo y compensa desde el sobre del error."""
+
+    @pytest.fixture
+    def coreografia(self, entorno_saga, monkeypatch):
+        repositorio, comandos = entorno_saga
+
+        def fabrica(id_correlacion):
+            return saga.CoordinadorCoreografiaInfluencersCampanasContratos(id_correlacion, repositorio_saga_log=repositorio)
+
+        monkeypatch.setattr(saga, 'sagas_activas', RegistroInstanciasSaga(fabrica, max_instancias=16))
+        return repositorio, comandos
+
+    def _flujo_hasta_campana(self):
+        saga.oir_mensaje(_influencer_registrado(1))
+        with agregar_compensacion('EliminarInfluencer', influencer_id='influencer-1'):
+            saga.oir_mensaje(_campana_creada(1, SimpleNamespace(id='campana-1', nombre='Bienvenida', descripcion='')))
+
+    def test_no_envia_comandos_ni_programa_plazos(self, coreografia):
+        repositorio, comandos = coreografia
+        self._flujo_hasta_campana()
+        saga.oir_mensaje(ContratoCreado(
+            contrato_id='contrato-1', influencer_id='influencer-1', campana_id='campana-1',
+            monto_total=100.0, moneda='USD', fecha_inicio=datetime.utcnow(), fecha_fin=None,
+            tipo_contrato='puntual', fecha_creacion=datetime.utcnow()
+        ))
+
+        id_correlacion = saga.id_correlacion_para(_influencer_registrado(1))
+        assert not comandos
+        assert len(saga.planificador_timeouts) == 0
+        assert [e.paso_index for e in repositorio.entradas[id_correlacion]] == [0, 1, 2, 3, 3]
+        assert repositorio.obtener_estado(id_correlacion).estado == EstadoSaga.COMPLETADA.value
+
+    def test_error_ejecuta_las_compensaciones_del_sobre_en_orden_inverso(self, coreografia):
+        repositorio, comandos = coreografia
+        self._flujo_hasta_campana()
+        error = ErrorCreacionContrato(campana_id='campana-1', error='sin presupuesto', influencer_id='influencer-1')
+
+        with agregar_compensacion('EliminarInfluencer', influencer_id='influencer-1'), \
+                agregar_compensacion('EliminarCampana', campana_id='campana-1', influencer_id='influencer-1'):
+            saga.oir_mensaje(error)
+            # El mismo error publicado dos veces no repite la cadena
+            saga.oir_mensaje(error)
+
+        assert [type(c) for c in comandos['influencer-1']] == [EliminarCampana, EliminarInfluencer]
+        assert comandos['influencer-1'][0].campana_id == 'campana-1'
+        assert 'sin presupuesto' in comandos['influencer-1'][1].razon
+        id_correlacion = saga.id_correlacion_para(_influencer_registrado(1))
+        assert repositorio.obtener_estado(id_correlacion).estado == EstadoSaga.COMPENSADA.value
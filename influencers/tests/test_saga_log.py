@@ -0,0 +1,148 @@
+"""
+Tests del repositorio de saga log: deduplicación de pasos por restricción única.
+"""
+
+import os
+import sys
+
+import pytest
+from flask import Flask
+from sqlalchemy import create_engine, text
+
+src_path = os.path.join(os.path.dirname(__file__), '..', 'src')
+sys.path.insert(0, src_path)
+
+from alpes_partners.seedwork.infraestructura.database import db
+from alpes_partners.modulos.sagas.dominio.entidades import EstadoSaga, SagaLog
+from alpes_partners.modulos.sagas.infraestructura.migraciones import agregar_restriccion_unica_saga_logs
+from alpes_partners.modulos.sagas.infraestructura.repositorio_saga_log import (
+    RepositorioSagaLogSQLAlchemy, SagaEstadoModelo, SagaLogModelo, actualizar_estados, obtener_sagas_en_curso,
+    valores_saga_log
+)
+
+
+@pytest.fixture
+def repositorio():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        SagaLogModelo.__table__.create(db.engine)
+        SagaEstadoModelo.__table__.create(db.engine)
+        yield RepositorioSagaLogSQLAlchemy()
+        db.session.remove()
+
+
+def _entrada(evento_tipo: str, paso_index: int, id_correlacion: str = 'saga-1', datos: dict = None) -> SagaLog:
+    return SagaLog(id_correlacion=id_correlacion, evento_tipo=evento_tipo,
+                   evento_datos=datos or {'paso': paso_index}, paso_index=paso_index)
+
+
+class TestRepositorioSagaLog:
+    """Tests del repositorio SQLAlchemy del saga log."""
+
+    def test_paso_repetido_no_se_inserta(self, repositorio):
+        assert repositorio.agregar(_entrada('Inicio', 0))
+        assert repositorio.agregar(_entrada('EventoDominioInfluencerRegistrado', 1))
+        assert not repositorio.agregar(_entrada('EventoDominioInfluencerRegistrado', 1))
+        db.session.commit()
+
+        tipos = [e.evento_tipo for e in repositorio.obtener_por_correlacion('saga-1')]
+        assert tipos == ['Inicio', 'EventoDominioInfluencerRegistrado']
+
+    def test_mismo_paso_en_otra_saga_se_inserta(self, repositorio):
+        assert repositorio.agregar(_entrada('Inicio', 0, id_correlacion='saga-1'))
+        assert repositorio.agregar(_entrada('Inicio', 0, id_correlacion='saga-2'))
+        db.session.commit()
+
+        assert db.session.query(SagaLogModelo).count() == 2
+
+    def test_estado_se_proyecta_con_cada_entrada(self, repositorio):
+        repositorio.agregar(_entrada('Inicio', 0))
+        repositorio.agregar(_entrada('EventoDominioInfluencerRegistrado', 1, datos={
+            'influencer_id': 'influencer-1', 'nombre': 'Ana', 'email': 'ana@test.com'
+        }))
+        repositorio.agregar(_entrada('EventoDominioCampanaCreada', 2, datos={
+            'campana_id': 'campana-1', 'nombre': 'Verano', 'influencer_id': 'influencer-1'
+        }))
+        repositorio.agregar(_entrada('Inicio', 0, id_correlacion='saga-2'))
+        db.session.commit()
+
+        estado = repositorio.obtener_estado('saga-1')
+        assert estado.estado == EstadoSaga.EN_CURSO.value
+        assert estado.paso_actual == 2
+        assert (estado.influencer_id, estado.influencer_nombre, estado.campana_id) == ('influencer-1', 'Ana', 'campana-1')
+        assert repositorio.contar_en_curso() == 2
+
+        repositorio.agregar(_entrada('Fin', 4))
+        db.session.commit()
+
+        estado = repositorio.obtener_estado('saga-1')
+        assert estado.estado == EstadoSaga.COMPLETADA.value
+        assert estado.influencer_email == 'ana@test.com'
+        assert estado.fecha_fin is not None
+        assert repositorio.contar_en_curso() == 1
+
+    def test_saga_terminada_no_cambia_con_entradas_tardias(self, repositorio):
+        repositorio.agregar(_entrada('Inicio', 0))
+        repositorio.agregar(_entrada('EventoDominioInfluencerRegistrado', 1, datos={'influencer_id': 'influencer-1'}))
+        repositorio.agregar(_entrada('TimeoutPasoSaga', 2, datos={'paso_index': 2, 'compensa': False}))
+        db.session.commit()
+        # La respuesta llega después del timeout
+        repositorio.agregar(_entrada('EventoDominioCampanaCreada', 2, datos={'campana_id': 'campana-1'}))
+        repositorio.agregar(_entrada('Fin', 3))
+        db.session.commit()
+
+        estado = repositorio.obtener_estado('saga-1')
+        assert (estado.estado, estado.error) == (EstadoSaga.FALLIDA.value, 'Timeout en el paso 2')
+        assert (estado.paso_actual, estado.campana_id) == (2, None)
+        assert len(repositorio.obtener_por_correlacion('saga-1')) == 5
+
+    def test_saga_terminada_en_el_mismo_lote_ignora_las_entradas_siguientes(self, repositorio):
+        actualizar_estados(db.session, [
+            valores_saga_log(_entrada('Inicio', 0)),
+            valores_saga_log(_entrada('TimeoutPasoSaga', 1, datos={'paso_index': 1, 'compensa': False})),
+            valores_saga_log(_entrada('Fin', 3)),
+        ])
+        db.session.commit()
+
+        assert repositorio.obtener_estado('saga-1').estado == EstadoSaga.FALLIDA.value
+
+    def test_sagas_en_curso_se_leen_por_lotes(self, repositorio):
+        for i in range(5):
+            repositorio.agregar(_entrada('Inicio', 0, id_correlacion=f'saga-{i}'))
+            repositorio.agregar(_entrada('EventoDominioInfluencerRegistrado', 1, id_correlacion=f'saga-{i}',
+                                         datos={'influencer_id': f'influencer-{i}'}))
+        repositorio.agregar(_entrada('Fin', 3, id_correlacion='saga-4'))
+        db.session.commit()
+
+        lotes = list(obtener_sagas_en_curso(db.session, tamano_lote=2))
+
+        assert [len(lote) for lote in lotes] == [2, 2]
+        estados = [estado for lote in lotes for estado in lote]
+        assert sorted(e.id_correlacion for e in estados) == ['saga-0', 'saga-1', 'saga-2', 'saga-3']
+        assert {e.influencer_id for e in estados} == {'influencer-0', 'influencer-1', 'influencer-2', 'influencer-3'}
+
+
+class TestMigracionRestriccionUnica:
+    """Tests de la migración que aplica uq_saga_logs_paso sobre una tabla existente."""
+
+    def test_duplicados_se_eliminan_y_filas_sin_paso_se_conservan(self, tmp_path):
+        database_url = f"sqlite:///{tmp_path / 'saga_logs.db'}"
+        engine = create_engine(database_url)
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE saga_logs (id VARCHAR PRIMARY KEY, id_correlacion VARCHAR, "
+                "evento_tipo VARCHAR, paso_index INTEGER)"
+            ))
+            conn.execute(text(
+                "INSERT INTO saga_logs (id, id_correlacion, evento_tipo, paso_index) VALUES "
+                "('a', 'saga-1', 'Inicio', 0), ('b', 'saga-1', 'Inicio', 0), "
+                "('c', 'saga-1', 'EventoLegado', NULL), ('d', 'saga-1', 'EventoLegado', NULL)"
+            ))
+
+        agregar_restriccion_unica_saga_logs(database_url)
+
+        with engine.connect() as conn:
+            ids = [fila[0] for fila in conn.execute(text("SELECT id FROM saga_logs ORDER BY id"))]
+        assert ids == ['a', 'c', 'd']
@@ -0,0 +1,197 @@
+"""
+Tests de la tabla de despacho compilada a partir de los pasos de una saga.
+"""
+
+import os
+import sys
+from dataclasses import dataclass
+
+import pytest
+
+src_path = os.path.join(os.path.dirname(__file__), '..', 'src')
+sys.path.insert(0, src_path)
+
+from alpes_partners.seedwork.aplicacion.comandos import Comando
+from alpes_partners.seedwork.aplicacion.sagas import CoordinadorOrquestacion, Fin, Inicio, TablaDespacho, Transaccion
+from alpes_partners.seedwork.dominio.eventos import EventoDominio
+
+
+class Abierta(EventoDominio): ...
+class PasoAListo(EventoDominio): ...
+class PasoAListoReintento(PasoAListo): ...
+class PasoAFallo(EventoDominio): ...
+class PasoBListo(EventoDominio): ...
+class PasoBFallo(EventoDominio): ...
+class PasoCListo(EventoDominio): ...
+class PasoCFallo(EventoDominio): ...
+class Ajeno(EventoDominio): ...
+
+
+@dataclass
+class EjecutarA(Comando): ...
+@dataclass
+class DeshacerA(Comando): ...
+@dataclass
+class EjecutarB(Comando): ...
+@dataclass
+class DeshacerB(Comando): ...
+@dataclass
+class EjecutarC(Comando): ...
+@dataclass
+class DeshacerC(Comando): ...
+@dataclass
+class DeshacerInicio(Comando): ...
+
+
+def _pasos():
+    return [
+        Inicio(index=0, evento=Abierta, compensacion=DeshacerInicio),
+        Transaccion(index=1, comando=EjecutarA, evento=PasoAListo, error=PasoAFallo, compensacion=DeshacerA),
+        Transaccion(index=2, comando=EjecutarB, evento=PasoBListo, error=PasoBFallo, compensacion=DeshacerB),
+        Fin(index=3),
+    ]
+
+
+def _pasos_concurrentes():
+    # A y B no dependen entre sí; C espera a ambos
+    return [
+        Inicio(index=0, evento=Abierta, compensacion=DeshacerInicio),
+        Transaccion(index=1, comando=EjecutarA, evento=PasoAListo, error=PasoAFallo, compensacion=DeshacerA),
+        Transaccion(index=2, comando=EjecutarB, evento=PasoBListo, error=PasoBFallo, compensacion=DeshacerB,
+                    depende_de=(0,)),
+        Transaccion(index=3, comando=EjecutarC, evento=PasoCListo, error=PasoCFallo, compensacion=DeshacerC,
+                    depende_de=(1, 2)),
+        Fin(index=4),
+    ]
+
+
+class SagaConcurrente(CoordinadorOrquestacion):
+    pasos = _pasos_concurrentes()
+
+    def __init__(self):
+        self.publicados = []
+        self.terminada = False
+        self.inicializar_pasos()
+
+    def construir_comando(self, evento, tipo_comando):
+        return tipo_comando()
+
+    def publicar_comando(self, evento, tipo_comando):
+        self.publicados.append(tipo_comando)
+
+    def persistir_en_saga_log(self, mensaje):
+        pass
+
+    def iniciar(self):
+        pass
+
+    def terminar(self):
+        self.terminada = True
+
+
+class TestTablaDespacho:
+    """Tests de la compilación de pasos a tablas de búsqueda."""
+
+    def test_evento_dispara_el_comando_del_paso_siguiente(self):
+        tabla = TablaDespacho(_pasos())
+
+        assert tabla.resolver(Abierta) == (0, False)
+        assert tabla.siguiente_comando[0] is EjecutarA
+        assert tabla.resolver(PasoAListo) == (1, False)
+        assert tabla.siguiente_comando[1] is EjecutarB
+        assert tabla.resolver(PasoBListo) == (2, False)
+        assert tabla.es_ultima_transaccion(2)
+        assert not tabla.es_ultima_transaccion(1)
+
+    def test_error_compensa_los_pasos_anteriores_en_orden_inverso(self):
+        tabla = TablaDespacho(_pasos())
+
+        assert tabla.resolver(PasoBFallo) == (2, True)
+        assert tabla.compensaciones[2] == ((DeshacerA,), (DeshacerInicio,))
+        assert tabla.resolver(PasoAFallo) == (1, True)
+        assert tabla.compensaciones[1] == ((DeshacerInicio,),)
+
+    def test_compensaciones_independientes_forman_una_etapa(self):
+        pasos = _pasos()
+        pasos.insert(3, Transaccion(index=3, comando=None, evento=Ajeno, error=None, compensacion=None))
+        tabla = TablaDespacho(pasos, grupos_paralelos=[(DeshacerB, DeshacerA)])
+
+        assert tabla.compensaciones[3] == ((DeshacerB, DeshacerA), (DeshacerInicio,))
+        assert tabla.compensaciones[2] == ((DeshacerA,), (DeshacerInicio,))
+
+    def test_subclase_se_resuelve_por_su_base(self):
+        tabla = TablaDespacho(_pasos())
+
+        assert tabla.resolver(PasoAListoReintento) == (1, False)
+        with pytest.raises(ValueError):
+            tabla.resolver(Ajeno)
+
+    def test_evento_en_dos_pasos_es_invalido(self):
+        pasos = _pasos()
+        pasos[2] = Transaccion(index=2, comando=EjecutarB, evento=PasoAListo, error=PasoBFallo, compensacion=DeshacerB)
+
+        with pytest.raises(ValueError):
+            TablaDespacho(pasos)
+
+
+class TestPasosConcurrentes:
+    """Tests de sagas cuyos pasos declaran dependencias en lugar de un orden lineal."""
+
+    def test_pasos_independientes_quedan_listos_a_la_vez(self):
+        tabla = TablaDespacho(_pasos_concurrentes())
+
+        assert not tabla.lineal
+        assert tabla.listos(0, {0}) == [1, 2]
+        assert tabla.listos(1, {0, 1}) == []
+        assert tabla.listos(2, {0, 1, 2}) == [3]
+        assert tabla.dependencias[4] == frozenset({3})
+        assert TablaDespacho(_pasos()).lineal
+
+    def test_fin_espera_todas_las_ramas(self):
+        pasos = _pasos_concurrentes()
+        pasos[3] = Transaccion(index=3, comando=EjecutarC, evento=PasoCListo, error=PasoCFallo,
+                               compensacion=DeshacerC, depende_de=(0,))
+        tabla = TablaDespacho(pasos)
+
+        assert tabla.dependencias[4] == frozenset({1, 2, 3})
+        assert not tabla.completa({0, 1, 3})
+        assert tabla.completa({0, 1, 2, 3})
+
+    def test_compensa_solo_las_ramas_completadas(self):
+        tabla = TablaDespacho(_pasos_concurrentes())
+
+        # B falla con A aún en vuelo: solo se deshace el inicio
+        assert tabla.compensaciones_para({0} | tabla.ancestros[2]) == ((DeshacerInicio,),)
+        # B falla con A ya completado
+        assert tabla.compensaciones_para({0, 1} | tabla.ancestros[2]) == ((DeshacerA,), (DeshacerInicio,))
+        # C falla: A y B están en el mismo nivel y se deshacen en una etapa
+        assert tabla.compensaciones[3] == ((DeshacerB, DeshacerA), (DeshacerInicio,))
+
+    def test_dependencia_con_paso_posterior_es_invalida(self):
+        pasos = _pasos_concurrentes()
+        pasos[1] = Transaccion(index=1, comando=EjecutarA, evento=PasoAListo, error=PasoAFallo,
+                               compensacion=DeshacerA, depende_de=(3,))
+
+        with pytest.raises(ValueError):
+            TablaDespacho(pasos)
+
+    def test_coordinador_envia_ramas_juntas_y_espera_el_join(self):
+        saga = SagaConcurrente()
+
+        saga.procesar_evento(Abierta())
+        assert saga.publicados == [EjecutarA, EjecutarB]
+        saga.procesar_evento(PasoBListo())
+        assert saga.publicados == [EjecutarA, EjecutarB]
+        saga.procesar_evento(PasoAListo())
+        assert saga.publicados == [EjecutarA, EjecutarB, EjecutarC]
+        saga.procesar_evento(PasoCListo())
+        assert saga.terminada
+
+    def test_coordinador_compensa_la_rama_completada(self):
+        saga = SagaConcurrente()
+
+        saga.procesar_evento(Abierta())
+        saga.procesar_evento(PasoAListo())
+        saga.procesar_evento(PasoBFallo())
+
+        assert saga.publicados[2:] == [DeshacerA, DeshacerInicio]